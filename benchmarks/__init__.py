@@ -0,0 +1,28 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+benchmarks — timing of the manafirewall hot paths against an in-process
+fake firewalld.
+
+    python3 -m benchmarks [--zones 1000] [--services 500] [--entries 100000]
+                          [--latency 0.2] [--repeat 5] [-o result.json]
+
+fakefirewall.FakeFirewallClient implements the FirewallClient subset used
+by the model, counting every call and sleeping a configurable latency per
+call to stand for the D-Bus round trip. datasets builds synthetic
+configurations of any size. paths replays, through ManaFirewallModel, the
+reads and the work done by the main dialog hot paths, without the
+widgets. The result is JSON, wall time and call counts per path, to be
+compared across commits.
+
+dbusservice is a fake firewalld D-Bus service, seeded from a dataset or a
+fixture configuration tree, and dbusharness runs the real
+firewall.client against it on a private bus to measure call latency,
+read throughput and signal storms end to end.
+
+Not installed, run from the source tree.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
@@ -0,0 +1,171 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+Runs the benchmarks and prints, or writes, the JSON results:
+
+    {"format": "manafirewall-benchmark", "version": 1, "python": ...,
+     "dataset": {sizes}, "latency_ms": ..., "repeat": ...,
+     "paths": {name: {"cold": {"wall_s": median, "min_s": ..., "calls": {...},
+                               "total_calls": n},
+                      "warm": {...}}}}
+
+cold runs start from empty model caches, as after a connection or a
+reload; warm runs follow a first one, as when the tab is shown again.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from manafirewall import model
+
+from benchmarks import datasets, fakefirewall, paths
+
+RESULT_FORMAT = 'manafirewall-benchmark'
+RESULT_VERSION = 1
+
+
+def _measure(fw, function, repeat, before=None):
+    '''Run function repeat times, returns the timings and the calls of
+    the last run.'''
+    times = []
+    for _i in range(repeat):
+        if before is not None:
+            before()
+        fw.resetCalls()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    calls = dict(sorted(fw.calls.items()))
+    return {
+        'wall_s':      statistics.median(times),
+        'min_s':       min(times),
+        'calls':       calls,
+        'total_calls': sum(calls.values()),
+    }
+
+
+def runPath(fw_model, name, items, runtime, repeat):
+    function, category, _tab = paths.PATHS[name]
+    view = paths.View(fw_model, runtime, items.get(category))
+    if category is not None and view.item is None:
+        return None
+
+    def invalidate():
+        fw_model._onCacheInvalidated(None, None)
+
+    cold = _measure(fw_model.fw, lambda: function(view), repeat, invalidate)
+    function(view)
+    warm = _measure(fw_model.fw, lambda: function(view), repeat)
+    view.close()
+    return {'cold': cold, 'warm': warm}
+
+
+def runDrain(fw_model, items, events, repeat):
+    '''
+    doSomethingIntoLoop(): firewalld signals of many zones queued, then
+    dispatched 20 per tick; the ports tab of the selected zone is shown,
+    its _onRightPaneZoneEvent reads the zone settings again.
+    '''
+    fw = fw_model.fw
+    router = fw_model.router
+    zones = sorted(fw.dataset.runtime['zones'])
+    view = paths.View(fw_model, True, items['zones'])
+    paths.PATHS['zone/ports'][0](view)
+    ticks = []
+
+    def post():
+        for i in range(events):
+            zone = zones[i % len(zones)]
+            if i % 2 == 0:
+                fw.emit('port-added', zone, str(20000 + i // 2), 'tcp', 0)
+            else:
+                fw.emit('port-removed', zone, str(20000 + i // 2), 'tcp')
+
+    def drain():
+        count = 0
+        while router.pending():
+            view.dialog.doSomethingIntoLoop()
+            count += 1
+        ticks.append(count)
+
+    result = _measure(fw, drain, repeat, post)
+    view.close()
+    result['events'] = events
+    result['ticks'] = ticks[-1] if ticks else 0
+    return {'cold': result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks',
+                                     description="Time the manafirewall hot paths against a fake firewalld")
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--services', type=int, default=500)
+    parser.add_argument('--ipsets', type=int, default=10)
+    parser.add_argument('--entries', type=int, default=100000, help="IP set entries, all sets")
+    parser.add_argument('--active', type=int, default=50, help="zones with bindings")
+    parser.add_argument('--latency', type=float, default=0.2, help="per call latency, in ms")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--events', type=int, default=2000, help="signals queued for the drain path")
+    parser.add_argument('--permanent', action='store_true', help="time the permanent view")
+    parser.add_argument('--path', action='append', choices=sorted(paths.PATHS) + ['event_drain'],
+                        help="run only this path (repeatable)")
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    dataset = datasets.synthetic(zones=args.zones, services=args.services, ipsets=args.ipsets,
+                                 entries=args.entries, active=args.active)
+    fw = fakefirewall.FakeFirewallClient(dataset, latency=args.latency / 1000.0)
+    fw_model = model.ManaFirewallModel()
+    fw_model.connect(fw=fw)
+
+    # the selection: the default (active) zone, the first service, the
+    # largest IP set
+    items = {
+        'zones':    dataset.options['default_zone'] or None,
+        'services': min(dataset.runtime['services'], default=None),
+        'ipsets':   max(dataset.runtime['ipsets'],
+                        key=lambda n: len(dataset.runtime['ipsets'][n].entries), default=None),
+    }
+    runtime = not args.permanent
+
+    results = {}
+    for name in args.path or list(paths.PATHS) + ['event_drain']:
+        if name == 'event_drain':
+            result = runDrain(fw_model, items, args.events, args.repeat) if items['zones'] else None
+        else:
+            result = runPath(fw_model, name, items, runtime, args.repeat)
+        if result is not None:
+            results[name] = result
+            print("%-22s cold %9.3f ms %6d calls" % (name, result['cold']['wall_s'] * 1000,
+                                                     result['cold']['total_calls']), file=sys.stderr)
+
+    document = {
+        'format':     RESULT_FORMAT,
+        'version':    RESULT_VERSION,
+        'time':       time.time(),
+        'python':     platform.python_version(),
+        'dataset':    dataset.sizes(),
+        'view':       'runtime' if runtime else 'permanent',
+        'latency_ms': args.latency,
+        'repeat':     args.repeat,
+        'paths':      results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+datasets — synthetic firewalld configurations for the benchmarks.
+
+A Dataset holds the runtime and permanent views as {category: {name:
+snapshot}}, the active zone bindings and the global options. synthetic()
+builds one of any size; the content is deterministic, so that two runs
+with the same arguments time the same work. fromTree() loads a fixture,
+a firewalld configuration tree as read by offline.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+from manafirewall import snapshot
+
+ICMP_TYPES = ('echo-reply', 'echo-request', 'destination-unreachable', 'time-exceeded',
+              'parameter-problem', 'redirect', 'router-advertisement', 'router-solicitation')
+
+
+class Dataset:
+    '''Configuration served by fakefirewall.FakeFirewallClient.'''
+
+    def __init__(self, runtime, permanent=None, active_zones=None, options=None):
+        self.runtime = runtime
+        # the views share every object until one of them changes
+        self.permanent = permanent if permanent is not None else \
+            {category: dict(objects) for category, objects in runtime.items()}
+        self.active_zones = active_zones or {}
+        self.options = options or {}
+
+    def sizes(self):
+        '''Object and entry counts, as reported with the results.'''
+        sizes = {category: len(objects) for category, objects in self.runtime.items()}
+        sizes['ipset_entries'] = sum(len(o.entries) for o in self.runtime['ipsets'].values())
+        sizes['active_zones'] = len(self.active_zones)
+        return sizes
+
+
+def _ipsetEntries(index, count):
+    # 10.<set>.x.y, unique up to 65536 entries per set, then /32 networks
+    # of 172.16/12
+    entries = []
+    for i in range(count):
+        if i < 65536:
+            entries.append("10.%d.%d.%d" % (index % 256, i // 256, i % 256))
+        else:
+            j = i - 65536
+            entries.append("172.%d.%d.%d/32" % (16 + j // 65536 % 16, j // 256 % 256, j % 256))
+    return entries
+
+
+def synthetic(zones=1000, services=500, ipsets=10, entries=100000, active=50,
+              rules_per_zone=5):
+    '''
+    Build a Dataset: zones with rules_per_zone services, ports and rich
+    rules each, services with a few ports, ipsets sharing entries IP set
+    entries (the first holds half of them), the first active zones bound
+    to an interface and a source.
+    '''
+    service_names = ["svc%04d" % i for i in range(services)]
+    service_objects = {
+        name: snapshot.ServiceSnapshot(
+            name, short=name.upper(), description="Synthetic service %s" % name,
+            ports=[(str(1024 + i), 'tcp'), (str(1024 + i), 'udp')],
+            protocols=['gre'] if i % 50 == 0 else [],
+            modules=[], destinations={}, includes=[], helpers=[])
+        for i, name in enumerate(service_names)}
+
+    zone_objects = {}
+    for i in range(zones):
+        name = "zone%04d" % i
+        zone_objects[name] = snapshot.ZoneSnapshot(
+            name, short=name.capitalize(), description="Synthetic zone %s" % name,
+            target='default',
+            services=[service_names[(i + k) % services] for k in range(rules_per_zone)] if services else [],
+            ports=[(str(8000 + k), 'tcp') for k in range(rules_per_zone)],
+            protocols=[], source_ports=[],
+            forward_ports=[(str(9000 + k), 'tcp', str(80 + k), '') for k in range(rules_per_zone // 2)],
+            icmp_blocks=list(ICMP_TYPES[:i % 3]), icmp_block_inversion=False,
+            masquerade=i % 2 == 0,
+            interfaces=[], sources=[],
+            rich_rules=['rule family="ipv4" source address="192.168.%d.%d" accept' % (i % 256, k)
+                        for k in range(rules_per_zone)])
+
+    ipset_objects = {}
+    if ipsets:
+        rest = entries - entries // 2
+        sizes = [entries // 2] + [rest // (ipsets - 1) + (i < rest % (ipsets - 1))
+                                  for i in range(ipsets - 1)] if ipsets > 1 else [entries]
+        for i, size in enumerate(sizes):
+            name = "set%03d" % i
+            ipset_objects[name] = snapshot.IPSetSnapshot(
+                name, short=name, description="", type='hash:net',
+                options={'family': 'inet'}, entries=_ipsetEntries(i, size))
+
+    icmp_objects = {name: snapshot.IcmpTypeSnapshot(name, short=name, destinations=['ipv4', 'ipv6'])
+                    for name in ICMP_TYPES}
+    helper_objects = {'ftp': snapshot.HelperSnapshot('ftp', family='', module='nf_conntrack_ftp',
+                                                     ports=[('21', 'tcp')])}
+
+    zone_names = sorted(zone_objects)
+    active_zones = {name: {'interfaces': ['eth%d' % i], 'sources': ['10.255.%d.0/24' % i]}
+                    for i, name in enumerate(zone_names[:active])}
+    options = {
+        'default_zone':      zone_names[0] if zone_names else '',
+        'log_denied':        'off',
+        'automatic_helpers': 'no',
+        'panic':             False,
+    }
+    runtime = {
+        'zones':     zone_objects,
+        'services':  service_objects,
+        'ipsets':    ipset_objects,
+        'icmptypes': icmp_objects,
+        'helpers':   helper_objects,
+    }
+    return Dataset(runtime, active_zones=active_zones, options=options)
+
+
+def fromTree(root):
+    '''
+    Build a Dataset from a firewalld configuration tree (see
+    offline.configDirs), as firewalld would load it at start.
+    '''
+    from manafirewall import offline
+    client = offline.OfflineClient(root)
+    runtime = {category: {name: client.store.read(category, name)
+                          for name in client.store.names(category)}
+               for category in snapshot.CLASSES}
+    options = {
+        'default_zone':      client.getDefaultZone(),
+        'log_denied':        client.getLogDenied(),
+        'automatic_helpers': client.getAutomaticHelpers(),
+        'panic':             False,
+    }
+    return Dataset(runtime, active_zones=client.getActiveZones(), options=options)
@@ -0,0 +1,252 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+dbusharness — end-to-end measures of the real firewall.client over a bus,
+against the fake firewalld of dbusservice.
+
+    python3 -m benchmarks.dbusharness [--tree ROOT | --zones N ...] [--calls 1000]
+                                      [--storm 5000] [-o result.json]
+
+A dbus-daemon with a private configuration is started, the fake service
+owns org.fedoraproject.FirewallD1 on it and the client finds it through
+DBUS_SYSTEM_BUS_ADDRESS, so neither the system bus nor the host firewall
+are touched. Measured:
+
+ - latency: per call time of a small read (getDefaultZone) and of a zone
+   settings read;
+ - throughput: a whole runtime and permanent view read with
+   ManaFirewallModel.configSnapshot(), objects per second;
+ - signal storms: the service emits bursts of zone port, IP set entry and
+   config zone signals, the time until the model has posted all of them
+   to the router (D-Bus and GLib thread cost) and the time to dispatch
+   them 20 per tick as doSomethingIntoLoop does.
+
+dbus-python, PyGObject and firewalld's python module are needed.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import dbusservice
+
+BUS_CONFIG = '''<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>session</type>
+  <listen>unix:dir=%s</listen>
+  <policy context="default">
+    <allow send_destination="*" eavesdrop="true"/>
+    <allow eavesdrop="true"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+'''
+
+# events the model posts for each storm kind
+STORM_EVENTS = {
+    'ports':   ('port-added', 'port-removed'),
+    'entries': ('ipset-entry-added', 'ipset-entry-removed'),
+    'config':  ('config-zone-updated',),
+}
+
+
+class PrivateBus:
+    '''A dbus-daemon of its own, with the fake firewalld on it; a context
+    manager, the address is in address.'''
+
+    def __init__(self, service_args=(), timeout=30):
+        self.service_args = list(service_args)
+        self.timeout = timeout
+        self.address = None
+        self._dir = None
+        self._daemon = None
+        self._service = None
+
+    def __enter__(self):
+        self._dir = tempfile.mkdtemp(prefix='manafirewall-bus-')
+        config = os.path.join(self._dir, 'bus.conf')
+        with open(config, 'w') as f:
+            f.write(BUS_CONFIG % self._dir)
+        self._daemon = subprocess.Popen(
+            ['dbus-daemon', '--config-file=' + config, '--nofork', '--print-address=1'],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        self.address = self._daemon.stdout.readline().strip()
+        if not self.address:
+            self.__exit__(None, None, None)
+            raise RuntimeError("dbus-daemon did not start")
+        self._service = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.dbusservice', '--address', self.address] + self.service_args,
+            stdout=subprocess.PIPE, universal_newlines=True)
+        # building a large dataset takes a while
+        if self._service.stdout.readline().strip() != 'ready':
+            self.__exit__(None, None, None)
+            raise RuntimeError("the fake firewalld did not start")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for process in (self._service, self._daemon):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(self.timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        return False
+
+
+def _timings(times):
+    times = sorted(times)
+    return {
+        'calls':    len(times),
+        'median_s': statistics.median(times),
+        'p95_s':    times[int(len(times) * 0.95) - 1] if len(times) >= 20 else times[-1],
+        'min_s':    times[0],
+    }
+
+
+def measureLatency(fw, zone, calls):
+    result = {}
+    for name, call in (('getDefaultZone', fw.getDefaultZone),
+                       ('getZoneSettings', lambda: fw.getZoneSettings(zone))):
+        times = []
+        for _i in range(calls):
+            start = time.perf_counter()
+            call()
+            times.append(time.perf_counter() - start)
+        result[name] = _timings(times)
+    return result
+
+
+def measureThroughput(fw_model):
+    result = {}
+    for view, runtime in (('runtime', True), ('permanent', False)):
+        fw_model._onCacheInvalidated(None, None)
+        start = time.perf_counter()
+        config = fw_model.configSnapshot(runtime)
+        elapsed = time.perf_counter() - start
+        objects = sum(len(getattr(config, c)) for c in config.CATEGORIES)
+        result[view] = {'wall_s': elapsed, 'objects': objects,
+                        'objects_per_s': objects / elapsed if elapsed else None}
+    return result
+
+
+def measureStorm(bus, fw_model, kind, count, timeout):
+    '''Ask for a storm and follow it up to the router and the dispatch.'''
+    import dbus
+    router = fw_model.router
+    received = []
+    tokens = [router.subscribe(event, lambda event, value: received.append(event))
+              for event in STORM_EVENTS[kind]]
+    test = dbus.Interface(bus.get_object(dbusservice.BUS_NAME, dbusservice.DBUS_PATH),
+                          dbus_interface=dbusservice.TEST_INTERFACE)
+    while router.dispatch(1000):
+        pass
+    start = time.perf_counter()
+    emit_s = float(test.EmitStorm(kind, count))
+    # posted by the GLib thread, pending() counts them
+    deadline = start + timeout
+    depth = []
+    while router.pending() < count and time.perf_counter() < deadline:
+        depth.append(router.pending())
+        time.sleep(0.001)
+    delivered_s = time.perf_counter() - start
+    posted = router.pending()
+    start = time.perf_counter()
+    ticks = 0
+    while router.dispatch(20):
+        ticks += 1
+    drain_s = time.perf_counter() - start
+    router.unsubscribeAll(tokens)
+    return {
+        'signals':     count,
+        'posted':      posted,
+        'handled':     len(received),
+        'emit_s':      emit_s,
+        'delivered_s': delivered_s,
+        'signals_per_s': posted / delivered_s if delivered_s else None,
+        'drain_s':     drain_s,
+        'ticks':       ticks,
+    }
+
+
+def run(address, args):
+    os.environ['DBUS_SYSTEM_BUS_ADDRESS'] = address
+    import dbus
+    import dbus.mainloop.glib
+    from gi.repository import GLib
+    from firewall import client
+    from manafirewall import model
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    # signals are received in a GLib thread, as in the text mode UI
+    loop = GLib.MainLoop()
+    thread = threading.Thread(target=loop.run, daemon=True)
+    thread.start()
+    try:
+        fw_model = model.ManaFirewallModel()
+        fw = fw_model.connect(fw=client.FirewallClient())
+        if not fw.connected:
+            raise RuntimeError("cannot connect to the fake firewalld on %s" % address)
+        zone = fw.getDefaultZone()
+        result = {
+            'latency':    measureLatency(fw, zone, args.calls),
+            'throughput': measureThroughput(fw_model),
+            'storms':     {kind: measureStorm(fw.bus, fw_model, kind, args.storm, args.timeout)
+                           for kind in STORM_EVENTS},
+        }
+    finally:
+        loop.quit()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.dbusharness',
+                                     description="Measure the firewalld client over a private bus")
+    dbusservice.addDatasetArguments(parser)
+    parser.add_argument('--calls', type=int, default=1000, help="calls per latency measure")
+    parser.add_argument('--storm', type=int, default=5000, help="signals per storm")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for a storm")
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    service_args = ['--zones', str(args.zones), '--services', str(args.services),
+                    '--ipsets', str(args.ipsets), '--entries', str(args.entries)]
+    if args.tree:
+        service_args = ['--tree', args.tree]
+    with PrivateBus(service_args) as bus:
+        result = run(bus.address, args)
+
+    document = {
+        'format':  'manafirewall-dbus-benchmark',
+        'version': 1,
+        'time':    time.time(),
+        'python':  platform.python_version(),
+        'dataset': dbusservice.datasetFromArguments(args).sizes(),
+    }
+    document.update(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,768 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+dbusservice — test only org.fedoraproject.FirewallD1 service, serving a
+datasets.Dataset on a private bus.
+
+    python3 -m benchmarks.dbusservice --address ADDRESS (--tree ROOT | [--zones N ...])
+
+It never touches the host firewall: it is started by dbusharness on the
+bus of a dbus-daemon of its own, the real firewall.client.FirewallClient
+is pointed at it through DBUS_SYSTEM_BUS_ADDRESS.
+
+Implemented, on the firewalld object paths and interfaces:
+
+ - the reads of the main, zone and ipset interfaces used by the model
+   (names, settings in both the tuple and the settings2 dictionary form,
+   active zones, global options, properties);
+ - zone service, port, protocol and source port add/remove/query, IP set
+   entry add/remove/query/get/set, the global option setters, panic mode
+   and reload, emitting the firewalld signals;
+ - the config interface (names, ByName object paths) and the config
+   objects (getSettings, getSettings2, update, update2, properties),
+   emitting Updated.
+
+The org.manatools.ManaFirewall.Test interface adds the signal storms used
+by the harness: EmitStorm(kind, count) emits count signals as fast as
+possible, kind being 'ports' (zone PortAdded/PortRemoved), 'entries'
+(ipset EntryAdded/EntryRemoved) or 'config' (config zone Updated).
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import logging
+import sys
+import time
+
+import dbus
+import dbus.mainloop.glib
+import dbus.service
+from gi.repository import GLib
+
+from benchmarks import datasets
+from manafirewall import snapshot
+
+logger = logging.getLogger('manafirewall.benchmarks.dbusservice')
+
+BUS_NAME = 'org.fedoraproject.FirewallD1'
+DBUS_PATH = '/org/fedoraproject/FirewallD1'
+DBUS_PATH_CONFIG = DBUS_PATH + '/config'
+DBUS_INTERFACE = 'org.fedoraproject.FirewallD1'
+DBUS_INTERFACE_ZONE = DBUS_INTERFACE + '.zone'
+DBUS_INTERFACE_IPSET = DBUS_INTERFACE + '.ipset'
+DBUS_INTERFACE_CONFIG = DBUS_INTERFACE + '.config'
+TEST_INTERFACE = 'org.manatools.ManaFirewall.Test'
+
+# emulated firewalld version
+VERSION = '1.3.0'
+
+# category -> (config interface and path part, settings tuple fields,
+#              tuple signature); None stands for an unused field
+SETTINGS = {
+    'zones': ('zone', (
+        'version', 'short', 'description', None, 'target', 'services', 'ports',
+        'icmp_blocks', 'masquerade', 'forward_ports', 'interfaces', 'sources',
+        'rich_rules', 'protocols', 'source_ports', 'icmp_block_inversion'),
+        '(sssbsasa(ss)asba(ssss)asasasasa(ss)b)'),
+    'services': ('service', (
+        'version', 'short', 'description', 'ports', 'modules', 'destinations',
+        'protocols', 'source_ports', 'includes', 'helpers'),
+        '(sssa(ss)asa{ss}asa(ss)asas)'),
+    'ipsets': ('ipset', (
+        'version', 'short', 'description', 'type', 'options', 'entries'),
+        '(ssssa{ss}as)'),
+    'icmptypes': ('icmptype', (
+        'version', 'short', 'description', 'destinations'),
+        '(sssas)'),
+    'helpers': ('helper', (
+        'version', 'short', 'description', 'family', 'module', 'ports'),
+        '(sssssa(ss))'),
+}
+
+# settings2 dictionaries: category -> ((key, attribute, D-Bus signature),)
+SETTINGS2 = {
+    'zones': (
+        ('version', 'version', 's'), ('short', 'short', 's'),
+        ('description', 'description', 's'), ('target', 'target', 's'),
+        ('services', 'services', 'as'), ('ports', 'ports', 'a(ss)'),
+        ('icmp_blocks', 'icmp_blocks', 'as'), ('masquerade', 'masquerade', 'b'),
+        ('forward_ports', 'forward_ports', 'a(ssss)'), ('interfaces', 'interfaces', 'as'),
+        ('sources', 'sources', 'as'), ('rules_str', 'rich_rules', 'as'),
+        ('protocols', 'protocols', 'as'), ('source_ports', 'source_ports', 'a(ss)'),
+        ('icmp_block_inversion', 'icmp_block_inversion', 'b')),
+    'services': (
+        ('version', 'version', 's'), ('short', 'short', 's'),
+        ('description', 'description', 's'), ('ports', 'ports', 'a(ss)'),
+        ('module_names', 'modules', 'as'), ('destination', 'destinations', 'a{ss}'),
+        ('protocols', 'protocols', 'as'), ('source_ports', 'source_ports', 'a(ss)'),
+        ('includes', 'includes', 'as'), ('helpers', 'helpers', 'as')),
+}
+
+# zone element -> (snapshot attribute, arguments after the zone)
+ZONE_ELEMENTS = {
+    'Service':    ('services', 1),
+    'Port':       ('ports', 2),
+    'Protocol':   ('protocols', 1),
+    'SourcePort': ('source_ports', 2),
+}
+
+IPSET_TYPES = ['hash:ip', 'hash:ip,mark', 'hash:ip,port', 'hash:ip,port,ip',
+               'hash:ip,port,net', 'hash:mac', 'hash:net', 'hash:net,iface',
+               'hash:net,net', 'hash:net,port', 'hash:net,port,net']
+
+
+# boolean scalars, False when unset
+BOOLEANS = ('masquerade', 'icmp_block_inversion')
+
+
+def _value(obj, attr):
+    '''Field of a snapshot as plain lists and dictionaries.'''
+    kind = {a: k for a, _suffix, k in obj.FIELDS}[attr]
+    value = getattr(obj, attr)
+    if kind == snapshot.SET:
+        return sorted(value)
+    if kind == snapshot.MAP:
+        return dict(value)
+    if value is None:
+        return False if attr in BOOLEANS else ''
+    return value
+
+
+def toTuple(category, obj):
+    return tuple(False if attr is None else _value(obj, attr) for attr in SETTINGS[category][1])
+
+
+def fromTuple(category, name, values):
+    return snapshot.CLASSES[category](name, **{
+        attr: value for attr, value in zip(SETTINGS[category][1], values) if attr is not None})
+
+
+def toSettings2(category, obj):
+    settings = dbus.Dictionary({}, signature='sv')
+    for key, attr, signature in SETTINGS2[category]:
+        value = _value(obj, attr)
+        if signature.startswith('a{'):
+            value = dbus.Dictionary(value, signature=signature[2:-1])
+        elif signature.startswith('a'):
+            value = dbus.Array(value, signature=signature[1:])
+        elif signature == 'b':
+            value = dbus.Boolean(value)
+        else:
+            value = dbus.String(value)
+        settings[key] = value
+    return settings
+
+
+def fromSettings2(category, obj, settings):
+    changes = {attr: settings[key] for key, attr, _signature in SETTINGS2[category] if key in settings}
+    return obj.replace(**changes)
+
+
+class PropertiesObject(dbus.service.Object):
+    '''Object with org.freedesktop.DBus.Properties of a fixed dictionary
+    per interface, see properties().'''
+
+    def properties(self, interface):
+        return {}
+
+    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature='ss', out_signature='v')
+    def Get(self, interface, prop):
+        try:
+            return self.properties(interface)[prop]
+        except KeyError:
+            raise dbus.exceptions.DBusException("%s.%s: no such property" % (interface, prop),
+                                                name='org.freedesktop.DBus.Error.InvalidArgs')
+
+    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature='s', out_signature='a{sv}')
+    def GetAll(self, interface):
+        return dbus.Dictionary(self.properties(interface), signature='sv')
+
+
+def _configClass(category):
+    '''
+    Config object class of a category, its methods are on
+    DBUS_INTERFACE_CONFIG.<kind>. Built with the metaclass since dbus
+    registers the methods of a class by its name.
+    '''
+    kind, _fields, signature = SETTINGS[category]
+    interface = DBUS_INTERFACE_CONFIG + '.' + kind
+
+    def __init__(self, service, path, name):
+        dbus.service.Object.__init__(self, service.bus, path)
+        self.service = service
+        self.name = name
+
+    def obj(self):
+        return self.service.dataset.permanent[category][self.name]
+
+    def properties(self, iface):
+        if iface != interface:
+            return {}
+        return {'name': self.name, 'filename': self.name + '.xml',
+                'path': '/etc/firewalld/%ss' % kind, 'builtin': False, 'default': False}
+
+    @dbus.service.method(interface, out_signature=signature)
+    def getSettings(self):
+        self.service.delay()
+        return toTuple(category, self.obj())
+
+    @dbus.service.method(interface, in_signature=signature)
+    def update(self, settings):
+        self.service.delay()
+        self.service.dataset.permanent[category][self.name] = fromTuple(category, self.name, settings)
+        self.Updated(self.name)
+
+    @dbus.service.method(interface, out_signature='a{sv}')
+    def getSettings2(self):
+        self.service.delay()
+        return toSettings2(category, self.obj())
+
+    @dbus.service.method(interface, in_signature='a{sv}')
+    def update2(self, settings):
+        self.service.delay()
+        self.service.dataset.permanent[category][self.name] = fromSettings2(category, self.obj(), settings)
+        self.Updated(self.name)
+
+    @dbus.service.signal(interface, signature='s')
+    def Updated(self, name):
+        pass
+
+    @dbus.service.signal(interface, signature='s')
+    def Removed(self, name):
+        pass
+
+    @dbus.service.signal(interface, signature='s')
+    def Renamed(self, name):
+        pass
+
+    namespace = {'__module__': __name__, '__init__': __init__, 'obj': obj,
+                 'properties': properties, 'getSettings': getSettings, 'update': update,
+                 'Updated': Updated, 'Removed': Removed, 'Renamed': Renamed}
+    if category in SETTINGS2:
+        namespace.update(getSettings2=getSettings2, update2=update2)
+    return type(PropertiesObject)('Config%sObject' % kind.capitalize(), (PropertiesObject,), namespace)
+
+
+CONFIG_CLASSES = {category: _configClass(category) for category in SETTINGS}
+
+
+class FakeFirewallDConfig(PropertiesObject):
+    '''/org/fedoraproject/FirewallD1/config: object paths by name.'''
+
+    def __init__(self, service):
+        dbus.service.Object.__init__(self, service.bus, DBUS_PATH_CONFIG)
+        self.service = service
+        # (category, name) -> config object, created on first use
+        self.objects = {}
+
+    def properties(self, interface):
+        if interface != DBUS_INTERFACE_CONFIG:
+            return {}
+        options = self.service.dataset.options
+        return {'DefaultZone': options['default_zone'], 'LogDenied': options['log_denied'],
+                'AutomaticHelpers': options['automatic_helpers']}
+
+    def object(self, category, name):
+        obj = self.objects.get((category, name))
+        if obj is None:
+            if name not in self.service.dataset.permanent[category]:
+                raise dbus.exceptions.DBusException("INVALID_%s: %s" % (SETTINGS[category][0].upper(), name),
+                                                    name=DBUS_INTERFACE + '.Exception')
+            path = '%s/%s/%d' % (DBUS_PATH_CONFIG, SETTINGS[category][0], len(self.objects))
+            obj = CONFIG_CLASSES[category](self.service, path, name)
+            self.objects[(category, name)] = obj
+        return obj
+
+    def _names(self, category):
+        self.service.delay()
+        return sorted(self.service.dataset.permanent[category])
+
+    def _byName(self, category, name):
+        self.service.delay()
+        return dbus.ObjectPath(self.object(category, name).__dbus_object_path__)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='as')
+    def getZoneNames(self):
+        return self._names('zones')
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='as')
+    def getServiceNames(self):
+        return self._names('services')
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='as')
+    def getIPSetNames(self):
+        return self._names('ipsets')
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='as')
+    def getIcmpTypeNames(self):
+        return self._names('icmptypes')
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='as')
+    def getHelperNames(self):
+        return self._names('helpers')
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, in_signature='s', out_signature='o')
+    def getZoneByName(self, name):
+        return self._byName('zones', name)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, in_signature='s', out_signature='o')
+    def getServiceByName(self, name):
+        return self._byName('services', name)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, in_signature='s', out_signature='o')
+    def getIPSetByName(self, name):
+        return self._byName('ipsets', name)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, in_signature='s', out_signature='o')
+    def getIcmpTypeByName(self, name):
+        return self._byName('icmptypes', name)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, in_signature='s', out_signature='o')
+    def getHelperByName(self, name):
+        return self._byName('helpers', name)
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='ao')
+    def listZones(self):
+        return [self._byName('zones', name) for name in self._names('zones')]
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='ao')
+    def listServices(self):
+        return [self._byName('services', name) for name in self._names('services')]
+
+    @dbus.service.method(DBUS_INTERFACE_CONFIG, out_signature='ao')
+    def getIPSets(self):
+        return [self._byName('ipsets', name) for name in self._names('ipsets')]
+
+    @dbus.service.signal(DBUS_INTERFACE_CONFIG, signature='s')
+    def ZoneAdded(self, name):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_CONFIG, signature='s')
+    def ServiceAdded(self, name):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_CONFIG, signature='s')
+    def IPSetAdded(self, name):
+        pass
+
+
+class FakeFirewallD(PropertiesObject):
+    '''/org/fedoraproject/FirewallD1, see the module documentation.'''
+
+    def __init__(self, bus, dataset, latency=0.0):
+        self.bus = bus
+        self.dataset = dataset
+        self.latency = latency
+        dbus.service.Object.__init__(self, bus, DBUS_PATH)
+        self.config = FakeFirewallDConfig(self)
+
+    def delay(self):
+        '''Added service time, 0 by default: the bus is what is measured.'''
+        if self.latency:
+            time.sleep(self.latency)
+
+    def properties(self, interface):
+        if interface != DBUS_INTERFACE:
+            return {}
+        return {
+            'version': VERSION, 'interface_version': '1.0', 'state': 'RUNNING',
+            'IPv4': True, 'IPv6': True, 'IPv6_rpfilter': True, 'BRIDGE': True,
+            'IPSet': True, 'IPSetTypes': dbus.Array(IPSET_TYPES, signature='s'),
+            'nf_conntrack_helper_setting': False,
+            'nf_conntrack_helpers': dbus.Dictionary({}, signature='sas'),
+            'nf_nat_helpers': dbus.Dictionary({}, signature='sas'),
+            'IPv4ICMPTypes': dbus.Array(sorted(self.dataset.runtime['icmptypes']), signature='s'),
+            'IPv6ICMPTypes': dbus.Array(sorted(self.dataset.runtime['icmptypes']), signature='s'),
+        }
+
+    def _runtime(self, category, name):
+        self.delay()
+        try:
+            return self.dataset.runtime[category][name]
+        except KeyError:
+            raise dbus.exceptions.DBusException("INVALID_%s: %s" % (SETTINGS[category][0].upper(), name),
+                                                name=DBUS_INTERFACE + '.Exception')
+
+    def _names(self, category):
+        self.delay()
+        return sorted(self.dataset.runtime[category])
+
+    # main interface: globals
+
+    @dbus.service.method(DBUS_INTERFACE)
+    def authorizeAll(self):
+        pass
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='s')
+    def getDefaultZone(self):
+        self.delay()
+        return self.dataset.options['default_zone']
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s')
+    def setDefaultZone(self, zone):
+        self._runtime('zones', zone)
+        self.dataset.options['default_zone'] = zone
+        self.DefaultZoneChanged(zone)
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='s')
+    def getLogDenied(self):
+        self.delay()
+        return self.dataset.options['log_denied']
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s')
+    def setLogDenied(self, value):
+        self.delay()
+        self.dataset.options['log_denied'] = value
+        self.LogDeniedChanged(value)
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='s')
+    def getAutomaticHelpers(self):
+        self.delay()
+        return self.dataset.options['automatic_helpers']
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s')
+    def setAutomaticHelpers(self, value):
+        self.delay()
+        self.dataset.options['automatic_helpers'] = value
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='b')
+    def queryPanicMode(self):
+        self.delay()
+        return self.dataset.options['panic']
+
+    @dbus.service.method(DBUS_INTERFACE)
+    def enablePanicMode(self):
+        self.dataset.options['panic'] = True
+        self.PanicModeEnabled()
+
+    @dbus.service.method(DBUS_INTERFACE)
+    def disablePanicMode(self):
+        self.dataset.options['panic'] = False
+        self.PanicModeDisabled()
+
+    @dbus.service.method(DBUS_INTERFACE)
+    def reload(self):
+        # firewalld loads the permanent configuration
+        self.delay()
+        self.dataset.runtime = {category: dict(objects)
+                                for category, objects in self.dataset.permanent.items()}
+        self.Reloaded()
+
+    @dbus.service.method(DBUS_INTERFACE)
+    def runtimeToPermanent(self):
+        self.delay()
+        self.dataset.permanent = {category: dict(objects)
+                                  for category, objects in self.dataset.runtime.items()}
+
+    # main interface: services, ICMP types, helpers, zone settings
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='as')
+    def listServices(self):
+        return self._names('services')
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s', out_signature=SETTINGS['services'][2])
+    def getServiceSettings(self, name):
+        return toTuple('services', self._runtime('services', name))
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s', out_signature='a{sv}')
+    def getServiceSettings2(self, name):
+        return toSettings2('services', self._runtime('services', name))
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='as')
+    def listIcmpTypes(self):
+        return self._names('icmptypes')
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s', out_signature=SETTINGS['icmptypes'][2])
+    def getIcmpTypeSettings(self, name):
+        return toTuple('icmptypes', self._runtime('icmptypes', name))
+
+    @dbus.service.method(DBUS_INTERFACE, out_signature='as')
+    def getHelpers(self):
+        return self._names('helpers')
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s', out_signature=SETTINGS['helpers'][2])
+    def getHelperSettings(self, name):
+        return toTuple('helpers', self._runtime('helpers', name))
+
+    @dbus.service.method(DBUS_INTERFACE, in_signature='s', out_signature=SETTINGS['zones'][2])
+    def getZoneSettings(self, name):
+        return toTuple('zones', self._runtime('zones', name))
+
+    # zone interface
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, out_signature='as')
+    def getZones(self):
+        return self._names('zones')
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='s', out_signature='a{sv}')
+    def getZoneSettings2(self, name):
+        return toSettings2('zones', self._runtime('zones', name))
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, out_signature='a{sa{sas}}')
+    def getActiveZones(self):
+        self.delay()
+        return dbus.Dictionary({zone: dbus.Dictionary({kind: dbus.Array(values, signature='s')
+                                                       for kind, values in data.items()}, signature='sas')
+                                for zone, data in self.dataset.active_zones.items()}, signature='sa{sas}')
+
+    def _element(self, action, element, zone, args):
+        attr, _count = ZONE_ELEMENTS[element]
+        obj = self._runtime('zones', zone)
+        value = tuple(args) if len(args) > 1 else args[0]
+        values = getattr(obj, attr)
+        if action == 'query':
+            return value in values
+        if action == 'add':
+            if value in values:
+                raise dbus.exceptions.DBusException("ALREADY_ENABLED: %s" % (value,),
+                                                    name=DBUS_INTERFACE + '.Exception')
+            values = values | {value}
+        else:
+            if value not in values:
+                raise dbus.exceptions.DBusException("NOT_ENABLED: %s" % (value,),
+                                                    name=DBUS_INTERFACE + '.Exception')
+            values = values - {value}
+        self.dataset.runtime['zones'][zone] = obj.replace(**{attr: values})
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ssi', out_signature='s')
+    def addService(self, zone, service, timeout):
+        self._element('add', 'Service', zone, (service,))
+        self.ServiceAdded(zone, service, timeout)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ss', out_signature='s')
+    def removeService(self, zone, service):
+        self._element('remove', 'Service', zone, (service,))
+        self.ServiceRemoved(zone, service)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ss', out_signature='b')
+    def queryService(self, zone, service):
+        return self._element('query', 'Service', zone, (service,))
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sssi', out_signature='s')
+    def addPort(self, zone, port, protocol, timeout):
+        self._element('add', 'Port', zone, (port, protocol))
+        self.PortAdded(zone, port, protocol, timeout)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sss', out_signature='s')
+    def removePort(self, zone, port, protocol):
+        self._element('remove', 'Port', zone, (port, protocol))
+        self.PortRemoved(zone, port, protocol)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sss', out_signature='b')
+    def queryPort(self, zone, port, protocol):
+        return self._element('query', 'Port', zone, (port, protocol))
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ssi', out_signature='s')
+    def addProtocol(self, zone, protocol, timeout):
+        self._element('add', 'Protocol', zone, (protocol,))
+        self.ProtocolAdded(zone, protocol, timeout)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ss', out_signature='s')
+    def removeProtocol(self, zone, protocol):
+        self._element('remove', 'Protocol', zone, (protocol,))
+        self.ProtocolRemoved(zone, protocol)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='ss', out_signature='b')
+    def queryProtocol(self, zone, protocol):
+        return self._element('query', 'Protocol', zone, (protocol,))
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sssi', out_signature='s')
+    def addSourcePort(self, zone, port, protocol, timeout):
+        self._element('add', 'SourcePort', zone, (port, protocol))
+        self.SourcePortAdded(zone, port, protocol, timeout)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sss', out_signature='s')
+    def removeSourcePort(self, zone, port, protocol):
+        self._element('remove', 'SourcePort', zone, (port, protocol))
+        self.SourcePortRemoved(zone, port, protocol)
+        return zone
+
+    @dbus.service.method(DBUS_INTERFACE_ZONE, in_signature='sss', out_signature='b')
+    def querySourcePort(self, zone, port, protocol):
+        return self._element('query', 'SourcePort', zone, (port, protocol))
+
+    # ipset interface
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, out_signature='as')
+    def getIPSets(self):
+        return self._names('ipsets')
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='s', out_signature=SETTINGS['ipsets'][2])
+    def getIPSetSettings(self, name):
+        return toTuple('ipsets', self._runtime('ipsets', name))
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='s', out_signature='as')
+    def getEntries(self, ipset):
+        return sorted(self._runtime('ipsets', ipset).entries)
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='sas')
+    def setEntries(self, ipset, entries):
+        obj = self._runtime('ipsets', ipset)
+        self.dataset.runtime['ipsets'][ipset] = obj.replace(entries=entries)
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='ss', out_signature='b')
+    def queryEntry(self, ipset, entry):
+        return entry in self._runtime('ipsets', ipset).entries
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='ss', out_signature='s')
+    def addEntry(self, ipset, entry):
+        obj = self._runtime('ipsets', ipset)
+        self.dataset.runtime['ipsets'][ipset] = obj.replace(entries=obj.entries | {entry})
+        self.EntryAdded(ipset, entry)
+        return ipset
+
+    @dbus.service.method(DBUS_INTERFACE_IPSET, in_signature='ss', out_signature='s')
+    def removeEntry(self, ipset, entry):
+        obj = self._runtime('ipsets', ipset)
+        self.dataset.runtime['ipsets'][ipset] = obj.replace(entries=obj.entries - {entry})
+        self.EntryRemoved(ipset, entry)
+        return ipset
+
+    # test interface
+
+    @dbus.service.method(TEST_INTERFACE, in_signature='su', out_signature='d')
+    def EmitStorm(self, kind, count):
+        '''Emit count signals, returns the time it took.'''
+        start = time.monotonic()
+        if kind == 'ports':
+            zones = sorted(self.dataset.runtime['zones'])
+            for i in range(count):
+                zone, port = zones[i % len(zones)], str(20000 + i // 2)
+                if i % 2 == 0:
+                    self.PortAdded(zone, port, 'tcp', 0)
+                else:
+                    self.PortRemoved(zone, port, 'tcp')
+        elif kind == 'entries':
+            ipsets = sorted(self.dataset.runtime['ipsets'])
+            for i in range(count):
+                ipset, entry = ipsets[i % len(ipsets)], "198.18.%d.%d" % (i // 2 // 256 % 256, i // 2 % 256)
+                if i % 2 == 0:
+                    self.EntryAdded(ipset, entry)
+                else:
+                    self.EntryRemoved(ipset, entry)
+        elif kind == 'config':
+            zones = sorted(self.dataset.permanent['zones'])
+            for i in range(count):
+                zone = zones[i % len(zones)]
+                self.config.object('zones', zone).Updated(zone)
+        else:
+            raise dbus.exceptions.DBusException("Unknown storm %s" % kind,
+                                                name='org.freedesktop.DBus.Error.InvalidArgs')
+        return time.monotonic() - start
+
+    # signals
+
+    @dbus.service.signal(DBUS_INTERFACE)
+    def Reloaded(self):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE, signature='s')
+    def DefaultZoneChanged(self, zone):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE, signature='s')
+    def LogDeniedChanged(self, value):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE)
+    def PanicModeEnabled(self):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE)
+    def PanicModeDisabled(self):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='ssi')
+    def ServiceAdded(self, zone, service, timeout):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='ss')
+    def ServiceRemoved(self, zone, service):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='sssi')
+    def PortAdded(self, zone, port, protocol, timeout):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='sss')
+    def PortRemoved(self, zone, port, protocol):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='ssi')
+    def ProtocolAdded(self, zone, protocol, timeout):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='ss')
+    def ProtocolRemoved(self, zone, protocol):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='sssi')
+    def SourcePortAdded(self, zone, port, protocol, timeout):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_ZONE, signature='sss')
+    def SourcePortRemoved(self, zone, port, protocol):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_IPSET, signature='ss')
+    def EntryAdded(self, ipset, entry):
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_IPSET, signature='ss')
+    def EntryRemoved(self, ipset, entry):
+        pass
+
+
+def addDatasetArguments(parser):
+    '''Dataset options shared with the harness.'''
+    parser.add_argument('--tree', help="fixture: firewalld configuration tree (see --offline)")
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--services', type=int, default=500)
+    parser.add_argument('--ipsets', type=int, default=10)
+    parser.add_argument('--entries', type=int, default=100000)
+
+
+def datasetFromArguments(args):
+    if args.tree:
+        return datasets.fromTree(args.tree)
+    return datasets.synthetic(zones=args.zones, services=args.services,
+                              ipsets=args.ipsets, entries=args.entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.dbusservice',
+                                     description="Fake firewalld on a private bus, for tests only")
+    parser.add_argument('--address', required=True, help="address of the private bus")
+    parser.add_argument('--latency', type=float, default=0.0, help="added service time per call, in ms")
+    addDatasetArguments(parser)
+    args = parser.parse_args(argv)
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = dbus.bus.BusConnection(args.address)
+    dataset = datasetFromArguments(args)
+    service = FakeFirewallD(bus, dataset, latency=args.latency / 1000.0)
+    # the name is taken last, clients wait for it
+    name = dbus.service.BusName(BUS_NAME, bus, do_not_queue=True)
+    logger.info("Serving %s on %s", dataset.sizes(), args.address)
+    print("ready", flush=True)
+    try:
+        GLib.MainLoop().run()
+    except KeyboardInterrupt:
+        pass
+    del name, service
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
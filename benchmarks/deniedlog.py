@@ -0,0 +1,236 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+deniedlog — parsing throughput and heavy hitter accuracy of the denied
+packets viewer (see manafirewall.deniedlog).
+
+    python3 -m benchmarks.deniedlog [FILE] [--lines 200000] [--format plain|export]
+                                    [--chunk 65536] [--top-k 100] [--write-fixture FILE]
+                                    [-o result.json]
+
+Without FILE a fixture is generated: kernel log lines with the firewalld
+prefixes (iptables and nftables backends, zone and FINAL_REJECT rules)
+mixed with unrelated lines, sources and ports drawn from a Zipf like
+distribution, as plain syslog text or in the journal export format;
+--write-fixture keeps it. The file is fed through FileSource in --chunk
+sized appends, as a growing log is read, then the Space-Saving tops are
+compared with exact counts: every item counted more than total/k times
+must be reported, with a count between the exact one and count + error.
+
+The exit status is 1 if a guarantee does not hold.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from manafirewall import deniedlog
+
+ZONES = ('public', 'external', 'dmz', 'work', 'home')
+PORTS = ((22, 'TCP'), (23, 'TCP'), (80, 'TCP'), (443, 'TCP'), (445, 'TCP'), (3389, 'TCP'),
+         (53, 'UDP'), (123, 'UDP'), (161, 'UDP'), (5060, 'UDP'))
+OTHER = ('kernel: usb 1-1: new high-speed USB device number 4 using xhci_hcd',
+         'systemd[1]: Started Session 12 of User root.',
+         'NetworkManager[812]: <info>  [1706700000.1234] dhcp4 (eth0): state changed')
+
+
+def _zipf(rng, size, s=1.2):
+    # index in [0, size), small indexes more likely
+    return min(size - 1, int(rng.paretovariate(s)) - 1)
+
+
+def generate(lines, seed=1):
+    '''Yields (time, message, hit): hit is the (source, port, zone)
+    expected, None for unrelated lines.'''
+    rng = random.Random(seed)
+    start = time.time() - lines / 1000.0
+    for i in range(lines):
+        when = start + i / 1000.0
+        if rng.random() < 0.2:
+            yield when, 'kernel: ' + rng.choice(OTHER) if i % 2 else rng.choice(OTHER), None
+            continue
+        src = '203.0.%d.%d' % (_zipf(rng, 256), _zipf(rng, 250) + 1)
+        dport, proto = PORTS[_zipf(rng, len(PORTS))]
+        zone = ZONES[_zipf(rng, len(ZONES))]
+        kind = rng.random()
+        if kind < 0.05:
+            prefix, zone = 'FINAL_REJECT', None
+        elif kind < 0.5:
+            prefix = 'filter_IN_%s_REJECT' % zone
+        else:
+            prefix = 'IN_%s_DROP' % zone
+        message = ('kernel: %s: IN=eth0 OUT= MAC=52:54:00:12:34:56:52:54:00:65:43:21:08:00 '
+                   'SRC=%s DST=192.0.2.10 LEN=60 TOS=0x00 PREC=0x00 TTL=52 ID=4242 DF '
+                   'PROTO=%s SPT=%d DPT=%d WINDOW=64240 RES=0x00 SYN URGP=0 ' %
+                   (prefix, src, proto, rng.randint(1024, 65535), dport))
+        yield when, message, (src, '%d/%s' % (dport, proto.lower()), zone)
+
+
+def writeFixture(path, lines, fmt):
+    '''Writes a generated fixture, returns the exact counters.'''
+    counters = (collections.Counter(), collections.Counter(), collections.Counter())
+    with open(path, 'wb') as f:
+        for i, (when, message, hit) in enumerate(generate(lines)):
+            if fmt == 'export':
+                f.write(b'__CURSOR=s=0;i=%x\n__REALTIME_TIMESTAMP=%d\n' % (i, int(when * 1e6)))
+                data = message.encode('utf-8')
+                if i % 50 == 0:
+                    # binary field, as journald writes values with control characters
+                    f.write(b'MESSAGE\n' + len(data).to_bytes(8, 'little') + data + b'\n')
+                else:
+                    f.write(b'MESSAGE=' + data + b'\n')
+                f.write(b'_TRANSPORT=kernel\n\n')
+            else:
+                f.write((time.strftime('%b %d %H:%M:%S', time.localtime(when)) +
+                         ' host ' + message + '\n').encode('utf-8'))
+            if hit is not None:
+                for counter, item in zip(counters, hit):
+                    if item is not None:
+                        counter[item] += 1
+    return counters
+
+
+def exactCounts(path):
+    '''Exact counters of an existing fixture, by the same parser.'''
+    counters = (collections.Counter(), collections.Counter(), collections.Counter())
+    source = deniedlog.FileSource(path)
+    while True:
+        records = source.read()
+        if not records:
+            break
+        for when, message in records:
+            hit = deniedlog.parseHit(message, when)
+            if hit is not None:
+                for counter, item in zip(counters, (hit.src, hit.port(), hit.zone)):
+                    if item is not None:
+                        counter[item] += 1
+    source.close()
+    return counters
+
+
+def feed(path, chunk, top_k):
+    '''Appends path to a growing file chunk by chunk, reading it back with
+    FileSource after each append; returns (stats, seconds, reads).'''
+    stats = deniedlog.DeniedStats(top_k=top_k)
+    fd, growing = tempfile.mkstemp(prefix='manafirewall-denied-')
+    elapsed = 0.0
+    reads = 0
+    try:
+        source = deniedlog.FileSource(growing)
+        with open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            while True:
+                data = src.read(chunk)
+                if not data:
+                    break
+                dst.write(data)
+                dst.flush()
+                start = time.perf_counter()
+                records = source.read()
+                while records:
+                    stats.feed(records)
+                    records = source.read()
+                elapsed += time.perf_counter() - start
+                reads += 1
+        source.close()
+    finally:
+        os.unlink(growing)
+    return stats, elapsed, reads
+
+
+def check(name, summary, exact):
+    '''Space-Saving guarantees, returns the failures.'''
+    failures = []
+    total = sum(exact.values())
+    reported = {item: (count, error) for item, count, error in summary.top()}
+    for item, true_count in exact.items():
+        if item in reported:
+            count, error = reported[item]
+            if not (true_count <= count <= true_count + error):
+                failures.append("%s %s: counted %d (error %d), exact %d" %
+                                (name, item, count, error, true_count))
+        elif true_count > total / summary.k:
+            failures.append("%s %s: %d hits (> total/k) not reported" % (name, item, true_count))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.deniedlog',
+                                     description="Measure the denied packets log parsing")
+    parser.add_argument('file', nargs='?', help="log fixture to read, generated if missing")
+    parser.add_argument('--lines', type=int, default=200000, help="lines of the generated fixture")
+    parser.add_argument('--format', choices=('plain', 'export'), default='plain')
+    parser.add_argument('--chunk', type=int, default=65536, help="bytes appended between two reads")
+    parser.add_argument('--top-k', type=int, default=deniedlog.DEFAULT_TOP_K)
+    parser.add_argument('--write-fixture', help="keep the generated fixture in this file")
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    path = args.file
+    generated = None
+    if path:
+        exact = exactCounts(path)
+    else:
+        if args.write_fixture:
+            path = args.write_fixture
+        else:
+            fd, path = tempfile.mkstemp(prefix='manafirewall-fixture-')
+            os.close(fd)
+            generated = path
+        exact = writeFixture(path, args.lines, args.format)
+    try:
+        size = os.path.getsize(path)
+        stats, elapsed, reads = feed(path, args.chunk, args.top_k)
+    finally:
+        if generated:
+            os.unlink(generated)
+
+    failures = []
+    for name, summary, counter in zip(('sources', 'ports', 'zones'),
+                                      (stats.sources, stats.ports, stats.zones), exact):
+        failures += check(name, summary, counter)
+    # every hit has a port
+    if stats.hits != sum(exact[1].values()):
+        failures.append("hits: %d read, %d expected" % (stats.hits, sum(exact[1].values())))
+
+    document = {
+        'format':        'manafirewall-deniedlog',
+        'version':       1,
+        'time':          time.time(),
+        'file':          args.file,
+        'log_format':    None if args.file else args.format,
+        'bytes':         size,
+        'lines':         stats.lines,
+        'hits':          stats.hits,
+        'reads':         reads,
+        'seconds':       elapsed,
+        'lines_per_s':   stats.lines / elapsed if elapsed else None,
+        'mb_per_s':      size / 1e6 / elapsed if elapsed else None,
+        'top_k':         args.top_k,
+        'distinct':      {'sources': len(exact[0]), 'ports': len(exact[1]), 'zones': len(exact[2])},
+        'top_sources':   stats.sources.top(10),
+        'top_ports':     stats.ports.top(10),
+        'top_zones':     stats.zones.top(10),
+        'failures':      failures,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    for failure in failures:
+        print("FAIL: %s" % failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+fakefirewall — in-process stand-in for firewall.client.FirewallClient.
+
+The configuration is a datasets.Dataset: object snapshots (they have the
+get*() accessors of the firewalld settings objects, so they are returned
+as settings), active zones and global options. The runtime and permanent
+views share the same objects unless the dataset gives a separate
+permanent view.
+
+Every public call is counted in calls and waits latency seconds, the
+D-Bus round trip; runtime IP set entry and zone element writes update the
+dataset and emit the firewalld signals, so that benchmarks and scripts
+can drive the event paths. emit() sends any signal.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import collections
+import threading
+import time
+
+from manafirewall import model
+
+# zone element -> (snapshot attribute, signal prefix, arguments are a tuple)
+_ZONE_ELEMENTS = {
+    'Service':    ('services',     'service',     False),
+    'Port':       ('ports',        'port',        True),
+    'Protocol':   ('protocols',    'protocol',    False),
+    'SourcePort': ('source_ports', 'source-port', True),
+}
+
+
+class FakeFirewallClient:
+    '''FirewallClient subset used by ManaFirewallModel, see the module
+    documentation.'''
+
+    offline = False
+
+    def __init__(self, dataset, latency=0.0):
+        self.dataset = dataset
+        self.latency = latency
+        self.connected = True
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._callbacks = collections.defaultdict(list)
+        self._config = FakeConfig(self)
+
+    # ------------------------------------------------------------------
+    # accounting and signals
+    # ------------------------------------------------------------------
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def resetCalls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def connect(self, signal, callback):
+        self._callbacks[signal].append(callback)
+
+    def emit(self, signal, *args):
+        '''Call the callbacks of a firewalld signal, as the GLib thread
+        does.'''
+        for callback in self._callbacks[signal]:
+            callback(*args)
+
+    def setExceptionHandler(self, handler):
+        pass
+
+    def setNotAuthorizedLoop(self, enable):
+        pass
+
+    def authorizeAll(self):
+        self._call('authorizeAll')
+
+    def config(self):
+        # a local attribute read in FirewallClient, not a D-Bus call
+        return self._config
+
+    def get_property(self, prop):
+        self._call('get_property')
+        if prop == 'IPSetTypes':
+            return ['hash:ip', 'hash:net', 'hash:mac']
+        raise KeyError(prop)
+
+    # ------------------------------------------------------------------
+    # runtime reads
+    # ------------------------------------------------------------------
+
+    def _names(self, category, name):
+        self._call(name)
+        return sorted(self.dataset.runtime[category])
+
+    def _settings(self, category, call, name):
+        self._call(call)
+        return self.dataset.runtime[category][name]
+
+    def getZones(self):
+        return self._names('zones', 'getZones')
+
+    def listServices(self):
+        return self._names('services', 'listServices')
+
+    def getIPSets(self):
+        return self._names('ipsets', 'getIPSets')
+
+    def listIcmpTypes(self):
+        return self._names('icmptypes', 'listIcmpTypes')
+
+    def getHelpers(self):
+        return self._names('helpers', 'getHelpers')
+
+    def getZoneSettings(self, name):
+        return self._settings('zones', 'getZoneSettings', name)
+
+    def getServiceSettings(self, name):
+        return self._settings('services', 'getServiceSettings', name)
+
+    def getIPSetSettings(self, name):
+        return self._settings('ipsets', 'getIPSetSettings', name)
+
+    def getIcmpTypeSettings(self, name):
+        return self._settings('icmptypes', 'getIcmpTypeSettings', name)
+
+    def getHelperSettings(self, name):
+        return self._settings('helpers', 'getHelperSettings', name)
+
+    def getActiveZones(self):
+        self._call('getActiveZones')
+        return {zone: {kind: list(values) for kind, values in data.items()}
+                for zone, data in self.dataset.active_zones.items()}
+
+    def getDefaultZone(self):
+        self._call('getDefaultZone')
+        return self.dataset.options['default_zone']
+
+    def getLogDenied(self):
+        self._call('getLogDenied')
+        return self.dataset.options['log_denied']
+
+    def getAutomaticHelpers(self):
+        self._call('getAutomaticHelpers')
+        return self.dataset.options['automatic_helpers']
+
+    def queryPanicMode(self):
+        self._call('queryPanicMode')
+        return self.dataset.options['panic']
+
+    # ------------------------------------------------------------------
+    # runtime writes
+    # ------------------------------------------------------------------
+
+    def _replaceIPSet(self, ipset, entries):
+        obj = self.dataset.runtime['ipsets'][ipset]
+        self.dataset.runtime['ipsets'][ipset] = obj.replace(entries=entries)
+
+    def getEntries(self, ipset):
+        self._call('getEntries')
+        return sorted(self.dataset.runtime['ipsets'][ipset].entries)
+
+    def queryEntry(self, ipset, entry):
+        self._call('queryEntry')
+        return entry in self.dataset.runtime['ipsets'][ipset].entries
+
+    def addEntry(self, ipset, entry):
+        self._call('addEntry')
+        self._replaceIPSet(ipset, self.dataset.runtime['ipsets'][ipset].entries | {entry})
+        self.emit('ipset-entry-added', ipset, entry)
+
+    def removeEntry(self, ipset, entry):
+        self._call('removeEntry')
+        self._replaceIPSet(ipset, self.dataset.runtime['ipsets'][ipset].entries - {entry})
+        self.emit('ipset-entry-removed', ipset, entry)
+
+    def setEntries(self, ipset, entries):
+        self._call('setEntries')
+        self._replaceIPSet(ipset, entries)
+
+    def _zoneElement(self, action, element, zone, *args):
+        attr, signal, is_tuple = _ZONE_ELEMENTS[element]
+        self._call(action + element)
+        value = tuple(args) if is_tuple else args[0]
+        obj = self.dataset.runtime['zones'][zone]
+        values = getattr(obj, attr)
+        if action == 'query':
+            return value in values
+        values = values | {value} if action == 'add' else values - {value}
+        self.dataset.runtime['zones'][zone] = obj.replace(**{attr: values})
+        if action == 'add':
+            self.emit(signal + '-added', zone, *args, 0)
+        else:
+            self.emit(signal + '-removed', zone, *args)
+        return zone
+
+    def __getattr__(self, attr):
+        for action in ('add', 'remove', 'query'):
+            element = attr[len(action):]
+            if attr.startswith(action) and element in _ZONE_ELEMENTS:
+                return lambda zone, *args: self._zoneElement(action, element, zone, *args)
+        raise AttributeError(attr)
+
+
+class FakeConfig:
+    '''FirewallClientConfig subset: names and per object access of the
+    permanent view.'''
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, attr):
+        # get<Kind>Names / get<Kind>ByName of model.CATEGORY_API
+        for category, (_rn, _rs, names, by_name, _add) in model.CATEGORY_API.items():
+            if attr == names:
+                return lambda: self._names(category, names)
+            if attr == by_name:
+                return lambda name: self._object(category, by_name, name)
+        raise AttributeError(attr)
+
+    def _names(self, category, call):
+        self._client._call(call)
+        return sorted(self._client.dataset.permanent[category])
+
+    def _object(self, category, call, name):
+        self._client._call(call)
+        if name not in self._client.dataset.permanent[category]:
+            raise KeyError(name)
+        return FakeConfigObject(self._client, category, name)
+
+
+class FakeConfigObject:
+    '''Permanent configuration object, settings read only.'''
+
+    def __init__(self, client, category, name):
+        self._client = client
+        self.category = category
+        self.name = name
+
+    def getSettings(self):
+        self._client._call('config.getSettings')
+        return self._client.dataset.permanent[self.category][self.name]
+
+    def get_properties(self):
+        self._client._call('config.get_properties')
+        return {'name': self.name, 'builtin': False, 'default': False}
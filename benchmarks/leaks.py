@@ -0,0 +1,148 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+leaks — fails when memory or subscriptions grow across simulated refresh
+cycles.
+
+    python3 -m benchmarks.leaks [--cycles 50] [--warmup 5] [--max-growth-kib 256]
+                                [--zones 100] [-o result.json]
+
+A cycle does what a long running session does over and over, against the
+fake client: the left pane is filled and its subscriptions renewed, every
+right tab of the selected zone, service and IP set is shown with its
+subscriptions (subscribed, filled, unsubscribed as _refreshRightPane
+does), firewalld signals are emitted and dispatched, and every few cycles
+firewalld reloads. Widgets are not created, the callback registrations
+the dialog keeps next to them follow the router subscriptions.
+
+manafirewall.memwatch samples traced memory and the counters after the
+warm up cycles and at the end. The exit status is 1 if traced memory grew
+more than --max-growth-kib, or if router subscriptions or cache sizes
+grew, 0 otherwise.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import json
+import sys
+
+from manafirewall import memwatch, model
+
+from benchmarks import datasets, fakefirewall, paths
+from benchmarks.replay import TAB_EVENTS
+
+# counters that must not grow once warm
+STABLE_COUNTERS = ('subscriptions', 'cache.objects', 'cache.active_zones')
+
+
+def _noop(event, value):
+    pass
+
+
+def refreshCycle(fw, fw_model, items, number, reload_every):
+    router = fw_model.router
+    zone = items['zones']
+
+    # left pane, as _fillLeftCategory and _subscribeLeftPane
+    left = [router.subscribe('config-zone-' + change, _noop)
+            for change in ('added', 'updated', 'removed', 'renamed')]
+    view = paths.View(fw_model, True, zone)
+    paths.fillLeftZones(view)
+    view.close()
+
+    # every right tab of each category, as _refreshRightPane
+    for name, (function, category, tab) in paths.PATHS.items():
+        if category is None or items.get(category) is None:
+            continue
+        view = paths.View(fw_model, True, items[category])
+        right = [router.subscribe(event, _noop, view.item) for event in TAB_EVENTS.get(tab, ())]
+        function(view)
+        view.close()
+        router.unsubscribeAll(right)
+
+    # firewalld traffic
+    port = str(20000 + number % 1000)
+    fw.addPort(zone, port, 'tcp')
+    fw.removePort(zone, port, 'tcp')
+    if reload_every and number % reload_every == 0:
+        fw.emit('reloaded')
+        fw_model.buildReloadSnapshot()
+    while router.dispatch(100):
+        pass
+    fw_model.reloadCompleted()
+    router.unsubscribeAll(left)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.leaks',
+                                     description="Check memory growth across simulated refresh cycles")
+    parser.add_argument('--cycles', type=int, default=50, help="measured refresh cycles")
+    parser.add_argument('--warmup', type=int, default=5, help="cycles before the baseline")
+    parser.add_argument('--reload-every', type=int, default=10, help="firewalld reload period in cycles, 0 never")
+    parser.add_argument('--max-growth-kib', type=int, default=256, help="allowed traced memory growth")
+    parser.add_argument('--zones', type=int, default=100)
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    dataset = datasets.synthetic(zones=args.zones, services=args.services, ipsets=2, entries=args.entries)
+    fw = fakefirewall.FakeFirewallClient(dataset)
+    fw_model = model.ManaFirewallModel()
+    fw_model.connect(fw=fw)
+    items = {
+        'zones':    dataset.options['default_zone'] or None,
+        'services': min(dataset.runtime['services'], default=None),
+        'ipsets':   min(dataset.runtime['ipsets'], default=None),
+    }
+
+    watcher = memwatch.MemoryWatcher({
+        'subscriptions': fw_model.router.subscriptionCount,
+        'cache':         fw_model.cacheSizes,
+    }, top=5)
+    watcher.start()
+    for number in range(args.warmup):
+        refreshCycle(fw, fw_model, items, number, args.reload_every)
+    baseline = len(watcher.samples)
+    watcher.sample(log=False)
+    for number in range(args.warmup, args.warmup + args.cycles):
+        refreshCycle(fw, fw_model, items, number, args.reload_every)
+    end = watcher.sample(log=False)
+    watcher.stop()
+
+    traced, counters = watcher.growth(baseline)
+    failures = []
+    if traced > args.max_growth_kib * 1024:
+        failures.append("traced memory grew by %d KiB over %d cycles" % (traced // 1024, args.cycles))
+    for name in STABLE_COUNTERS:
+        if counters.get(name, 0) > 0:
+            failures.append("%s grew by %d" % (name, counters[name]))
+
+    document = {
+        'format':           'manafirewall-leaks',
+        'version':          1,
+        'dataset':          dataset.sizes(),
+        'cycles':           args.cycles,
+        'warmup':           args.warmup,
+        'traced_growth':    traced,
+        'per_cycle':        traced / args.cycles if args.cycles else None,
+        'counters_growth':  counters,
+        'top_growth':       [list(g) for g in end.growth],
+        'failures':         failures,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    for failure in failures:
+        print("FAIL: %s" % failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
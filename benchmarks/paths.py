@@ -0,0 +1,205 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+paths — the main dialog hot paths, run through the dialog methods.
+
+A View is a ManaWallDialog without its window: the pane state is set by
+ManaWallDialog._initViewState(), the widget factory, the event manager and
+the replace points are the stubs below. The dialog methods themselves
+(_fillLeftZones, _refreshRightPane per tab, _replacePointSummary,
+_fillRPIPSetEntries...) are timed: the ManaFirewallModel reads, the Python
+work around them and the table and tree items they build. Only the
+toolkit drawing is left out; stub tables keep the items added, so the
+result of a path can be checked. NetworkManager is not used.
+
+PATHS maps the names used in the results to (function, category, right
+tab).
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+from manafirewall import dialog
+
+
+class StubWidget:
+    '''Any widget: children and items are kept, every other call does
+    nothing and returns None.'''
+
+    def __init__(self, kind, parent=None):
+        self.kind = kind
+        self.children = []
+        self.items = []
+        self._value = None
+        if parent is not None:
+            parent.children.append(self)
+
+    def widgetClass(self):
+        return 'Y' + self.kind
+
+    # containers, replace points
+
+    def hasChildren(self):
+        return bool(self.children)
+
+    def deleteChildren(self):
+        self.children = []
+
+    # selection widgets
+
+    def addItem(self, item):
+        self.items.append(item)
+
+    def addItems(self, items):
+        self.items.extend(items)
+
+    def deleteAllItems(self):
+        self.items = []
+
+    def itemsCount(self):
+        return len(self.items)
+
+    def selectedItem(self):
+        return None
+
+    # check boxes, input fields
+
+    def setValue(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+    isChecked = value
+
+    def __getattr__(self, name):
+        return _nothing
+
+
+def _nothing(*args, **kwargs):
+    return None
+
+
+class StubFactory:
+    '''Widget factory: createXxx(parent, ...) returns a StubWidget child
+    of parent.'''
+
+    def __getattr__(self, name):
+        if not name.startswith('create'):
+            raise AttributeError(name)
+        kind = name[len('create'):]
+
+        def create(parent=None, *args, **kwargs):
+            return StubWidget(kind, parent)
+        return create
+
+
+class StubEventManager:
+    def __getattr__(self, name):
+        return _nothing
+
+
+class View:
+    '''Dialog state read by the paths: the model, the view and the
+    selected item; dialog is the ManaWallDialog running them.'''
+
+    def __init__(self, model, runtime=True, item=None):
+        self.model = model
+        self.runtime = runtime
+        self.item = item
+        d = dialog.ManaWallDialog.__new__(dialog.ManaWallDialog)
+        d._initViewState()
+        d.model = model
+        d.eventRouter = model.router
+        d.runtime_view = runtime
+        d.factory = StubFactory()
+        d.eventManager = StubEventManager()
+        d.leftReplacePoint = StubWidget('ReplacePoint')
+        d.replacePoint = StubWidget('ReplacePoint')
+        d.changeBindingsButton = StubWidget('PushButton')
+        # no NetworkManager connections in the zone tree
+        d._nm = lambda wait=False: None
+        # doSomethingIntoLoop() without the diagnostics
+        d.watchdog = None
+        d.memoryWatcher = None
+        d._startupProbe = None
+        self.dialog = d
+
+    def select(self, category, tab=None):
+        d = self.dialog
+        d._currentCategory = category
+        d._currentItem = self.item
+        if tab is not None:
+            d._currentRightTab = tab
+
+    def close(self):
+        '''Drop the event subscriptions of the panes.'''
+        router = self.model.router
+        router.unsubscribeAll(self.dialog.leftPaneSubscriptions)
+        router.unsubscribeAll(self.dialog.rightPaneSubscriptions)
+
+
+# ----------------------------------------------------------------------
+# left pane
+# ----------------------------------------------------------------------
+
+def fillLeftZones(view):
+    '''_fillLeftZones() and _renderZoneTree(); returns the tree items.'''
+    view.select('zones')
+    view.dialog._fillLeftZones(view.item)
+    return view.dialog.activeBindingsTree.items
+
+
+def fillLeftServices(view):
+    '''_fillLeftServices(); returns the list items.'''
+    view.select('services')
+    view.dialog._fillLeftServices(view.item)
+    return view.dialog._leftList.items
+
+
+def fillLeftIPSets(view):
+    '''_fillLeftIPSets(); returns the list items.'''
+    view.select('ipsets')
+    view.dialog._fillLeftIPSets(view.item)
+    return view.dialog._leftList.items
+
+
+# ----------------------------------------------------------------------
+# right pane
+# ----------------------------------------------------------------------
+
+def refreshRightPane(category, tab):
+    '''_refreshRightPane() of the tab, returns the function running it.'''
+    def refresh(view):
+        view.select(category, tab)
+        view.dialog._refreshRightPane()
+        return view.dialog.replacePoint.children
+    refresh.__doc__ = '_refreshRightPane() of %s %s' % (category, tab)
+    return refresh
+
+
+def fillRPIPSetEntries(view):
+    '''_fillRPIPSetEntries() of the entries table already shown, as after
+    an IP set change; returns the table items.'''
+    d = view.dialog
+    if getattr(d, 'entriesList', None) is None or d._currentCategory != 'ipsets':
+        refreshRightPane('ipsets', 'entries')(view)
+    d._fillRPIPSetEntries()
+    return d.entriesList.items
+
+
+# name -> (function, category of the selected item, right tab)
+PATHS = {
+    'fill_left_zones':    (fillLeftZones,    None, None),
+    'fill_left_services': (fillLeftServices, None, None),
+    'fill_left_ipsets':   (fillLeftIPSets,   None, None),
+}
+for _tab in ('summary', 'services', 'ports', 'protocols', 'source_ports', 'masquerade',
+             'forwarding', 'icmp_filter', 'interfaces', 'sources', 'rich_rules'):
+    PATHS['zone/' + _tab] = (refreshRightPane('zones', _tab), 'zones', _tab)
+for _tab in ('summary', 'ports', 'protocols', 'source_ports', 'modules', 'destinations'):
+    PATHS['service/' + _tab] = (refreshRightPane('services', _tab), 'services', _tab)
+PATHS['ipset/summary'] = (refreshRightPane('ipsets', 'summary'), 'ipsets', 'summary')
+PATHS['ipset/entries'] = (refreshRightPane('ipsets', 'entries'), 'ipsets', 'entries')
+PATHS['ipset/fill_entries'] = (fillRPIPSetEntries, 'ipsets', 'entries')
@@ -0,0 +1,226 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+replay — feeds a signal recording (see manafirewall.signalrecorder) to the
+model and measures the event loop.
+
+    python3 -m benchmarks.replay RECORDING [--speed 1] [--tick-ms 100]
+                                 [--batch 20] [--permanent] [-o result.json]
+
+A producer thread calls the model callbacks at the recorded times divided
+by --speed (0: as fast as possible), as the GLib thread does. The main
+thread plays doSomethingIntoLoop: every --tick-ms it dispatches up to
+--batch events, to the model and to a benchmarks.paths View showing the
+zone tree and the --tab right tab of the default zone: the handlers of
+the main dialog panes run, against stub widgets and a fake client.
+
+Reported, as JSON: per event type handling cost, queue depth sampled at
+each tick, drain lag, the time from post to dispatch of each event, and
+the events dropped or discarded by the reload barrier.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import collections
+import json
+import statistics
+import sys
+import threading
+import time
+
+from manafirewall import eventRouter, model, signalrecorder
+
+from benchmarks import datasets, fakefirewall, paths
+
+# right tab -> runtime zone events refreshing it, as
+# ManaWallDialog._subscribeRightPane
+TAB_EVENTS = {
+    'services':     ('service-added', 'service-removed'),
+    'ports':        ('port-added', 'port-removed'),
+    'source_ports': ('source-port-added', 'source-port-removed'),
+    'forwarding':   ('forward-port-added', 'forward-port-removed'),
+    'icmp_filter':  ('icmp-changed', 'icmp-inversion'),
+    'protocols':    ('protocol-added', 'protocol-removed'),
+    'masquerade':   ('masquerade-added', 'masquerade-removed'),
+}
+
+BINDING_EVENTS = ('interface-added', 'interface-removed', 'zone-of-interface-changed',
+                  'source-added', 'source-removed', 'zone-of-source-changed')
+
+
+class TimedRouter(eventRouter.EventRouter):
+    '''EventRouter remembering when each queued event was posted, and
+    counting the events dropped or discarded by the reload barrier.'''
+
+    def __init__(self):
+        eventRouter.EventRouter.__init__(self)
+        self._timesLock = threading.Lock()
+        self._posted = collections.deque()   # (post time, event), queue order
+        self.dropped = collections.Counter()
+        self._skipped = False
+
+    def post(self, event, value=None, key=None, force=False):
+        with self._timesLock:
+            queued = eventRouter.EventRouter.post(self, event, value, key, force)
+            if queued:
+                self._posted.append((time.perf_counter(), event))
+            else:
+                self.dropped[event] += 1
+        return queued
+
+    def _discarded(self, event):
+        self.dropped[event] += 1
+        self._skipped = True
+
+    def dispatchTimed(self, max_events):
+        '''dispatch() one event at a time, returns [(event, lag, cost)].'''
+        result = []
+        while len(result) < max_events:
+            start = time.perf_counter()
+            self._skipped = False
+            if not self.dispatch(1):
+                break
+            end = time.perf_counter()
+            with self._timesLock:
+                posted, event = self._posted.popleft()
+            if self._skipped:
+                continue
+            result.append((event, start - posted, end - start))
+        return result
+
+
+def _percentiles(values):
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+    return {
+        'count':    len(values),
+        'median_s': statistics.median(values),
+        'p95_s':    values[max(int(len(values) * 0.95) - 1, 0)],
+        'max_s':    values[-1],
+        'total_s':  sum(values),
+    }
+
+
+def subscribeView(fw_model, view, tab):
+    '''Show the zone tree and the right tab through the dialog, which
+    subscribes its pane handlers, and subscribe the global handlers the
+    main dialog would have.'''
+    router = fw_model.router
+    zone_tab = paths.PATHS.get('zone/' + tab, paths.PATHS['zone/services'])[0]
+    paths.fillLeftZones(view)
+    if view.item:
+        zone_tab(view)
+
+    def onReloaded(event, value):
+        fw_model.startReloadSnapshot()
+
+    def onReloadSnapshot(event, snapshot):
+        fw_model.snapshot = snapshot
+        try:
+            paths.fillLeftZones(view)
+            if view.item:
+                zone_tab(view)
+        finally:
+            fw_model.snapshot = None
+        fw_model.reloadCompleted()
+
+    router.subscribe('reloaded', onReloaded)
+    router.subscribe('reload-snapshot', onReloadSnapshot)
+    for event in BINDING_EVENTS:
+        router.subscribe(event, view.dialog._onBindingEvent)
+
+
+def replay(fw, fw_model, signals, speed, tick, batch):
+    router = fw_model.router
+    done = threading.Event()
+
+    def produce():
+        start = time.perf_counter()
+        for offset, signal, args in signals:
+            if speed:
+                delay = start + offset / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            fw.emit(signal, *args)
+        done.set()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    start = time.perf_counter()
+    producer.start()
+    depth = []
+    handled = []
+    while True:
+        finished = done.is_set()
+        depth.append((round(time.perf_counter() - start, 4), router.pending()))
+        handled.extend(router.dispatchTimed(batch))
+        if finished and not router.pending():
+            break
+        time.sleep(tick)
+    producer.join()
+    # the reload snapshot thread may still be posting
+    time.sleep(tick)
+    handled.extend(router.dispatchTimed(sys.maxsize))
+    return time.perf_counter() - start, depth, handled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.replay',
+                                     description="Replay a firewalld signal recording through the model")
+    parser.add_argument('recording', help="file written with manafirewall --record-signals")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument('--tick-ms', type=float, default=100.0, help="doSomethingIntoLoop period")
+    parser.add_argument('--batch', type=int, default=20, help="events dispatched per tick")
+    parser.add_argument('--permanent', action='store_true', help="the dialog shows the permanent view")
+    parser.add_argument('--tab', default='ports', choices=sorted(TAB_EVENTS), help="right tab shown")
+    parser.add_argument('--tree', help="serve this firewalld configuration tree instead of a synthetic one")
+    parser.add_argument('--zones', type=int, default=100)
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    header, signals = signalrecorder.load(args.recording)
+    dataset = datasets.fromTree(args.tree) if args.tree else \
+        datasets.synthetic(zones=args.zones, services=50, ipsets=2, entries=1000)
+    fw = fakefirewall.FakeFirewallClient(dataset)
+    fw_model = model.ManaFirewallModel(TimedRouter())
+    fw_model.connect(fw=fw)
+    view = paths.View(fw_model, not args.permanent, dataset.options['default_zone'] or None)
+    subscribeView(fw_model, view, args.tab)
+    fw.resetCalls()
+
+    wall, depth, handled = replay(fw, fw_model, signals, args.speed, args.tick_ms / 1000.0, args.batch)
+
+    costs = collections.defaultdict(list)
+    for event, _lag, cost in handled:
+        costs[event].append(cost)
+    document = {
+        'format':    'manafirewall-replay',
+        'version':   1,
+        'recording': {'file': args.recording, 'time': header['time'], 'signals': len(signals),
+                      'duration_s': signals[-1][0] if signals else 0.0},
+        'speed':     args.speed,
+        'tick_ms':   args.tick_ms,
+        'batch':     args.batch,
+        'wall_s':    wall,
+        'events':    len(handled),
+        'dropped':   dict(sorted(fw_model.router.dropped.items())),
+        'handling':  {event: _percentiles(values) for event, values in sorted(costs.items())},
+        'drain_lag': _percentiles([lag for _event, lag, _cost in handled]),
+        'queue_depth': {'max': max((d for _t, d in depth), default=0), 'samples': depth},
+        'calls':     dict(sorted(fw.calls.items())),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+startup — import time and time to first paint, against a budget.
+
+    python3 -m benchmarks.startup [--backends gtk,qt,ncurses] [--repeat 3]
+                                  [--import-budget-ms 400] [--paint-budget-ms 2000]
+                                  [-o result.json]
+
+Import: manafirewall.dialog is imported in a fresh interpreter with
+-X importtime; the cumulative time and the slowest top level imports are
+reported, and the modules that must be imported on first use only (LAZY)
+are checked not to be loaded.
+
+First paint: scripts/manafirewall is started per backend with
+MANAFIREWALL_STARTUP_PROBE set, the dialog writes the probe file at the
+first loop tick; the time from the spawn to the probe is measured and the
+process is terminated. ncurses runs on a pseudo terminal, gtk and qt are
+skipped without a display. The configured firewalld and user preferences
+are used, as in a real start.
+
+The exit status is 1 if a budget is exceeded or a lazy module is loaded
+at import.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package benchmarks
+'''
+
+import argparse
+import json
+import os
+import pty
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'scripts', 'manafirewall')
+
+# modules manafirewall.dialog must not import at load time
+LAZY = (
+    'firewall.client',
+    'firewall.core.fw_nm',
+    'manafirewall.helpinfo',
+    'manatools.ui.helpdialog',
+    'manafirewall.optionDialog',
+    'manafirewall.zoneBaseDialog',
+    'manafirewall.serviceBaseDialog',
+    'manafirewall.ipsetBaseDialog',
+    'manafirewall.portDialog',
+    'manafirewall.forwardDialog',
+    'manafirewall.protocolDialog',
+    'manafirewall.moduleDialog',
+    'manafirewall.activeBindingsDialog',
+    'manafirewall.changeZoneConnectionDialog',
+    'manafirewall.ipsetEntryDialog',
+    'manafirewall.historyDialog',
+    'manafirewall.journalDialog',
+    'manafirewall.deniedLogDialog',
+    'manafirewall.busStatsDialog',
+    'manafirewall.cli',
+    'manafirewall.declarative',
+    'manafirewall.history',
+    'manafirewall.journal',
+    'manafirewall.asynclog',
+    'manafirewall.configwatch',
+    'manafirewall.warmcache',
+    'manafirewall.memwatch',
+)
+
+_IMPORT_CODE = '''
+import json, sys
+import manafirewall.dialog
+print(json.dumps(sorted(m for m in %r if m in sys.modules)))
+''' % (LAZY,)
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    return env
+
+
+def measureImport(top=10):
+    '''Import manafirewall.dialog once, returns the result dict.'''
+    run = subprocess.run([sys.executable, '-X', 'importtime', '-c', _IMPORT_CODE],
+                         env=_env(), capture_output=True, universal_newlines=True)
+    if run.returncode != 0:
+        return {'error': run.stderr.strip().splitlines()[-1] if run.stderr.strip() else 'failed'}
+    imports = []
+    total = None
+    for line in run.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue
+        name = fields[2].rstrip()
+        if name.strip() == 'manafirewall.dialog':
+            total = cumulative / 1e6
+        # top level imports of the dialog are indented by two spaces
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            imports.append((name.strip(), cumulative / 1e6))
+    imports.sort(key=lambda i: i[1], reverse=True)
+    return {
+        'total_s':     total,
+        'slowest':     imports[:top],
+        'lazy_loaded': json.loads(run.stdout.strip().splitlines()[-1]),
+    }
+
+
+def measurePaint(backend, timeout):
+    '''Start the application with backend, returns seconds to the first
+    loop tick, or an error string.'''
+    if backend in ('gtk', 'qt') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return 'skipped: no display'
+    fd, probe = tempfile.mkstemp(prefix='manafirewall-probe-')
+    os.close(fd)
+    os.unlink(probe)
+    env = _env()
+    env['MANAFIREWALL_STARTUP_PROBE'] = probe
+    master = None
+    streams = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    if backend == 'ncurses':
+        master, slave = pty.openpty()
+        env.setdefault('TERM', 'xterm')
+        streams = {'stdin': slave, 'stdout': slave, 'stderr': slave}
+    start = time.time()
+    process = subprocess.Popen([sys.executable, SCRIPT, '--' + backend], env=env, **streams)
+    if master is not None:
+        os.close(slave)
+        os.set_blocking(master, False)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(probe):
+                with open(probe) as f:
+                    painted = f.read().strip()
+                if painted:
+                    return float(painted) - start
+            if process.poll() is not None:
+                return 'exited with status %d' % process.returncode
+            if master is not None:
+                # keep the pseudo terminal from filling up
+                try:
+                    os.read(master, 65536)
+                except OSError:
+                    pass
+            time.sleep(0.01)
+        return 'timeout'
+    finally:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        if master is not None:
+            os.close(master)
+        if os.path.exists(probe):
+            os.unlink(probe)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.startup',
+                                     description="Measure import time and time to first paint")
+    parser.add_argument('--backends', default='gtk,qt,ncurses', help="comma separated backends to start")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--import-budget-ms', type=float, default=400.0)
+    parser.add_argument('--paint-budget-ms', type=float, default=2000.0)
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for a first paint")
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    failures = []
+    imports = [measureImport() for _i in range(args.repeat)]
+    errors = [i['error'] for i in imports if 'error' in i]
+    if errors:
+        import_result = {'error': errors[0]}
+        failures.append("import: %s" % errors[0])
+    else:
+        total = statistics.median(i['total_s'] for i in imports)
+        import_result = {'median_s': total, 'slowest': imports[-1]['slowest'],
+                         'lazy_loaded': imports[-1]['lazy_loaded']}
+        if total * 1000 > args.import_budget_ms:
+            failures.append("import took %.0f ms, budget %.0f ms" % (total * 1000, args.import_budget_ms))
+        if import_result['lazy_loaded']:
+            failures.append("imported at load: %s" % ", ".join(import_result['lazy_loaded']))
+
+    paint = {}
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        times = []
+        for _i in range(args.repeat):
+            result = measurePaint(backend, args.timeout)
+            if isinstance(result, str):
+                paint[backend] = {'error': result}
+                break
+            times.append(result)
+        else:
+            median = statistics.median(times)
+            paint[backend] = {'median_s': median, 'times_s': times}
+            if median * 1000 > args.paint_budget_ms:
+                failures.append("%s first paint took %.0f ms, budget %.0f ms" %
+                                (backend, median * 1000, args.paint_budget_ms))
+
+    document = {
+        'format':      'manafirewall-startup',
+        'version':     1,
+        'time':        time.time(),
+        'repeat':      args.repeat,
+        'budgets_ms':  {'import': args.import_budget_ms, 'paint': args.paint_budget_ms},
+        'import':      import_result,
+        'first_paint': paint,
+        'failures':    failures,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+    for failure in failures:
+        print("FAIL: %s" % failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+asynclog — logging off the UI thread.
+
+The application loggers only put records into a queue
+(logging.handlers.QueueHandler); a writer thread (QueueListener) formats
+them and writes the log file. Rotation, and the gzip compression of the
+rotated files if enabled, happen in the writer thread as well, so a debug
+level session does no file I/O nor formatting in the UI thread.
+
+Records are written as text, or as JSON lines (one object per record) to
+be read by tools.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+
+TEXT_FORMAT = '%(asctime)s [%(name)s]{%(filename)s:%(lineno)d}(%(levelname)s) %(message)s'
+
+DEFAULT_MAX_SIZE_MB = 10
+DEFAULT_BACKUPS = 5
+
+
+class JSONFormatter(logging.Formatter):
+    '''One JSON object per record.'''
+
+    def format(self, record):
+        document = {
+            'time':    record.created,
+            'iso':     time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) +
+                       '.%03d' % record.msecs,
+            'level':   record.levelname,
+            'logger':  record.name,
+            'file':    record.filename,
+            'line':    record.lineno,
+            'thread':  record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            document['exception'] = record.exc_text
+        if record.stack_info:
+            document['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    '''Puts records into the queue as they are: only the message is merged
+    with its arguments, at call time, formatting is left to the writer.'''
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _gzipRotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _gzipNamer(name):
+    return name + '.gz'
+
+
+class AsyncLogging:
+    '''Queue based logging into file_name for the logger named root, see
+    the module documentation. start() it once, stop() flushes the queue.'''
+
+    def __init__(self, file_name, root='manafirewall', level=logging.INFO, json_lines=False,
+                 max_size_mb=DEFAULT_MAX_SIZE_MB, backups=DEFAULT_BACKUPS, compress=False):
+        self.file_name = file_name
+        self.root = root
+        self.level = level
+        self.json_lines = json_lines
+        self.max_bytes = max(1, int(max_size_mb)) * 1024 * 1024
+        self.backups = max(0, int(backups))
+        self.compress = compress
+        self._handler = None
+        self._listener = None
+
+    def start(self):
+        if self._listener is not None:
+            return
+        handler = logging.handlers.RotatingFileHandler(
+            self.file_name, maxBytes=self.max_bytes, backupCount=self.backups)
+        if self.compress:
+            handler.namer = _gzipNamer
+            handler.rotator = _gzipRotator
+        handler.setFormatter(JSONFormatter() if self.json_lines else logging.Formatter(TEXT_FORMAT))
+        records = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._handler = _QueueHandler(records)
+        logger = logging.getLogger(self.root)
+        logger.addHandler(self._handler)
+        logger.setLevel(self.level)
+        logger.propagate = False
+        self._listener.start()
+
+    def stop(self):
+        '''Write what is queued and close the file.'''
+        if self._listener is None:
+            return
+        logging.getLogger(self.root).removeHandler(self._handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+        self._handler = None
+
+    @property
+    def running(self):
+        return self._listener is not None
@@ -0,0 +1,142 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+
+'''
+busStatsDialog — popup showing the D-Bus calls accounted by the profiler
+(see profiling.AccountingClient): latency per method, calls per user
+action and reads repeated within one action. Refreshed every second.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import gettext
+import html
+import logging
+
+import manatools.ui.basedialog as basedialog
+import manatools.aui.yui as MUI
+
+_ = gettext.gettext
+logger = logging.getLogger('manafirewall.busstatsdialog')
+
+
+class BusStatsDialog(basedialog.BaseDialog):
+    '''D-Bus call statistics of a profiling.Profiler.'''
+
+    def __init__(self, profiler):
+        basedialog.BaseDialog.__init__(
+            self, _("Bus Statistics"), "", basedialog.DialogType.POPUP, 760, 560)
+        self._profiler = profiler
+        self._shown = None
+
+    def UIlayout(self, layout):
+        vbox = self.factory.createVBox(layout)
+
+        heading = self.factory.createHeading(vbox, _("D-Bus calls to firewalld"))
+        heading.setAutoWrap()
+        self.factory.createVSpacing(vbox, 0.3)
+
+        header = MUI.YTableHeader()
+        header.addColumn(_('Method'))
+        header.addColumn(_('Calls'))
+        header.addColumn(_('Median ms'))
+        header.addColumn(_('95% ms'))
+        header.addColumn(_('Max ms'))
+        self._methodTable = self.factory.createTable(vbox, header)
+        self._methodTable.setStretchable(MUI.YUIDimension.YD_VERT, True)
+        self._methodTable.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        header = MUI.YTableHeader()
+        header.addColumn(_('Action'))
+        header.addColumn(_('Runs'))
+        header.addColumn(_('Calls'))
+        header.addColumn(_('Calls per run'))
+        header.addColumn(_('Duplicate reads'))
+        self._actionTable = self.factory.createTable(vbox, header)
+        self._actionTable.setStretchable(MUI.YUIDimension.YD_VERT, True)
+        self._actionTable.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+        self._actionTable.setNotify(True)
+        self.eventManager.addWidgetEvent(self._actionTable, self._onActionSelected)
+
+        # duplicate reads of the selected action
+        self._duplicates = self.factory.createRichText(vbox, "")
+        self._duplicates.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        hbox = self.factory.createHBox(layout)
+        resetBtn = self.factory.createIconButton(hbox, 'edit-clear', _("&Reset"))
+        self.factory.createHStretch(hbox)
+        closeBtn = self.factory.createIconButton(hbox, 'window-close', _("&Close"))
+        self.eventManager.addWidgetEvent(resetBtn, self._onReset)
+        self.eventManager.addWidgetEvent(closeBtn, self._onClose)
+        self.eventManager.addCancelEvent(self._onClose)
+        self.dialog.setDefaultButton(closeBtn)
+
+        # refresh while shown, calls go on in background threads
+        self.timeout = 1000
+        self._actions = {}
+        self._fillTables()
+
+    def doSomethingIntoLoop(self):
+        self._fillTables()
+
+    def _fillTables(self):
+        methods, actions = self._profiler.callStats()
+        shown = (sorted((m, h['count']) for m, h in methods.items()),
+                 sorted((a, runs, calls) for a, (runs, calls, _d) in actions.items()))
+        if shown == self._shown:
+            return
+        self._shown = shown
+        self._actions = actions
+
+        self._methodTable.deleteAllItems()
+        itemColl = []
+        for method, h in sorted(methods.items(), key=lambda m: m[1]['count'], reverse=True):
+            item = MUI.YTableItem()
+            item.addCell(method)
+            item.addCell(str(h['count']))
+            for key in ('p50_s', 'p95_s', 'max_s'):
+                item.addCell("%.2f" % (h[key] * 1000))
+            itemColl.append(item)
+        self._methodTable.addItems(itemColl)
+
+        selected = self._selectedAction()
+        self._actionTable.deleteAllItems()
+        itemColl = []
+        for action, (runs, calls, duplicates) in sorted(actions.items(), key=lambda a: a[1][1], reverse=True):
+            item = MUI.YTableItem()
+            item.addCell(action)
+            item.addCell(str(runs))
+            item.addCell(str(calls))
+            item.addCell("%.1f" % (calls / runs) if runs else "-")
+            item.addCell(str(sum(duplicates.values())))
+            item.setSelected(action == selected)
+            itemColl.append(item)
+        self._actionTable.addItems(itemColl)
+        self._showDuplicates()
+
+    def _selectedAction(self):
+        item = self._actionTable.selectedItem()
+        return item.cell(0).label() if item else None
+
+    def _showDuplicates(self):
+        action = self._selectedAction()
+        duplicates = self._actions.get(action, (0, 0, {}))[2]
+        if not duplicates:
+            self._duplicates.setValue("")
+            return
+        lines = [_("Reads repeated within one run of %s:") % html.escape(action)]
+        for call, count in sorted(duplicates.items(), key=lambda d: d[1], reverse=True):
+            lines.append("&nbsp;&nbsp;<tt>%s</tt> &times;%d" % (html.escape(call), count))
+        self._duplicates.setValue("<br>".join(lines))
+
+    def _onActionSelected(self):
+        self._showDuplicates()
+
+    def _onReset(self):
+        self._profiler.reset()
+        self._fillTables()
+
+    def _onClose(self):
+        self.ExitLoop()
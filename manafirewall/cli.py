@@ -0,0 +1,408 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+cli — headless subcommands of the manafirewall script.
+
+    manafirewall plan  [--runtime] STATE   show what apply would change
+    manafirewall apply [--runtime] STATE   bring firewalld to STATE
+    manafirewall export [--runtime] [--format json|yaml] [-o FILE]
+                                           dump the whole configuration
+    manafirewall import [--runtime] [--dry-run] FILE
+                                           apply an exported document
+    manafirewall snapshot [-m LABEL]       save the permanent configuration
+    manafirewall history                   list the saved snapshots
+    manafirewall diff OLD [NEW]            compare two snapshots, or one
+                                           with the permanent configuration
+    manafirewall restore [--dry-run] ID    go back to a snapshot
+    manafirewall journal [--since T] [--until T] [--object NAME]
+                         [--event NAME] [--source app|signal]
+                         [--grep TEXT] [-n COUNT] [--json]
+                                           show the audit journal
+    manafirewall metrics [--permanent] [-o FILE] [--interval SECONDS]
+                                           write Prometheus metrics, once
+                                           or every SECONDS (see metrics.py)
+
+Commands reading or writing the configuration accept --offline ROOT to
+work on the XML files under ROOT instead of a running firewalld.
+
+apply, import and restore save a snapshot of the permanent configuration before
+writing it, unless --no-snapshot is given. The changes they write are
+recorded into the audit journal (see journal.py). Snapshot ids can be abbreviated
+to a unique prefix of their date or of their hash part.
+
+The permanent configuration is used unless --runtime is given. Timing is
+printed on stderr.
+
+Exit codes: 0 success (plan: nothing to change), 1 error, 2 plan found
+changes to apply, 3 apply failed after some change was written.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import argparse
+import gettext
+import json
+import sys
+import time
+
+import manafirewall.declarative as declarative
+import manafirewall.history as history
+import manafirewall.journal as journal
+import manafirewall.metrics as metrics
+import manafirewall.model as model
+
+_ = gettext.gettext
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CHANGES = 2
+EXIT_PARTIAL = 3
+
+
+def _addOffline(parser):
+    parser.add_argument('--offline', metavar='ROOT',
+                        help=_('work on the configuration files under ROOT (a chroot or image root, or a '
+                               'firewalld configuration directory) without a running firewalld'))
+    return parser
+
+
+def _addStateCommand(subparsers, name, help_text):
+    parser = _addOffline(subparsers.add_parser(name, help=help_text))
+    parser.add_argument('state', help=_('desired state file (YAML, or JSON if ending with .json)'))
+    parser.add_argument('--runtime', action='store_true',
+                        help=_('work on the runtime configuration instead of the permanent one'))
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help=_('do not save a snapshot of the permanent configuration before writing'))
+    return parser
+
+
+def _parser(prog):
+    parser = argparse.ArgumentParser(prog=prog)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _addStateCommand(subparsers, 'plan', _('show the changes needed to reach the desired state'))
+    _addStateCommand(subparsers, 'apply', _('apply the changes needed to reach the desired state'))
+    parser_import = _addStateCommand(subparsers, 'import', _('import an exported configuration'))
+    parser_import.add_argument('--dry-run', action='store_true',
+                               help=_('only show the changes, as plan does'))
+    parser_export = _addOffline(subparsers.add_parser('export', help=_('export the whole configuration')))
+    parser_export.add_argument('--runtime', action='store_true',
+                               help=_('export the runtime configuration instead of the permanent one'))
+    parser_export.add_argument('--format', choices=('json', 'yaml'),
+                               help=_('document format, by default from the output name, else yaml'))
+    parser_export.add_argument('-o', '--output', help=_('output file, standard output if omitted'))
+    parser_snapshot = _addOffline(subparsers.add_parser('snapshot', help=_('save the permanent configuration')))
+    parser_snapshot.add_argument('-m', '--label', default='', help=_('snapshot description'))
+    subparsers.add_parser('history', help=_('list the saved snapshots'))
+    parser_diff = _addOffline(subparsers.add_parser('diff', help=_('compare snapshots')))
+    parser_diff.add_argument('old', help=_('snapshot id'))
+    parser_diff.add_argument('new', nargs='?',
+                             help=_('snapshot id, the permanent configuration if omitted'))
+    parser_restore = _addOffline(subparsers.add_parser('restore', help=_('restore a snapshot')))
+    parser_restore.add_argument('id', help=_('snapshot id'))
+    parser_restore.add_argument('--dry-run', action='store_true',
+                                help=_('only show the changes'))
+    parser_restore.add_argument('--no-snapshot', action='store_true',
+                                help=_('do not save a snapshot of the permanent configuration before writing'))
+    parser_journal = subparsers.add_parser('journal', help=_('show the audit journal, newest first'))
+    parser_journal.add_argument('--since', metavar='TIME',
+                                help=_('"YYYY-MM-DD[ HH:MM[:SS]]", or a time ago such as 30m, 12h, 7d'))
+    parser_journal.add_argument('--until', metavar='TIME', help=_('as --since'))
+    parser_journal.add_argument('--object', help=_('zone, service, IP set... name, wildcards allowed'))
+    parser_journal.add_argument('--event', help=_('client method or firewalld signal, wildcards allowed'))
+    parser_journal.add_argument('--source', choices=(journal.SOURCE_APP, journal.SOURCE_SIGNAL),
+                                help=_('only changes made by manafirewall, or only firewalld signals'))
+    parser_journal.add_argument('--grep', metavar='TEXT', help=_('text to find into arguments and errors'))
+    parser_journal.add_argument('-n', '--count', type=int, default=50, help=_('entries to show'))
+    parser_journal.add_argument('--json', action='store_true', help=_('one JSON object per entry'))
+    parser_metrics = _addOffline(subparsers.add_parser('metrics', help=_('write Prometheus metrics')))
+    parser_metrics.add_argument('--permanent', action='store_true',
+                                help=_('count the permanent configuration instead of the runtime one'))
+    parser_metrics.add_argument('-o', '--output', metavar='FILE',
+                                help=_('file written atomically, e.g. into the node_exporter textfile '
+                                       'directory; standard output if omitted'))
+    parser_metrics.add_argument('--interval', type=int, metavar='SECONDS',
+                                help=_('keep running, write the metrics every SECONDS reading only the '
+                                       'objects changed since the previous export'))
+    return parser
+
+
+# subcommand name -> handler(args), filled below
+COMMANDS = {}
+
+
+def _connect(args, journaled=False):
+    '''Returns a headless model, None if firewalld (or the offline
+    configuration) cannot be reached. If journaled, the changes written are
+    recorded into the audit journal.'''
+    fw_model = model.ManaFirewallModel()
+    if journaled:
+        fw_model.journal = journal.Journal()
+        fw_model.journal.start()
+    if args.offline:
+        if getattr(args, 'runtime', False):
+            print(_("There is no runtime configuration offline"), file=sys.stderr)
+            return None
+        try:
+            fw_model.connectOffline(args.offline, headless=True)
+        except Exception as e:
+            print(_("Cannot open %(root)s: %(error)s") % {'root': args.offline, 'error': e},
+                  file=sys.stderr)
+            return None
+        return fw_model
+    try:
+        fw_model.connect(headless=True)
+    except Exception as e:
+        print(_("Cannot connect to firewalld: %s") % e, file=sys.stderr)
+        return None
+    if not fw_model.connected:
+        print(_("Cannot connect to firewalld"), file=sys.stderr)
+        return None
+    return fw_model
+
+
+def _timing(plan):
+    print(_("read %(read).3f s, apply %(apply).3f s, %(writes)d write(s)") %
+          {'read': plan.read_time, 'apply': plan.apply_time, 'writes': plan.writes},
+          file=sys.stderr)
+
+
+def _planCommand(args, apply):
+    try:
+        state = declarative.loadState(args.state)
+    except declarative.StateError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    fw_model = _connect(args, journaled=apply)
+    if fw_model is None:
+        return EXIT_ERROR
+    try:
+        plan = declarative.buildPlan(fw_model, state, args.runtime)
+    except declarative.StateError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print(_("Cannot read the firewalld configuration: %s") % e, file=sys.stderr)
+        return EXIT_ERROR
+
+    return _runPlan(fw_model, plan, apply,
+                    None if args.runtime or args.no_snapshot else
+                    "before %s %s" % (args.command, args.state))
+
+
+def _saveSnapshot(fw_model, label):
+    '''Save the permanent configuration, returns the snapshot id or None.'''
+    try:
+        snapshot_id = history.SnapshotStore().save(fw_model.configSnapshot(False),
+                                                   fw_model.globalState(), label)
+    except Exception as e:
+        print(_("Cannot save a snapshot: %s") % e, file=sys.stderr)
+        return None
+    print(_("Saved snapshot %s") % snapshot_id, file=sys.stderr)
+    return snapshot_id
+
+
+def _runPlan(fw_model, plan, apply, snapshot_label=None):
+    '''Print and optionally apply a plan, saving a snapshot first if a
+    label is given.'''
+    for line in plan.describe():
+        print(line)
+    if not plan:
+        print(_("No changes."))
+        _timing(plan)
+        return EXIT_OK
+    if not apply:
+        _timing(plan)
+        return EXIT_CHANGES
+
+    if snapshot_label is not None and _saveSnapshot(fw_model, snapshot_label) is None:
+        return EXIT_ERROR
+    try:
+        declarative.applyPlan(fw_model, plan)
+    except Exception as e:
+        print(_("Apply failed: %s") % e, file=sys.stderr)
+        _timing(plan)
+        return EXIT_PARTIAL if plan.writes else EXIT_ERROR
+    print(_("Applied %d change(s).") % len(plan.operations))
+    _timing(plan)
+    return EXIT_OK
+
+
+COMMANDS['plan'] = lambda args: _planCommand(args, apply=False)
+COMMANDS['apply'] = lambda args: _planCommand(args, apply=True)
+COMMANDS['import'] = lambda args: _planCommand(args, apply=not args.dry_run)
+
+
+def _exportCommand(args):
+    fmt = args.format
+    if fmt is None:
+        fmt = 'json' if args.output and args.output.endswith('.json') else 'yaml'
+    fw_model = _connect(args)
+    if fw_model is None:
+        return EXIT_ERROR
+    try:
+        document, read_time = declarative.exportDocument(fw_model, args.runtime)
+    except Exception as e:
+        print(_("Cannot read the firewalld configuration: %s") % e, file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        if args.output:
+            with open(args.output, 'w') as f:
+                declarative.dumpDocument(document, f, fmt)
+        else:
+            declarative.dumpDocument(document, sys.stdout, fmt)
+    except OSError as e:
+        print(_("Cannot write %(file)s: %(error)s") % {'file': args.output, 'error': e},
+              file=sys.stderr)
+        return EXIT_ERROR
+    print(_("read %(read).3f s, %(objects)d object(s)") %
+          {'read': read_time,
+           'objects': sum(len(document[c]) for c in declarative.CLASSES)},
+          file=sys.stderr)
+    return EXIT_OK
+
+
+COMMANDS['export'] = _exportCommand
+
+
+def _snapshotCommand(args):
+    fw_model = _connect(args)
+    if fw_model is None:
+        return EXIT_ERROR
+    snapshot_id = _saveSnapshot(fw_model, args.label)
+    if snapshot_id is None:
+        return EXIT_ERROR
+    print(snapshot_id)
+    return EXIT_OK
+
+
+def _historyCommand(args):
+    try:
+        entries = history.SnapshotStore().history()
+    except history.HistoryError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    for snapshot_id, timestamp, label, count in entries:
+        print("%s  %s  %4d  %s" % (snapshot_id, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+                                   count, label))
+    return EXIT_OK
+
+
+def _diffCommand(args):
+    store = history.SnapshotStore()
+    try:
+        old_id = store.resolve(args.old)
+        if args.new:
+            diff = store.diff(old_id, store.resolve(args.new))
+        else:
+            fw_model = _connect(args)
+            if fw_model is None:
+                return EXIT_ERROR
+            diff = store.diffCurrent(old_id, fw_model.configSnapshot(False), fw_model.globalState())
+    except history.HistoryError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print(_("Cannot read the firewalld configuration: %s") % e, file=sys.stderr)
+        return EXIT_ERROR
+    for line in history.formatDiff(diff):
+        print(line)
+    return EXIT_CHANGES if diff else EXIT_OK
+
+
+def _restoreCommand(args):
+    store = history.SnapshotStore()
+    fw_model = _connect(args, journaled=not args.dry_run)
+    if fw_model is None:
+        return EXIT_ERROR
+    try:
+        snapshot_id = store.resolve(args.id)
+        plan = store.restorePlan(fw_model, snapshot_id)
+    except (history.HistoryError, declarative.StateError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print(_("Cannot read the firewalld configuration: %s") % e, file=sys.stderr)
+        return EXIT_ERROR
+    return _runPlan(fw_model, plan, not args.dry_run,
+                    None if args.no_snapshot else "before restore %s" % snapshot_id)
+
+
+COMMANDS['snapshot'] = _snapshotCommand
+COMMANDS['history'] = _historyCommand
+COMMANDS['diff'] = _diffCommand
+COMMANDS['restore'] = _restoreCommand
+
+
+def _journalCommand(args):
+    try:
+        since = journal.parseTime(args.since) if args.since else None
+        until = journal.parseTime(args.until) if args.until else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    start = time.monotonic()
+    try:
+        entries = journal.query(journal.openReadOnly(), since=since, until=until, source=args.source,
+                                event=args.event, obj=args.object, text=args.grep, limit=args.count)
+    except journal.JournalError as e:
+        print(e, file=sys.stderr)
+        return EXIT_ERROR
+    elapsed = time.monotonic() - start
+    # oldest first, as a log
+    for entry in reversed(entries):
+        print(json.dumps(entry, sort_keys=True) if args.json else journal.formatEntry(entry))
+    print(_("%(count)d entries, query %(time).3f s") % {'count': len(entries), 'time': elapsed},
+          file=sys.stderr)
+    return EXIT_OK
+
+
+COMMANDS['journal'] = _journalCommand
+
+
+def _metricsCommand(args):
+    args.runtime = not args.permanent
+    if args.interval is not None:
+        if args.interval < 1 or not args.output:
+            print(_("--interval needs -o FILE and at least one second"), file=sys.stderr)
+            return EXIT_ERROR
+        if args.offline:
+            print(_("--interval needs a running firewalld"), file=sys.stderr)
+            return EXIT_ERROR
+        # signals routed, they keep the caches and the global state current
+        fw_model = model.ManaFirewallModel()
+        exporter = metrics.TextfileExporter(fw_model, args.output, args.runtime)
+        try:
+            fw_model.connect()
+        except Exception as e:
+            print(_("Cannot connect to firewalld: %s") % e, file=sys.stderr)
+            return EXIT_ERROR
+        exporter.serve(args.interval)
+        return EXIT_OK
+
+    fw_model = _connect(args)
+    if fw_model is None:
+        return EXIT_ERROR
+    exporter = metrics.TextfileExporter(fw_model, args.output, args.runtime)
+    try:
+        if args.output:
+            exporter.export()
+        else:
+            sys.stdout.write(exporter.render())
+    except OSError as e:
+        print(_("Cannot write %(file)s: %(error)s") % {'file': args.output, 'error': e},
+              file=sys.stderr)
+        return EXIT_ERROR
+    # the metrics are written anyway, with manafirewall_up 0
+    return EXIT_OK if exporter.up else EXIT_ERROR
+
+
+COMMANDS['metrics'] = _metricsCommand
+
+
+def main(argv, prog='manafirewall'):
+    '''Run a subcommand, argv starting with its name. Returns the exit
+    code.'''
+    args = _parser(prog).parse_args(argv)
+    return COMMANDS[args.command](args)
@@ -0,0 +1,130 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+configwatch — notices out-of-band edits of the firewalld configuration
+files (an admin, config management, a package update).
+
+ConfigWatcher monitors the zones, services and ipsets directories with
+GLib file monitors (inotify on Linux). Changes are collected per file and
+debounced, so that a burst of writes (an editor saving, a tool rewriting
+every zone) becomes a single 'config-files-changed' event carrying
+{category: [object names]}. Like the firewalld signal callbacks the
+monitor callbacks run in the GLib thread and only post to the router.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import logging
+import os
+
+from gi.repository import Gio, GLib
+
+logger = logging.getLogger('manafirewall.configwatch')
+
+# watched categories, the directory has the category name
+CATEGORIES = ('zones', 'services', 'ipsets')
+
+# quiet time before a burst of changes is posted
+DEBOUNCE_MS = 500
+
+_EVENTS = (
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.CREATED,
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_IN,
+    Gio.FileMonitorEvent.MOVED_OUT,
+    Gio.FileMonitorEvent.RENAMED,
+)
+
+
+def configDirs(root=None):
+    '''
+    Returns the firewalld configuration directories holding the watched
+    categories, those of an offline tree (see offline.configDirs) if root
+    is given.
+    '''
+    if root is None:
+        return ['/etc/firewalld', '/usr/lib/firewalld']
+    import manafirewall.offline as offline
+    return [d for d in offline.configDirs(root) if d]
+
+
+def objectName(path):
+    '''Object name of a configuration file path, None for anything else
+    (editor backups, temporary files, firewalld .old copies).'''
+    filename = os.path.basename(path)
+    if filename.startswith('.') or not filename.endswith('.xml'):
+        return None
+    return filename[:-4]
+
+
+class ConfigWatcher:
+    '''Monitors the object directories under the given configuration
+    directories, see the module documentation.'''
+
+    def __init__(self, router, dirs=None, debounce=DEBOUNCE_MS):
+        self.router = router
+        self.dirs = dirs if dirs is not None else configDirs()
+        self.debounce = debounce
+        self._monitors = []
+        self._pending = {}    # category -> set of names
+        self._timeout = None
+
+    @property
+    def running(self):
+        return bool(self._monitors)
+
+    def start(self):
+        '''Create the monitors in the default main context, missing
+        directories are skipped.'''
+        if self._monitors:
+            return
+        for base in self.dirs:
+            for category in CATEGORIES:
+                directory = os.path.join(base, category)
+                if not os.path.isdir(directory):
+                    continue
+                try:
+                    monitor = Gio.File.new_for_path(directory).monitor_directory(
+                        Gio.FileMonitorFlags.WATCH_MOVES, None)
+                except GLib.Error as e:
+                    logger.warning("Cannot watch %s: %s", directory, e.message)
+                    continue
+                monitor.connect('changed', self._onChanged, category)
+                self._monitors.append(monitor)
+        logger.info("Watching %d configuration directories", len(self._monitors))
+
+    def stop(self):
+        for monitor in self._monitors:
+            monitor.cancel()
+        self._monitors = []
+        if self._timeout is not None:
+            GLib.source_remove(self._timeout)
+            self._timeout = None
+        self._pending.clear()
+
+    def _onChanged(self, monitor, gfile, other, event_type, category):
+        if event_type not in _EVENTS:
+            return
+        names = self._pending.setdefault(category, set())
+        for f in (gfile, other):
+            name = objectName(f.get_path()) if f is not None else None
+            if name is not None:
+                names.add(name)
+        if not names:
+            del self._pending[category]
+            return
+        # every change restarts the quiet time
+        if self._timeout is not None:
+            GLib.source_remove(self._timeout)
+        self._timeout = GLib.timeout_add(self.debounce, self._flush)
+
+    def _flush(self):
+        self._timeout = None
+        changed = {category: sorted(names) for category, names in self._pending.items()}
+        self._pending.clear()
+        logger.debug("Configuration files changed: %s", changed)
+        self.router.post('config-files-changed', changed)
+        return GLib.SOURCE_REMOVE
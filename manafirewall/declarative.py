@@ -0,0 +1,428 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+declarative — desired-state files and the minimal plan to reach them.
+
+A desired-state file (YAML or JSON) describes zones, services, IP sets,
+ICMP types, helpers and the global options, using the ObjectSnapshot field
+names:
+
+    default_zone: public
+    log_denied: unicast
+    zones:
+      public:
+        services: [ssh, dhcpv6-client]
+        ports: ["8080/tcp"]
+        forward_ports:
+          - {port: "80", protocol: tcp, to_port: "8080", to_address: ""}
+        masquerade: false
+        forward: true
+        interfaces: [eth0]
+    services:
+      myapp:
+        short: My application
+        ports: ["9000-9010/tcp"]
+    ipsets:
+      blocklist:
+        type: hash:ip
+        entries: [192.0.2.1, 192.0.2.2]
+
+A listed field is authoritative (sets are replaced as a whole), fields and
+objects not listed are left untouched. exportDocument() writes the same
+schema with every field of every object, so an export is also a state that
+import (plan + apply) brings another host to.
+
+buildPlan() reads only the objects named in the state, concurrently,
+diffs them against the desired snapshots and returns the operations
+needed; applying a plan issues one settings update per changed permanent
+object, or one call per changed element in the runtime view, so a no-op
+apply does not write.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import json
+import logging
+import time
+
+import manafirewall.snapshot as snapshot
+
+logger = logging.getLogger('manafirewall.declarative')
+
+CLASSES = snapshot.CLASSES
+
+# plan order: objects are created before the ones referring to them
+# (zones -> services, ipsets, icmptypes; services -> helpers)
+APPLY_ORDER = ('helpers', 'icmptypes', 'ipsets', 'services', 'zones')
+
+# global option (a globalState() key) -> model setter
+GLOBALS = {
+    'default_zone':      'setDefaultZone',
+    'log_denied':        'setLogDenied',
+    'automatic_helpers': 'setAutomaticHelpers',
+}
+
+# export document header, accepted (and checked) by loadState()
+EXPORT_FORMAT = 'manafirewall-export'
+EXPORT_VERSION = 1
+HEADER_KEYS = ('format', 'version', 'view')
+
+# fields given as "port/protocol" strings or [port, protocol] lists
+PORT_FIELDS = ('ports', 'source_ports')
+FORWARD_PORT_KEYS = ('port', 'protocol', 'to_port', 'to_address')
+
+# runtime zone fields changed element by element, see model.ZONE_ELEMENTS
+RUNTIME_ZONE_ELEMENTS = {
+    'services':      'Service',
+    'ports':         'Port',
+    'protocols':     'Protocol',
+    'source_ports':  'SourcePort',
+    'forward_ports': 'ForwardPort',
+    'icmp_blocks':   'IcmpBlock',
+    'interfaces':    'Interface',
+    'sources':       'Source',
+    'rich_rules':    'RichRule',
+}
+RUNTIME_ZONE_FLAGS = {
+    'masquerade':           'Masquerade',
+    'icmp_block_inversion': 'IcmpBlockInversion',
+    'forward':              'Forward',
+}
+
+# scalar fields that are not strings
+BOOLEAN_FIELDS = ('masquerade', 'icmp_block_inversion', 'forward')
+INTEGER_FIELDS = ('ingress_priority', 'egress_priority')
+
+
+class StateError(Exception):
+    '''The desired state is invalid or cannot be reached.'''
+
+
+def loadState(path):
+    '''Read a desired-state file, JSON if it ends with .json, YAML
+    otherwise.'''
+    try:
+        with open(path) as f:
+            if path.endswith('.json'):
+                state = json.load(f)
+            else:
+                import yaml
+                state = yaml.safe_load(f)
+    except (OSError, ValueError) as e:
+        raise StateError("Cannot read %s: %s" % (path, e))
+    except Exception as e:
+        # yaml.YAMLError
+        raise StateError("Cannot parse %s: %s" % (path, e))
+    if state is None:
+        state = {}
+    if not isinstance(state, dict):
+        raise StateError("%s: the top level must be a mapping" % path)
+    unknown = set(state) - set(CLASSES) - set(GLOBALS) - set(HEADER_KEYS)
+    if unknown:
+        raise StateError("%s: unknown keys %s" % (path, ", ".join(sorted(unknown))))
+    if state.get('format', EXPORT_FORMAT) != EXPORT_FORMAT or \
+            state.get('version', EXPORT_VERSION) != EXPORT_VERSION:
+        raise StateError("%s: unsupported document format %s version %s" %
+                         (path, state.get('format'), state.get('version')))
+    return state
+
+
+def objectToState(obj):
+    '''The state specification of an object snapshot, the inverse of
+    _fields().'''
+    spec = {}
+    for attr, _suffix, kind in obj.FIELDS:
+        value = getattr(obj, attr)
+        if value is None:
+            continue
+        if kind == snapshot.SET:
+            if attr in PORT_FIELDS:
+                value = ["%s/%s" % v for v in sorted(value)]
+            elif attr == 'forward_ports':
+                value = [dict(zip(FORWARD_PORT_KEYS, v)) for v in sorted(value)]
+            else:
+                value = sorted(value)
+        elif kind == snapshot.MAP:
+            value = dict(sorted(value))
+        spec[attr] = value
+    return spec
+
+
+def stateToObject(category, name, spec):
+    '''The object snapshot of a state specification, the inverse of
+    objectToState().'''
+    return CLASSES[category](name, **_fields(category, name, spec))
+
+
+def exportDocument(model, runtime):
+    '''
+    Returns the whole view (every object of every category and the global
+    options) as a state document, and the time spent reading it.
+    '''
+    t_start = time.monotonic()
+    config = model.configSnapshot(runtime)
+    options = model.globalState()
+    read_time = time.monotonic() - t_start
+    document = {
+        'format':  EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'view':    'runtime' if runtime else 'permanent',
+    }
+    for key in GLOBALS:
+        document[key] = options[key]
+    for category in CLASSES:
+        objects = getattr(config, category)
+        document[category] = {name: objectToState(objects[name]) for name in sorted(objects)}
+    return document, read_time
+
+
+def dumpDocument(document, f, fmt):
+    '''Write a state document as 'json' or 'yaml'.'''
+    if fmt == 'json':
+        json.dump(document, f, indent=2)
+        f.write('\n')
+    else:
+        import yaml
+        yaml.safe_dump(document, f, default_flow_style=False, sort_keys=False)
+
+
+def _port(value):
+    if isinstance(value, str):
+        port, sep, protocol = value.rpartition('/')
+        if not sep or not port or not protocol:
+            raise StateError("Invalid port '%s', expected port/protocol" % value)
+        return (port, protocol)
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return (str(value[0]), str(value[1]))
+    raise StateError("Invalid port %r" % (value,))
+
+
+def _forwardPort(value):
+    if isinstance(value, dict):
+        unknown = set(value) - set(FORWARD_PORT_KEYS)
+        if unknown:
+            raise StateError("Invalid forward port keys %s" % ", ".join(sorted(unknown)))
+        return tuple(str(value.get(k) or '') for k in FORWARD_PORT_KEYS)
+    if isinstance(value, (list, tuple)) and len(value) == 4:
+        return tuple(str(v or '') for v in value)
+    raise StateError("Invalid forward port %r" % (value,))
+
+
+def _fields(category, name, spec):
+    '''Normalize an object specification into snapshot fields.'''
+    if spec is None:
+        spec = {}
+    if not isinstance(spec, dict):
+        raise StateError("%s %s: expected a mapping" % (category, name))
+    kinds = {attr: kind for attr, _suffix, kind in CLASSES[category].FIELDS}
+    fields = {}
+    for attr, value in spec.items():
+        kind = kinds.get(attr)
+        if kind is None:
+            raise StateError("%s %s: unknown field '%s'" % (category, name, attr))
+        if kind == snapshot.SET:
+            if not isinstance(value, (list, tuple)):
+                raise StateError("%s %s: '%s' must be a list" % (category, name, attr))
+            if attr in PORT_FIELDS:
+                value = [_port(v) for v in value]
+            elif attr == 'forward_ports':
+                value = [_forwardPort(v) for v in value]
+            else:
+                value = [str(v) for v in value]
+        elif kind == snapshot.MAP:
+            if not isinstance(value, dict):
+                raise StateError("%s %s: '%s' must be a mapping" % (category, name, attr))
+            value = {str(k): str(v) for k, v in value.items()}
+        elif attr in BOOLEAN_FIELDS:
+            value = bool(value)
+        elif attr in INTEGER_FIELDS:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise StateError("%s %s: '%s' must be an integer" % (category, name, attr))
+        else:
+            value = '' if value is None else str(value)
+        fields[attr] = value
+    return fields
+
+
+class Operation:
+    '''One change of the plan: create, update or remove an object, or set
+    a global option (category None, name the option).'''
+
+    __slots__ = ('category', 'name', 'action', 'current', 'desired', 'changes')
+
+    def __init__(self, category, name, action, current, desired, changes):
+        self.category = category
+        self.name = name
+        self.action = action      # 'create', 'update', 'remove' or 'global'
+        self.current = current
+        self.desired = desired
+        self.changes = changes    # ObjectSnapshot.diff(), or (old, new)
+
+    def describe(self):
+        '''Human readable lines.'''
+        if self.action == 'global':
+            return ["~ %s: %s -> %s" % ((self.name.replace('_', ' '),) + self.changes)]
+        if self.action == 'remove':
+            return ["- %s %s" % (self.category[:-1], self.name)]
+        sign = '+' if self.action == 'create' else '~'
+        lines = ["%s %s %s" % (sign, self.category[:-1], self.name)]
+        for attr in sorted(self.changes):
+            change = self.changes[attr]
+            if isinstance(change[0], frozenset):
+                for label, values in (('+', change[0]), ('-', change[1])):
+                    for value in sorted(values):
+                        lines.append("    %s %s: %s" % (label, attr, _format(attr, value)))
+            else:
+                lines.append("    %s: %r -> %r" % (attr, change[0], change[1]))
+        return lines
+
+
+def _format(attr, value):
+    if attr in PORT_FIELDS:
+        return "%s/%s" % value
+    if isinstance(value, tuple):
+        return ":".join(value)
+    return value
+
+
+class Plan:
+    '''Operations bringing one view to the desired state.'''
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.operations = []
+        self.read_time = 0.0
+        self.apply_time = 0.0
+        self.writes = 0
+
+    def __bool__(self):
+        return bool(self.operations)
+
+    def describe(self):
+        lines = []
+        for op in self.operations:
+            lines.extend(op.describe())
+        return lines
+
+
+def buildPlan(model, state, runtime, prune=False):
+    '''
+    Diff the desired state against the current view. Only the objects
+    named in the state are read. With prune the objects of the categories
+    given in the state and not listed there are removed (permanent view
+    only), after the other changes.
+    '''
+    plan = Plan(runtime)
+    t_start = time.monotonic()
+    desired = {}
+    for category in APPLY_ORDER:
+        objects = state.get(category) or {}
+        if not isinstance(objects, dict):
+            raise StateError("'%s' must be a mapping of names" % category)
+        desired[category] = {name: _fields(category, name, objects[name]) for name in objects}
+
+    present = {c: set(model.names(c, runtime)) for c in APPLY_ORDER
+               if desired[c] or (prune and c in state)}
+    current = model.readObjects({c: sorted(present[c] & set(desired[c])) for c in present}, runtime)
+    for category in APPLY_ORDER:
+        cls = CLASSES[category]
+        for name, fields in sorted(desired[category].items()):
+            if name in current[category]:
+                old = current[category][name]
+                new = old.replace(**fields)
+                changes = old.diff(new)
+                if changes:
+                    plan.operations.append(Operation(category, name, 'update', old, new, changes))
+            else:
+                if runtime:
+                    raise StateError("%s %s does not exist, it can be created only in the permanent "
+                                     "configuration" % (category[:-1], name))
+                new = cls(name, **fields)
+                changes = cls(name).diff(new)
+                plan.operations.append(Operation(category, name, 'create', None, new, changes))
+
+    wanted = {key: state[key] for key in GLOBALS if state.get(key) not in (None, '')}
+    for key, value in wanted.items():
+        if isinstance(value, bool):
+            # YAML reads unquoted off/no as false
+            raise StateError("'%s' must be a string, quote it" % key)
+    if wanted:
+        options = model.globalState()
+        for key, value in wanted.items():
+            value = str(value)
+            if value != options[key]:
+                plan.operations.append(Operation(None, key, 'global', None, value,
+                                                 (options[key], value)))
+    if prune:
+        if runtime:
+            raise StateError("Objects can be removed only in the permanent configuration")
+        for category in reversed(APPLY_ORDER):
+            if category in state:
+                for name in sorted(present.get(category, set()) - set(desired[category])):
+                    plan.operations.append(Operation(category, name, 'remove', None, None, None))
+    plan.read_time = time.monotonic() - t_start
+    if runtime:
+        _checkRuntime(plan)
+    return plan
+
+
+def _checkRuntime(plan):
+    for op in plan.operations:
+        if op.action != 'update':
+            continue
+        if op.category == 'zones':
+            allowed = set(RUNTIME_ZONE_ELEMENTS) | set(RUNTIME_ZONE_FLAGS)
+        elif op.category == 'ipsets':
+            allowed = {'entries'}
+        else:
+            allowed = set()
+        fixed = set(op.changes) - allowed
+        if fixed:
+            raise StateError("%s %s: %s cannot be changed in the runtime configuration" %
+                             (op.category[:-1], op.name, ", ".join(sorted(fixed))))
+
+
+def applyPlan(model, plan):
+    '''Apply the plan operations in order, stops at the first error.'''
+    t_start = time.monotonic()
+    try:
+        for op in plan.operations:
+            if op.action == 'global':
+                getattr(model, GLOBALS[op.name])(op.desired)
+                plan.writes += 1
+            elif op.action == 'remove':
+                model.removeObject(op.category, op.name)
+                plan.writes += 1
+            elif not plan.runtime:
+                # the whole object in a single update
+                model.updateObject(op.category, op.desired, create=(op.action == 'create'))
+                plan.writes += 1
+            elif op.category == 'ipsets':
+                model.setIPSetEntries(op.name, op.desired.entries)
+                plan.writes += 1
+            else:
+                _applyRuntimeZone(model, op, plan)
+    finally:
+        plan.apply_time = time.monotonic() - t_start
+
+
+def _applyRuntimeZone(model, op, plan):
+    for attr, change in sorted(op.changes.items()):
+        if attr in RUNTIME_ZONE_FLAGS:
+            model.setZoneElement(True, op.name, RUNTIME_ZONE_FLAGS[attr], change[1])
+            plan.writes += 1
+            continue
+        element = RUNTIME_ZONE_ELEMENTS[attr]
+        added, removed = change
+        for value in sorted(removed):
+            args = value if isinstance(value, tuple) else (value,)
+            model.removeZoneElement(True, op.name, element, *args)
+            plan.writes += 1
+        for value in sorted(added):
+            args = value if isinstance(value, tuple) else (value,)
+            model.addZoneElement(True, op.name, element, *args)
+            plan.writes += 1
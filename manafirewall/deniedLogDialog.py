@@ -0,0 +1,180 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+
+'''
+deniedLogDialog — popup following the packets denied by firewalld when
+Log Denied is set (see deniedlog.py): the most recent hits and the top
+sources, destination ports and zones. Reading and parsing happen in a
+background thread, the tables are refreshed every second.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import gettext
+import logging
+import os
+import time
+
+import manatools.ui.basedialog as basedialog
+import manatools.aui.yui as MUI
+
+import manafirewall.deniedlog as deniedlog
+
+_ = gettext.gettext
+logger = logging.getLogger('manafirewall.deniedlogdialog')
+
+# rows shown in the recent hits and in the top tables
+RECENT_ROWS = 200
+TOP_ROWS = 20
+
+
+class DeniedLogDialog(basedialog.BaseDialog):
+    '''Denied packets viewer, log_denied is the current firewalld setting.'''
+
+    def __init__(self, log_denied=None, source=None):
+        basedialog.BaseDialog.__init__(
+            self, _("Denied Packets"), "", basedialog.DialogType.POPUP, 900, 640)
+        self._log_denied = log_denied
+        self._source = source
+        self._monitor = None
+        self._shown = None
+        self._last = (time.monotonic(), 0)
+
+    def UIlayout(self, layout):
+        vbox = self.factory.createVBox(layout)
+
+        heading = self.factory.createHeading(vbox, _("Packets denied by firewalld"))
+        heading.setAutoWrap()
+        if self._log_denied == 'off':
+            label = self.factory.createLabel(self.factory.createLeft(vbox),
+                                             _("Log Denied is off: set it to see the denied packets"))
+            label.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+        self.factory.createVSpacing(vbox, 0.3)
+
+        header = MUI.YTableHeader()
+        header.addColumn(_('Time'))
+        header.addColumn(_('Zone'))
+        header.addColumn(_('Action'))
+        header.addColumn(_('Interface'))
+        header.addColumn(_('Source'))
+        header.addColumn(_('Destination'))
+        header.addColumn(_('Port'))
+        self._recentTable = self.factory.createTable(vbox, header)
+        self._recentTable.setStretchable(MUI.YUIDimension.YD_VERT, True)
+        self._recentTable.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        hbox = self.factory.createHBox(vbox)
+        self._topTables = {}
+        for key, title in (('sources', _('Source')), ('ports', _('Port')), ('zones', _('Zone'))):
+            header = MUI.YTableHeader()
+            header.addColumn(title)
+            header.addColumn(_('Hits'))
+            table = self.factory.createTable(hbox, header)
+            table.setStretchable(MUI.YUIDimension.YD_VERT, True)
+            table.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+            self._topTables[key] = table
+
+        self._status = self.factory.createLabel(self.factory.createLeft(vbox), "")
+        self._status.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        hbox = self.factory.createHBox(layout)
+        openBtn = self.factory.createIconButton(hbox, 'document-open', _("&Open Log File…"))
+        self._pauseBtn = self.factory.createIconButton(hbox, 'media-playback-pause', _("&Pause"))
+        self.factory.createHStretch(hbox)
+        closeBtn = self.factory.createIconButton(hbox, 'window-close', _("&Close"))
+        self.eventManager.addWidgetEvent(openBtn, self._onOpen)
+        self.eventManager.addWidgetEvent(self._pauseBtn, self._onPause)
+        self.eventManager.addWidgetEvent(closeBtn, self._onClose)
+        self.eventManager.addCancelEvent(self._onClose)
+        self.dialog.setDefaultButton(closeBtn)
+
+        self.timeout = 1000
+        self._paused = False
+        self._follow(self._source if self._source is not None else deniedlog.defaultSource())
+
+    def _follow(self, source):
+        if self._monitor is not None:
+            self._monitor.stop()
+            self._monitor = None
+        self._shown = None
+        if source is None:
+            self._status.setText(_("No kernel log found, open a log file"))
+            return
+        logger.info("Following denied packets from %s", source)
+        self._monitor = deniedlog.DeniedLogMonitor(source)
+        self._monitor.start()
+        self._last = (time.monotonic(), 0)
+        self._fillTables()
+
+    def doSomethingIntoLoop(self):
+        if not self._paused:
+            self._fillTables()
+
+    def _fillTables(self):
+        if self._monitor is None:
+            return
+        snapshot = self._monitor.snapshot(RECENT_ROWS, TOP_ROWS)
+
+        now = time.monotonic()
+        last_time, last_lines = self._last
+        rate = (snapshot['lines'] - last_lines) / (now - last_time) if now > last_time else 0
+        self._last = (now, snapshot['lines'])
+        status = _("%(source)s: %(lines)d lines, %(hits)d denied packets, %(rate).0f lines/s") % {
+            'source': self._monitor.source, 'lines': snapshot['lines'],
+            'hits': snapshot['hits'], 'rate': rate}
+        if self._monitor.error:
+            status += " — " + self._monitor.error
+        self._status.setText(status)
+
+        if snapshot['hits'] == self._shown:
+            return
+        self._shown = snapshot['hits']
+
+        self._recentTable.deleteAllItems()
+        itemColl = []
+        for hit in snapshot['recent']:
+            item = MUI.YTableItem()
+            item.addCell(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(hit.time)) if hit.time else "")
+            item.addCell(hit.zone or "")
+            item.addCell(hit.action)
+            item.addCell(hit.iface or "")
+            item.addCell(hit.src or "")
+            item.addCell(hit.dst or "")
+            item.addCell(hit.port() or "")
+            itemColl.append(item)
+        self._recentTable.addItems(itemColl)
+
+        for key, table in self._topTables.items():
+            table.deleteAllItems()
+            itemColl = []
+            for name, count, error in snapshot[key]:
+                item = MUI.YTableItem()
+                item.addCell(name)
+                # counts are upper bounds, show the uncertainty
+                item.addCell("%d" % count if not error else "%d (±%d)" % (count, error))
+                itemColl.append(item)
+            table.addItems(itemColl)
+
+    def _onOpen(self):
+        filename = MUI.YUI.app().askForExistingFile(
+              "/var/log", "*", _("Open a kernel log or a journal export"))
+        if not filename:
+            return
+        if not os.access(filename, os.R_OK):
+            self._status.setText(_("Cannot read %s") % filename)
+            return
+        self._follow(deniedlog.FileSource(filename, from_start=True))
+
+    def _onPause(self):
+        self._paused = not self._paused
+        self._pauseBtn.setLabel(_("&Resume") if self._paused else _("&Pause"))
+        if not self._paused:
+            self._fillTables()
+
+    def _onClose(self):
+        if self._monitor is not None:
+            self._monitor.stop()
+            self._monitor = None
+        self.ExitLoop()
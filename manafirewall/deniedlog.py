@@ -0,0 +1,472 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+deniedlog — follows the kernel log lines written for the packets firewalld
+denies (Log Denied), and aggregates them in bounded memory.
+
+Sources, read incrementally (only what was appended since the previous
+read, with the partial last line or entry kept for the next one):
+
+    FileSource      a plain text log (syslog, journalctl -k), or a file in
+                    the journal export format (journalctl -o export),
+                    detected from its first bytes; a truncated or rotated
+                    file is read again from its beginning
+    CommandSource   the output of a command, e.g. journalctl -k -f -o export
+
+A line is a hit if it has a firewalld log prefix ("filter_IN_public_REJECT:",
+"IN_public_DROP:", "FINAL_REJECT:"...): DeniedStats keeps the last hits in
+a ring buffer and the heavy hitters (sources, destination ports, zones)
+with the Space-Saving algorithm, k counters each whatever the traffic: a
+counted item is over-estimated by at most its error, and any item seen
+more than total/k times is in the counters.
+
+DeniedLogMonitor reads and parses in a background thread, the UI takes a
+snapshot() of the statistics when it refreshes.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import collections
+import logging
+import os
+import re
+import select
+import shutil
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger('manafirewall.deniedlog')
+
+DEFAULT_RING_SIZE = 1000
+DEFAULT_TOP_K = 100
+
+# bytes read per call
+READ_SIZE = 1 << 20
+
+# a partial line or export entry larger than this is dropped
+MAX_PENDING = 1 << 20
+
+# plain log files tried when journalctl is not available
+LOG_FILES = ('/var/log/kern.log', '/var/log/messages', '/var/log/syslog')
+
+_EXPORT_MAGIC = (b'__CURSOR=', b'__REALTIME_TIMESTAMP=', b'__MONOTONIC_TIMESTAMP=')
+_EXPORT_FIELDS = frozenset(('MESSAGE', '__REALTIME_TIMESTAMP'))
+
+_PREFIX = re.compile(r'(?:^|[\s:\]])(?P<prefix>[A-Za-z0-9_.-]+_(?:REJECT|DROP|DENY)):\s')
+_ZONE = re.compile(r'^(?:(?:filter|nat|mangle|raw)_)?(?:(?P<chain>IN|OUT|FWD|FWDI|FWDO)_)?'
+                   r'(?P<zone>.+)_(?P<action>REJECT|DROP|DENY)$')
+_FIELDS = re.compile(r'\b(IN|OUT|SRC|DST|PROTO|SPT|DPT)=(\S*)')
+# prefixes of the rules not bound to a zone
+_NO_ZONE = frozenset(('FINAL', 'STATE_INVALID'))
+
+_ISO_TIME = re.compile(r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)')
+_SYSLOG_TIME = re.compile(r'^([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d)')
+
+
+class Hit:
+    '''One denied packet.'''
+
+    __slots__ = ('time', 'zone', 'chain', 'action', 'iface', 'src', 'dst', 'proto', 'sport', 'dport')
+
+    def __init__(self, when, zone, chain, action, fields):
+        self.time = when
+        self.zone = zone
+        self.chain = chain
+        self.action = action
+        self.iface = fields.get('IN') or fields.get('OUT') or None
+        self.src = fields.get('SRC')
+        self.dst = fields.get('DST')
+        self.proto = fields.get('PROTO')
+        self.sport = fields.get('SPT')
+        self.dport = fields.get('DPT')
+
+    def port(self):
+        '''"port/protocol", or the protocol alone (ICMP...)'''
+        if self.dport:
+            return "%s/%s" % (self.dport, (self.proto or '').lower())
+        return (self.proto or '').lower() or None
+
+
+class _TimeParser:
+    '''Time of a plain log line, cached per second since strptime is slow.'''
+
+    def __init__(self):
+        self._text = None
+        self._value = None
+        self._year = time.localtime().tm_year
+
+    def __call__(self, line):
+        match = _ISO_TIME.match(line) or _SYSLOG_TIME.match(line)
+        if match is None:
+            return None
+        text = match.group(1)
+        if text != self._text:
+            try:
+                if 'T' in text:
+                    self._value = time.mktime(time.strptime(text, '%Y-%m-%dT%H:%M:%S'))
+                else:
+                    # syslog times have no year
+                    self._value = time.mktime(time.strptime("%d %s" % (self._year, text), '%Y %b %d %H:%M:%S'))
+            except ValueError:
+                self._value = None
+            self._text = text
+        return self._value
+
+
+def parseHit(message, when=None):
+    '''Returns the Hit of a kernel log message, None if it is not a
+    firewalld denied packet.'''
+    if 'SRC=' not in message:
+        return None
+    match = _PREFIX.search(message)
+    if match is None:
+        return None
+    prefix = _ZONE.match(match.group('prefix'))
+    if prefix is None:
+        return None
+    zone = prefix.group('zone')
+    fields = dict(_FIELDS.findall(message, match.end()))
+    return Hit(when, None if zone in _NO_ZONE else zone, prefix.group('chain'),
+               prefix.group('action'), fields)
+
+
+class LineParser:
+    '''Plain text: returns the (time, message) of the complete lines fed.'''
+
+    def __init__(self):
+        self._pending = b''
+        self._time = _TimeParser()
+
+    def feed(self, data):
+        data = self._pending + data
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._pending = data if len(data) <= MAX_PENDING else b''
+            return []
+        self._pending = data[end + 1:]
+        return [(self._time(line), line)
+                for line in data[:end].decode('utf-8', 'replace').split('\n')]
+
+
+class ExportParser:
+    '''Journal export format: returns the (time, message) of the complete
+    entries fed. Entries are "FIELD=value" lines, or for binary values the
+    field name, a 64 bit little endian size, the data and a new line; an
+    empty line ends the entry.'''
+
+    def __init__(self):
+        self._pending = b''
+        self._fields = {}
+
+    def feed(self, data):
+        data = self._pending + data
+        records = []
+        pos = 0
+        fields = self._fields
+        while True:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                break
+            if end == pos:
+                if fields:
+                    records.append(self._record(fields))
+                    fields = {}
+                pos = end + 1
+                continue
+            equal = data.find(b'=', pos, end)
+            if equal >= 0:
+                name = data[pos:equal].decode('ascii', 'replace')
+                if name in _EXPORT_FIELDS:
+                    fields[name] = data[equal + 1:end]
+                pos = end + 1
+                continue
+            # binary field
+            start = end + 1
+            if len(data) < start + 8:
+                break
+            size = int.from_bytes(data[start:start + 8], 'little')
+            stop = start + 8 + size
+            if len(data) < stop + 1:
+                break
+            name = data[pos:end].decode('ascii', 'replace')
+            if name in _EXPORT_FIELDS:
+                fields[name] = data[start + 8:stop]
+            pos = stop + 1
+        self._fields = fields
+        self._pending = data[pos:]
+        if len(self._pending) > MAX_PENDING:
+            logger.warning("Dropping an export entry larger than %d bytes", MAX_PENDING)
+            self._pending = b''
+            self._fields = {}
+        return records
+
+    @staticmethod
+    def _record(fields):
+        when = fields.get('__REALTIME_TIMESTAMP')
+        try:
+            when = int(when) / 1e6 if when is not None else None
+        except ValueError:
+            when = None
+        return when, fields.get('MESSAGE', b'').decode('utf-8', 'replace')
+
+
+def _parserFor(head):
+    return ExportParser() if head.startswith(_EXPORT_MAGIC) else LineParser()
+
+
+class FileSource:
+    '''Follows a log file, see the module documentation. If from_start is
+    False, only what is appended after the first read is returned.'''
+
+    polled = True
+
+    def __init__(self, path, from_start=True):
+        self.path = path
+        self.from_start = from_start
+        self._file = None
+        self._inode = None
+        self._parser = None
+
+    def __str__(self):
+        return self.path
+
+    def _open(self, first):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._inode = stat.st_ino
+        self._parser = _parserFor(self._file.read(64))
+        self._file.seek(0 if self.from_start or not first else stat.st_size)
+        if not first:
+            logger.info("%s truncated or rotated, reading it again", self.path)
+
+    def read(self):
+        '''Returns the (time, message) records appended since the previous
+        call.'''
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        if self._file is None:
+            self._open(True)
+        elif stat.st_ino != self._inode or stat.st_size < self._file.tell():
+            self._open(False)
+        data = self._file.read(READ_SIZE)
+        return self._parser.feed(data) if data else []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CommandSource:
+    '''Follows the output of a command (journal export format or plain
+    text), read() waits up to POLL_INTERVAL seconds for some output.'''
+
+    polled = False
+
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, argv):
+        self.argv = list(argv)
+        self.ended = False
+        self._process = None
+        self._parser = None
+
+    def __str__(self):
+        return ' '.join(self.argv)
+
+    def read(self):
+        if self._process is None:
+            self._process = subprocess.Popen(self.argv, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+        fd = self._process.stdout.fileno()
+        if not select.select([fd], [], [], self.POLL_INTERVAL)[0]:
+            return []
+        data = os.read(fd, READ_SIZE)
+        if not data:
+            self.ended = True
+            return []
+        if self._parser is None:
+            self._parser = _parserFor(data)
+        return self._parser.feed(data)
+
+    def close(self):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+
+def defaultSource():
+    '''The kernel messages from journald if available, else from the
+    first plain log file found; None if there is none.'''
+    if shutil.which('journalctl'):
+        return CommandSource(['journalctl', '-k', '-f', '-n', '1000', '-o', 'export'])
+    for path in LOG_FILES:
+        if os.access(path, os.R_OK):
+            return FileSource(path, from_start=False)
+    return None
+
+
+class SpaceSaving:
+    '''Space-Saving heavy hitters (Metwally et al.) over k counters, with
+    the stream-summary buckets: add() and eviction are O(1).'''
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._buckets = {}      # count -> items having it
+        self._min = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _move(self, item, old, new):
+        if old:
+            bucket = self._buckets[old]
+            bucket.discard(item)
+            if not bucket:
+                del self._buckets[old]
+                if old == self._min:
+                    self._min = new
+        self._buckets.setdefault(new, set()).add(item)
+        self._counts[item] = new
+
+    def add(self, item):
+        if item is None:
+            return
+        self.total += 1
+        count = self._counts.get(item)
+        if count is not None:
+            self._move(item, count, count + 1)
+            return
+        if len(self._counts) < self.k:
+            self._errors[item] = 0
+            self._move(item, 0, 1)
+            self._min = 1
+            return
+        # replace an item with the minimum count, the newcomer inherits it
+        evicted = next(iter(self._buckets[self._min]))
+        count = self._min
+        self._buckets[count].discard(evicted)
+        del self._counts[evicted]
+        del self._errors[evicted]
+        self._errors[item] = count
+        self._counts[item] = count
+        self._buckets[count].add(item)
+        self._move(item, count, count + 1)
+
+    def top(self, n=None):
+        '''[(item, count, error)], highest counts first.'''
+        items = sorted(self._counts.items(), key=lambda i: i[1], reverse=True)
+        return [(item, count, self._errors[item]) for item, count in items[:n]]
+
+
+class DeniedStats:
+    '''Recent hits and heavy hitters, see the module documentation.'''
+
+    def __init__(self, ring_size=DEFAULT_RING_SIZE, top_k=DEFAULT_TOP_K):
+        self.recent = collections.deque(maxlen=ring_size)
+        self.sources = SpaceSaving(top_k)
+        self.ports = SpaceSaving(top_k)
+        self.zones = SpaceSaving(top_k)
+        self.lines = 0
+        self.hits = 0
+
+    def add(self, hit):
+        self.hits += 1
+        self.recent.append(hit)
+        self.sources.add(hit.src)
+        self.ports.add(hit.port())
+        self.zones.add(hit.zone)
+
+    def feed(self, records):
+        '''Parse and count (time, message) records, returns the hits.'''
+        hits = 0
+        for when, message in records:
+            hit = parseHit(message, when)
+            if hit is not None:
+                self.add(hit)
+                hits += 1
+        self.lines += len(records)
+        return hits
+
+
+class DeniedLogMonitor:
+    '''Reads a source into a DeniedStats from a background thread.'''
+
+    # seconds between two reads of a polled source with nothing new
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, source, stats=None):
+        self.source = source
+        self.stats = stats if stats is not None else DeniedStats()
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='manafirewall-deniedlog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.source.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                records = self.source.read()
+                if records:
+                    with self._lock:
+                        self.stats.feed(records)
+                elif getattr(self.source, 'ended', False):
+                    break
+                elif self.source.polled:
+                    self._stop.wait(self.POLL_INTERVAL)
+        except (OSError, ValueError) as e:
+            if not self._stop.is_set():
+                self.error = str(e)
+                logger.warning("Cannot read %s: %s", self.source, e)
+
+    def snapshot(self, recent=200, top=20):
+        '''Consistent copy for the UI: {'lines', 'hits', 'recent' (newest
+        first), 'sources', 'ports', 'zones' ([(item, count, error)]),
+        'top_total' (sources counted)}.'''
+        with self._lock:
+            stats = self.stats
+            hits = list(stats.recent)[-recent:] if recent else []
+            return {
+                'lines':     stats.lines,
+                'hits':      stats.hits,
+                'recent':    hits[::-1],
+                'sources':   stats.sources.top(top),
+                'ports':     stats.ports.top(top),
+                'zones':     stats.zones.top(top),
+                'top_total': stats.sources.total,
+            }
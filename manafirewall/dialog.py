@@ -12,21 +12,13 @@ Author:  Angelo Naselli <anaselli@linux.it>
 '''
 
 import logging
-import logging.handlers
 import os.path
 
 import manatools.ui.common as common
 import manatools.ui.basedialog as basedialog
-import manatools.ui.helpdialog as helpdialog
 import manatools.config as configuration
 import manatools.aui.yui as MUI
 
-from firewall import client
-from firewall import functions
-from firewall.core.base import DEFAULT_ZONE_TARGET
-from firewall.core.fw_nm import nm_is_imported, \
-                                nm_get_connections, nm_get_zone_of_connection, \
-                                nm_set_zone_of_connection
 import gettext
 import html
 import time
@@ -38,55 +30,55 @@ from inspect import ismethod
 from manafirewall.version import __version__ as VERSION
 from manafirewall.version import __project_name__ as PROJECT
 
-from queue import SimpleQueue, Empty
-
-import manafirewall.zoneBaseDialog as zoneBaseDialog
-import manafirewall.serviceBaseDialog as serviceBaseDialog
-import manafirewall.ipsetBaseDialog as ipsetBaseDialog
-import manafirewall.changeZoneConnectionDialog as changeZoneConnectionDialog
-import manafirewall.portDialog as portDialog
-import manafirewall.forwardDialog as forwardDialog
-import manafirewall.protocolDialog as protocolDialog
-import manafirewall.optionDialog as optionDialog
-import manafirewall.helpinfo as helpinfo
-import manafirewall.moduleDialog as moduleDialog
-import manafirewall.activeBindingsDialog as activeBindingsDialog
-import manafirewall.ipsetEntryDialog as ipsetEntryDialog
+# sub-dialogs, help, NetworkManager support, the firewall client modules and
+# the optional features (journal, file logging, config watcher, warm start
+# cache, import/export, history, memory diagnostics) are imported where they
+# are used, to keep them off the startup path
+import manafirewall.model as model
+import manafirewall.signalrecorder as signalrecorder
+import manafirewall.profiling as profiling
+from manafirewall.profiling import TimeFunction
+import manafirewall.watchdog as watchdog
 
 logger = logging.getLogger('manafirewall.dialog')
 _ = gettext.gettext
 
-def TimeFunction(func):
-    """
-    This decorator prints execution time
-    """
-    def newFunc(*args, **kwargs):
-        t_start = time.monotonic()
-        rc = func(*args, **kwargs)
-        t_end = time.monotonic()
-        name = func.__name__
-        t_diff = t_end - t_start
-        if t_diff >= 0.001:
-          logger.debug("%s took %.3f sec", name, t_diff)
-        return rc
-
-    newFunc.__name__ = func.__name__
-    newFunc.__doc__ = func.__doc__
-    newFunc.__dict__.update(func.__dict__)
-    return newFunc
-
 
 class ManaWallDialog(basedialog.BaseDialog):
   '''
   manafirewall main dialog
   '''
-  def __init__(self):
+  def __init__(self, offline=None, record_signals=None):
     #gettext.install('manafirewall', localedir='/usr/share/locale', names=('ngettext',))
     # set icon (if missing into python-manatools)
     self.__name = "manafirewall"
+    # configuration tree root to work on without firewalld, see offline.py
+    self._offlineRoot = offline
     self.log_enabled = False
     self.log_directory = None
     self.level_debug = False
+    self.log_json = False
+    # None: the asynclog.py defaults
+    self.log_max_size = None
+    self.log_backups = None
+    self.log_compress = False
+    # queue based file logging, see asynclog.py
+    self.asyncLogging = None
+    self.profiling_enabled = False
+    self.watchdog_enabled = False
+    self.watchdog_budget = watchdog.DEFAULT_BUDGET_MS
+    # UI loop stall detection, see watchdog.py
+    self.watchdog = None
+    self.memory_diagnostics = False
+    # memory and leak diagnostics, see memwatch.py
+    self.memoryWatcher = None
+    self.journal_enabled = True
+    # None: the journal.py default
+    self.journal_retention = None
+    # audit journal of changes and signals, see journal.py
+    self.journal = None
+    # file written at the first loop tick, see benchmarks.startup
+    self._startupProbe = os.environ.get('MANAFIREWALL_STARTUP_PROBE')
 
     MUI.YUI.app().setApplicationIcon("manafirewall")
     # Wayland/Plasma: tell the compositor which .desktop file represents this
@@ -150,24 +142,7 @@ class ManaWallDialog(basedialog.BaseDialog):
                                         "connection '%s'")
     self.enabled = _("enabled")
     self.disabled = _("disabled")
-    self.connection_lost = False
-    self.log_denied = ""
-    self.automatic_helpers = ""
-    self.active_zones = { }
-    self.runtime_view = True
-    self.buttons = None
-    self.replacePointWidgetsAndCallbacks = []
-    self.leftReplacePointWidgetsAndCallbacks = []
-    self._reloading = False
-    self._reload_pending_zones = []
-    self._reload_pending_services = []
-    # UX state tracking
-    self._currentCategory = 'zones'    # 'zones', 'services', 'ipsets'
-    self._currentItem     = None       # selected zone/service/ipset name
-    self._currentRightTab = 'summary'  # selected right tab key
-    self._nm_connections_data = {}     # NM connection data cache
-    self.activeBindingsTree = None     # current left tree/list widget
-    self._leftList = None              # current left list widget (services/ipsets)
+    self._initViewState()
 
     self.config = configuration.AppConfig(self.__name)
 
@@ -181,7 +156,8 @@ class ManaWallDialog(basedialog.BaseDialog):
           print("WARNING: log directory '%s' does not exist; logging disabled" % self.log_directory)
           self._log_missing_dir_warning = self.log_directory
         else:
-          log_filename = os.path.join(self.log_directory, "manafirewall.log")
+          log_filename = os.path.join(self.log_directory,
+                                      "manafirewall.jsonl" if self.log_json else "manafirewall.log")
           if self.level_debug:
             self._logger_setup(log_filename, loglvl=logging.DEBUG)
           else:
@@ -202,7 +178,22 @@ class ManaWallDialog(basedialog.BaseDialog):
         'richtext': True,
       })
 
-    self.fwEventQueue = SimpleQueue()
+    # firewalld state and access, the dialog is a view over it
+    self.model = model.ManaFirewallModel()
+    if record_signals:
+      self.model.recorder = signalrecorder.SignalRecorder(record_signals)
+    if self.journal_enabled:
+      import manafirewall.journal as journal
+      retention = self.journal_retention if self.journal_retention is not None else journal.DEFAULT_RETENTION_DAYS
+      self.journal = journal.Journal(retention_days=retention)
+      self.journal.start()
+      self.model.journal = self.journal
+    self.eventRouter = self.model.router
+    if self.profiling_enabled:
+      # handler latencies, event queue latency and D-Bus calls per action
+      profiling.profiler.enable()
+      self.model.profiler = profiling.profiler
+      self.eventRouter.profiler = profiling.profiler
 
     if MUI.YUI.app().isTextMode():
       self.glib_loop = GLib.MainLoop()
@@ -210,20 +201,64 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.glib_thread.start()
 
 
+  def _initViewState(self):
+    '''
+    state of the panes and of the current selection, no widget is created
+    (benchmarks.paths runs the pane methods against stub widgets from here)
+    '''
+    self.connection_lost = False
+    self.log_denied = ""
+    self.automatic_helpers = ""
+    self._zoneTreeData = None
+    # zone tree items and their (label, data) children, see _renderZoneTree
+    self._zoneTreeItems = {}
+    self._zoneTreeChildrenCache = {}
+    # IP set names shown into the left list and entries of the current one,
+    # a private set updated in place, with its greatest entry (the last row)
+    self._ipsetListItems = {}
+    self._ipsetEntries = set()
+    self._ipsetLast = ''
+    self.runtime_view = True
+    self.buttons = None
+    self.replacePointWidgetsAndCallbacks = []
+    self.leftReplacePointWidgetsAndCallbacks = []
+    # event router subscriptions of the current left and right pane content
+    self.leftPaneSubscriptions = []
+    self.rightPaneSubscriptions = []
+    # out-of-band configuration file edits (see configwatch), optional
+    self.configWatcher = None
+    self._changedFiles = set()
+    # UX state tracking
+    self._currentCategory = 'zones'    # 'zones', 'services', 'ipsets'
+    self._currentItem     = None       # selected zone/service/ipset name
+    self._currentRightTab = 'summary'  # selected right tab key
+    self._nm_connections_data = {}     # NM connection data cache
+    # firewall.core.fw_nm, imported on first use (see _nm)
+    self._fw_nm = None
+    self._nmThread = None
+    self.activeBindingsTree = None     # current left tree/list widget
+    self._leftList = None              # current left list widget (services/ipsets)
+
   def _logger_setup(self,
                     file_name='manafirewall.log',
                     logroot='manafirewall',
-                    logfmt='%(asctime)s [%(name)s]{%(filename)s:%(lineno)d}(%(levelname)s) %(message)s',
                     loglvl=logging.INFO):
-    """Setup Python logging."""
-    maxbytes = 10*1024*1024
-    fmt = logging.Formatter(logfmt)
-    handler = logging.handlers.RotatingFileHandler(
-              file_name, maxBytes=maxbytes, backupCount=5)
-    handler.setFormatter(fmt)
-    logger.addHandler(handler)
-    logger.setLevel(loglvl)
-    logger.propagate = False
+    """Setup Python logging, written by a background thread (see asynclog.py)."""
+    import manafirewall.asynclog as asynclog
+    max_size = self.log_max_size if self.log_max_size is not None else asynclog.DEFAULT_MAX_SIZE_MB
+    backups = self.log_backups if self.log_backups is not None else asynclog.DEFAULT_BACKUPS
+    self.asyncLogging = asynclog.AsyncLogging(
+      file_name, root=logroot, level=loglvl, json_lines=self.log_json,
+      max_size_mb=max_size, backups=backups, compress=self.log_compress)
+    self.asyncLogging.start()
+
+  def _stopLogging(self):
+    '''
+    write the queued log records and close the log file
+    '''
+    if self.asyncLogging is not None:
+      self.asyncLogging.stop()
+      self.asyncLogging = None
 
 
   def _configFileRead(self) :
@@ -260,6 +295,30 @@ class ManaWallDialog(basedialog.BaseDialog):
                 log['directory'] = self.log_directory
             if 'level_debug' in log.keys() :
                 self.level_debug = log['level_debug']
+            if 'json' in log.keys() :
+                self.log_json = log['json']
+            if 'max_size_mb' in log.keys() :
+                self.log_max_size = log['max_size_mb']
+            if 'backups' in log.keys() :
+                self.log_backups = log['backups']
+            if 'compress' in log.keys() :
+                self.log_compress = log['compress']
+            if 'profiling' in log.keys() :
+                self.profiling_enabled = log['profiling']
+            if 'watchdog' in log.keys() :
+                self.watchdog_enabled = log['watchdog']
+            if 'watchdog_budget_ms' in log.keys() :
+                self.watchdog_budget = log['watchdog_budget_ms']
+            if 'memory_diagnostics' in log.keys() :
+                self.memory_diagnostics = log['memory_diagnostics']
+
+        #### Audit journal
+        if isinstance(user_settings.get('journal'), dict):
+          journal_prefs = user_settings['journal']
+          if 'enabled' in journal_prefs.keys() :
+            self.journal_enabled = journal_prefs['enabled']
+          if 'retention_days' in journal_prefs.keys() :
+            self.journal_retention = journal_prefs['retention_days']
 
     # Ensure 'settings' always exists in userPreferences so that callers
     # never need to guard against a missing or None sub-dict.
@@ -291,8 +350,17 @@ class ManaWallDialog(basedialog.BaseDialog):
       mItem = self.menubar.addMenu(_("&File"))
       self.fileMenu = {
           'menu_name' : mItem,
+          'export'    : self.menubar.addItem(mItem, _("&Export Configuration…"), 'document-export'),
+          'import'    : self.menubar.addItem(mItem, _("&Import Configuration…"), 'document-import'),
+          'history'   : self.menubar.addItem(mItem, _("&History…"), 'document-open-recent'),
+          'journal'   : self.menubar.addItem(mItem, _("&Journal…"), 'document-properties'),
+          'sep0'      : mItem.addSeparator(),
           'quit'      : self.menubar.addItem(mItem, _("&Quit"), "application-exit"),
       }
+      self.eventManager.addMenuEvent(self.fileMenu['export'], self.onExportConfiguration)
+      self.eventManager.addMenuEvent(self.fileMenu['import'], self.onImportConfiguration)
+      self.eventManager.addMenuEvent(self.fileMenu['history'], self.onHistory)
+      self.eventManager.addMenuEvent(self.fileMenu['journal'], self.onJournal)
       self.eventManager.addMenuEvent(self.fileMenu['quit'], self.onQuitEvent, sendObjOnEvent)
 
       # building Options menu
@@ -303,13 +371,20 @@ class ManaWallDialog(basedialog.BaseDialog):
           'reload' : self.menubar.addItem(mItem, _("&Reload Firewalld"), 'view-refresh'),
           'sep0'     : mItem.addSeparator(),
           'active_bindings': self.menubar.addItem(mItem, _("Active &Bindings…"), 'network-wired'),
+          'denied_log': self.menubar.addItem(mItem, _("&Denied Packets…"), 'security-low'),
           'sep1'     : mItem.addSeparator(),
           'settings' : self.menubar.addItem(mItem, _("&Settings"), 'preferences-system'),
       }
       self.eventManager.addMenuEvent(self.optionsMenu['runtime_to_permanent'], self.onRuntimeToPermanent)
       self.eventManager.addMenuEvent(self.optionsMenu['reload'], self.onReloadFirewalld)
       self.eventManager.addMenuEvent(self.optionsMenu['active_bindings'], self.onActiveBindings)
+      self.eventManager.addMenuEvent(self.optionsMenu['denied_log'], self.onDeniedLog)
       self.eventManager.addMenuEvent(self.optionsMenu['settings'], self.onOptionSettings)
+      if self.profiling_enabled:
+        self.optionsMenu['profiling'] = self.menubar.addItem(mItem, _("&Profiling Report"), 'utilities-system-monitor')
+        self.eventManager.addMenuEvent(self.optionsMenu['profiling'], self.onProfilingReport)
+        self.optionsMenu['bus_stats'] = self.menubar.addItem(mItem, _("&Bus Statistics…"), 'network-transmit-receive')
+        self.eventManager.addMenuEvent(self.optionsMenu['bus_stats'], self.onBusStats)
 
       # building Help menu
       mItem = self.menubar.addMenu(_("&Help"))
@@ -479,6 +554,8 @@ class ManaWallDialog(basedialog.BaseDialog):
     # ─────────────────────────────────────────────────────────────────────────
     # Status bar
     # ─────────────────────────────────────────────────────────────────────────
+    self.configFilesLabel = self.factory.createLabel(layout, "")
+    self.configFilesLabel.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
     align = self.factory.createLeft(layout)
     statusLine = self.factory.createHBox(align)
     self.statusLabel = self.factory.createLabel(statusLine, self.failed_to_connect_label)
@@ -506,46 +583,106 @@ class ManaWallDialog(basedialog.BaseDialog):
     #self.eventManager.addTimeOutEvent(self.onTimeOutEvent)
     # End Dialof layout
 
-    self.dialog.setEnabled(False)
+    # menus, options and the (cached) left pane are usable while connecting
+    self._setLiveEnabled(False)
+    if not self._offlineRoot:
+      self._paintWarmStart()
     self.initFWClient()
 
+    if self.watchdog_enabled:
+      self.watchdog = watchdog.StallWatchdog(self.watchdog_budget)
+      self.watchdog.start()
+    if self.memory_diagnostics:
+      import manafirewall.memwatch as memwatch
+      self.memoryWatcher = memwatch.MemoryWatcher({
+        'callbacks.left':      lambda: len(self.leftReplacePointWidgetsAndCallbacks),
+        'callbacks.right':     lambda: len(self.replacePointWidgetsAndCallbacks),
+        'subscriptions':       self.eventRouter.subscriptionCount,
+        'subscriptions.left':  lambda: len(self.leftPaneSubscriptions),
+        'subscriptions.right': lambda: len(self.rightPaneSubscriptions),
+        'cache':               self.model.cacheSizes,
+      })
+      self.memoryWatcher.start()
+
+  @property
+  def fw(self):
+    '''
+    firewalld client, owned by the model
+    '''
+    return self.model.fw
+
+  def _nm(self, wait=False):
+    '''
+    returns firewall.core.fw_nm, imported on first use since it loads the
+    NetworkManager GI bindings. Unless wait is True the import runs in
+    background and None is returned meanwhile, 'nm-ready' is posted once
+    it is done
+    '''
+    if self._fw_nm is None and wait:
+      import firewall.core.fw_nm as fw_nm
+      self._fw_nm = fw_nm
+    elif self._fw_nm is None and self._nmThread is None:
+      self._nmThread = threading.Thread(target=self._importNM, daemon=True)
+      self._nmThread.start()
+    return self._fw_nm
+
+  def _importNM(self):
+    '''
+    background import of firewall.core.fw_nm, see _nm()
+    '''
+    try:
+      import firewall.core.fw_nm as fw_nm
+    except Exception as e:
+      logger.warning("NetworkManager support not available: %s", e)
+      return
+    self._fw_nm = fw_nm
+    self.eventRouter.post('nm-ready', force=True)
+
   def _serviceSettings(self):
     '''
     returns current service settings
     '''
-    selected_service = self._currentItem
-    if not selected_service:
+    if not self._currentItem:
       return None
-    if self.runtime_view:
-      try:
-        return self.fw.getServiceSettings(selected_service)
-      except Exception:
-        return None
-    else:
-      try:
-        service = self.fw.config().getServiceByName(selected_service)
-        return service.getSettings()
-      except Exception:
-        return None
+    return self.model.serviceSettings(self._currentItem, self.runtime_view)
 
   def _zoneSettings(self):
     '''
     returns current zone settings
     '''
-    selected_zone = self._currentItem
-    if not selected_zone:
+    if not self._currentItem:
       return None
-    if self.runtime_view:
-      try:
-        return self.fw.getZoneSettings(selected_zone)
-      except Exception:
-        return None
-    else:
-      try:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        return zone.getSettings()
-      except Exception:
-        return None
+    return self.model.zoneSettings(self._currentItem, self.runtime_view)
+
+  def _zoneNames(self):
+    '''
+    returns zone names of the current view
+    '''
+    return self.model.zoneNames(self.runtime_view)
+
+  def _serviceNames(self):
+    '''
+    returns service names of the current view
+    '''
+    return self.model.serviceNames(self.runtime_view)
+
+  def _ipsetNames(self):
+    '''
+    returns IP set names of the current view
+    '''
+    return self.model.ipsetNames(self.runtime_view)
+
+  def _activeZones(self):
+    '''
+    returns active zones (runtime bindings)
+    '''
+    return self.model.activeZones()
+
+  def _defaultZone(self):
+    '''
+    returns the default zone
+    '''
+    return self.model.defaultZone()
 
   def _AddEditRemoveButtons(self, container):
     '''
@@ -585,6 +722,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     item.addCell(str(strValue))
     return item
 
+  @TimeFunction
   def _replacePointICMP(self):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -605,6 +743,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.eventManager.addWidgetEvent(self.icmpFilterInversionCheck, self.OnICMPFilterInversionChecked)
     self.replacePointWidgetsAndCallbacks.append({'widget': self.icmpFilterInversionCheck, 'action': self.OnICMPFilterInversionChecked})
 
+  @TimeFunction
   def _fillRPICMPFilter(self):
     '''
     fill current ICMP into replace point
@@ -614,11 +753,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       configured_icmp = settings.getIcmpBlocks()
       icmp_block_inversion = settings.getIcmpBlockInversion()
 
-      icmp_types = None
-      if self.runtime_view:
-        icmp_types = self.fw.listIcmpTypes()
-      else:
-        icmp_types = self.fw.config().getIcmpTypeNames()
+      icmp_types = self.model.icmpTypeNames(self.runtime_view)
 
       current_icmp = ""
       current = self.icmpFilterList.selectedItem()
@@ -638,6 +773,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.icmpFilterInversionCheck.setNotify(True)
 
 
+  @TimeFunction
   def _replacePointMasquerade(self):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -653,6 +789,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.replacePointWidgetsAndCallbacks.append({'widget': self.masquerade, 'action': self.onZoneMasquerade})
     self._fillRPMasquerade()
 
+  @TimeFunction
   def _fillRPMasquerade(self):
     '''
     sets masquerade value
@@ -665,6 +802,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.masquerade.setValue(bool(masquerade))
     self.masquerade.setNotify(True)
 
+  @TimeFunction
   def _replacePointProtocols(self, context):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -682,6 +820,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.replacePointWidgetsAndCallbacks.append({'widget': self.buttons[op], 'action': self.onPortButtonsPressed})
     self._fillRPProtocols(context)
 
+  @TimeFunction
   def _fillRPProtocols(self, context):
     '''
     fill current protocols into replace point
@@ -711,6 +850,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.protocolList.deleteAllItems()
     self.protocolList.addItems(v)
 
+  @TimeFunction
   def _replacePointPort(self, context):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -729,6 +869,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.replacePointWidgetsAndCallbacks.append({'widget': self.buttons[op], 'action': self.onPortButtonsPressed})
     self._fillRPPort(context)
 
+  @TimeFunction
   def _fillRPPort(self, context):
     '''
     fill current ports into replace point
@@ -763,6 +904,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.portList.deleteAllItems()
     self.portList.addItems(v)
 
+  @TimeFunction
   def _replacePointServices(self):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -779,6 +921,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.eventManager.addWidgetEvent(self.serviceList, self.onRPServiceChecked)
     self.replacePointWidgetsAndCallbacks.append({'widget': self.serviceList, 'action': self.onRPServiceChecked})
 
+  @TimeFunction
   def _fillRPServices(self):
     '''
     fill current services into replace point
@@ -787,11 +930,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     if settings:
       configured_services = settings.getServices()
 
-      services = None
-      if self.runtime_view:
-        services = self.fw.listServices()
-      else:
-        services = self.fw.config().getServiceNames()
+      services = self._serviceNames()
 
       current_service = ""
       current = self.serviceList.selectedItem()
@@ -806,6 +945,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.serviceList.deleteAllItems()
       self.serviceList.addItems(v)
 
+  @TimeFunction
   def _replacePointForwardPorts(self):
     if len(self.replacePointWidgetsAndCallbacks) > 0:
       logger.error("Error there are still widget events for ReplacePoint")
@@ -826,6 +966,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.replacePointWidgetsAndCallbacks.append({'widget': self.buttons[op], 'action': self.onPortButtonsPressed})
     self._fillRPForwardPorts()
 
+  @TimeFunction
   def _fillRPForwardPorts(self):
     '''
     fill current forwarding ports into replace point
@@ -846,6 +987,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.portForwardList.deleteAllItems()
       self.portForwardList.addItems(v)
 
+  @TimeFunction
   def onRPICMPFilterChecked(self, widgetEvent):
     '''
     works on enabling/disabling icmp filter for zone
@@ -858,35 +1000,22 @@ class ManaWallDialog(basedialog.BaseDialog):
         selected_zone = self._currentItem
         if selected_zone:
           name = item.cell(label_column).label()
-          if self.runtime_view:
-            if item.checked(cb_column):
-              self.fw.addIcmpBlock(selected_zone, name)
-            else:
-              self.fw.removeIcmpBlock(selected_zone, name)
+          if item.checked(cb_column):
+            self.model.addZoneElement(self.runtime_view, selected_zone, 'IcmpBlock', name)
           else:
-            zone = self.fw.config().getZoneByName(selected_zone)
-            if item.checked(cb_column):
-              zone.addIcmpBlock(name)
-            else:
-              zone.removeIcmpBlock(name)
+            self.model.removeZoneElement(self.runtime_view, selected_zone, 'IcmpBlock', name)
 
+  @TimeFunction
   def OnICMPFilterInversionChecked(self):
     '''
     manages ICMP Block Inversion checked (Accept if checked)
     '''
     selected_zone = self._currentItem
     if selected_zone:
-      if self.runtime_view:
-        if self.icmpFilterInversionCheck.isChecked():
-          if not self.fw.queryIcmpBlockInversion(selected_zone):
-            self.fw.addIcmpBlockInversion(selected_zone)
-        else:
-          if self.fw.queryIcmpBlockInversion(selected_zone):
-            self.fw.removeIcmpBlockInversion(selected_zone)
-      else:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        zone.setIcmpBlockInversion(self.icmpFilterInversionCheck.isChecked())
+      self.model.setZoneElement(self.runtime_view, selected_zone, 'IcmpBlockInversion',
+                                self.icmpFilterInversionCheck.isChecked())
 
+  @TimeFunction
   def onRPServiceChecked(self, widgetEvent):
     '''
     works on enabling/disabling service for zone
@@ -899,17 +1028,10 @@ class ManaWallDialog(basedialog.BaseDialog):
         selected_zone = self._currentItem
         if selected_zone:
           service_name = item.cell(label_column).label()
-          if self.runtime_view:
-            if item.checked(cb_column):
-              self.fw.addService(selected_zone, service_name)
-            else:
-              self.fw.removeService(selected_zone, service_name)
+          if item.checked(cb_column):
+            self.model.addZoneElement(self.runtime_view, selected_zone, 'Service', service_name)
           else:
-            zone = self.fw.config().getZoneByName(selected_zone)
-            if item.checked(cb_column):
-              zone.addService(service_name)
-            else:
-              zone.removeService(service_name)
+            self.model.removeZoneElement(self.runtime_view, selected_zone, 'Service', service_name)
 
   def _del_edit_port(self):
     '''
@@ -922,16 +1044,13 @@ class ManaWallDialog(basedialog.BaseDialog):
         port_range = selected_portitem.cell(0).label()
         protocol   = selected_portitem.cell(1).label()
 
-        if self.runtime_view:
-          self.fw.removePort(selected_zone, port_range, protocol)
-        else:
-          zone = self.fw.config().getZoneByName(selected_zone)
-          zone.removePort(port_range, protocol)
+        self.model.removeZoneElement(self.runtime_view, selected_zone, 'Port', port_range, protocol)
 
   def _add_edit_port(self, add):
     '''
     add or edit port (add is True for new port)
     '''
+    import manafirewall.portDialog as portDialog
     selected_zone = self._currentItem
     if selected_zone:
 
@@ -953,17 +1072,9 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      if self.runtime_view:
-        if not self.fw.queryPort(selected_zone, newPortInfo['port_range'], newPortInfo['protocol']):
-          self.fw.addPort(selected_zone, newPortInfo['port_range'], newPortInfo['protocol'])
-          if not add:
-            self.fw.removePort(selected_zone, oldPortInfo['port_range'], oldPortInfo['protocol'])
-      else:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        if not zone.queryPort(newPortInfo['port_range'], newPortInfo['protocol']):
-          if not add:
-            zone.removePort(oldPortInfo['port_range'], oldPortInfo['protocol'])
-          zone.addPort(newPortInfo['port_range'], newPortInfo['protocol'])
+      self.model.replaceZoneElement(self.runtime_view, selected_zone, 'Port',
+                                    None if add else (oldPortInfo['port_range'], oldPortInfo['protocol']),
+                                    (newPortInfo['port_range'], newPortInfo['protocol']))
 
   def _service_conf_del_edit_port(self):
     '''
@@ -976,13 +1087,13 @@ class ManaWallDialog(basedialog.BaseDialog):
         port_range = selected_portitem.cell(0).label()
         protocol   = selected_portitem.cell(1).label()
 
-        service = self.fw.config().getServiceByName(active_service)
-        service.removePort(port_range, protocol)
+        self.model.removeServiceElement(active_service, 'Port', port_range, protocol)
 
   def _service_conf_add_edit_port(self, add):
     '''
     add, edit or remove port from a service (add is True for new port)
     '''
+    import manafirewall.portDialog as portDialog
     active_service = self._currentItem
     if active_service:
 
@@ -1004,16 +1115,15 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      service = self.fw.config().getServiceByName(active_service)
-      if not service.queryPort(newPortInfo['port_range'], newPortInfo['protocol']):
-        if not add:
-          service.removePort(oldPortInfo['port_range'], oldPortInfo['protocol'])
-        service.addPort(newPortInfo['port_range'], newPortInfo['protocol'])
+      self.model.replaceServiceElement(active_service, 'Port',
+                                       None if add else (oldPortInfo['port_range'], oldPortInfo['protocol']),
+                                       (newPortInfo['port_range'], newPortInfo['protocol']))
 
   def _add_edit_protocol(self, add):
     '''
     add or edit protocol (add is True for new protocol)
     '''
+    import manafirewall.protocolDialog as protocolDialog
     selected_zone = self._currentItem
     if selected_zone:
 
@@ -1033,17 +1143,9 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      if self.runtime_view:
-        if not self.fw.queryProtocol(selected_zone, newInfo['protocol']):
-          self.fw.addProtocol(selected_zone, newInfo['protocol'])
-          if not add:
-            self.fw.removeProtocol(selected_zone, oldInfo['protocol'])
-      else:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        if not zone.queryProtocol(newInfo['protocol']):
-          if not add:
-            zone.removeProtocol(oldInfo['protocol'])
-          zone.addProtocol(newInfo['protocol'])
+      self.model.replaceZoneElement(self.runtime_view, selected_zone, 'Protocol',
+                                    None if add else (oldInfo['protocol'],),
+                                    (newInfo['protocol'],))
 
   def _del_edit_protocol(self):
     '''
@@ -1055,16 +1157,13 @@ class ManaWallDialog(basedialog.BaseDialog):
       if selected_portitem:
         protocol   = selected_portitem.cell(0).label()
 
-        if self.runtime_view:
-          self.fw.removeProtocol(selected_zone, protocol)
-        else:
-          zone = self.fw.config().getZoneByName(selected_zone)
-          zone.removeProtocol(protocol)
+        self.model.removeZoneElement(self.runtime_view, selected_zone, 'Protocol', protocol)
 
   def _add_edit_source_port(self, add):
     '''
     add or edit source port from zone (add is True for new port)
     '''
+    import manafirewall.portDialog as portDialog
     selected_zone = self._currentItem
     if selected_zone:
 
@@ -1086,17 +1185,9 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      if self.runtime_view:
-        if not self.fw.querySourcePort(selected_zone, newPortInfo['port_range'], newPortInfo['protocol']):
-          self.fw.addSourcePort(selected_zone, newPortInfo['port_range'], newPortInfo['protocol'])
-          if not add:
-            self.fw.removeSourcePort(selected_zone, oldPortInfo['port_range'], oldPortInfo['protocol'])
-      else:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        if not zone.querySourcePort(newPortInfo['port_range'], newPortInfo['protocol']):
-          if not add:
-            zone.removeSourcePort(oldPortInfo['port_range'], oldPortInfo['protocol'])
-          zone.addSourcePort(newPortInfo['port_range'], newPortInfo['protocol'])
+      self.model.replaceZoneElement(self.runtime_view, selected_zone, 'SourcePort',
+                                    None if add else (oldPortInfo['port_range'], oldPortInfo['protocol']),
+                                    (newPortInfo['port_range'], newPortInfo['protocol']))
 
   def _del_edit_source_port(self):
     '''
@@ -1109,11 +1200,7 @@ class ManaWallDialog(basedialog.BaseDialog):
         port_range = selected_portitem.cell(0).label()
         protocol   = selected_portitem.cell(1).label()
 
-        if self.runtime_view:
-          self.fw.removeSourcePort(selected_zone, port_range, protocol)
-        else:
-          zone = self.fw.config().getZoneByName(selected_zone)
-          zone.removeSourcePort(port_range, protocol)
+        self.model.removeZoneElement(self.runtime_view, selected_zone, 'SourcePort', port_range, protocol)
 
   def _service_conf_del_edit_source_port(self):
     '''
@@ -1126,13 +1213,13 @@ class ManaWallDialog(basedialog.BaseDialog):
         port_range = selected_portitem.cell(0).label()
         protocol   = selected_portitem.cell(1).label()
 
-        service = self.fw.config().getServiceByName(active_service)
-        service.removeSourcePort(port_range, protocol)
+        self.model.removeServiceElement(active_service, 'SourcePort', port_range, protocol)
 
   def _service_conf_add_edit_source_port(self, add):
     '''
     add or edit source port from a service (add is True for new port)
     '''
+    import manafirewall.portDialog as portDialog
     active_service = self._currentItem
     if active_service:
 
@@ -1154,16 +1241,15 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      service = self.fw.config().getServiceByName(active_service)
-      if not service.querySourcePort(newPortInfo['port_range'], newPortInfo['protocol']):
-        if not add:
-          service.removeSourcePort(oldPortInfo['port_range'], oldPortInfo['protocol'])
-        service.addSourcePort(newPortInfo['port_range'], newPortInfo['protocol'])
+      self.model.replaceServiceElement(active_service, 'SourcePort',
+                                       None if add else (oldPortInfo['port_range'], oldPortInfo['protocol']),
+                                       (newPortInfo['port_range'], newPortInfo['protocol']))
 
   def _add_edit_forward_port(self, add):
     '''
     add or edit forward port from zone (add is True for new port)
     '''
+    import manafirewall.forwardDialog as forwardDialog
     selected_zone = self._currentItem
     if selected_zone:
 
@@ -1189,33 +1275,19 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      if self.runtime_view:
-        if not self.fw.queryForwardPort(selected_zone, newPortForwardingInfo['port'], newPortForwardingInfo['protocol'],
-                                        newPortForwardingInfo['to_port'], newPortForwardingInfo['to_address']):
-          self.fw.addForwardPort(selected_zone, newPortForwardingInfo['port'], newPortForwardingInfo['protocol'],
-                                 newPortForwardingInfo['to_port'], newPortForwardingInfo['to_address'])
-          if not add:
-            self.fw.removeForwardPort(selected_zone, oldPortForwardingInfo['port'], oldPortForwardingInfo['protocol'],
-                                       oldPortForwardingInfo['to_port'], oldPortForwardingInfo['to_address'])
-          if add and newPortForwardingInfo['to_address'] and not self.fw.queryMasquerade(selected_zone):
-            if common.askYesOrNo({'title': _("Information needed"),
-                                  'text': _("Forwarding to another system is only useful if the interface is masqueraded.<br>Do you want to masquerade this zone?"),
-                                  'richtext': True, 'default_button': 1}):
-              self.fw.addMasquerade(selected_zone)
-      else:
-        zone = self.fw.config().getZoneByName(selected_zone)
-        if not zone.queryForwardPort(newPortForwardingInfo['port'], newPortForwardingInfo['protocol'],
-                                     newPortForwardingInfo['to_port'], newPortForwardingInfo['to_address']):
-          if not add:
-            zone.removeForwardPort(oldPortForwardingInfo['port'], oldPortForwardingInfo['protocol'],
-                                   oldPortForwardingInfo['to_port'], oldPortForwardingInfo['to_address'])
-          zone.addForwardPort(newPortForwardingInfo['port'], newPortForwardingInfo['protocol'],
-                              newPortForwardingInfo['to_port'], newPortForwardingInfo['to_address'])
-          if add and newPortForwardingInfo['to_address'] and not zone.getMasquerade():
-            if common.askYesOrNo({'title': _("Information needed"),
-                                  'text': _("Forwarding to another system is only useful if the interface is masqueraded.<br>Do you want to masquerade this zone?"),
-                                  'richtext': True, 'default_button': 1}):
-              zone.setMasquerade(True)
+      old = None
+      if not add:
+        old = (oldPortForwardingInfo['port'], oldPortForwardingInfo['protocol'],
+               oldPortForwardingInfo['to_port'], oldPortForwardingInfo['to_address'])
+      new = (newPortForwardingInfo['port'], newPortForwardingInfo['protocol'],
+             newPortForwardingInfo['to_port'], newPortForwardingInfo['to_address'])
+      if self.model.replaceZoneElement(self.runtime_view, selected_zone, 'ForwardPort', old, new):
+        if add and newPortForwardingInfo['to_address'] and \
+            not self.model.queryZoneElement(self.runtime_view, selected_zone, 'Masquerade'):
+          if common.askYesOrNo({'title': _("Information needed"),
+                                'text': _("Forwarding to another system is only useful if the interface is masqueraded.<br>Do you want to masquerade this zone?"),
+                                'richtext': True, 'default_button': 1}):
+            self.model.addZoneElement(self.runtime_view, selected_zone, 'Masquerade')
 
   def _del_edit_forward_port(self):
     '''
@@ -1230,17 +1302,14 @@ class ManaWallDialog(basedialog.BaseDialog):
         to_port    = selected_portitem.cell(2).label() if selected_portitem.cell(2) else ""
         to_address = selected_portitem.cell(3).label() if selected_portitem.cell(3) else ""
 
-        if self.runtime_view:
-            self.fw.removeForwardPort(selected_zone, port, protocol,
-                                      to_port, to_address)
-        else:
-            zone = self.fw.config().getZoneByName(selected_zone)
-            zone.removeForwardPort(port, protocol, to_port, to_address)
+        self.model.removeZoneElement(self.runtime_view, selected_zone, 'ForwardPort',
+                                     port, protocol, to_port, to_address)
 
   def _service_conf_add_edit_protocol(self, add):
     '''
     add or edit protocol from a service (add is True for new protocol)
     '''
+    import manafirewall.protocolDialog as protocolDialog
     active_service = self._currentItem
     if active_service:
 
@@ -1260,11 +1329,9 @@ class ManaWallDialog(basedialog.BaseDialog):
         # nothing to change
         return
 
-      service = self.fw.config().getServiceByName(active_service)
-      if not service.queryProtocol(newInfo['protocol']):
-        if not add:
-          service.removeProtocol(oldInfo['protocol'])
-        service.addProtocol(newInfo['protocol'])
+      self.model.replaceServiceElement(active_service, 'Protocol',
+                                       None if add else (oldInfo['protocol'],),
+                                       (newInfo['protocol'],))
 
   def _service_conf_del_edit_protocol(self):
     '''
@@ -1276,9 +1343,9 @@ class ManaWallDialog(basedialog.BaseDialog):
       if selected_portitem:
         protocol   = selected_portitem.cell(0).label()
 
-        service = self.fw.config().getServiceByName(active_service)
-        service.removeProtocol(protocol)
+        self.model.removeServiceElement(active_service, 'Protocol', protocol)
 
+  @TimeFunction
   def onZoneMasquerade(self):
     '''
     Zone masquerade has changed
@@ -1286,18 +1353,10 @@ class ManaWallDialog(basedialog.BaseDialog):
     if self._currentCategory == 'zones':
       selected_zone = self._currentItem
       if selected_zone:
-        checked = self.masquerade.isChecked()
-        if self.runtime_view:
-          if checked:
-            if not self.fw.queryMasquerade(selected_zone):
-              self.fw.addMasquerade(selected_zone)
-          else:
-            if self.fw.queryMasquerade(selected_zone):
-              self.fw.removeMasquerade(selected_zone)
-        else:
-          zone = self.fw.config().getZoneByName(selected_zone)
-          zone.setMasquerade(checked)
+        self.model.setZoneElement(self.runtime_view, selected_zone, 'Masquerade',
+                                  self.masquerade.isChecked())
 
+  @TimeFunction
   def onPortButtonsPressed(self, button):
     '''
     add, edit, remove port has been pressed
@@ -1493,6 +1552,7 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     self._fillLeftCategory()
 
+  @TimeFunction
   def _fillLeftCategory(self):
     '''Dispatch to the correct fill method for the current category.'''
     if self._currentCategory == 'zones':
@@ -1500,7 +1560,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     elif self._currentCategory == 'services':
       self._fillLeftServices(self._currentItem)
     elif self._currentCategory == 'ipsets':
-      self._fillLeftIPSets()
+      self._fillLeftIPSets(self._currentItem)
     self._updateRightTabState()
     self._refreshRightPane()
     self._updateLeftButtonState()
@@ -1535,99 +1595,158 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.eventManager.removeWidgetEvent(e['widget'], e['action'])
     self.leftReplacePointWidgetsAndCallbacks.clear()
 
+  @TimeFunction
   def _fillLeftZones(self, selected=None):
     '''Fill leftReplacePoint with a zone tree (all zones, active bindings as children).'''
-    self._cleanLeftCallbacks()
-    self.leftReplacePoint.deleteChildren()
-    self.activeBindingsTree = None
-    self._connectionsTreeItem = None
-
     zones = []
-    active_zones = {}
     default_zone = ''
     try:
-      if self.runtime_view:
-        zones = sorted(self.fw.getZones())
-      else:
-        zones = sorted(self.fw.config().getZoneNames())
-      active_zones = self.fw.getActiveZones()
-      default_zone = self.fw.getDefaultZone()
+      zones = sorted(self._zoneNames())
+      default_zone = self._defaultZone()
+      self._activeZones()
     except Exception:
       pass
 
-    # Build NM connection map
-    self._nm_connections_data = {}
+    # NM connection map, kept so that binding changes can be rendered
+    # without asking NetworkManager again
     _connections      = {}
     _connections_name = {}
-    if nm_is_imported():
+    nm = self._nm()
+    if nm is not None and nm.nm_is_imported():
       try:
-        nm_get_connections(_connections, _connections_name)
+        nm.nm_get_connections(_connections, _connections_name)
       except Exception:
         pass
-      for zone_name, data in active_zones.items():
-        for iface in data.get('interfaces', []):
+    self._zoneTreeData = {
+      'zones'            : zones,
+      'default_zone'     : default_zone,
+      'connections'      : _connections,
+      'connections_name' : _connections_name,
+      'nm_zones'         : {},
+    }
+    self._renderZoneTree(selected)
+
+  def _zoneTreeConnections(self):
+    '''
+    NM connection map of the active bindings, {conn_id: [zone, [ifaces],
+    display_name]}. The NetworkManager zone of a connection not looked up
+    yet is asked in background (see _lookupNMZones), the firewalld zone is
+    used meanwhile
+    '''
+    data = self._zoneTreeData
+    connections = {}
+    missing = set()
+    _connections = data['connections']
+    if _connections:
+      for zone_name, zone_data in self.model.active_zones.items():
+        for iface in zone_data.get('interfaces', []):
           if iface in _connections:
             conn_id = _connections[iface]
-            if conn_id not in self._nm_connections_data:
-              try:
-                nm_zone = nm_get_zone_of_connection(conn_id)
-              except Exception:
-                nm_zone = ''
-              self._nm_connections_data[conn_id] = [
+            if conn_id not in connections:
+              nm_zone = data['nm_zones'].get(conn_id)
+              if nm_zone is None:
+                missing.add(conn_id)
+              connections[conn_id] = [
                 nm_zone if nm_zone else zone_name, [],
-                _connections_name.get(conn_id, conn_id)
+                data['connections_name'].get(conn_id, conn_id)
               ]
-            self._nm_connections_data[conn_id][1].append(iface)
+            connections[conn_id][1].append(iface)
+    if missing:
+      self._lookupNMZones(data, missing)
+    return connections
+
+  def _lookupNMZones(self, data, conn_ids):
+    '''
+    ask NetworkManager the zone of the given connections in a background
+    thread, 'nm-zones' is posted with the answers
+    '''
+    conn_ids = conn_ids - data.setdefault('nm_pending', set())
+    if not conn_ids:
+      return
+    data['nm_pending'].update(conn_ids)
 
-    nm_ifaces = {iface for _, ifaces_l, _ in self._nm_connections_data.values()
-                 for iface in ifaces_l}
+    def lookup():
+      zones = {}
+      for conn_id in conn_ids:
+        try:
+          zones[conn_id] = self._nm(wait=True).nm_get_zone_of_connection(conn_id) or ''
+        except Exception:
+          zones[conn_id] = ''
+      self.eventRouter.post('nm-zones', (data, zones), force=True)
+
+    threading.Thread(target=lookup, daemon=True).start()
+
+  def _zoneTreeChildren(self, zone, nm_ifaces):
+    '''(label, data) of the children of a zone tree item'''
+    zone_data = self.model.active_zones.get(zone, {})
+    children = []
+    # NM-managed connections
+    for conn_id in sorted(self._nm_connections_data):
+      z, ifaces, name = self._nm_connections_data[conn_id]
+      if z == zone:
+        children.append(('{} ({})'.format(name, ', '.join(sorted(ifaces))), ('connection', conn_id)))
+    # Bare interfaces (not NM-managed)
+    for iface in sorted(zone_data.get('interfaces', [])):
+      if iface not in nm_ifaces:
+        children.append((iface, None))
+    # Sources
+    for src in sorted(zone_data.get('sources', [])):
+      children.append((src, None))
+    return children
+
+  def _zoneTreeItem(self, zone, children):
+    label = '{} [{}]'.format(zone, _('default')) if zone == self._zoneTreeData['default_zone'] else zone
+    zone_item = MUI.YTreeItem(label=label, is_open=True)
+    zone_item.setData(('zone', zone))
+    for child_label, child_data in children:
+      child = MUI.YTreeItem(parent=zone_item, label=child_label)
+      if child_data is not None:
+        child.setData(child_data)
+    return zone_item
+
+  def _nmInterfaces(self):
+    return {iface for _, ifaces_l, _ in self._nm_connections_data.values()
+            for iface in ifaces_l}
+
+  def _renderZoneTree(self, selected=None):
+    '''Build the zone tree from the cached zone list and active bindings.'''
+    self._cleanLeftCallbacks()
+    self.leftReplacePoint.deleteChildren()
+    self.activeBindingsTree = None
+    self._connectionsTreeItem = None
+
+    data = self._zoneTreeData
+    zones        = data['zones']
+    default_zone = data['default_zone']
+
+    self._nm_connections_data = self._zoneTreeConnections()
+    nm_ifaces = self._nmInterfaces()
 
     # Build the zone tree
     self.activeBindingsTree = self.factory.createTree(self.factory.createHBox(self.leftReplacePoint), '')
     self.activeBindingsTree.setStretchable(MUI.YUIDimension.YD_VERT, True)
     self.activeBindingsTree.setNotify(True)
 
-    itemColl = []
     selected_zone = selected if selected in zones else \
                     (default_zone if default_zone in zones else (zones[0] if zones else None))
 
+    # zone items and their children, kept so that binding events only
+    # rebuild the touched zones (see _patchZoneTree)
+    self._zoneTreeItems = {}
+    self._zoneTreeChildrenCache = {}
+    itemColl = []
     for zone in zones:
-      label = '{} [{}]'.format(zone, _('default')) if zone == default_zone else zone
-      zone_item = MUI.YTreeItem(label=label, is_open=True)
-      zone_item.setData(('zone', zone))
-
-      zone_data  = active_zones.get(zone, {})
-      interfaces = sorted(zone_data.get('interfaces', []))
-      sources    = sorted(zone_data.get('sources', []))
-
-      # NM-managed connections
-      for conn_id in sorted(self._nm_connections_data):
-        z, ifaces, name = self._nm_connections_data[conn_id]
-        if z == zone:
-          child = MUI.YTreeItem(
-            parent=zone_item,
-            label='{} ({})'.format(name, ', '.join(sorted(ifaces))))
-          child.setData(('connection', conn_id))
-
-      # Bare interfaces (not NM-managed)
-      for iface in interfaces:
-        if iface not in nm_ifaces:
-          MUI.YTreeItem(parent=zone_item, label=iface)
-
-      # Sources
-      for src in sources:
-        MUI.YTreeItem(parent=zone_item, label=src)
-
+      children = self._zoneTreeChildren(zone, nm_ifaces)
+      zone_item = self._zoneTreeItem(zone, children)
+      self._zoneTreeItems[zone] = zone_item
+      self._zoneTreeChildrenCache[zone] = children
       itemColl.append(zone_item)
 
     self.activeBindingsTree.addItems(itemColl)
 
     # Pre-select zone
     if selected_zone:
-      for zi in itemColl:
-        if zi.data() == ('zone', selected_zone):
-          self.activeBindingsTree.selectItem(zi, True)
-          break
+      self.activeBindingsTree.selectItem(self._zoneTreeItems[selected_zone], True)
       self._currentItem = selected_zone
 
     self.eventManager.addWidgetEvent(self.activeBindingsTree, self._onZoneTreeSelected, True)
@@ -1636,7 +1755,44 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     self.leftReplacePoint.showChild()
     self.changeBindingsButton.setEnabled(False)
+    self._subscribeLeftPane()
+
+  def _patchZoneTree(self, touched):
+    '''
+    binding changes of the touched zones (and of the zones NM connections
+    moved from or to): only the items of the zones whose children changed
+    are built again, the tree widget and its callbacks are kept
+    '''
+    old_connections = self._nm_connections_data
+    self._nm_connections_data = self._zoneTreeConnections()
+    zones = set(touched)
+    for conn_id in set(old_connections) | set(self._nm_connections_data):
+      old = old_connections.get(conn_id)
+      new = self._nm_connections_data.get(conn_id)
+      if old != new:
+        zones.update(c[0] for c in (old, new) if c is not None)
+
+    nm_ifaces = self._nmInterfaces()
+    changed = False
+    for zone in zones:
+      if zone not in self._zoneTreeItems:
+        continue
+      children = self._zoneTreeChildren(zone, nm_ifaces)
+      if children == self._zoneTreeChildrenCache[zone]:
+        continue
+      self._zoneTreeItems[zone] = self._zoneTreeItem(zone, children)
+      self._zoneTreeChildrenCache[zone] = children
+      changed = True
+    if not changed:
+      return
 
+    self.activeBindingsTree.deleteAllItems()
+    self.activeBindingsTree.addItems([self._zoneTreeItems[z] for z in self._zoneTreeData['zones']])
+    if self._currentItem in self._zoneTreeItems:
+      self.activeBindingsTree.selectItem(self._zoneTreeItems[self._currentItem], True)
+    self.changeBindingsButton.setEnabled(False)
+
+  @TimeFunction
   def _fillLeftServices(self, selected=None):
     '''Fill leftReplacePoint with a services list.'''
     self._cleanLeftCallbacks()
@@ -1646,10 +1802,7 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     services = []
     try:
-      if self.runtime_view:
-        services = sorted(self.fw.listServices())
-      else:
-        services = sorted(self.fw.config().getServiceNames())
+      services = sorted(self._serviceNames())
     except Exception:
       pass
 
@@ -1678,20 +1831,20 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     self.leftReplacePoint.showChild()
     self.changeBindingsButton.setEnabled(False)
+    self._subscribeLeftPane()
 
-  def _fillLeftIPSets(self):
+  @TimeFunction
+  def _fillLeftIPSets(self, selected=None):
     '''Fill leftReplacePoint with an IP Sets list.'''
     self._cleanLeftCallbacks()
     self.leftReplacePoint.deleteChildren()
     self.activeBindingsTree = None
     self._leftList = None
+    self._ipsetListItems = {}
 
     ipsets = []
     try:
-      if self.runtime_view:
-        ipsets = sorted(self.fw.getIPSets())
-      else:
-        ipsets = sorted(self.fw.config().getIPSetNames())
+      ipsets = sorted(self._ipsetNames())
     except Exception:
       pass
 
@@ -1701,19 +1854,19 @@ class ManaWallDialog(basedialog.BaseDialog):
     self._leftList.setStretchable(MUI.YUIDimension.YD_VERT, True)
     self._leftList.setNotify(True)
 
-    first_ipset = None
+    selected_ipset = selected if selected in ipsets else (ipsets[0] if ipsets else None)
     itemColl = []
     for ipset in ipsets:
       it = MUI.YTableItem()
       it.addCell(ipset)
-      if first_ipset is None:
-        first_ipset = ipset
+      if ipset == selected_ipset:
         it.setSelected(True)
       itemColl.append(it)
+      self._ipsetListItems[ipset] = it
     self._leftList.addItems(itemColl)
 
-    if first_ipset:
-      self._currentItem = first_ipset
+    if selected_ipset:
+      self._currentItem = selected_ipset
 
     self.eventManager.addWidgetEvent(self._leftList, self._onLeftListSelected, True)
     self.leftReplacePointWidgetsAndCallbacks.append(
@@ -1721,11 +1874,13 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     self.leftReplacePoint.showChild()
     self.changeBindingsButton.setEnabled(False)
+    self._subscribeLeftPane()
 
   # ─────────────────────────────────────────────────────────────────────────
   # New UX: left-pane event handlers
   # ─────────────────────────────────────────────────────────────────────────
 
+  @TimeFunction
   def _onZoneTreeSelected(self, obj):
     '''Handle a selection change in the zones tree.'''
     if self.activeBindingsTree is None:
@@ -1758,6 +1913,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.changeBindingsButton.setEnabled(False)
     self._updateLeftButtonState()
 
+  @TimeFunction
   def _onLeftListSelected(self, obj):
     '''Handle a selection change in the services/ipsets list.'''
     if self._leftList is None:
@@ -1774,6 +1930,7 @@ class ManaWallDialog(basedialog.BaseDialog):
         self._refreshRightPane()
       self._updateLeftButtonState()
 
+  @TimeFunction
   def onLeftTabChanged(self):
     '''Handle left DumbTab selection change (Zones / Services / IP Sets).'''
     item = self.leftTab.selectedItem()
@@ -1791,6 +1948,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self._currentRightTab = 'summary'
     self._fillLeftCategory()
 
+  @TimeFunction
   def onLeftAddButton(self):
     if self._currentCategory == 'zones':
       self.onAddZone()
@@ -1799,6 +1957,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     elif self._currentCategory == 'ipsets':
       self.onIPSetConfAddIPSet()
 
+  @TimeFunction
   def onLeftEditButton(self):
     if self._currentCategory == 'zones':
       self.onEditZone()
@@ -1807,6 +1966,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     elif self._currentCategory == 'ipsets':
       self.onIPSetConfEditIPSet()
 
+  @TimeFunction
   def onLeftRemoveButton(self):
     if self._currentCategory == 'zones':
       self.onRemoveZone()
@@ -1815,6 +1975,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     elif self._currentCategory == 'ipsets':
       self.onIPSetConfRemoveIPSet()
 
+  @TimeFunction
   def onLeftLoadDefaultsButton(self):
     if self._currentCategory == 'zones':
       self.onLoadDefaultsZone()
@@ -1911,6 +2072,7 @@ class ManaWallDialog(basedialog.BaseDialog):
   def _updateRightTabState(self):
     self._rebuildRightTabs()
 
+  @TimeFunction
   def onRightTabChanged(self):
     '''Handle right DumbTab selection.'''
     item = self.rightTab.selectedItem()
@@ -1948,11 +2110,16 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.icmpFilterList  = None
     self.modulesList     = None
     self.entriesList     = None
+    self._ipsetEntries   = set()
+    self._ipsetLast      = ''
+    self.bindingsList    = None
     self._destIpv4Input  = None
     self._destIpv6Input  = None
+    self._subscribeRightPane()
 
-    if self._currentItem is None:
-      # No item selected — show blank pane (placeholder keeps ReplacePoint non-empty)
+    if self._currentItem is None or not self.model.connected:
+      # No item selected, or nothing to read it from yet — show blank pane
+      # (placeholder keeps ReplacePoint non-empty)
       self.factory.createVStretch(self.replacePoint)
       self.replacePoint.showChild()
       return
@@ -2026,6 +2193,7 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     self.replacePoint.showChild()
 
+  @TimeFunction
   def _replacePointIPSetEntries(self):
     '''Fill replacePoint with entries for the selected IP set.
 
@@ -2083,32 +2251,61 @@ class ManaWallDialog(basedialog.BaseDialog):
     ]
     self._fillRPIPSetEntries()
 
+  def _readIPSetEntries(self, ipset_name):
+    '''Return the entries of the given IP set as a set.'''
+    return self.model.ipsetEntries(ipset_name, self.runtime_view)
+
+  @TimeFunction
   def _fillRPIPSetEntries(self):
     '''Reload the entries table from firewalld.'''
     if self.entriesList is None:
       return
-    entries = []
-    ipset_name = self._currentItem
-    if ipset_name:
-      try:
-        if self.runtime_view:
-          entries = sorted(self.fw.getEntries(ipset_name))
-        else:
-          settings = self.fw.config().getIPSetByName(ipset_name).getSettings()
-          entries = sorted(settings.getEntries())
-      except Exception:
-        pass
+    self._ipsetEntries = self._readIPSetEntries(self._currentItem) if self._currentItem else set()
+    self._renderIPSetEntries()
+
+  def _applyIPSetEntriesDelta(self, added=(), removed=()):
+    '''
+    apply added and removed entries to the cached entries of the current
+    IP set, redrawing the table only if something really changed. Events
+    for changes already applied locally are no-ops. The work is in the size
+    of the delta, unless the table has to be drawn again: aui tables cannot
+    insert or delete a row in the middle.
+    '''
+    if self.entriesList is None:
+      return
+    added   = set(added) - self._ipsetEntries
+    removed = set(removed) & self._ipsetEntries
+    if not added and not removed:
+      return
+    self._ipsetEntries -= removed
+    self._ipsetEntries |= added
+    if not removed and min(added) > self._ipsetLast:
+      # new entries sort after the existing ones, just append them
+      for entry in sorted(added):
+        it = MUI.YTableItem()
+        it.addCell(entry)
+        self.entriesList.addItem(it)
+      self._ipsetLast = max(added)
+      return
+    # the greatest entry is computed again while drawing
+    self._renderIPSetEntries()
+
+  def _renderIPSetEntries(self):
+    '''Draw the entries table from the cached entries, no D-Bus calls.'''
     items = []
+    entries = sorted(self._ipsetEntries)
     for entry in entries:
       it = MUI.YTableItem()
       it.addCell(entry)
       items.append(it)
+    self._ipsetLast = entries[-1] if entries else ''
     self.entriesList.deleteAllItems()
     self.entriesList.addItems(items)
     # Reset selection-dependent buttons
     self._entriesEditButton.setEnabled(False)
     self._entriesRemoveButton.setEnabled(False)
 
+  @TimeFunction
   def _onIPSetEntrySelected(self, obj):
     if self.entriesList is None:
       return
@@ -2116,18 +2313,14 @@ class ManaWallDialog(basedialog.BaseDialog):
     self._entriesEditButton.setEnabled(has_sel)
     self._entriesRemoveButton.setEnabled(has_sel)
 
+  @TimeFunction
   def _onIPSetEntryAdd(self):
     '''Add a new entry to the current IP set.'''
+    import manafirewall.ipsetEntryDialog as ipsetEntryDialog
     if not self._currentItem:
       return
     ipset_name = self._currentItem
-    try:
-      if self.runtime_view:
-        settings = self.fw.getIPSetSettings(ipset_name)
-      else:
-        settings = self.fw.config().getIPSetByName(ipset_name).getSettings()
-    except Exception:
-      return
+    settings = self.model.ipsetSettings(ipset_name, self.runtime_view)
     if settings is None:
       return
     dlg = ipsetEntryDialog.IPSetEntryDialog(
@@ -2136,20 +2329,16 @@ class ManaWallDialog(basedialog.BaseDialog):
     if not entry:
       return
     try:
-      if self.runtime_view:
-        if not self.fw.queryEntry(ipset_name, entry):
-          self.fw.addEntry(ipset_name, entry)
-      else:
-        ipset = self.fw.config().getIPSetByName(ipset_name)
-        if not ipset.queryEntry(entry):
-          ipset.addEntry(entry)
+      self.model.replaceIPSetEntry(self.runtime_view, ipset_name, None, entry)
     except Exception as exc:
       logger.warning("_onIPSetEntryAdd: %s", exc)
       return
-    self._fillRPIPSetEntries()
+    self._applyIPSetEntriesDelta(added=(entry,))
 
+  @TimeFunction
   def _onIPSetEntryEdit(self):
     '''Edit the selected entry of the current IP set.'''
+    import manafirewall.ipsetEntryDialog as ipsetEntryDialog
     if not self._currentItem or self.entriesList is None:
       return
     item = self.entriesList.selectedItem()
@@ -2157,13 +2346,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       return
     old_entry  = item.cell(0).label()
     ipset_name = self._currentItem
-    try:
-      if self.runtime_view:
-        settings = self.fw.getIPSetSettings(ipset_name)
-      else:
-        settings = self.fw.config().getIPSetByName(ipset_name).getSettings()
-    except Exception:
-      return
+    settings = self.model.ipsetSettings(ipset_name, self.runtime_view)
     if settings is None:
       return
     dlg = ipsetEntryDialog.IPSetEntryDialog(
@@ -2172,20 +2355,14 @@ class ManaWallDialog(basedialog.BaseDialog):
     if not new_entry or new_entry == old_entry:
       return
     try:
-      if self.runtime_view:
-        if not self.fw.queryEntry(ipset_name, new_entry):
-          self.fw.addEntry(ipset_name, new_entry)
-          self.fw.removeEntry(ipset_name, old_entry)
-      else:
-        ipset = self.fw.config().getIPSetByName(ipset_name)
-        if not ipset.queryEntry(new_entry):
-          ipset.removeEntry(old_entry)
-          ipset.addEntry(new_entry)
+      if not self.model.replaceIPSetEntry(self.runtime_view, ipset_name, old_entry, new_entry):
+        return
     except Exception as exc:
       logger.warning("_onIPSetEntryEdit: %s", exc)
       return
-    self._fillRPIPSetEntries()
+    self._applyIPSetEntriesDelta(added=(new_entry,), removed=(old_entry,))
 
+  @TimeFunction
   def _onIPSetEntryRemove(self):
     '''Remove the selected entry from the current IP set.'''
     if not self._currentItem or self.entriesList is None:
@@ -2196,64 +2373,57 @@ class ManaWallDialog(basedialog.BaseDialog):
     entry      = item.cell(0).label()
     ipset_name = self._currentItem
     try:
-      if self.runtime_view:
-        if self.fw.queryEntry(ipset_name, entry):
-          self.fw.removeEntry(ipset_name, entry)
-      else:
-        ipset = self.fw.config().getIPSetByName(ipset_name)
-        ipset.removeEntry(entry)
+      self.model.removeIPSetEntry(self.runtime_view, ipset_name, entry)
     except Exception as exc:
       logger.warning("_onIPSetEntryRemove: %s", exc)
       return
-    self._fillRPIPSetEntries()
+    self._applyIPSetEntriesDelta(removed=(entry,))
 
+  @TimeFunction
   def _replacePointZoneInterfaces(self):
     '''Show interfaces bound to the selected zone (read-only, expert tab).'''
-    vbox = self.factory.createVBox(self.replacePoint)
-    try:
-      zone_data = self.fw.getActiveZones().get(self._currentItem, {})
-      ifaces = sorted(zone_data.get('interfaces', []))
-    except Exception:
-      ifaces = []
-    hdr = MUI.YTableHeader()
-    hdr.addColumn(_('Interface'))
-    tbl = self.factory.createTable(vbox, hdr, False)
-    tbl.setStretchable(MUI.YUIDimension.YD_VERT, True)
-    items = []
-    for iface in ifaces:
-      it = MUI.YTableItem()
-      it.addCell(iface)
-      items.append(it)
-    tbl.addItems(items)
+    self._replacePointZoneBindings('interfaces', _('Interface'))
 
+  @TimeFunction
   def _replacePointZoneSources(self):
     '''Show sources bound to the selected zone (read-only, expert tab).'''
+    self._replacePointZoneBindings('sources', _('Source'))
+
+  @TimeFunction
+  def _replacePointZoneBindings(self, kind, title):
+    '''Create the bindings table, kind is 'interfaces' or 'sources'.'''
     vbox = self.factory.createVBox(self.replacePoint)
+    hdr = MUI.YTableHeader()
+    hdr.addColumn(title)
+    self.bindingsList = self.factory.createTable(vbox, hdr, False)
+    self.bindingsList.setStretchable(MUI.YUIDimension.YD_VERT, True)
+    self._bindingsKind = kind
+    self._fillRPZoneBindings()
+
+  @TimeFunction
+  def _fillRPZoneBindings(self):
+    '''Fill the bindings table from the cached active zones.'''
+    if self.bindingsList is None:
+      return
     try:
-      zone_data = self.fw.getActiveZones().get(self._currentItem, {})
-      sources = sorted(zone_data.get('sources', []))
+      zone_data = self._activeZones().get(self._currentItem, {})
+      bindings = sorted(zone_data.get(self._bindingsKind, []))
     except Exception:
-      sources = []
-    hdr = MUI.YTableHeader()
-    hdr.addColumn(_('Source'))
-    tbl = self.factory.createTable(vbox, hdr, False)
-    tbl.setStretchable(MUI.YUIDimension.YD_VERT, True)
+      bindings = []
     items = []
-    for src in sources:
+    for binding in bindings:
       it = MUI.YTableItem()
-      it.addCell(src)
+      it.addCell(binding)
       items.append(it)
-    tbl.addItems(items)
+    self.bindingsList.deleteAllItems()
+    self.bindingsList.addItems(items)
 
+  @TimeFunction
   def _replacePointZoneRichRules(self):
     '''Show rich rules for the selected zone (read-only, expert tab).'''
     vbox = self.factory.createVBox(self.replacePoint)
     try:
-      if self.runtime_view:
-        rules = sorted(str(r) for r in self.fw.getRichRules(self._currentItem))
-      else:
-        zone = self.fw.config().getZoneByName(self._currentItem)
-        rules = sorted(str(r) for r in zone.getSettings().getRichRules())
+      rules = sorted(str(r) for r in self.model.richRules(self._currentItem, self.runtime_view))
     except Exception:
       rules = []
     hdr = MUI.YTableHeader()
@@ -2268,6 +2438,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       items.append(it)
     tbl.addItems(items)
 
+  @TimeFunction
   def _replacePointModules(self):
     '''Fill replacePoint with kernel modules for the selected service (permanent only).'''
     if len(self.replacePointWidgetsAndCallbacks) > 0:
@@ -2298,6 +2469,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     ]
     self._fillRPModules()
 
+  @TimeFunction
   def _fillRPModules(self):
     '''Populate the modules table from current service settings.'''
     settings = self._serviceSettings()
@@ -2315,14 +2487,17 @@ class ManaWallDialog(basedialog.BaseDialog):
     has_rows = self.modulesList.itemsCount() > 0
     self._modulesRemoveButton.setEnabled(not self.runtime_view and has_rows)
 
+  @TimeFunction
   def _onModuleSelected(self, obj):
     item = self.modulesList.selectedItem()
     self._modulesRemoveButton.setEnabled(not self.runtime_view and item is not None)
 
+  @TimeFunction
   def _onModuleAdd(self):
+    import manafirewall.moduleDialog as moduleDialog
     if self.runtime_view or not self._currentItem:
       return
-    service = self.fw.config().getServiceByName(self._currentItem)
+    service = self.model.serviceConfig(self._currentItem)
     settings = service.getSettings()
     existing = list(settings.getModules()) if settings else []
     dlg = moduleDialog.HelperDialog(self.fw, existing=existing)
@@ -2334,6 +2509,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       service.update(settings)
     self._fillRPModules()
 
+  @TimeFunction
   def _onModuleRemove(self):
     if self.runtime_view or not self._currentItem:
       return
@@ -2341,13 +2517,14 @@ class ManaWallDialog(basedialog.BaseDialog):
     if item is None:
       return
     mod_name = item.cell(0).label()
-    service = self.fw.config().getServiceByName(self._currentItem)
+    service = self.model.serviceConfig(self._currentItem)
     settings = service.getSettings()
     if settings.queryModule(mod_name):
       settings.removeModule(mod_name)
       service.update(settings)
     self._fillRPModules()
 
+  @TimeFunction
   def _replacePointDestinations(self):
     '''Fill replacePoint with IPv4/IPv6 destination for the selected service (permanent only).'''
     if len(self.replacePointWidgetsAndCallbacks) > 0:
@@ -2377,6 +2554,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       self.eventManager.addWidgetEvent(saveBtn, self._onDestinationSave)
       self.replacePointWidgetsAndCallbacks.append({'widget': saveBtn, 'action': self._onDestinationSave})
 
+  @TimeFunction
   def _fillRPDestinations(self):
     '''Populate IPv4/IPv6 input fields from current service settings.'''
     settings = self._serviceSettings()
@@ -2386,12 +2564,13 @@ class ManaWallDialog(basedialog.BaseDialog):
     if self._destIpv6Input is not None:
       self._destIpv6Input.setValue(destinations.get('ipv6', ''))
 
+  @TimeFunction
   def _onDestinationSave(self):
     if self.runtime_view or not self._currentItem:
       return
     ipv4 = self._destIpv4Input.value().strip() if self._destIpv4Input else ''
     ipv6 = self._destIpv6Input.value().strip() if self._destIpv6Input else ''
-    service = self.fw.config().getServiceByName(self._currentItem)
+    service = self.model.serviceConfig(self._currentItem)
     settings = service.getSettings()
     # Build new destinations dict; omit empty entries
     new_dest = {}
@@ -2402,6 +2581,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     settings.setDestinations(new_dest)
     service.update(settings)
 
+  @TimeFunction
   def _replacePointSummary(self):
     '''Fill replacePoint with a summary for the current item.
     Called from _refreshRightPane() which already cleared replacePoint.
@@ -2429,8 +2609,8 @@ class ManaWallDialog(basedialog.BaseDialog):
       default_zone = ''
       active_zones = {}
       try:
-        default_zone = self.fw.getDefaultZone()
-        active_zones = self.fw.getActiveZones()
+        default_zone = self._defaultZone()
+        active_zones = self._activeZones()
       except Exception:
         pass
 
@@ -2495,13 +2675,7 @@ class ManaWallDialog(basedialog.BaseDialog):
 
     elif self._currentCategory == 'ipsets':
       content += '<h2>{}: {}</h2>'.format(_('IP Set'), _esc(self._currentItem))
-      try:
-        if self.runtime_view:
-          settings = self.fw.getIPSetSettings(self._currentItem)
-        else:
-          settings = self.fw.config().getIPSetByName(self._currentItem).getSettings()
-      except Exception:
-        settings = None
+      settings = self.model.ipsetSettings(self._currentItem, self.runtime_view)
       if settings:
         ipset_type = settings.getType()
         version    = settings.getVersion()
@@ -2539,6 +2713,7 @@ class ManaWallDialog(basedialog.BaseDialog):
   # New UX: mode bar handler
   # ─────────────────────────────────────────────────────────────────────────
 
+  @TimeFunction
   def onModeChanged(self):
     '''Handle Runtime / Permanent switch.'''
     if self._runtimeRadio is not None:
@@ -2550,9 +2725,10 @@ class ManaWallDialog(basedialog.BaseDialog):
     # in permanent mode the user edits the permanent config directly and
     # pressing Runtime→Permanent would overwrite those edits with the
     # current runtime state, losing all permanent-mode changes.
-    self._rtpButton.setEnabled(self.runtime_view)
+    live = self.runtime_view and self.model.connected
+    self._rtpButton.setEnabled(live)
     try:
-      self.optionsMenu['runtime_to_permanent'].setEnabled(self.runtime_view)
+      self.optionsMenu['runtime_to_permanent'].setEnabled(live)
     except Exception:
       pass
     self._fillLeftCategory()
@@ -2565,44 +2741,108 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     initialize firewall client
     '''
-    self.fw = client.FirewallClient(wait=1)
     self.__use_exception_handler = True
-    self.fw.setExceptionHandler(self._exception_handler)
-    self.fw.setNotAuthorizedLoop(True)
-
-    self.fw.connect("connection-changed", self.fwConnectionChanged)
-    self.fw.connect("panic-mode-enabled", self.panic_mode_enabled_cb)
-    self.fw.connect("panic-mode-disabled", self.panic_mode_disabled_cb)
-    self.fw.connect("default-zone-changed", self.default_zone_changed_cb)
-    self.fw.connect("service-added", self.service_added_cb)
-    self.fw.connect("service-removed", self.service_removed_cb)
-    self.fw.connect("port-added", self.port_added_cb)
-    self.fw.connect("port-removed", self.port_removed_cb)
-    self.fw.connect("protocol-added", self.protocol_added_cb)
-    self.fw.connect("protocol-removed", self.protocol_removed_cb)
-    self.fw.connect("source-port-added", self.source_port_added_cb)
-    self.fw.connect("source-port-removed", self.source_port_removed_cb)
-    self.fw.connect("masquerade-added", self.masquerade_added_cb)
-    self.fw.connect("masquerade-removed", self.masquerade_removed_cb)
-    self.fw.connect("forward-port-added", self.forward_port_added_cb)
-    self.fw.connect("forward-port-removed", self.forward_port_removed_cb)
-    self.fw.connect("icmp-block-added", self.icmp_added_cb)
-    self.fw.connect("icmp-block-removed", self.icmp_removed_cb)
-    self.fw.connect("icmp-block-inversion-added", self.icmp_inversion_added_cb)
-    self.fw.connect("icmp-block-inversion-removed", self.icmp_inversion_removed_cb)
-
-    self.fw.connect("config:zone-added",   self.conf_zone_added_cb)
-    self.fw.connect("config:zone-updated", self.conf_zone_updated_cb)
-    self.fw.connect("config:zone-removed", self.conf_zone_removed_cb)
-    self.fw.connect("config:zone-renamed", self.conf_zone_renamed_cb)
-    self.fw.connect("config:service-added", self.conf_service_added_cb)
-    self.fw.connect("config:service-updated", self.conf_service_updated_cb)
-    self.fw.connect("config:service-removed", self.conf_service_removed_cb)
-    self.fw.connect("config:service-renamed", self.conf_service_renamed_cb)
-
-    self.fw.connect("log-denied-changed", self.log_denied_changed_cb)
-    self.fw.connect("zone-of-interface-changed", self.zone_of_interface_changed_cb)
-    self.fw.connect("reloaded", self.reload_cb)
+    self._subscribeGlobalEvents()
+    if self._offlineRoot:
+      self._initOffline()
+    else:
+      if self.model.snapshot is None:
+        self.statusLabel.setText(self.trying_to_connect_label)
+      self.model.startConnect(exception_handler=self._exception_handler)
+    self._updateConfigWatcher()
+
+  def _setLiveEnabled(self, enabled):
+    '''
+    enable or disable what needs firewalld: editing, reload, runtime to
+    permanent, import, export, history, bindings and the right pane. Menus,
+    options and the left pane stay usable while not connected, as long as
+    there is something to show (the warm start cache)
+    '''
+    live = enabled and not self._offlineRoot
+    self._reloadButton.setEnabled(live)
+    self._rtpButton.setEnabled(live and self.runtime_view)
+    self.rightTab.setEnabled(enabled)
+    if enabled:
+      self._updateLeftButtonState()
+    else:
+      for button in (self._leftAddButton, self._leftEditButton,
+                     self._leftRemoveButton, self._leftLoadDefaultsButton,
+                     self.changeBindingsButton):
+        button.setEnabled(False)
+    browse = enabled or self.model.snapshot is not None
+    self.leftTab.setEnabled(browse)
+    if not self._offlineRoot:
+      if self._runtimeRadio is not None:
+        self._runtimeRadio.setEnabled(browse)
+        self._permanentRadio.setEnabled(browse)
+      elif hasattr(self, 'currentViewCombobox'):
+        self.currentViewCombobox.setEnabled(browse)
+    for menu, key, on in (
+        ('fileMenu', 'export', enabled),
+        ('fileMenu', 'import', enabled),
+        ('fileMenu', 'history', enabled),
+        ('optionsMenu', 'runtime_to_permanent', live and self.runtime_view),
+        ('optionsMenu', 'reload', live),
+        ('optionsMenu', 'active_bindings', enabled)):
+      try:
+        getattr(self, menu)[key].setEnabled(on)
+      except Exception:
+        pass
+
+  def _updateConfigWatcher(self):
+    '''
+    start or stop watching the configuration files, according to the
+    watch_config_files preference
+    '''
+    try:
+      _prefs = (getattr(self.config, 'userPreferences', None) or {}).get('settings', {})
+      watch = _prefs.get('watch_config_files', False)
+    except Exception:
+      watch = False
+    if watch and self.configWatcher is None:
+      import manafirewall.configwatch as configwatch
+      try:
+        dirs = configwatch.configDirs(self._offlineRoot)
+      except Exception as e:
+        logger.warning("Cannot watch the configuration files: %s", e)
+        return
+      self.configWatcher = configwatch.ConfigWatcher(self.eventRouter, dirs)
+      self.configWatcher.start()
+    elif not watch and self.configWatcher is not None:
+      self.configWatcher.stop()
+      self.configWatcher = None
+      self._changedFiles.clear()
+      self.configFilesLabel.setText("")
+
+  def _initOffline(self):
+    '''
+    work on the configuration files under self._offlineRoot, permanent
+    view only
+    '''
+    self.connected_label = _("Offline configuration: %s") % self._offlineRoot
+    self.runtime_view = False
+    if self._runtimeRadio is not None:
+      self._permanentRadio.setValue(True)
+      self._runtimeRadio.setEnabled(False)
+      self._permanentRadio.setEnabled(False)
+    elif hasattr(self, 'currentViewCombobox'):
+      self.currentViewCombobox.selectItem(self.views['permanent']['item'])
+      self.currentViewCombobox.setEnabled(False)
+    self._reloadButton.setEnabled(False)
+    self._rtpButton.setEnabled(False)
+    for key in ('reload', 'runtime_to_permanent'):
+      try:
+        self.optionsMenu[key].setEnabled(False)
+      except Exception:
+        pass
+    try:
+      self.model.connectOffline(self._offlineRoot)
+    except Exception as e:
+      logger.error("Cannot open offline configuration %s: %s", self._offlineRoot, e)
+      common.warningMsgBox({'title': _("Offline configuration"),
+                            'text': _("Cannot open %(root)s: %(error)s") % {'root': self._offlineRoot, 'error': e}})
+      return
+    logger.info("Offline configuration %s opened", self._offlineRoot)
 
   def load_zones(self, selected = None):
     '''
@@ -2613,15 +2853,11 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.selectedConfigurationCombo.setEnabled(True)
     self.selectedConfigurationCombo.setLabel(self.configureViews['zones']['title'])
 
-    zones = []
-    if self.runtime_view:
-      zones = self.fw.getZones()
-    else:
-      zones = self.fw.config().getZoneNames()
+    zones = self._zoneNames()
 
     selected_zone = selected
     if selected not in zones:
-      selected_zone = self.fw.getDefaultZone()
+      selected_zone = self._defaultZone()
 
     # zones
     itemColl = []
@@ -2643,11 +2879,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.selectedConfigurationCombo.setEnabled(True)
     self.selectedConfigurationCombo.setLabel(self.configureViews['services']['title'])
 
-    services = []
-    if self.runtime_view:
-      services = self.fw.listServices()
-    else:
-      services = self.fw.config().getServiceNames()
+    services = self._serviceNames()
 
     selected_service = service_name
     if selected_service not in services:
@@ -2673,11 +2905,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.selectedConfigurationCombo.setEnabled(True)
     self.selectedConfigurationCombo.setLabel(self.configureViews['ipsets']['title'])
 
-    ipsets = []
-    if self.runtime_view:
-        ipsets = self.fw.getIPSets()
-    else:
-        ipsets = self.fw.config().getIPSetNames()
+    ipsets = self._ipsetNames()
 
     # ipsets
     itemColl = []
@@ -2690,212 +2918,104 @@ class ManaWallDialog(basedialog.BaseDialog):
 
 #### Firewall events
 
-  def fwConnectionChanged(self):
-    '''
-    connection changed
-    '''
-    if self.fw.connected:
-      self.fwEventQueue.put({'event': "connection-changed", 'value': True})
-      logger.info("Firewalld connected")
-    else:
-      self.fwEventQueue.put({'event': "connection-changed", 'value': False})
-      logger.info("Firewalld disconnected")
-
-  def panic_mode_enabled_cb(self):
-    '''
-    manage panicmode enabled evend from firewalld
-    '''
-    self.fwEventQueue.put({'event': "panicmode-changed", 'value': True})
-
-  def panic_mode_disabled_cb(self):
+  def _swapReloadSnapshot(self, snapshot):
     '''
-    manage panicmode disabled evend from firewalld
+    renders the post-reload snapshot once, then goes back to live queries
     '''
-    self.fwEventQueue.put({'event': "panicmode-changed", 'value': False})
-
-  def default_zone_changed_cb(self, zone):
-    '''
-    manage default zone changed from firewalld
-    '''
-    self.fwEventQueue.put({'event': "default-zone-changed", 'value': zone})
-
-  def conf_zone_added_cb(self, zone):
-    '''
-    config zone has been added
-    '''
-    if self._reloading:
-      self._reload_pending_zones.append(zone)
-    else:
-      self.fwEventQueue.put({'event': "config-zone-added", 'value': zone})
-
-  def conf_zone_updated_cb(self, zone):
-    '''
-    config zone has been updated
-    '''
-    self.fwEventQueue.put({'event': "config-zone-updated", 'value': zone})
-
-  def conf_zone_removed_cb(self, zone):
-    '''
-    config zone has been removed
-    '''
-    self.fwEventQueue.put({'event': "config-zone-removed", 'value': zone})
-
-  def conf_zone_renamed_cb(self, zone):
-    '''
-    config zone has been removed
-    '''
-    self.fwEventQueue.put({'event': "config-zone-renamed", 'value': zone})
-
-  def conf_service_added_cb(self, service):
-    '''
-    config service has been added
-    '''
-    if self._reloading:
-      self._reload_pending_services.append(service)
+    if snapshot is not None:
+      self.model.snapshot = snapshot
+      self._showGlobalState(snapshot)
+    try:
+      self._fillLeftCategory()
+    finally:
+      self.model.snapshot = None
+    self.dialog.setEnabled(True)
+    elapsed = self.model.reloadCompleted()
+    if elapsed is not None:
+      logger.info("Reload to usable took %.3f sec", elapsed)
+
+  def _paintWarmStart(self):
+    '''
+    paints the last known state (see warmcache.py) while the connection
+    to firewalld is not up yet, marked as cached. The model reads names
+    from it, so that the left pane can be browsed, until connection-changed
+    replaces it with live data
+    '''
+    import manafirewall.warmcache as warmcache
+    state, fresh = warmcache.load()
+    if state is None:
+      return
+    ui = state.get('ui', {})
+    if ui.get('category') == 'services' or \
+        (ui.get('category') == 'ipsets' and self._ipsetsTabItem in self._leftTabItems()):
+      self._currentCategory = ui['category']
+      self.leftTab.selectItem(self._servicesTabItem if ui['category'] == 'services' else self._ipsetsTabItem)
+    self._currentItem = ui.get('item')
+    if ui.get('runtime_view') is False:
+      self.runtime_view = False
+      if self._runtimeRadio is not None:
+        self._permanentRadio.setValue(True)
+      elif hasattr(self, 'currentViewCombobox'):
+        self.currentViewCombobox.selectItem(self.views['permanent']['item'])
+      self._rtpButton.setEnabled(False)
+
+    cached = _("cached")
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(state.get('time', 0)))
+    if fresh:
+      self.statusLabel.setText(_("Showing the configuration cached at %s, connecting to firewalld...") % when)
     else:
-      self.fwEventQueue.put({'event': "config-service-added", 'value': service})
-
-  def conf_service_updated_cb(self, service):
-    '''
-    config service has been updated
-    '''
-    self.fwEventQueue.put({'event': "config-service-updated", 'value': service})
-
-  def conf_service_removed_cb(self, service):
-    '''
-    config service has been removed
-    '''
-    self.fwEventQueue.put({'event': "config-service-removed", 'value': service})
-
-  def conf_service_renamed_cb(self, service):
-    '''
-    config service has been removed
-    '''
-    self.fwEventQueue.put({'event': "config-service-renamed", 'value': service})
-
-  def service_added_cb(self, zone, service, timeout):
-    '''
-    service has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "service-added", 'value': {'zone' : zone, 'service': service } })
-
-  def service_removed_cb(self, zone, service):
-    '''
-    service has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "service-removed", 'value': {'zone' : zone, 'service': service } })
-
-  def port_added_cb(self, zone, port, protocol, timeout):
-    '''
-    port has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "port-added", 'value': {'zone' : zone, 'port': port, 'protocol' : protocol } })
-
-  def port_removed_cb(self, zone, port, protocol):
-    '''
-    port has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "port-removed", 'value': {'zone' : zone, 'port': port, 'protocol' : protocol } })
-
-  def protocol_added_cb(self, zone, protocol, timeout):
-    '''
-    protocol has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "protocol-added", 'value': {'zone' : zone, 'protocol' : protocol}})
-
-  def protocol_removed_cb(self, zone, protocol):
-    '''
-    protocol has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "protocol-removed", 'value': {'zone' : zone, 'protocol' : protocol}})
-
-  def source_port_added_cb(self, zone, port, protocol, timeout):
-    '''
-    source port has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "source-port-added", 'value': {'zone' : zone, 'port': port, 'protocol' : protocol } })
-
-  def source_port_removed_cb(self, zone, port, protocol):
-    '''
-    source port has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "source-port-removed", 'value': {'zone' : zone, 'port': port, 'protocol' : protocol } })
-
-  def masquerade_added_cb(self, zone, timeout):
-    '''
-    masquerade has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "masquerade-added", 'value': zone})
-
-  def masquerade_removed_cb(self, zone):
-    '''
-    masquerade has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "masquerade-removed", 'value': zone})
-
-  def forward_port_added_cb(self, zone, port, protocol, to_port, to_address, timeout):
-    '''
-    forward port has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "forward-port-added", 'value': {'zone' : zone, 'to_port': to_port, 'protocol' : protocol, 'to_address': to_address } })
-
-  def forward_port_removed_cb(self, zone, port, protocol, to_port, to_address):
-    '''
-    forward port has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "forward-port-removed", 'value': {'zone' : zone, 'to_port': to_port, 'protocol' : protocol, 'to_address': to_address } })
-
-  def icmp_added_cb(self, zone, icmp, timeout):
-    '''
-    ICMP filter has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "icmp-changed", 'value': {'zone' : zone, 'icmp': icmp, 'added': True} })
-
-  def icmp_removed_cb(self, zone, icmp):
-    '''
-    ICMP filter has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "icmp-changed", 'value': {'zone' : zone, 'icmp': icmp, 'added': False}})
-
-  def icmp_inversion_added_cb(self, zone):
-    '''
-    ICMP inversion has been added at run time
-    '''
-    self.fwEventQueue.put({'event': "icmp-inversion", 'value': {'zone' : zone, 'inversion': True}})
-
-  def icmp_inversion_removed_cb(self, zone):
-    '''
-    ICMP inversion has been removed at run time
-    '''
-    self.fwEventQueue.put({'event': "icmp-inversion", 'value': {'zone' : zone, 'inversion': False}})
-
-
-  def log_denied_changed_cb(self, value):
-    '''
-    log-denied setting changed in firewalld
-    '''
-    self.fwEventQueue.put({'event': "log-denied-changed", 'value': value})
+      self.statusLabel.setText(_("Showing an OUTDATED configuration cached at %s (changed on disk since), "
+                                 "connecting to firewalld...") % when)
+    self.defaultZoneLabel.setText(_("Default Zone: {}").format("%s (%s)" % (state['default_zone'], cached)))
+    self.logDeniedLabel.setText(_("  Log Denied: {}").format("%s (%s)" % (state['log_denied'], cached)))
+    self.automaticHelpersLabel.setText(_("  Automatic Helpers: {}").format(
+      "%s (%s)" % (state['automatic_helpers'], cached)))
+
+    # left pane only, the right one would need live settings
+    self.model.snapshot = state
+    try:
+      if self._currentCategory == 'zones':
+        self._fillLeftZones(self._currentItem)
+      elif self._currentCategory == 'services':
+        self._fillLeftServices(self._currentItem)
+      else:
+        self._fillLeftIPSets(self._currentItem)
+    except Exception as e:
+      logger.warning("Cannot paint the warm start cache: %s", e)
+      self.model.snapshot = None
+      return
+    self._setLiveEnabled(False)
+    logger.debug("Painted %s warm start cache from %s", "fresh" if fresh else "outdated", when)
 
-  def zone_of_interface_changed_cb(self, zone, interface):
-    logger.debug("zone_of_interface_changed_cb %s - %s", zone, interface)
+  def _leftTabItems(self):
+    try:
+      _prefs = (getattr(self.config, 'userPreferences', None) or {}).get('settings', {})
+      _show_ipsets = _prefs.get('show_ipsets', False)
+    except Exception:
+      _show_ipsets = False
+    tabs = [self._zonesTabItem, self._servicesTabItem]
+    if _show_ipsets:
+      tabs.append(self._ipsetsTabItem)
+    return tabs
 
-  def reload_cb(self):
+  def _saveWarmStart(self):
     '''
-    firewalld reloaded event — emitted after all config signals of the burst.
-    Sets _reloading so that any late callbacks (daemon-triggered reload) are
-    accumulated; then queues group events for whatever was collected, then
-    queues the reloaded event.
+    saves the current state for the next start, see _paintWarmStart()
     '''
-    self._reloading = True
-    if self._reload_pending_zones:
-      self.fwEventQueue.put({'event': "config-zones-group-added",
-                             'value': list(self._reload_pending_zones)})
-      self._reload_pending_zones.clear()
-    if self._reload_pending_services:
-      self.fwEventQueue.put({'event': "config-services-group-added",
-                             'value': list(self._reload_pending_services)})
-      self._reload_pending_services.clear()
-    self.fwEventQueue.put({'event': "reloaded", 'value': True})
+    if self._offlineRoot or not self.model.connected:
+      return
+    try:
+      state = self.model.viewState()
+    except Exception as e:
+      logger.warning("Cannot save the warm start cache: %s", e)
+      return
+    state['ui'] = {
+      'category'    : self._currentCategory,
+      'item'        : self._currentItem,
+      'runtime_view': self.runtime_view,
+    }
+    import manafirewall.warmcache as warmcache
+    warmcache.save(state)
 
   def saveUserPreference(self):
     '''
@@ -2903,6 +3023,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
 
     self.config.saveUserPreferences()
+    self._saveWarmStart()
 
 
 #### GUI events
@@ -2928,6 +3049,9 @@ class ManaWallDialog(basedialog.BaseDialog):
         self.glib_thread.join(timeout=2)
       except Exception:
         pass
+    if self.journal is not None:
+      self.journal.stop()
+    self._stopLogging()
 
   def onQuitEvent(self, obj) :
     '''
@@ -2938,6 +3062,13 @@ class ManaWallDialog(basedialog.BaseDialog):
     else:
       logger.info("Quit button pressed")
     self.saveUserPreference()
+    if self.profiling_enabled:
+      self._logProfilingReport()
+    if self.watchdog is not None:
+      self.watchdog.stop()
+    if self.memoryWatcher is not None:
+      self.memoryWatcher.sample()
+      self.memoryWatcher.stop()
 
     if MUI.YUI.app().isTextMode():
       self.glib_loop.quit()
@@ -2945,43 +3076,182 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.ExitLoop()
     if MUI.YUI.app().isTextMode():
       self.glib_thread.join()
+    if self.journal is not None:
+      self.journal.stop()
+    self._stopLogging()
 
   def onOptionSettings(self):
     '''
     Show optionDialog for extended settings
     '''
+    import manafirewall.optionDialog as optionDialog
     self.dialog.setEnabled(False)
     up = optionDialog.OptionDialog(self)
     up.run()
-    if self._reloading:
+    if self.eventRouter.barrier:
       # If we are reloading, the dialog will be closed by the reload callback, so we don't need to re-enable it
       return
     # Rebuild left tabs in case show_ipsets changed while the dialog was open
     self._rebuildLeftTabs()
+    self._updateConfigWatcher()
     self.dialog.setEnabled(True)
 
   def onActiveBindings(self):
     '''
     Show active zone bindings (runtime: connections, interfaces, sources).
     '''
+    import manafirewall.activeBindingsDialog as activeBindingsDialog
     self.dialog.setEnabled(False)
     dlg = activeBindingsDialog.ActiveBindingsDialog(self.fw)
     dlg.run()
     self.dialog.setEnabled(True)
 
+  @TimeFunction
   def onReloadFirewalld(self):
     '''
     Reload Firewalld menu pressed
     '''
-    self._reloading = True
     self.dialog.setEnabled(False)
-    self.fw.reload()
-
+    try:
+      reloaded = self.model.reload()
+    except Exception as e:
+      logger.error("Reload failed: %s", e)
+      reloaded = False
+    if not reloaded:
+      # no 'reloaded' event will come to enable it again
+      self.dialog.setEnabled(True)
+      common.warningMsgBox({'title': _("Reload Firewalld"), 'text': _("Firewalld could not be reloaded")})
+
+  @TimeFunction
   def onRuntimeToPermanent(self):
     '''
     Make runtime configuration permanent
     '''
-    self.fw.runtimeToPermanent()
+    self.model.runtimeToPermanent()
+
+  def onExportConfiguration(self):
+    '''
+    Export the current view (every object and the global options) into a
+    YAML or JSON document
+    '''
+    import manafirewall.declarative as declarative
+    view = _("runtime") if self.runtime_view else _("permanent")
+    filename = MUI.YUI.app().askForSaveFileName(
+          os.path.expanduser("~"), "*.yaml *.yml *.json",
+          _("Export the %s configuration") % view)
+    if not filename:
+      return
+    try:
+      document, read_time = declarative.exportDocument(self.model, self.runtime_view)
+      with open(filename, 'w') as f:
+        declarative.dumpDocument(document, f, 'json' if filename.endswith('.json') else 'yaml')
+    except Exception as e:
+      logger.error("Export to %s failed: %s", filename, e)
+      common.warningMsgBox({'title': _("Export failed"), 'text': str(e)})
+      return
+    logger.info("Exported the %s configuration to %s, read in %.3f s", view, filename, read_time)
+
+  def onImportConfiguration(self):
+    '''
+    Bring the current view to an exported document, showing the changes
+    before applying them. Views are refreshed by firewalld signals.
+    '''
+    import manafirewall.declarative as declarative
+    import manafirewall.history as history
+    filename = MUI.YUI.app().askForExistingFile(
+          os.path.expanduser("~"), "*.yaml *.yml *.json",
+          _("Import a configuration"))
+    if not filename:
+      return
+    try:
+      state = declarative.loadState(filename)
+      plan = declarative.buildPlan(self.model, state, self.runtime_view)
+    except Exception as e:
+      common.warningMsgBox({'title': _("Import failed"), 'text': str(e)})
+      return
+    if not plan:
+      common.infoMsgBox({'title': _("Import configuration"), 'text': _("No changes.")})
+      return
+    lines = plan.describe()
+    if len(lines) > 40:
+      lines = lines[:40] + [_("… %d more") % (len(lines) - 40)]
+    if not common.askYesOrNo({'title': _("Import configuration"),
+                              'text': "<br>".join(html.escape(l) for l in lines),
+                              'richtext': True, 'size': (600, 400)}):
+      return
+    try:
+      if not self.runtime_view:
+        history.SnapshotStore().save(self.model.configSnapshot(False), self.model.globalState(),
+                                     "before import %s" % filename)
+      declarative.applyPlan(self.model, plan)
+    except Exception as e:
+      logger.error("Import of %s failed after %d write(s): %s", filename, plan.writes, e)
+      common.warningMsgBox({'title': _("Import failed"), 'text': str(e)})
+
+  def onHistory(self):
+    '''
+    Show the snapshot history of the permanent configuration
+    '''
+    import manafirewall.historyDialog as historyDialog
+    self.dialog.setEnabled(False)
+    dlg = historyDialog.HistoryDialog(self.model)
+    dlg.run()
+    self.dialog.setEnabled(True)
+
+  def onJournal(self):
+    '''
+    Show the audit journal of changes and firewalld events
+    '''
+    import manafirewall.journalDialog as journalDialog
+    self.dialog.setEnabled(False)
+    dlg = journalDialog.JournalDialog(self.journal.path if self.journal is not None else None)
+    dlg.run()
+    self.dialog.setEnabled(True)
+
+  def onDeniedLog(self):
+    '''
+    Follow the packets denied by firewalld in the kernel log
+    '''
+    import manafirewall.deniedLogDialog as deniedLogDialog
+    self.dialog.setEnabled(False)
+    dlg = deniedLogDialog.DeniedLogDialog(self.log_denied)
+    dlg.run()
+    self.dialog.setEnabled(True)
+
+  def onProfilingReport(self):
+    '''
+    Dump the profiling measures as JSON into the log directory and as a
+    summary into the log
+    '''
+    filename = os.path.join(self.log_directory or os.path.expanduser("~"),
+                            time.strftime("manafirewall-profile-%Y%m%d-%H%M%S.json"))
+    self._logProfilingReport()
+    try:
+      profiling.profiler.dump(filename)
+    except Exception as e:
+      logger.error("Cannot write the profiling report %s: %s", filename, e)
+      common.warningMsgBox({'title': _("Profiling Report"), 'text': str(e)})
+      return
+    logger.info("Profiling report written to %s", filename)
+    common.infoMsgBox({'title': _("Profiling Report"),
+                       'text': _("Profiling report written to %s") % filename})
+
+  def onBusStats(self):
+    '''
+    Show the D-Bus calls accounted by the profiler
+    '''
+    import manafirewall.busStatsDialog as busStatsDialog
+    self.dialog.setEnabled(False)
+    dlg = busStatsDialog.BusStatsDialog(profiling.profiler)
+    dlg.run()
+    self.dialog.setEnabled(True)
+
+  def _logProfilingReport(self):
+    '''
+    log the profiling summary
+    '''
+    for line in profiling.profiler.report():
+      logger.info("%s", line)
 
   def update_active_bindings(self):
     '''
@@ -2994,17 +3264,17 @@ class ManaWallDialog(basedialog.BaseDialog):
     self._interfacesTreeItem  = None
     self._sourcesTreeItem     = None
 
-    if not self.fw.connected:
+    if not self.model.connected:
       return
 
     active_zones = {}
     try:
-      active_zones = self.fw.getActiveZones()
+      active_zones = self._activeZones()
     except Exception:
       pass
     default_zone = ""
     try:
-      default_zone = self.fw.getDefaultZone()
+      default_zone = self._defaultZone()
     except Exception:
       pass
 
@@ -3013,11 +3283,12 @@ class ManaWallDialog(basedialog.BaseDialog):
     bare_interfaces = {}             # {iface: zone}
     sources = {}                     # {source: zone}
 
-    if nm_is_imported():
+    nm = self._nm()
+    if nm is not None and nm.nm_is_imported():
       _connections = {}       # {iface_path: conn_id}
       _connections_name = {}  # {conn_id: display_name}
       try:
-        nm_get_connections(_connections, _connections_name)
+        nm.nm_get_connections(_connections, _connections_name)
       except Exception:
         pass
       for zone, data in active_zones.items():
@@ -3026,7 +3297,7 @@ class ManaWallDialog(basedialog.BaseDialog):
             conn_id = _connections[iface]
             if conn_id not in self._nm_connections_data:
               try:
-                nm_zone = nm_get_zone_of_connection(conn_id)
+                nm_zone = nm.nm_get_zone_of_connection(conn_id)
               except Exception:
                 nm_zone = ""
               self._nm_connections_data[conn_id] = [
@@ -3075,14 +3346,17 @@ class ManaWallDialog(basedialog.BaseDialog):
     self._interfacesTreeItem  = ifaceParent
     self._sourcesTreeItem     = srcParent
 
+  @TimeFunction
   def _onBindingSelected(self, obj):
     '''Legacy stub — new handler is _onZoneTreeSelected.'''
     self._onZoneTreeSelected(obj)
 
+  @TimeFunction
   def onChangeBinding(self, obj):
     '''
     Change Zone button pressed — open zone selector for the selected connection.
     '''
+    import manafirewall.changeZoneConnectionDialog as changeZoneConnectionDialog
     if self.activeBindingsTree is None:
       return
     item = self.activeBindingsTree.selectedItem()
@@ -3101,7 +3375,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     self.dialog.setEnabled(True)
     if new_zone is not None:
       try:
-        nm_set_zone_of_connection(new_zone, conn_id)
+        self._nm(wait=True).nm_set_zone_of_connection(new_zone, conn_id)
         self._fillLeftZones(self._currentItem)
       except Exception as e:
         logger.error("Failed to change zone of connection %s: %s", conn_id, e)
@@ -3119,6 +3393,8 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     Help menu invoked
     '''
+    import manafirewall.helpinfo as helpinfo
+    import manatools.ui.helpdialog as helpdialog
     info = helpinfo.ManaFirewallHelpInfo()
     hd = helpdialog.HelpDialog(info)
     hd.run()
@@ -3155,7 +3431,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     if self.runtime_view or not self._currentItem:
       return
-    zone = self.fw.config().getZoneByName(self._currentItem)
+    zone = self.model.zoneConfig(self._currentItem)
     zone.remove()
     self._currentItem = None
     self._fillLeftZones()
@@ -3175,19 +3451,23 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     if self.runtime_view or not self._currentItem:
       return
-    zone = self.fw.config().getZoneByName(self._currentItem)
+    zone = self.model.zoneConfig(self._currentItem)
     zone.loadDefaults()
 
   def _add_edit_zone(self, add):
     '''
     adds or edit zone (parameter add True if adding)
     '''
+    import manafirewall.zoneBaseDialog as zoneBaseDialog
+    from firewall import client
+    from firewall import functions
+    from firewall.core.base import DEFAULT_ZONE_TARGET
     zoneBaseInfo = {}
     zoneBaseInfo['max_zone_name_len'] = functions.max_zone_name_len()
     if not add:
       if not self._currentItem:
         return
-      zone = self.fw.config().getZoneByName(self._currentItem)
+      zone = self.model.zoneConfig(self._currentItem)
       settings = zone.getSettings()
       props = zone.get_properties()
       zoneBaseInfo['name']        = zone.get_property("name")
@@ -3212,7 +3492,7 @@ class ManaWallDialog(basedialog.BaseDialog):
          zoneBaseInfo['description'] == newZoneBaseInfo['description'] and \
          zoneBaseInfo['target']      == newZoneBaseInfo['target']:
         return
-      zone = self.fw.config().getZoneByName(self._currentItem)
+      zone = self.model.zoneConfig(self._currentItem)
       if zoneBaseInfo['version']     != newZoneBaseInfo['version'] or \
          zoneBaseInfo['short']       != newZoneBaseInfo['short'] or \
          zoneBaseInfo['description'] != newZoneBaseInfo['description'] or \
@@ -3233,7 +3513,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       settings.setShort(newZoneBaseInfo['short'])
       settings.setDescription(newZoneBaseInfo['description'])
       settings.setTarget(newZoneBaseInfo['target'])
-      self.fw.config().addZone(newZoneBaseInfo['name'], settings)
+      self.model.addZone(newZoneBaseInfo['name'], settings)
 
   def onServiceConfAddService(self, *args):
     '''
@@ -3249,7 +3529,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     if self.runtime_view or not self._currentItem:
       return
-    service = self.fw.config().getServiceByName(self._currentItem)
+    service = self.model.serviceConfig(self._currentItem)
     service.remove()
     self._currentItem = None
     self._fillLeftServices()
@@ -3266,7 +3546,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     if self.runtime_view or not self._currentItem:
       return
-    service = self.fw.config().getServiceByName(self._currentItem)
+    service = self.model.serviceConfig(self._currentItem)
     service.loadDefaults()
 
   # ─────────────────────────────────────────────────────────────────────────
@@ -3284,7 +3564,7 @@ class ManaWallDialog(basedialog.BaseDialog):
     if self.runtime_view or not self._currentItem:
       return
     try:
-      ipset = self.fw.config().getIPSetByName(self._currentItem)
+      ipset = self.model.ipsetConfig(self._currentItem)
       ipset.remove()
     except Exception as exc:
       logger.warning("onIPSetConfRemoveIPSet: %s", exc)
@@ -3302,21 +3582,23 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''Load defaults for the selected IP set (permanent mode only).'''
     if self.runtime_view or not self._currentItem:
       return
-    ipset = self.fw.config().getIPSetByName(self._currentItem)
+    ipset = self.model.ipsetConfig(self._currentItem)
     ipset.loadDefaults()
 
   def _add_edit_ipset(self, add):
     '''Open the IP set base dialog and create/update the IP set.'''
+    import manafirewall.ipsetBaseDialog as ipsetBaseDialog
+    from firewall import client
     ipsetBaseInfo = {}
     try:
-      ipset_types = self.fw.get_property("IPSetTypes")
+      ipset_types = self.model.ipsetTypes()
     except Exception:
       ipset_types = None
 
     if not add:
       if not self._currentItem:
         return
-      ipset    = self.fw.config().getIPSetByName(self._currentItem)
+      ipset    = self.model.ipsetConfig(self._currentItem)
       settings = ipset.getSettings()
       props    = ipset.get_properties()
       ipsetBaseInfo['name']        = ipset.get_property('name')
@@ -3334,7 +3616,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       return
 
     if not add:
-      ipset    = self.fw.config().getIPSetByName(self._currentItem)
+      ipset    = self.model.ipsetConfig(self._currentItem)
       settings = ipset.getSettings()
       changed  = False
       if ipsetBaseInfo.get('version', '')     != newInfo.get('version', ''):
@@ -3361,7 +3643,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       settings.setDescription(newInfo.get('description', ''))
       settings.setType(newInfo['type'])
       settings.setOptions(newInfo.get('options', {}))
-      self.fw.config().addIPSet(newInfo['name'], settings)
+      self.model.addIPSet(newInfo['name'], settings)
       self._currentItem = newInfo['name']
 
     self._fillLeftCategory()
@@ -3370,12 +3652,14 @@ class ManaWallDialog(basedialog.BaseDialog):
     '''
     adds or edit service (parameter add True if adding)
     '''
+    import manafirewall.serviceBaseDialog as serviceBaseDialog
+    from firewall import client
     serviceBaseInfo = {}
     if not add:
       if not self._currentItem:
         return
       active_service = self._currentItem
-      service = self.fw.config().getServiceByName(active_service)
+      service = self.model.serviceConfig(active_service)
       settings = service.getSettings()
       props = service.get_properties()
       serviceBaseInfo['default']     = props["default"]
@@ -3396,7 +3680,7 @@ class ManaWallDialog(basedialog.BaseDialog):
          serviceBaseInfo['short']       == newServiceBaseInfo['short'] and \
          serviceBaseInfo['description'] == newServiceBaseInfo['description']:
         return
-      service = self.fw.config().getServiceByName(self._currentItem)
+      service = self.model.serviceConfig(self._currentItem)
       if serviceBaseInfo['version']     != newServiceBaseInfo['version'] or \
          serviceBaseInfo['short']       != newServiceBaseInfo['short'] or \
          serviceBaseInfo['description'] != newServiceBaseInfo['description']:
@@ -3414,7 +3698,7 @@ class ManaWallDialog(basedialog.BaseDialog):
       settings.setVersion(newServiceBaseInfo['version'])
       settings.setShort(newServiceBaseInfo['short'])
       settings.setDescription(newServiceBaseInfo['description'])
-      self.fw.config().addService(newServiceBaseInfo['name'], settings)
+      self.model.addService(newServiceBaseInfo['name'], settings)
 
   # Legacy stubs — no longer wired to any widget, kept for safety
   def onSelectedConfigurationComboChanged(self):
@@ -3432,163 +3716,346 @@ class ManaWallDialog(basedialog.BaseDialog):
 
   def doSomethingIntoLoop(self):
     '''
-    check on internal queue if any fw event has been managed
+    deliver the firewalld events queued by the GLib thread to subscribers
     '''
+    if self.watchdog is not None:
+      self.watchdog.beat()
+    if self.memoryWatcher is not None:
+      self.memoryWatcher.tick()
+    if self._startupProbe:
+      self._writeStartupProbe()
+    # firewalld can be chatty; unsubscribed events cost a dictionary lookup,
+    # so drain up to 20 events per tick
+    self.eventRouter.dispatch(20)
+
+  def _writeStartupProbe(self):
+    '''
+    the window has been painted and the loop is running: tell the startup
+    benchmark, once
+    '''
+    path, self._startupProbe = self._startupProbe, None
     try:
-      # firewalld can be chatty during reload; drain up to 20 events per tick
-      counter = 0
-      count_max = 20 if self._reloading else 1
-
-      while counter < count_max:
-        counter += 1
-        item = self.fwEventQueue.get_nowait()
-
-        if item['event'] == 'connection-changed':
-          connected = item['value']
-          self.connection_lost = not connected
-          t = self.connected_label if connected else self.trying_to_connect_label
-          self.statusLabel.setText(t)
-          if connected:
-            self.fw.authorizeAll()
-            default_zone = self.fw.getDefaultZone()
-            self.defaultZoneLabel.setText(_("Default Zone: {}").format(default_zone))
-            self.log_denied = self.fw.getLogDenied()
-            self.logDeniedLabel.setText(_("  Log Denied: {}").format(self.log_denied))
-            self.automatic_helpers = self.fw.getAutomaticHelpers()
-            self.automaticHelpersLabel.setText(_("  Automatic Helpers: {}").format(self.automatic_helpers))
-            panic = self.fw.queryPanicMode()
-            t = self.enabled if panic else self.disabled
-            self.panicLabel.setText(_("  Panic Mode: {}").format(t))
-            self._fillLeftCategory()
-            self.dialog.setEnabled(True)
-          else:
-            self.defaultZoneLabel.setText(_("Default Zone: {}").format("--------"))
-            self.logDeniedLabel.setText(_("  Log Denied: {}").format("--------"))
-            self.automaticHelpersLabel.setText(_("  Automatic Helpers: {}").format("--------"))
-            self.panicLabel.setText(_("  Panic Mode: {}").format("--------"))
-            self.dialog.setEnabled(False)
-
-        elif item['event'] == 'log-denied-changed':
-          self.log_denied = item['value']
-          self.logDeniedLabel.setText(_("  Log Denied: {}").format(self.log_denied))
-          self.dialog.setEnabled(True)
-          logger.debug("Log denied changed to %s", self.log_denied)
-
-        elif item['event'] == 'panicmode-changed':
-          t = self.enabled if item['value'] else self.disabled
-          self.panicLabel.setText(_("  Panic Mode: {}").format(t))
-
-        elif item['event'] == 'default-zone-changed':
-          zone = item['value']
-          self.defaultZoneLabel.setText(_("Default Zone: {}").format(zone))
-          # Refresh zone tree so default marker updates
-          if self._currentCategory == 'zones':
-            self._fillLeftZones(self._currentItem)
-
-        elif item['event'] in ('config-zone-added', 'config-zone-updated',
-                               'config-zone-renamed', 'config-zone-removed'):
-          if not self.runtime_view and self._currentCategory == 'zones':
-            self._fillLeftZones(self._currentItem)
-            if item['event'] == 'config-zone-updated':
-              self._refreshRightPane()
+      with open(path, 'w') as f:
+        f.write("%f\n" % time.time())
+    except OSError as e:
+      logger.warning("Cannot write the startup probe %s: %s", path, e)
 
-        elif item['event'] in ('config-service-added', 'config-service-updated',
-                               'config-service-renamed', 'config-service-removed'):
-          if not self.runtime_view and self._currentCategory == 'services':
-            self._fillLeftServices(self._currentItem)
-            if item['event'] == 'config-service-updated':
-              self._refreshRightPane()
+  # ─────────────────────────────────────────────────────────────────────────
+  # Firewall event subscriptions
+  # ─────────────────────────────────────────────────────────────────────────
 
-        elif item['event'] == 'config-zones-group-added':
-          logger.debug("Zones group-added: %d zones", len(item['value']))
-          if not self.runtime_view and self._currentCategory == 'zones':
-            self._fillLeftZones(self._currentItem)
-
-        elif item['event'] == 'config-services-group-added':
-          logger.debug("Services group-added: %d services", len(item['value']))
-          if not self.runtime_view and self._currentCategory == 'services':
-            self._fillLeftServices(self._currentItem)
-
-        elif item['event'] in ('service-added', 'service-removed'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'services':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPServices()
-
-        elif item['event'] in ('port-added', 'port-removed'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'ports':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPPort("zone_ports")
-              if self.buttons is not None:
-                self.buttons['edit'].setEnabled(self.portList.itemsCount() > 0)
-                self.buttons['remove'].setEnabled(self.portList.itemsCount() > 0)
-
-        elif item['event'] in ('source-port-added', 'source-port-removed'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'source_ports':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPPort("zone_sourceports")
-              if self.buttons is not None:
-                self.buttons['edit'].setEnabled(self.portList.itemsCount() > 0)
-                self.buttons['remove'].setEnabled(self.portList.itemsCount() > 0)
-
-        elif item['event'] in ('forward-port-added', 'forward-port-removed'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'forwarding':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPForwardPorts()
-              if self.buttons is not None:
-                self.buttons['edit'].setEnabled(self.portForwardList.itemsCount() > 0)
-                self.buttons['remove'].setEnabled(self.portForwardList.itemsCount() > 0)
-
-        elif item['event'] in ('icmp-changed', 'icmp-inversion'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'icmp_filter':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPICMPFilter()
-
-        elif item['event'] in ('protocol-added', 'protocol-removed'):
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'protocols':
-            value = item['value']
-            if value['zone'] == self._currentItem:
-              self._fillRPProtocols('zone_protocols')
-              if self.buttons is not None:
-                self.buttons['edit'].setEnabled(self.protocolList.itemsCount() > 0)
-                self.buttons['remove'].setEnabled(self.protocolList.itemsCount() > 0)
-
-        elif item['event'] == 'masquerade-added':
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'masquerade':
-            if item['value'] == self._currentItem and not self.masquerade.isChecked():
-              self.masquerade.setNotify(False)
-              self.masquerade.setValue(True)
-              self.masquerade.setNotify(True)
-
-        elif item['event'] == 'masquerade-removed':
-          if self.runtime_view and self._currentCategory == 'zones' and \
-             self._currentRightTab == 'masquerade':
-            if item['value'] == self._currentItem and self.masquerade.isChecked():
-              self.masquerade.setNotify(False)
-              self.masquerade.setValue(False)
-              self.masquerade.setNotify(True)
-
-        elif item['event'] == 'reloaded':
-          logger.debug("Firewall reloaded event received")
-          self._fillLeftCategory()
-          self._reloading = False
-          self.dialog.setEnabled(True)
+  def _subscribeGlobalEvents(self):
+    '''
+    subscribe to events that are always handled, whatever is shown
+    '''
+    for event, handler in (
+        ('connection-changed',   self._onConnectionChangedEvent),
+        ('status',               self._onStatusEvent),
+        ('log-denied-changed',   self._onLogDeniedChangedEvent),
+        ('panicmode-changed',    self._onPanicModeChangedEvent),
+        ('default-zone-changed', self._onDefaultZoneChangedEvent),
+        ('reloaded',             self._onReloadedEvent),
+        ('reload-snapshot',      self._onReloadSnapshotEvent),
+        ('config-files-changed', self._onConfigFilesChangedEvent),
+        ('nm-ready',             self._onNMReadyEvent),
+        ('nm-zones',             self._onNMZonesEvent),
+        ('interface-added',           self._onBindingEvent),
+        ('interface-removed',         self._onBindingEvent),
+        ('zone-of-interface-changed', self._onBindingEvent),
+        ('source-added',              self._onBindingEvent),
+        ('source-removed',            self._onBindingEvent),
+        ('zone-of-source-changed',    self._onBindingEvent)):
+      self.eventRouter.subscribe(event, handler)
+
+  def _subscribeLeftPane(self):
+    '''
+    subscribe to the events that change the current left pane list, only
+    the permanent configuration signals zones and services changes
+    '''
+    self.eventRouter.unsubscribeAll(self.leftPaneSubscriptions)
+    if self.runtime_view:
+      return
+    if self._currentCategory == 'zones':
+      events = ('config-zone-added', 'config-zone-updated',
+                'config-zone-renamed', 'config-zone-removed')
+    elif self._currentCategory == 'services':
+      events = ('config-service-added', 'config-service-updated',
+                'config-service-renamed', 'config-service-removed')
+    elif self._currentCategory == 'ipsets':
+      for event in ('config-ipset-added', 'config-ipset-renamed', 'config-ipset-removed'):
+        self.leftPaneSubscriptions.append(
+          self.eventRouter.subscribe(event, self._onLeftPaneIPSetEvent))
+      return
+    else:
+      return
+    for event in events:
+      self.leftPaneSubscriptions.append(
+        self.eventRouter.subscribe(event, self._onLeftPaneConfigEvent))
 
+  def _subscribeRightPane(self):
+    '''
+    subscribe to the events of the zone or IP set shown into the right pane
+    '''
+    self.eventRouter.unsubscribeAll(self.rightPaneSubscriptions)
+    if not self._currentItem:
+      return
+    if self._currentCategory == 'ipsets':
+      if self._currentRightTab == 'entries':
+        if self.runtime_view:
+          events = ('ipset-entry-added', 'ipset-entry-removed')
         else:
-          logger.warning("Unmanaged event: %s - value: %s",
-                         item['event'], item.get('value', 'None'))
+          events = ('config-ipset-updated',)
+      elif not self.runtime_view:
+        events = ('config-ipset-updated',)
+      else:
+        events = ()
+      for event in events:
+        self.rightPaneSubscriptions.append(
+          self.eventRouter.subscribe(event, self._onRightPaneIPSetEvent, self._currentItem))
+      return
+    if not self.runtime_view or self._currentCategory != 'zones':
+      return
+    # right tab -> events refreshing it
+    tab_events = {
+      'services':     ('service-added', 'service-removed'),
+      'ports':        ('port-added', 'port-removed'),
+      'source_ports': ('source-port-added', 'source-port-removed'),
+      'forwarding':   ('forward-port-added', 'forward-port-removed'),
+      'icmp_filter':  ('icmp-changed', 'icmp-inversion'),
+      'protocols':    ('protocol-added', 'protocol-removed'),
+      'masquerade':   ('masquerade-added', 'masquerade-removed'),
+    }
+    for event in tab_events.get(self._currentRightTab, ()):
+      self.rightPaneSubscriptions.append(
+        self.eventRouter.subscribe(event, self._onRightPaneZoneEvent, self._currentItem))
+
+  def _onConnectionChangedEvent(self, event, connected):
+    self.connection_lost = not connected
+    t = self.connected_label if connected else self.trying_to_connect_label
+    self.statusLabel.setText(t)
+    if connected:
+      self._clearChangedFiles()
+      # authorization and status bar values arrive as 'status' events
+      self.model.startStatusQueries()
+      # drop the warm start cache, live data from now on
+      self.model.snapshot = None
+      self._setLiveEnabled(True)
+      self._fillLeftCategory()
+    else:
+      self._showGlobalState(dict.fromkeys(('default_zone', 'log_denied', 'automatic_helpers', 'panic')))
+      self._setLiveEnabled(False)
 
-    except Empty:
-      pass
+  def _onStatusEvent(self, event, state):
+    '''
+    a global state value read by ManaFirewallModel.startStatusQueries()
+    '''
+    if not self.connection_lost:
+      self._showGlobalState(state)
+
+  def _showGlobalState(self, state):
+    '''
+    show the global state values found into state (see
+    ManaFirewallModel.globalState()), None as unknown
+    '''
+    unknown = "--------"
+    if 'default_zone' in state:
+      value = state['default_zone']
+      self.defaultZoneLabel.setText(_("Default Zone: {}").format(unknown if value is None else value))
+    if 'log_denied' in state:
+      self.log_denied = state['log_denied']
+      self.logDeniedLabel.setText(_("  Log Denied: {}").format(
+        unknown if self.log_denied is None else self.log_denied))
+    if 'automatic_helpers' in state:
+      self.automatic_helpers = state['automatic_helpers']
+      self.automaticHelpersLabel.setText(_("  Automatic Helpers: {}").format(
+        unknown if self.automatic_helpers is None else self.automatic_helpers))
+    if 'panic' in state:
+      value = state['panic']
+      t = unknown if value is None else self.enabled if value else self.disabled
+      self.panicLabel.setText(_("  Panic Mode: {}").format(t))
+
+  def _onNMReadyEvent(self, event, value):
+    '''
+    NetworkManager support is loaded, show the connections into the zone
+    tree
+    '''
+    if self._currentCategory == 'zones' and self.activeBindingsTree is not None:
+      self._fillLeftZones(self._currentItem)
+
+  def _onNMZonesEvent(self, event, value):
+    '''
+    NetworkManager zones of connections looked up in background (see
+    _lookupNMZones): move them into their zone items
+    '''
+    data, zones = value
+    if data is not self._zoneTreeData:
+      # the tree has been filled again meanwhile
+      return
+    data['nm_zones'].update(zones)
+    data['nm_pending'].difference_update(zones)
+    if self._currentCategory == 'zones' and self.activeBindingsTree is not None:
+      self._patchZoneTree(set())
+
+  def _onLogDeniedChangedEvent(self, event, value):
+    self.log_denied = value
+    self.logDeniedLabel.setText(_("  Log Denied: {}").format(self.log_denied))
+    self.dialog.setEnabled(True)
+    logger.debug("Log denied changed to %s", self.log_denied)
+
+  def _onPanicModeChangedEvent(self, event, value):
+    t = self.enabled if value else self.disabled
+    self.panicLabel.setText(_("  Panic Mode: {}").format(t))
+
+  def _onDefaultZoneChangedEvent(self, event, zone):
+    self.defaultZoneLabel.setText(_("Default Zone: {}").format(zone))
+    # Refresh zone tree so default marker updates
+    if self._currentCategory == 'zones':
+      self._fillLeftZones(self._currentItem)
+
+  def _onReloadedEvent(self, event, value):
+    logger.debug("Firewall reloaded event received")
+    self._clearChangedFiles()
+    self.dialog.setEnabled(False)
+    self.model.startReloadSnapshot()
+
+  def _onReloadSnapshotEvent(self, event, snapshot):
+    self._swapReloadSnapshot(snapshot)
+
+  def _clearChangedFiles(self):
+    '''firewalld (re)loaded its configuration from disk'''
+    if self._changedFiles and not self._offlineRoot:
+      self._changedFiles.clear()
+      self.configFilesLabel.setText("")
+
+  def _onConfigFilesChangedEvent(self, event, changed):
+    '''
+    configuration files edited out of band (see configwatch): tell that
+    disk and loaded state differ. Offline the permanent objects shown are
+    read again; firewalld serves what it loaded until it is reloaded, so
+    there is nothing to read again online
+    '''
+    self._changedFiles.update("%s/%s" % (category, name)
+                              for category, names in changed.items() for name in names)
+    files = sorted(self._changedFiles)
+    shown = ", ".join(files[:5]) + (_(" and %d more") % (len(files) - 5) if len(files) > 5 else "")
+    if self._offlineRoot:
+      self.configFilesLabel.setText(_("Changed on disk by another program, read again: %s") % shown)
+    else:
+      self.configFilesLabel.setText(
+        _("The files on disk differ from the configuration firewalld has loaded, "
+          "reload firewalld to use them: %s") % shown)
+      return
+
+    names = changed.get(self._currentCategory)
+    if self.runtime_view or not names:
+      return
+    if self._currentItem in names and \
+        self._currentItem not in self.model.names(self._currentCategory, False):
+      self._currentItem = None
+    if self._currentCategory == 'zones':
+      self._fillLeftZones(self._currentItem)
+    elif self._currentCategory == 'services':
+      self._fillLeftServices(self._currentItem)
+    else:
+      self._fillLeftIPSets(self._currentItem)
+    if self._currentItem is None or self._currentItem in names:
+      self._refreshRightPane()
+
+  def _onLeftPaneConfigEvent(self, event, name):
+    '''
+    permanent zone or service configuration changed
+    '''
+    if self._currentCategory == 'zones':
+      self._fillLeftZones(self._currentItem)
+    else:
+      self._fillLeftServices(self._currentItem)
+    if event.endswith('-updated') and name == self._currentItem:
+      self._refreshRightPane()
+
+  def _onLeftPaneIPSetEvent(self, event, name):
+    '''
+    permanent IP set added, removed or renamed
+    '''
+    if event == 'config-ipset-added':
+      if name not in self._ipsetListItems:
+        self._fillLeftIPSets(self._currentItem)
+      return
+    elif event == 'config-ipset-removed':
+      if name not in self._ipsetListItems:
+        return
+      if name != self._currentItem:
+        self._fillLeftIPSets(self._currentItem)
+        return
+      self._currentItem = None
+    else:
+      # renamed only carries the new name, the old one is unknown
+      self._currentItem = None
+    self._fillLeftIPSets(self._currentItem)
+    self._refreshRightPane()
+
+  def _onRightPaneIPSetEvent(self, event, value):
+    '''
+    change of the IP set shown into the right pane
+    '''
+    if event == 'ipset-entry-added':
+      self._applyIPSetEntriesDelta(added=(value['entry'],))
+    elif event == 'ipset-entry-removed':
+      self._applyIPSetEntriesDelta(removed=(value['entry'],))
+    elif self._currentRightTab == 'entries':
+      # permanent settings changed, read the entries once and diff them
+      current = self._readIPSetEntries(self._currentItem)
+      self._applyIPSetEntriesDelta(added=current - self._ipsetEntries,
+                                   removed=self._ipsetEntries - current)
+    else:
+      self._refreshRightPane()
+
+  def _onRightPaneZoneEvent(self, event, value):
+    '''
+    runtime change of the zone shown into the right pane
+    '''
+    tab = self._currentRightTab
+    if tab == 'services':
+      self._fillRPServices()
+    elif tab in ('ports', 'source_ports'):
+      self._fillRPPort("zone_ports" if tab == 'ports' else "zone_sourceports")
+      if self.buttons is not None:
+        self.buttons['edit'].setEnabled(self.portList.itemsCount() > 0)
+        self.buttons['remove'].setEnabled(self.portList.itemsCount() > 0)
+    elif tab == 'forwarding':
+      self._fillRPForwardPorts()
+      if self.buttons is not None:
+        self.buttons['edit'].setEnabled(self.portForwardList.itemsCount() > 0)
+        self.buttons['remove'].setEnabled(self.portForwardList.itemsCount() > 0)
+    elif tab == 'icmp_filter':
+      self._fillRPICMPFilter()
+    elif tab == 'protocols':
+      self._fillRPProtocols('zone_protocols')
+      if self.buttons is not None:
+        self.buttons['edit'].setEnabled(self.protocolList.itemsCount() > 0)
+        self.buttons['remove'].setEnabled(self.protocolList.itemsCount() > 0)
+    elif tab == 'masquerade':
+      added = (event == 'masquerade-added')
+      if self.masquerade.isChecked() != added:
+        self.masquerade.setNotify(False)
+        self.masquerade.setValue(added)
+        self.masquerade.setNotify(True)
+
+  def _onBindingEvent(self, event, value):
+    '''
+    interface or source binding changed: patch the cached active zones and
+    the views showing them, without calling getActiveZones() again
+    '''
+    touched = self.model.applyBindingEvent(event, value)
+    if touched is None:
+      # nothing cached yet, the next fill reads the bindings anyway
+      return
+    if self._currentCategory != 'zones':
+      return
+    if self.activeBindingsTree is not None and self._zoneTreeData is not None:
+      self._patchZoneTree(touched)
+    if self._currentItem in touched:
+      if self._currentRightTab in ('interfaces', 'sources'):
+        self._fillRPZoneBindings()
+      elif self._currentRightTab == 'summary':
+        self._refreshRightPane()
 
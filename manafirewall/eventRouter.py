@@ -0,0 +1,156 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+eventRouter — routes firewalld events from the GLib thread to the views
+that subscribed to them.
+
+Events are posted from the GLib (D-Bus) thread as (event, key, value)
+triples, where key is the firewalld object the event refers to (e.g. the
+zone name) or None for global events. Views subscribe in the UI thread to
+(event, key) pairs, or to (event, None) to get every event of that type.
+Dispatching an event is two dictionary lookups, so the per-event cost does
+not grow with the number of views.
+
+The reload barrier drops the events of a firewalld reload burst: while it
+is up post() drops every non forced event, and raising it with
+discard=True also discards the non forced events already queued, which
+dispatch() then skips. Each queued event carries the barrier generation it
+was posted in, forced events none.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import logging
+import threading
+import time
+
+from queue import SimpleQueue, Empty
+
+logger = logging.getLogger('manafirewall.eventrouter')
+
+
+class EventRouter:
+    '''Thread-safe event queue with table-driven dispatch.
+
+    post() and the reload barrier methods may be called from any thread,
+    subscribe(), unsubscribe() and dispatch() only from the UI thread.
+    '''
+
+    def __init__(self):
+        self._queue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._barrier = False
+        # bumped by raiseBarrier(discard=True), queued events of an older
+        # generation are skipped
+        self._generation = 0
+        self._subscriptions = {}  # (event, key) -> [handler, ...]
+        # profiling.Profiler measuring queue latency and handling, optional
+        self.profiler = None
+
+    # ------------------------------------------------------------------
+    # producer side (GLib thread)
+    # ------------------------------------------------------------------
+
+    def post(self, event, value=None, key=None, force=False):
+        '''Queue an event. While the barrier is up the event is dropped,
+        unless force is True. Returns True if the event has been queued.'''
+        posted = time.monotonic() if self.profiler is not None else None
+        with self._lock:
+            if self._barrier and not force:
+                return False
+            self._queue.put((event, key, value, posted, None if force else self._generation))
+        return True
+
+    def raiseBarrier(self, discard=False):
+        '''Drop every non forced event from now on; with discard, also the
+        non forced events already queued.'''
+        with self._lock:
+            self._barrier = True
+            if discard:
+                self._generation += 1
+
+    def lowerBarrier(self):
+        '''Accept events again.'''
+        with self._lock:
+            self._barrier = False
+
+    @property
+    def barrier(self):
+        with self._lock:
+            return self._barrier
+
+    def pending(self):
+        '''Approximate number of queued events.'''
+        return self._queue.qsize()
+
+    def subscriptionCount(self):
+        '''Number of subscribed handlers, for diagnostics.'''
+        return sum(len(handlers) for handlers in self._subscriptions.values())
+
+    # ------------------------------------------------------------------
+    # consumer side (UI thread)
+    # ------------------------------------------------------------------
+
+    def subscribe(self, event, handler, key=None):
+        '''Call handler(event, value) for every event matching (event, key);
+        key None matches any key. Returns a token for unsubscribe().'''
+        token = (event, key, handler)
+        self._subscriptions.setdefault((event, key), []).append(handler)
+        return token
+
+    def unsubscribe(self, token):
+        event, key, handler = token
+        handlers = self._subscriptions.get((event, key))
+        if handlers is None:
+            return
+        try:
+            handlers.remove(handler)
+        except ValueError:
+            return
+        if not handlers:
+            del self._subscriptions[(event, key)]
+
+    def unsubscribeAll(self, tokens):
+        '''Unsubscribe a list of tokens and empty it.'''
+        for token in tokens:
+            self.unsubscribe(token)
+        tokens.clear()
+
+    def dispatch(self, max_events=20):
+        '''Deliver up to max_events queued events. Returns the number of
+        events taken from the queue.'''
+        count = 0
+        while count < max_events:
+            try:
+                event, key, value, posted, generation = self._queue.get_nowait()
+            except Empty:
+                break
+            count += 1
+            if generation is not None and generation != self._generation:
+                self._discarded(event)
+                continue
+            handlers = self._subscriptions.get((event, None), [])
+            if key is not None:
+                handlers = handlers + self._subscriptions.get((event, key), [])
+            if not handlers:
+                logger.debug("No subscriber for event %s (%s)", event, key)
+                continue
+            # handlers may (un)subscribe while running, iterate over a copy
+            handlers = tuple(handlers)
+            if posted is not None and self.profiler.enabled:
+                self.profiler.run(event, self._deliver, (handlers, event, value), kind='events')
+                self.profiler.record('queue', event, time.monotonic() - posted)
+            else:
+                self._deliver(handlers, event, value)
+        return count
+
+    def _discarded(self, event):
+        '''Called for each queued event skipped by dispatch().'''
+        logger.debug("Event %s discarded by the reload barrier", event)
+
+    @staticmethod
+    def _deliver(handlers, event, value):
+        for handler in handlers:
+            handler(event, value)
@@ -0,0 +1,285 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+history — content-addressed store of permanent configuration snapshots.
+
+Layout, under $XDG_CONFIG_HOME/manafirewall/snapshots:
+
+    objects/ab/cdef...json    one zone, service, IP set, ICMP type or
+                              helper, named by the sha256 of its content
+    manifests/<id>.json       one snapshot: time, label, global options and
+                              {category: {name: object hash}}
+
+An object is written once whatever the number of snapshots referring to it,
+so a snapshot costs its manifest plus the objects changed since the
+previous ones. Two snapshots are diffed comparing their hashes, only the
+objects that differ are read. Loaded objects are shared by hash, so the
+ConfigSnapshot versions built from two manifests share every unchanged
+object.
+
+Objects are stored in the desired-state schema (see declarative), restore
+is a pruning plan applied through the permanent configuration API, one
+update per changed object.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+import manafirewall.declarative as declarative
+import manafirewall.snapshot as snapshot
+
+logger = logging.getLogger('manafirewall.history')
+
+MANIFEST_FORMAT = 'manafirewall-snapshot'
+MANIFEST_VERSION = 1
+
+
+class HistoryError(Exception):
+    '''A snapshot cannot be found or read.'''
+
+
+def defaultRoot():
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(config_home, 'manafirewall', 'snapshots')
+
+
+def _canonical(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _writeAtomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotStore:
+    '''Snapshots of the permanent configuration, see the module
+    documentation.'''
+
+    def __init__(self, root=None):
+        self.root = root or defaultRoot()
+        self._hashes = {}     # ObjectSnapshot -> hash, saved or read
+        self._objects = {}    # hash -> ObjectSnapshot
+        self._specs = {}      # hash -> (category, name, spec)
+        self._manifests = {}  # id -> manifest
+
+    def _objectPath(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:] + '.json')
+
+    def _manifestPath(self, snapshot_id):
+        return os.path.join(self.root, 'manifests', snapshot_id + '.json')
+
+    def _store(self, category, obj):
+        '''Write an object unless already stored, returns its hash.'''
+        digest = self._hashes.get(obj)
+        if digest is not None:
+            return digest
+        spec = declarative.objectToState(obj)
+        data = _canonical({'category': category, 'name': obj.name, 'spec': spec})
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._objectPath(digest)
+        if not os.path.exists(path):
+            _writeAtomic(path, data)
+        self._hashes[obj] = digest
+        self._objects[digest] = obj
+        self._specs[digest] = (category, obj.name, spec)
+        return digest
+
+    def _spec(self, digest):
+        entry = self._specs.get(digest)
+        if entry is None:
+            try:
+                with open(self._objectPath(digest), 'rb') as f:
+                    data = json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError) as e:
+                raise HistoryError("Cannot read object %s: %s" % (digest, e))
+            entry = (data['category'], data['name'], data['spec'])
+            self._specs[digest] = entry
+        return entry
+
+    def _object(self, digest):
+        obj = self._objects.get(digest)
+        if obj is None:
+            category, name, spec = self._spec(digest)
+            obj = declarative.stateToObject(category, name, spec)
+            self._objects[digest] = obj
+            self._hashes[obj] = digest
+        return obj
+
+    def save(self, config, options, label=''):
+        '''
+        Store a ConfigSnapshot of the permanent view and the global options
+        (see ManaFirewallModel.globalState()), returns the snapshot id.
+        '''
+        manifest = {
+            'format':  MANIFEST_FORMAT,
+            'version': MANIFEST_VERSION,
+            'time':    time.time(),
+            'label':   label,
+            'globals': {key: options[key] for key in declarative.GLOBALS},
+            'objects': {},
+        }
+        for category in snapshot.ConfigSnapshot.CATEGORIES:
+            objects = getattr(config, category)
+            manifest['objects'][category] = {name: self._store(category, obj)
+                                             for name, obj in objects.items()}
+        data = _canonical(manifest)
+        snapshot_id = "%s-%s" % (time.strftime('%Y%m%d-%H%M%S', time.localtime(manifest['time'])),
+                                 hashlib.sha256(data).hexdigest()[:8])
+        _writeAtomic(self._manifestPath(snapshot_id), data)
+        self._manifests[snapshot_id] = manifest
+        logger.info("Saved snapshot %s (%s)", snapshot_id, label)
+        return snapshot_id
+
+    def ids(self):
+        '''Snapshot ids, oldest first.'''
+        try:
+            names = os.listdir(os.path.join(self.root, 'manifests'))
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith('.json'))
+
+    def resolve(self, prefix):
+        '''Returns the snapshot id whose date or hash part starts with
+        prefix.'''
+        ids = self.ids()
+        if prefix in ids:
+            return prefix
+        matches = [i for i in ids if i.startswith(prefix) or i.rpartition('-')[2].startswith(prefix)]
+        if len(matches) != 1:
+            raise HistoryError("%s snapshot matching '%s'" %
+                               ("No" if not matches else "More than one", prefix))
+        return matches[0]
+
+    def manifest(self, snapshot_id):
+        manifest = self._manifests.get(snapshot_id)
+        if manifest is None:
+            try:
+                with open(self._manifestPath(snapshot_id), 'rb') as f:
+                    manifest = json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError) as e:
+                raise HistoryError("Cannot read snapshot %s: %s" % (snapshot_id, e))
+            if manifest.get('format') != MANIFEST_FORMAT or \
+                    manifest.get('version') != MANIFEST_VERSION:
+                raise HistoryError("Snapshot %s has an unsupported format" % snapshot_id)
+            self._manifests[snapshot_id] = manifest
+        return manifest
+
+    def history(self):
+        '''[(id, time, label, number of objects)], newest first.'''
+        result = []
+        for snapshot_id in reversed(self.ids()):
+            manifest = self.manifest(snapshot_id)
+            count = sum(len(objects) for objects in manifest['objects'].values())
+            result.append((snapshot_id, manifest['time'], manifest['label'], count))
+        return result
+
+    def load(self, snapshot_id):
+        '''Returns the ConfigSnapshot and the global options of a
+        snapshot.'''
+        manifest = self.manifest(snapshot_id)
+        config = snapshot.ConfigSnapshot(**{
+            category: {name: self._object(digest) for name, digest in objects.items()}
+            for category, objects in manifest['objects'].items()})
+        return config, dict(manifest['globals'])
+
+    def state(self, snapshot_id):
+        '''Returns the snapshot as a desired-state document.'''
+        manifest = self.manifest(snapshot_id)
+        state = dict(manifest['globals'])
+        for category, objects in manifest['objects'].items():
+            state[category] = {name: self._spec(digest)[2] for name, digest in objects.items()}
+        return state
+
+    def diff(self, old_id, new_id):
+        '''
+        Differences between two snapshots as ConfigSnapshot.diff(), plus
+        'globals': {key: (old, new)}. Only the objects whose hash differs
+        are read.
+        '''
+        old = self.manifest(old_id)
+        new = self.manifest(new_id)
+        result = {}
+        for category in snapshot.ConfigSnapshot.CATEGORIES:
+            a = old['objects'].get(category, {})
+            b = new['objects'].get(category, {})
+            changed = {name: self._object(a[name]).diff(self._object(b[name]))
+                       for name in a.keys() & b.keys() if a[name] != b[name]}
+            added = sorted(b.keys() - a.keys())
+            removed = sorted(a.keys() - b.keys())
+            if added or removed or changed:
+                result[category] = {'added': added, 'removed': removed, 'changed': changed}
+        options = {key: (old['globals'].get(key), new['globals'].get(key))
+                   for key in declarative.GLOBALS
+                   if old['globals'].get(key) != new['globals'].get(key)}
+        if options:
+            result['globals'] = options
+        return result
+
+    def diffCurrent(self, snapshot_id, config, options):
+        '''Differences from a snapshot to the given current configuration
+        and global options.'''
+        old, old_options = self.load(snapshot_id)
+        result = old.diff(config)
+        changed = {key: (old_options.get(key), options[key])
+                   for key in declarative.GLOBALS if old_options.get(key) != options[key]}
+        if changed:
+            result['globals'] = changed
+        return result
+
+    def restorePlan(self, model, snapshot_id):
+        '''
+        Returns the plan bringing the permanent configuration back to a
+        snapshot, removing the objects created since.
+        '''
+        return declarative.buildPlan(model, self.state(snapshot_id), False, prune=True)
+
+    def delete(self, snapshot_id):
+        '''Remove a snapshot and the objects no other snapshot refers
+        to.'''
+        os.remove(self._manifestPath(snapshot_id))
+        self._manifests.pop(snapshot_id, None)
+        referenced = set()
+        for other in self.ids():
+            for objects in self.manifest(other)['objects'].values():
+                referenced.update(objects.values())
+        objects_dir = os.path.join(self.root, 'objects')
+        for dirpath, _dirnames, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                digest = os.path.basename(dirpath) + filename[:-5]
+                if filename.endswith('.json') and digest not in referenced:
+                    os.remove(os.path.join(dirpath, filename))
+                    obj = self._objects.pop(digest, None)
+                    self._specs.pop(digest, None)
+                    if obj is not None:
+                        self._hashes.pop(obj, None)
+
+
+def formatDiff(diff):
+    '''Human readable lines of SnapshotStore.diff().'''
+    lines = []
+    for key, (old, new) in sorted(diff.get('globals', {}).items()):
+        lines.append("~ %s: %s -> %s" % (key.replace('_', ' '), old, new))
+    for category in snapshot.ConfigSnapshot.CATEGORIES:
+        changes = diff.get(category)
+        if not changes:
+            continue
+        kind = category[:-1]
+        for name in changes['added']:
+            lines.append("+ %s %s" % (kind, name))
+        for name in changes['removed']:
+            lines.append("- %s %s" % (kind, name))
+        for name in sorted(changes['changed']):
+            op = declarative.Operation(category, name, 'update', None, None, changes['changed'][name])
+            lines.extend(op.describe())
+    return lines
@@ -0,0 +1,160 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+
+'''
+historyDialog — popup listing the saved snapshots of the permanent
+configuration, to take, compare, restore and delete them.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import gettext
+import html
+import logging
+import time
+
+import manatools.ui.basedialog as basedialog
+import manatools.ui.common as common
+import manatools.aui.yui as MUI
+
+import manafirewall.declarative as declarative
+import manafirewall.history as history
+
+_ = gettext.gettext
+logger = logging.getLogger('manafirewall.historydialog')
+
+
+class HistoryDialog(basedialog.BaseDialog):
+    '''Snapshot history of the permanent configuration.'''
+
+    def __init__(self, model, store=None):
+        basedialog.BaseDialog.__init__(
+            self, _("Configuration History"), "", basedialog.DialogType.POPUP, 700, 500)
+        self._model = model
+        self._store = store or history.SnapshotStore()
+
+    def UIlayout(self, layout):
+        vbox = self.factory.createVBox(layout)
+
+        heading = self.factory.createHeading(vbox, _("Snapshots of the permanent configuration"))
+        heading.setAutoWrap()
+        self.factory.createVSpacing(vbox, 0.3)
+
+        header = MUI.YTableHeader()
+        header.addColumn(_('Snapshot'))
+        header.addColumn(_('Date'))
+        header.addColumn(_('Objects'))
+        header.addColumn(_('Description'))
+        self._table = self.factory.createTable(vbox, header)
+        self._table.setStretchable(MUI.YUIDimension.YD_VERT, True)
+        self._table.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        self._changes = self.factory.createRichText(vbox, "")
+        self._changes.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        hbox = self.factory.createHBox(layout)
+        saveBtn = self.factory.createIconButton(hbox, 'document-save', _("&Take Snapshot"))
+        diffBtn = self.factory.createIconButton(hbox, 'document-properties', _("Show &Changes"))
+        restoreBtn = self.factory.createIconButton(hbox, 'document-revert', _("&Restore"))
+        deleteBtn = self.factory.createIconButton(hbox, 'edit-delete', _("&Delete"))
+        self.factory.createHStretch(hbox)
+        closeBtn = self.factory.createIconButton(hbox, 'window-close', _("&Close"))
+        self.eventManager.addWidgetEvent(saveBtn, self._onSave)
+        self.eventManager.addWidgetEvent(diffBtn, self._onDiff)
+        self.eventManager.addWidgetEvent(restoreBtn, self._onRestore)
+        self.eventManager.addWidgetEvent(deleteBtn, self._onDelete)
+        self.eventManager.addWidgetEvent(closeBtn, self._onClose)
+        self.eventManager.addCancelEvent(self._onClose)
+        self.dialog.setDefaultButton(closeBtn)
+
+        self._fillTable()
+
+    def _fillTable(self):
+        self._table.deleteAllItems()
+        try:
+            entries = self._store.history()
+        except history.HistoryError as e:
+            logger.warning("Cannot read the snapshot history: %s", e)
+            entries = []
+        itemColl = []
+        for snapshot_id, timestamp, label, count in entries:
+            item = MUI.YTableItem()
+            item.addCell(snapshot_id)
+            item.addCell(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)))
+            item.addCell(str(count))
+            item.addCell(label)
+            itemColl.append(item)
+        self._table.addItems(itemColl)
+
+    def _selected(self):
+        item = self._table.selectedItem()
+        return item.cell(0).label() if item else None
+
+    def _showLines(self, lines):
+        self._changes.setValue("<br>".join(html.escape(line) for line in lines))
+
+    def _onSave(self):
+        try:
+            self._store.save(self._model.configSnapshot(False), self._model.globalState(),
+                             _("manual snapshot"))
+        except Exception as e:
+            common.warningMsgBox({'title': _("Snapshot failed"), 'text': str(e)})
+            return
+        self._fillTable()
+
+    def _onDiff(self):
+        snapshot_id = self._selected()
+        if not snapshot_id:
+            return
+        try:
+            diff = self._store.diffCurrent(snapshot_id, self._model.configSnapshot(False),
+                                           self._model.globalState())
+        except Exception as e:
+            common.warningMsgBox({'title': _("Cannot compare"), 'text': str(e)})
+            return
+        lines = history.formatDiff(diff)
+        self._showLines(lines if lines else [_("No changes since this snapshot.")])
+
+    def _onRestore(self):
+        snapshot_id = self._selected()
+        if not snapshot_id:
+            return
+        try:
+            plan = self._store.restorePlan(self._model, snapshot_id)
+        except Exception as e:
+            common.warningMsgBox({'title': _("Restore failed"), 'text': str(e)})
+            return
+        if not plan:
+            self._showLines([_("No changes since this snapshot.")])
+            return
+        self._showLines(plan.describe())
+        if not common.askYesOrNo({'title': _("Restore snapshot"),
+                                  'text': _("Restore the permanent configuration to snapshot %s?<br>"
+                                            "The current one is saved first.") % snapshot_id,
+                                  'richtext': True}):
+            return
+        try:
+            self._store.save(self._model.configSnapshot(False), self._model.globalState(),
+                             "before restore %s" % snapshot_id)
+            declarative.applyPlan(self._model, plan)
+        except Exception as e:
+            logger.error("Restore of %s failed after %d write(s): %s", snapshot_id, plan.writes, e)
+            common.warningMsgBox({'title': _("Restore failed"), 'text': str(e)})
+        self._fillTable()
+
+    def _onDelete(self):
+        snapshot_id = self._selected()
+        if not snapshot_id:
+            return
+        if common.askYesOrNo({'title': _("Delete snapshot"),
+                              'text': _("Delete snapshot %s?") % snapshot_id}):
+            try:
+                self._store.delete(snapshot_id)
+            except OSError as e:
+                common.warningMsgBox({'title': _("Delete failed"), 'text': str(e)})
+            self._fillTable()
+
+    def _onClose(self):
+        self.ExitLoop()
@@ -0,0 +1,402 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+journal — append-only audit journal of the changes made by manafirewall
+and of the firewalld signals it receives, in SQLite.
+
+Every entry has its time, its source ('app' for a change issued through
+the firewalld client, 'signal' for an event received from firewalld), the
+user running the application (app entries), the event (client method, e.g.
+"addPort" or "FirewallClientZone.update", or signal name, e.g.
+"config:zone-updated"), the object it is about (zone, service, IP set...)
+when known, the arguments as JSON and, for a failed change, the error.
+
+Callers only queue entries: a writer thread inserts them in batches, one
+transaction per BATCH_SIZE entries or per FLUSH_INTERVAL seconds, and
+applies the retention policy (entries older than retention_days, or beyond
+max_rows) at start and every PRUNE_INTERVAL seconds. The database is in WAL
+mode, so that the viewers (journalDialog, "manafirewall journal") read it
+while it is written. Entries are never updated, a trigger rejects it.
+
+Queries go newest first and page by entry id, the indexes on time, object
+and event keep them fast on millions of entries.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import atexit
+import getpass
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+import manafirewall.profiling as profiling
+
+logger = logging.getLogger('manafirewall.journal')
+
+SCHEMA_VERSION = 1
+
+SOURCE_APP = 'app'
+SOURCE_SIGNAL = 'signal'
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_MAX_ROWS = 5000000
+
+# entries inserted per transaction, and the longest they wait for it
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+# seconds between two retention runs
+PRUNE_INTERVAL = 3600
+
+# entries per query page
+PAGE_SIZE = 500
+
+# client methods changing the configuration
+MUTATION_PREFIXES = ('add', 'remove', 'set', 'update', 'enable', 'disable', 'reload',
+                     'completeReload', 'runtimeToPermanent', 'rename', 'loadDefaults',
+                     'change', 'reset')
+
+# mutations and signals whose first argument is a value, not an object name
+GLOBAL_EVENTS = frozenset(('setLogDenied', 'setAutomaticHelpers', 'log-denied-changed',
+                           'connection-changed', 'reloaded', 'panic-mode-enabled',
+                           'panic-mode-disabled'))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    id      INTEGER PRIMARY KEY,
+    time    REAL NOT NULL,
+    source  TEXT NOT NULL,
+    user    TEXT,
+    event   TEXT NOT NULL,
+    object  TEXT,
+    detail  TEXT,
+    error   TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_time ON entries(time);
+CREATE INDEX IF NOT EXISTS entries_object ON entries(object);
+CREATE INDEX IF NOT EXISTS entries_event ON entries(event);
+CREATE TABLE IF NOT EXISTS events (
+    name    TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS entries_append_only BEFORE UPDATE ON entries
+BEGIN
+    SELECT RAISE(ABORT, 'the journal is append only');
+END;
+'''
+
+_COLUMNS = ('id', 'time', 'source', 'user', 'event', 'object', 'detail', 'error')
+
+
+class JournalError(Exception):
+    '''The journal cannot be opened or read.'''
+
+
+def defaultPath():
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(data_home, 'manafirewall', 'journal.sqlite')
+
+
+def currentUser():
+    '''User name, with the one who ran sudo if any.'''
+    user = getpass.getuser()
+    sudo_user = os.environ.get('SUDO_USER')
+    if sudo_user and sudo_user != user:
+        return "%s (%s)" % (sudo_user, user)
+    return user
+
+
+def _jsonDefault(value):
+    # firewalld settings objects keep their content into settings
+    settings = getattr(value, 'settings', None)
+    if settings is not None:
+        return settings
+    return str(value)
+
+
+def _objectOf(event, args):
+    if event.rpartition('.')[2] in GLOBAL_EVENTS or not args or not isinstance(args[0], str):
+        return None
+    return str(args[0])
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version > SCHEMA_VERSION:
+        connection.close()
+        raise JournalError("%s has a newer schema (%d)" % (path, version))
+    connection.executescript(_SCHEMA)
+    connection.execute('PRAGMA user_version=%d' % SCHEMA_VERSION)
+    return connection
+
+
+def prune(connection, retention_days=DEFAULT_RETENTION_DAYS, max_rows=DEFAULT_MAX_ROWS):
+    '''Apply the retention policy, 0 or None disable a limit. Returns the
+    number of removed entries.'''
+    removed = 0
+    with connection:
+        if retention_days:
+            removed += connection.execute('DELETE FROM entries WHERE time < ?',
+                                          (time.time() - retention_days * 86400,)).rowcount
+        if max_rows:
+            row = connection.execute('SELECT id FROM entries ORDER BY id DESC LIMIT 1 OFFSET ?',
+                                     (max_rows,)).fetchone()
+            if row is not None:
+                removed += connection.execute('DELETE FROM entries WHERE id <= ?', row).rowcount
+    return removed
+
+
+class Journal:
+    '''Queues entries for the writer thread, see the module documentation.
+    start() it once; stop(), also called at exit, writes what is queued.'''
+
+    def __init__(self, path=None, retention_days=DEFAULT_RETENTION_DAYS,
+                 max_rows=DEFAULT_MAX_ROWS, user=None):
+        self.path = path or defaultPath()
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.user = user or currentUser()
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='manafirewall-journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def append(self, source, event, args=(), error=None):
+        '''Queue an entry, args are the call or signal arguments.'''
+        self._queue.put((time.time(), source, event, args, error))
+
+    def wrap(self, signal, callback):
+        '''Returns callback journaling its calls as signal.'''
+        def journaled(*args):
+            self.append(SOURCE_SIGNAL, signal, args)
+            return callback(*args)
+        return journaled
+
+    def _row(self, entry):
+        when, source, event, args, error = entry
+        detail = json.dumps(list(args), separators=(',', ':'), default=_jsonDefault) if args else None
+        return (when, source, self.user if source == SOURCE_APP else None, event,
+                _objectOf(event, args), detail, error)
+
+    def _run(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = _connect(self.path)
+        except (OSError, sqlite3.Error, JournalError) as e:
+            logger.error("Cannot open the journal %s: %s", self.path, e)
+            # keep draining, so that callers never block nor grow the queue
+            while self._queue.get() is not None:
+                pass
+            return
+        next_prune = 0
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while entry is not None:
+                batch.append(entry)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            stopping = entry is None
+            if batch:
+                self._write(connection, batch)
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+                try:
+                    removed = prune(connection, self.retention_days, self.max_rows)
+                except sqlite3.Error as e:
+                    logger.warning("Journal retention failed: %s", e)
+                else:
+                    if removed:
+                        logger.info("Journal retention removed %d entries", removed)
+                    # keep the query planner statistics up to date
+                    connection.execute('PRAGMA optimize')
+        connection.close()
+        logger.debug("Journal closed, %d entries written", self.written)
+
+    def _write(self, connection, batch):
+        try:
+            rows = [self._row(entry) for entry in batch]
+            with connection:
+                connection.executemany(
+                    'INSERT INTO entries (time, source, user, event, object, detail, error) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                connection.executemany('INSERT OR IGNORE INTO events (name) VALUES (?)',
+                                       {(row[3],) for row in rows})
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error("Cannot write %d journal entries: %s", len(batch), e)
+            return
+        self.written += len(rows)
+
+
+class JournalClient(profiling.ClientProxy):
+    '''Proxy of a FirewallClient journaling the changes made through it.
+    The configuration objects it returns (config(), get*ByName()) are
+    proxied as well, their calls named Class.method and journaled with the
+    object name.'''
+
+    def __init__(self, client, journal, prefix='', name=None):
+        profiling.ClientProxy.__init__(self, client)
+        self._journal = journal
+        self._prefix = prefix
+        self._name = name
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        mutation = name.startswith(MUTATION_PREFIXES) and name not in profiling.LOCAL_METHODS
+        if not mutation and name != 'config' and not name.endswith('ByName'):
+            return attr
+        method = self._prefix + name
+        journal = self._journal
+        object_name = self._name
+
+        def journaled(*args, **kwargs):
+            if not mutation:
+                result = attr(*args, **kwargs)
+                if result is None:
+                    return None
+                owner = args[0] if name.endswith('ByName') and args else None
+                return JournalClient(result, journal, profiling.proxiedClass(result).__name__ + '.', owner)
+            logged = args if object_name is None else (object_name,) + args
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                journal.append(SOURCE_APP, method, logged, str(e) or type(e).__name__)
+                raise
+            journal.append(SOURCE_APP, method, logged)
+            return result
+        return journaled
+
+
+# ----------------------------------------------------------------------
+# reading
+# ----------------------------------------------------------------------
+
+def openReadOnly(path=None):
+    '''Returns a read-only connection to the journal.'''
+    path = path or defaultPath()
+    if not os.path.exists(path):
+        raise JournalError("There is no journal at %s" % path)
+    try:
+        return sqlite3.connect('file:%s?mode=ro' % urllib.parse.quote(path), uri=True, timeout=10)
+    except sqlite3.Error as e:
+        raise JournalError("Cannot open %s: %s" % (path, e))
+
+
+def _match(column, value):
+    '''equality, or a glob if value has wildcards (a prefix glob still
+    uses the index)'''
+    if any(c in value for c in '*?['):
+        return '%s GLOB ?' % column, value
+    return '%s = ?' % column, value
+
+
+def query(connection, since=None, until=None, source=None, event=None, obj=None,
+          text=None, before=None, limit=PAGE_SIZE):
+    '''
+    Returns the entries matching the filters as dicts, newest first.
+    since and until are epoch times, event and obj exact names or globs,
+    text is searched into the arguments and error. before is the id of the
+    last entry of the previous page.
+    '''
+    clauses = []
+    params = []
+    if since is not None:
+        clauses.append('time >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('time < ?')
+        params.append(until)
+    if source:
+        clauses.append('source = ?')
+        params.append(source)
+    for column, value in (('event', event), ('object', obj)):
+        if value:
+            clause, param = _match(column, value)
+            clauses.append(clause)
+            params.append(param)
+    if text:
+        clauses.append("(detail LIKE ? ESCAPE '\\' OR error LIKE ? ESCAPE '\\')")
+        pattern = '%%%s%%' % text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.extend((pattern, pattern))
+    if before is not None:
+        clauses.append('id < ?')
+        params.append(before)
+    sql = 'SELECT %s FROM entries' % ', '.join(_COLUMNS)
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY id DESC LIMIT ?'
+    params.append(limit)
+    try:
+        return [dict(zip(_COLUMNS, row)) for row in connection.execute(sql, params)]
+    except sqlite3.Error as e:
+        raise JournalError("Cannot read the journal: %s" % e)
+
+
+def eventNames(connection):
+    '''Every event name ever journaled, sorted.'''
+    try:
+        return [row[0] for row in connection.execute('SELECT name FROM events ORDER BY name')]
+    except sqlite3.Error as e:
+        raise JournalError("Cannot read the journal: %s" % e)
+
+
+def parseTime(text):
+    '''Epoch time of "YYYY-MM-DD[ HH:MM[:SS]]", or of a time ago such as
+    "30m", "12h" or "7d". Raises ValueError.'''
+    text = text.strip()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text[-1:] in units and text[:-1].isdigit():
+        return time.time() - int(text[:-1]) * units[text[-1]]
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            pass
+    raise ValueError("Invalid time %s" % text)
+
+
+def formatEntry(entry):
+    '''One line description of an entry.'''
+    line = "%s  %-6s %-22s %-40s %s" % (
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['time'])),
+        entry['source'], entry['user'] or '-', entry['event'], entry['object'] or '-')
+    if entry['detail']:
+        line += "  " + entry['detail']
+    if entry['error']:
+        line += "  FAILED: " + entry['error']
+    return line
@@ -0,0 +1,164 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+
+'''
+journalDialog — popup browsing the audit journal (see journal.py): the
+changes made by manafirewall and the firewalld signals received, newest
+first, filtered by object, event, source, time and text, one page at a
+time.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import gettext
+import logging
+import time
+
+import manatools.ui.basedialog as basedialog
+import manatools.ui.common as common
+import manatools.aui.yui as MUI
+
+import manafirewall.journal as journal
+
+_ = gettext.gettext
+logger = logging.getLogger('manafirewall.journaldialog')
+
+
+class JournalDialog(basedialog.BaseDialog):
+    '''Audit journal viewer.'''
+
+    def __init__(self, path=None):
+        basedialog.BaseDialog.__init__(
+            self, _("Journal"), "", basedialog.DialogType.POPUP, 900, 600)
+        self._path = path
+        self._connection = None
+        self._last_id = None
+
+    def UIlayout(self, layout):
+        vbox = self.factory.createVBox(layout)
+
+        heading = self.factory.createHeading(vbox, _("Changes and firewalld events"))
+        heading.setAutoWrap()
+        self.factory.createVSpacing(vbox, 0.3)
+
+        hbox = self.factory.createHBox(vbox)
+        self._objectField = self.factory.createInputField(hbox, _("Object"))
+        self._eventCombo = self.factory.createComboBox(hbox, _("Event"))
+        self._sourceCombo = self.factory.createComboBox(hbox, _("Source"))
+        self._sources = {}
+        itemColl = []
+        for label, source in ((_("Any"), None),
+                              (_("manafirewall"), journal.SOURCE_APP),
+                              (_("firewalld"), journal.SOURCE_SIGNAL)):
+            item = MUI.YItem(label, source is None)
+            self._sources[label] = source
+            itemColl.append(item)
+        self._sourceCombo.addItems(itemColl)
+        self._sinceField = self.factory.createInputField(hbox, _("Since (7d, 2024-01-31)"))
+        self._textField = self.factory.createInputField(hbox, _("Text"))
+        searchBtn = self.factory.createIconButton(hbox, 'edit-find', _("&Search"))
+        self.eventManager.addWidgetEvent(searchBtn, self._onSearch)
+
+        header = MUI.YTableHeader()
+        header.addColumn(_('Time'))
+        header.addColumn(_('Source'))
+        header.addColumn(_('User'))
+        header.addColumn(_('Event'))
+        header.addColumn(_('Object'))
+        header.addColumn(_('Arguments'))
+        header.addColumn(_('Error'))
+        self._table = self.factory.createTable(vbox, header)
+        self._table.setStretchable(MUI.YUIDimension.YD_VERT, True)
+        self._table.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        self._status = self.factory.createLabel(self.factory.createLeft(vbox), "")
+        self._status.setStretchable(MUI.YUIDimension.YD_HORIZ, True)
+
+        hbox = self.factory.createHBox(layout)
+        newestBtn = self.factory.createIconButton(hbox, 'go-top', _("&Newest"))
+        self._olderBtn = self.factory.createIconButton(hbox, 'go-down', _("&Older"))
+        self.factory.createHStretch(hbox)
+        closeBtn = self.factory.createIconButton(hbox, 'window-close', _("&Close"))
+        self.eventManager.addWidgetEvent(newestBtn, self._onSearch)
+        self.eventManager.addWidgetEvent(self._olderBtn, self._onOlder)
+        self.eventManager.addWidgetEvent(closeBtn, self._onClose)
+        self.eventManager.addCancelEvent(self._onClose)
+        self.dialog.setDefaultButton(searchBtn)
+
+        try:
+            self._connection = journal.openReadOnly(self._path)
+            events = journal.eventNames(self._connection)
+        except journal.JournalError as e:
+            logger.warning("%s", e)
+            self._status.setText(str(e))
+            self._olderBtn.setEnabled(False)
+            return
+        itemColl = [MUI.YItem(_("Any"), True)] + [MUI.YItem(name, False) for name in events]
+        self._eventCombo.addItems(itemColl)
+        self._fillTable(None)
+
+    def _filters(self):
+        since = self._sinceField.value().strip()
+        event = self._eventCombo.selectedItem()
+        source = self._sourceCombo.selectedItem()
+        return {
+            'since':  journal.parseTime(since) if since else None,
+            'event':  event.label() if event is not None and event.label() != _("Any") else None,
+            'source': self._sources.get(source.label()) if source is not None else None,
+            'obj':    self._objectField.value().strip() or None,
+            'text':   self._textField.value().strip() or None,
+        }
+
+    def _fillTable(self, before):
+        if self._connection is None:
+            return
+        try:
+            filters = self._filters()
+        except ValueError as e:
+            common.warningMsgBox({'title': _("Journal"), 'text': str(e)})
+            return
+        start = time.monotonic()
+        try:
+            entries = journal.query(self._connection, before=before, **filters)
+        except journal.JournalError as e:
+            common.warningMsgBox({'title': _("Journal"), 'text': str(e)})
+            return
+        elapsed = time.monotonic() - start
+
+        self._table.deleteAllItems()
+        itemColl = []
+        for entry in entries:
+            item = MUI.YTableItem()
+            item.addCell(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['time'])))
+            item.addCell(entry['source'])
+            item.addCell(entry['user'] or "")
+            item.addCell(entry['event'])
+            item.addCell(entry['object'] or "")
+            item.addCell(entry['detail'] or "")
+            item.addCell(entry['error'] or "")
+            itemColl.append(item)
+        self._table.addItems(itemColl)
+
+        self._last_id = entries[-1]['id'] if entries else None
+        # a full page means there may be older entries
+        self._olderBtn.setEnabled(len(entries) == journal.PAGE_SIZE)
+        if before is None:
+            text = _("%(count)d newest entries (%(time).0f ms)")
+        else:
+            text = _("%(count)d older entries (%(time).0f ms)")
+        self._status.setText(text % {'count': len(entries), 'time': elapsed * 1000})
+
+    def _onSearch(self):
+        self._fillTable(None)
+
+    def _onOlder(self):
+        if self._last_id is not None:
+            self._fillTable(self._last_id)
+
+    def _onClose(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self.ExitLoop()
@@ -0,0 +1,166 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+memwatch — memory and leak diagnostics for long running sessions.
+
+MemoryWatcher periodically takes a tracemalloc snapshot and reads a set of
+counters (registered widget callbacks, router subscriptions, cache sizes,
+live objects), and logs what grew since the previous sample: traced
+memory, the counters that changed and the source lines allocating the
+most new memory. The UI calls tick() from its loop, samples are taken
+there, in the thread owning the counted structures.
+
+tracemalloc slows the application down, the watcher is a diagnostic mode
+(Logging options) and benchmarks.leaks runs it over simulated refresh
+cycles.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import gc
+import logging
+import time
+import tracemalloc
+
+logger = logging.getLogger('manafirewall.memwatch')
+
+# seconds between two samples
+DEFAULT_INTERVAL = 300
+
+# allocation sites logged per sample
+DEFAULT_TOP = 10
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class Sample:
+    '''One measure: traced memory, counters and, against the previous
+    sample, the growth per allocation site.'''
+
+    __slots__ = ('time', 'traced', 'peak', 'counters', 'growth')
+
+    def __init__(self, traced, peak, counters, growth):
+        self.time = time.time()
+        self.traced = traced
+        self.peak = peak
+        self.counters = counters
+        self.growth = growth    # [(site, size difference, count difference)]
+
+    def asDict(self):
+        return {
+            'time':     self.time,
+            'traced':   self.traced,
+            'peak':     self.peak,
+            'counters': dict(self.counters),
+            'growth':   [list(g) for g in self.growth],
+        }
+
+
+class MemoryWatcher:
+    '''Samples memory and the counters returned by the sources callables
+    ({name: callable returning a number, or a dict of numbers}).'''
+
+    def __init__(self, sources=None, interval=DEFAULT_INTERVAL, top=DEFAULT_TOP, frames=1):
+        self.sources = dict(sources or {})
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.samples = []
+        self._snapshot = None
+        self._next = None
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._snapshot = None
+        self.sample()
+        logger.info("Memory diagnostics started, a sample every %d s", self.interval)
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+        self._next = None
+
+    @property
+    def running(self):
+        return self._next is not None
+
+    def tick(self):
+        '''Take a sample if the interval has elapsed; cheap otherwise.'''
+        if self._next is not None and time.monotonic() >= self._next:
+            self.sample()
+
+    def counters(self):
+        '''Current value of the counters, source errors are logged.'''
+        values = {}
+        for name, source in self.sources.items():
+            try:
+                value = source()
+            except Exception as e:
+                logger.warning("Memory diagnostics: cannot read %s: %s", name, e)
+                continue
+            if isinstance(value, dict):
+                values.update(("%s.%s" % (name, k), v) for k, v in value.items())
+            else:
+                values[name] = value
+        values['gc.objects'] = len(gc.get_objects())
+        return values
+
+    def sample(self, log=True):
+        '''Take and return a Sample, logging the growth since the previous
+        one.'''
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        traced, peak = tracemalloc.get_traced_memory()
+        growth = []
+        if self._snapshot is not None:
+            for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top]:
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                growth.append(("%s:%d" % (frame.filename, frame.lineno), stat.size_diff, stat.count_diff))
+        self._snapshot = snapshot
+        self._next = time.monotonic() + self.interval
+        sample = Sample(traced, peak, self.counters(), growth)
+        previous = self.samples[-1] if self.samples else None
+        self.samples.append(sample)
+        if log:
+            self._log(previous, sample)
+        return sample
+
+    def _log(self, previous, sample):
+        if previous is None:
+            logger.info("Memory baseline: %d KiB traced, %s", sample.traced // 1024,
+                        ", ".join("%s %s" % c for c in sorted(sample.counters.items())))
+            return
+        changed = ["%s %s -> %s" % (name, previous.counters.get(name), value)
+                   for name, value in sorted(sample.counters.items())
+                   if previous.counters.get(name) != value]
+        logger.info("Memory: %+d KiB traced (%d KiB, peak %d KiB)%s",
+                    (sample.traced - previous.traced) // 1024, sample.traced // 1024, sample.peak // 1024,
+                    "; " + ", ".join(changed) if changed else "")
+        for site, size, count in sample.growth:
+            logger.info("  %+8d KiB %+7d blocks  %s", size // 1024, count, site)
+
+    def growth(self, first=0):
+        '''Traced memory and counter differences between sample first and
+        the last one.'''
+        if len(self.samples) <= first:
+            return 0, {}
+        start, end = self.samples[first], self.samples[-1]
+        return end.traced - start.traced, {
+            name: value - start.counters.get(name, 0)
+            for name, value in end.counters.items()
+            if value != start.counters.get(name, 0)
+        }
@@ -0,0 +1,271 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+metrics — firewall state as Prometheus metrics, written for the
+node_exporter textfile collector.
+
+    manafirewall_up                               1 if firewalld answered
+    manafirewall_zones                            zones of the view
+    manafirewall_zone_{services,ports,rich_rules,sources,interfaces}{zone}
+    manafirewall_ipsets                           IP sets of the view
+    manafirewall_ipset_entries{ipset,type}        entries of an IP set
+    manafirewall_ipset_maxelem{ipset,type}        its maxelem option
+    manafirewall_panic_mode                       1 if panic mode is on
+    manafirewall_log_denied{value}                1 for the current setting
+    manafirewall_default_zone{zone}               1 for the default zone
+    manafirewall_last_reload_timestamp_seconds    once a reload was seen
+    manafirewall_seconds_since_reload             idem
+    manafirewall_export_duration_seconds, manafirewall_export_objects_changed
+
+All metrics carry a view="runtime" or "permanent" label. The file is
+written atomically: a temporary file in the same directory, renamed over
+the previous one, so the collector never reads half of it.
+
+Exports reuse the model caches (see model.readObjects): an object is read
+from firewalld again only after a signal dropped it, and its samples are
+formatted again only if its snapshot changed, so an export costs the name
+lists plus the changed objects. The global state is read once and then
+followed by the signals. serve() runs the exports from a GLib main loop,
+where the signals are received and dispatched.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import contextlib
+import logging
+import os
+import signal
+import tempfile
+import time
+
+logger = logging.getLogger('manafirewall.metrics')
+
+DEFAULT_INTERVAL = 60
+
+PREFIX = 'manafirewall_'
+
+# family -> (type, help), in output order
+FAMILIES = (
+    ('up',                            'gauge', 'Whether firewalld could be read.'),
+    ('zones',                         'gauge', 'Number of zones.'),
+    ('zone_services',                 'gauge', 'Services enabled in the zone.'),
+    ('zone_ports',                    'gauge', 'Ports opened in the zone.'),
+    ('zone_rich_rules',               'gauge', 'Rich rules of the zone.'),
+    ('zone_sources',                  'gauge', 'Sources bound to the zone.'),
+    ('zone_interfaces',               'gauge', 'Interfaces bound to the zone.'),
+    ('ipsets',                        'gauge', 'Number of IP sets.'),
+    ('ipset_entries',                 'gauge', 'Entries of the IP set.'),
+    ('ipset_maxelem',                 'gauge', 'Maximum number of entries of the IP set.'),
+    ('panic_mode',                    'gauge', 'Whether panic mode is enabled.'),
+    ('log_denied',                    'gauge', 'Current Log Denied setting.'),
+    ('default_zone',                  'gauge', 'Current default zone.'),
+    ('last_reload_timestamp_seconds', 'gauge', 'Time of the last firewalld reload seen.'),
+    ('seconds_since_reload',          'gauge', 'Seconds since the last firewalld reload seen.'),
+    ('export_duration_seconds',       'gauge', 'Time taken by the export.'),
+    ('export_objects_changed',        'gauge', 'Zones and IP sets formatted again by the export.'),
+)
+
+# firewalld default of the IP set maxelem option
+DEFAULT_MAXELEM = 65536
+
+# zone family -> snapshot attribute
+_ZONE_COUNTS = (
+    ('zone_services',   'services'),
+    ('zone_ports',      'ports'),
+    ('zone_rich_rules', 'rich_rules'),
+    ('zone_sources',    'sources'),
+    ('zone_interfaces', 'interfaces'),
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def sample(family, number, **labels):
+    '''One exposition line of the family.'''
+    if labels:
+        text = ','.join('%s="%s"' % (k, _escape(v)) for k, v in sorted(labels.items()))
+        return '%s%s{%s} %s' % (PREFIX, family, text, _number(number))
+    return '%s%s %s' % (PREFIX, family, _number(number))
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def writeAtomically(path, text):
+    '''Replace path with text, readers see the old or the new content.'''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+    try:
+        try:
+            f = os.fdopen(fd, 'w')
+        except BaseException:
+            os.close(fd)
+            raise
+        try:
+            f.write(text)
+            f.flush()
+            os.fchmod(f.fileno(), 0o644)
+        finally:
+            f.close()
+        os.replace(temporary, path)
+    except BaseException:
+        # keep the original error
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+        raise
+
+
+class TextfileExporter:
+    '''Exports the runtime (or permanent) view of a connected model into
+    path, see the module documentation. Create it before connecting the
+    model, so its event subscriptions see the first signals.'''
+
+    def __init__(self, fw_model, path, runtime=True):
+        self.model = fw_model
+        self.path = path
+        self.runtime = runtime
+        self.view = 'runtime' if runtime else 'permanent'
+        self.last_reload = None
+        # whether the last export could read firewalld
+        self.up = False
+        # (category, name) -> (snapshot, {family: [lines]})
+        self._samples = {}
+        self._global = None
+        router = fw_model.router
+        router.subscribe('connection-changed', self._onGlobalInvalidated)
+        router.subscribe('reloaded', self._onReloaded)
+        router.subscribe('panicmode-changed', self._onGlobalEvent)
+        router.subscribe('log-denied-changed', self._onGlobalEvent)
+        router.subscribe('default-zone-changed', self._onGlobalEvent)
+
+    def _onGlobalInvalidated(self, event, value):
+        self._global = None
+
+    def _onReloaded(self, event, value):
+        self.last_reload = time.time()
+        self._global = None
+        # nobody builds a reload snapshot here, accept the signals again
+        self.model.router.lowerBarrier()
+        self.model.reloadCompleted()
+
+    def _onGlobalEvent(self, event, value):
+        if self._global is None:
+            return
+        key = {'panicmode-changed':    'panic',
+               'log-denied-changed':   'log_denied',
+               'default-zone-changed': 'default_zone'}[event]
+        self._global[key] = value
+
+    def _objectSamples(self, category, name, obj):
+        '''Samples of one zone or IP set, cached while its snapshot is the
+        same. Returns (samples, changed).'''
+        cached = self._samples.get((category, name))
+        if cached is not None and cached[0] is obj:
+            return cached[1], False
+        samples = {}
+        if category == 'zones':
+            for family, attr in _ZONE_COUNTS:
+                samples[family] = [sample(family, len(getattr(obj, attr)), view=self.view, zone=name)]
+        else:
+            options = dict(obj.options)
+            try:
+                maxelem = int(options.get('maxelem', DEFAULT_MAXELEM))
+            except ValueError:
+                maxelem = DEFAULT_MAXELEM
+            labels = {'view': self.view, 'ipset': name, 'type': obj.type}
+            samples['ipset_entries'] = [sample('ipset_entries', len(obj.entries), **labels)]
+            samples['ipset_maxelem'] = [sample('ipset_maxelem', maxelem, **labels)]
+        self._samples[(category, name)] = (obj, samples)
+        return samples, True
+
+    def render(self):
+        '''Returns the exposition text, reading what changed.'''
+        start = time.monotonic()
+        lines = {}
+
+        def add(family, number, **labels):
+            lines.setdefault(family, []).append(sample(family, number, view=self.view, **labels))
+
+        changed = 0
+        try:
+            if not self.model.connected:
+                raise RuntimeError("not connected")
+            wanted = {'zones': self.model.names('zones', self.runtime),
+                      'ipsets': self.model.names('ipsets', self.runtime)}
+            objects = self.model.readObjects(wanted, self.runtime)
+            if self._global is None:
+                self._global = self.model.globalState()
+        except Exception as e:
+            logger.warning("Cannot read firewalld: %s", e)
+            self._samples.clear()
+            self._global = None
+            self.up = False
+            add('up', 0)
+        else:
+            self.up = True
+            add('up', 1)
+            for category in ('zones', 'ipsets'):
+                add(category, len(objects[category]))
+                for name, obj in sorted(objects[category].items()):
+                    samples, is_changed = self._objectSamples(category, name, obj)
+                    changed += is_changed
+                    for family, family_lines in samples.items():
+                        lines.setdefault(family, []).extend(family_lines)
+            # forget removed objects
+            for key in [k for k in self._samples if k[1] not in objects[k[0]]]:
+                del self._samples[key]
+            add('panic_mode', bool(self._global['panic']))
+            add('log_denied', 1, value=self._global['log_denied'])
+            add('default_zone', 1, zone=self._global['default_zone'])
+            if self.last_reload is not None:
+                add('last_reload_timestamp_seconds', round(self.last_reload, 3))
+                add('seconds_since_reload', round(time.time() - self.last_reload, 3))
+        add('export_duration_seconds', round(time.monotonic() - start, 6))
+        add('export_objects_changed', changed)
+
+        text = []
+        for family, kind, help_text in FAMILIES:
+            if family in lines:
+                text.append('# HELP %s%s %s' % (PREFIX, family, help_text))
+                text.append('# TYPE %s%s %s' % (PREFIX, family, kind))
+                text.extend(lines[family])
+        return '\n'.join(text) + '\n'
+
+    def export(self):
+        '''Deliver the pending signals, then write the file.'''
+        router = self.model.router
+        while router.dispatch(1000):
+            pass
+        writeAtomically(self.path, self.render())
+
+    def serve(self, interval=DEFAULT_INTERVAL):
+        '''Export now and every interval seconds until SIGTERM or SIGINT;
+        the model must be connected with its signals routed.'''
+        from gi.repository import GLib
+        loop = GLib.MainLoop()
+
+        def tick():
+            try:
+                self.export()
+            except OSError as e:
+                logger.error("Cannot write %s: %s", self.path, e)
+            return GLib.SOURCE_CONTINUE
+
+        def first():
+            tick()
+            return GLib.SOURCE_REMOVE
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, loop.quit)
+        GLib.idle_add(first)
+        GLib.timeout_add_seconds(max(1, int(interval)), tick)
+        loop.run()
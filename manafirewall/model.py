@@ -0,0 +1,915 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+model — firewalld state and access for manafirewall, without any UI code.
+
+ManaFirewallModel owns the FirewallClient connection and turns its signals
+into eventRouter events. It keeps the caches (active zone bindings, the
+post-reload snapshot) and exposes the read and mutation API used by the
+main dialog. Headless tools and benchmarks can use it directly, going
+through the same code path as the GUI; the client can be passed in, so
+that a fake one can replace firewalld.
+
+Every read and write takes a runtime argument: True to work on the runtime
+configuration, False on the permanent one.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+import manafirewall.eventRouter as eventRouter
+import manafirewall.profiling as profiling
+import manafirewall.snapshot as snapshot
+
+logger = logging.getLogger('manafirewall.model')
+
+# zone elements managed by {add,remove,query}<Element>, with the arguments
+# following the zone name (runtime) or alone (permanent config object)
+ZONE_ELEMENTS = ('Service', 'Port', 'Protocol', 'SourcePort', 'ForwardPort',
+                 'IcmpBlock', 'Masquerade', 'IcmpBlockInversion', 'Forward',
+                 'Interface', 'Source', 'RichRule')
+
+# service elements managed by {add,remove,query}<Element>, permanent only
+SERVICE_ELEMENTS = ('Port', 'Protocol', 'SourcePort', 'Module')
+
+# category -> (runtime names, runtime settings, config names, config object,
+#              config add) FirewallClient / FirewallClientConfig methods
+CATEGORY_API = {
+    'zones':     ('getZones', 'getZoneSettings',
+                  'getZoneNames', 'getZoneByName', 'addZone'),
+    'services':  ('listServices', 'getServiceSettings',
+                  'getServiceNames', 'getServiceByName', 'addService'),
+    'ipsets':    ('getIPSets', 'getIPSetSettings',
+                  'getIPSetNames', 'getIPSetByName', 'addIPSet'),
+    'icmptypes': ('listIcmpTypes', 'getIcmpTypeSettings',
+                  'getIcmpTypeNames', 'getIcmpTypeByName', 'addIcmpType'),
+    'helpers':   ('getHelpers', 'getHelperSettings',
+                  'getHelperNames', 'getHelperByName', 'addHelper'),
+}
+
+# concurrent D-Bus reads of readObjects()
+READ_WORKERS = 8
+
+# global state key -> FirewallClient getter, see globalState()
+GLOBAL_STATE = (
+    ('default_zone',      'getDefaultZone'),
+    ('log_denied',        'getLogDenied'),
+    ('automatic_helpers', 'getAutomaticHelpers'),
+    ('panic',             'queryPanicMode'),
+)
+
+
+class ManaFirewallModel:
+    '''firewalld connection, caches and API.
+
+    Signal callbacks run in the GLib thread and only post events to the
+    router; everything else must be called from the thread dispatching the
+    router events (the UI thread in the GUI).
+    '''
+
+    def __init__(self, router=None):
+        self.router = router if router is not None else eventRouter.EventRouter()
+        self.fw = None
+        # active_zones is read once and then patched by the interface and
+        # source signals, until the connection changes or firewalld reloads
+        self.active_zones = {}
+        self._activeZonesValid = False
+        # reload barrier: while the router barrier is up every intermediate
+        # firewalld signal is dropped, a fresh snapshot is built after
+        # 'reloaded' (see buildReloadSnapshot)
+        self.snapshot = None
+        self._reload_started = None
+        # client failures reported to the exception handler, per thread:
+        # with a handler set the client does not raise (see _clientCall)
+        self._callErrors = threading.local()
+        self._exception_handler = None
+        # (category, runtime, name) -> ObjectSnapshot, filled on first read
+        # and dropped by the signals changing the object
+        self._objects = {}
+        # signalrecorder.SignalRecorder, set before connect() to record the
+        # firewalld signals
+        self.recorder = None
+        # profiling.Profiler, set before connect() to account the D-Bus calls
+        self.profiler = None
+        # journal.Journal, set before connect() to journal the changes made
+        # through the client and the firewalld signals
+        self.journal = None
+        # subscribed before any view, so caches are invalidated before views
+        # read them again
+        self.router.subscribe('connection-changed', self._onCacheInvalidated)
+        self.router.subscribe('reloaded', self._onCacheInvalidated)
+        for event in ('service-added', 'service-removed', 'port-added', 'port-removed',
+                      'protocol-added', 'protocol-removed', 'source-port-added',
+                      'source-port-removed', 'masquerade-added', 'masquerade-removed',
+                      'forward-port-added', 'forward-port-removed', 'icmp-changed',
+                      'icmp-inversion'):
+            self.router.subscribe(event, self._onRuntimeZoneChanged)
+        for event in ('interface-added', 'interface-removed', 'zone-of-interface-changed',
+                      'source-added', 'source-removed', 'zone-of-source-changed'):
+            self.router.subscribe(event, self._onRuntimeBindingChanged)
+        for event in ('ipset-entry-added', 'ipset-entry-removed'):
+            self.router.subscribe(event, self._onRuntimeIPSetChanged)
+        for category in ('zone', 'service', 'ipset'):
+            for change in ('added', 'updated', 'removed', 'renamed'):
+                self.router.subscribe('config-%s-%s' % (category, change), self._onConfigChanged)
+        self.router.subscribe('config-files-changed', self._onConfigFilesChanged)
+
+    # ------------------------------------------------------------------
+    # connection
+    # ------------------------------------------------------------------
+
+    def connect(self, fw=None, exception_handler=None, headless=False):
+        '''Connect to firewalld, or use the given client, and route its
+        signals. Returns the client.
+
+        A headless connection is tried once, D-Bus errors are raised and no
+        signal is routed, since nobody dispatches the events.'''
+        if fw is None:
+            from firewall import client
+            if headless:
+                fw = client.FirewallClient()
+            else:
+                fw = client.FirewallClient(wait=1)
+                fw.setNotAuthorizedLoop(True)
+        if exception_handler is not None:
+            self._exception_handler = exception_handler
+            fw.setExceptionHandler(self._onClientException)
+        self.fw = fw
+        if self.journal is not None:
+            import manafirewall.journal as journal
+            self.fw = journal.JournalClient(self.fw, self.journal)
+        if self.profiler is not None:
+            self.fw = profiling.AccountingClient(self.fw, self.profiler)
+        if headless:
+            return self.fw
+
+        for signal, callback in (
+                ("connection-changed", self.fwConnectionChanged),
+                ("panic-mode-enabled", self.panic_mode_enabled_cb),
+                ("panic-mode-disabled", self.panic_mode_disabled_cb),
+                ("default-zone-changed", self.default_zone_changed_cb),
+                ("service-added", self.service_added_cb),
+                ("service-removed", self.service_removed_cb),
+                ("port-added", self.port_added_cb),
+                ("port-removed", self.port_removed_cb),
+                ("protocol-added", self.protocol_added_cb),
+                ("protocol-removed", self.protocol_removed_cb),
+                ("source-port-added", self.source_port_added_cb),
+                ("source-port-removed", self.source_port_removed_cb),
+                ("masquerade-added", self.masquerade_added_cb),
+                ("masquerade-removed", self.masquerade_removed_cb),
+                ("forward-port-added", self.forward_port_added_cb),
+                ("forward-port-removed", self.forward_port_removed_cb),
+                ("icmp-block-added", self.icmp_added_cb),
+                ("icmp-block-removed", self.icmp_removed_cb),
+                ("icmp-block-inversion-added", self.icmp_inversion_added_cb),
+                ("icmp-block-inversion-removed", self.icmp_inversion_removed_cb),
+                ("config:zone-added", self.conf_zone_added_cb),
+                ("config:zone-updated", self.conf_zone_updated_cb),
+                ("config:zone-removed", self.conf_zone_removed_cb),
+                ("config:zone-renamed", self.conf_zone_renamed_cb),
+                ("config:service-added", self.conf_service_added_cb),
+                ("config:service-updated", self.conf_service_updated_cb),
+                ("config:service-removed", self.conf_service_removed_cb),
+                ("config:service-renamed", self.conf_service_renamed_cb),
+                ("config:ipset-added", self.conf_ipset_added_cb),
+                ("config:ipset-updated", self.conf_ipset_updated_cb),
+                ("config:ipset-removed", self.conf_ipset_removed_cb),
+                ("config:ipset-renamed", self.conf_ipset_renamed_cb),
+                ("ipset-entry-added", self.ipset_entry_added_cb),
+                ("ipset-entry-removed", self.ipset_entry_removed_cb),
+                ("log-denied-changed", self.log_denied_changed_cb),
+                ("interface-added", self.interface_added_cb),
+                ("interface-removed", self.interface_removed_cb),
+                ("zone-of-interface-changed", self.zone_of_interface_changed_cb),
+                ("source-added", self.source_added_cb),
+                ("source-removed", self.source_removed_cb),
+                ("zone-of-source-changed", self.zone_of_source_changed_cb),
+                ("reloaded", self.reload_cb)):
+            if self.recorder is not None:
+                callback = self.recorder.wrap(signal, callback)
+            if self.journal is not None:
+                callback = self.journal.wrap(signal, callback)
+            fw.connect(signal, callback)
+        return self.fw
+
+    def startConnect(self, exception_handler=None):
+        '''Connect to firewalld in a background thread, see connect(): the
+        D-Bus connection and the client set up do not hold the caller, the
+        'connection-changed' event follows as usual. Returns the thread.'''
+        def run():
+            try:
+                self.connect(exception_handler=exception_handler)
+            except Exception as e:
+                logger.error("Cannot connect to firewalld: %s", e)
+        thread = threading.Thread(target=run, name='manafirewall-connect', daemon=True)
+        thread.start()
+        return thread
+
+    def connectOffline(self, root, headless=False):
+        '''Use the firewalld configuration files under root instead of a
+        running firewalld, see offline.OfflineClient. Returns the client.'''
+        import manafirewall.offline as offline
+        fw = self.connect(fw=offline.OfflineClient(root), headless=headless)
+        if not headless:
+            self.fwConnectionChanged()
+        return fw
+
+    def _onClientException(self, message):
+        self._callErrors.count = getattr(self._callErrors, 'count', 0) + 1
+        self._exception_handler(message)
+
+    def _clientCall(self, method, *args):
+        '''Call a client method, returns True if it succeeded. Failures are
+        raised, or with an exception handler set only reported to it.'''
+        errors = getattr(self._callErrors, 'count', 0)
+        getattr(self.fw, method)(*args)
+        return getattr(self._callErrors, 'count', 0) == errors
+
+    @property
+    def connected(self):
+        return self.fw is not None and self.fw.connected
+
+    @property
+    def offline(self):
+        '''True if working on configuration files, without firewalld.'''
+        return getattr(self.fw, 'offline', False)
+
+    def authorizeAll(self):
+        self.fw.authorizeAll()
+
+    def globalState(self):
+        '''Returns default zone, log denied, automatic helpers and panic
+        mode as a dictionary.'''
+        return {key: getattr(self.fw, getter)() for key, getter in GLOBAL_STATE}
+
+    def startStatusQueries(self, authorize=True):
+        '''
+        Authorize (if authorize) and read the global state in background
+        threads, all concurrently. Every value is posted as a 'status' event
+        {key: value} as soon as it is read, keyed by its GLOBAL_STATE key; a
+        failed read is logged and posted as {key: None}.
+        '''
+        fw = self.fw
+
+        def query(key, getter):
+            try:
+                value = getattr(fw, getter)()
+            except Exception as e:
+                logger.warning("Cannot read %s: %s", key, e)
+                value = None
+            self.router.post('status', {key: value}, key)
+
+        def authorizeAll():
+            try:
+                fw.authorizeAll()
+            except Exception as e:
+                logger.warning("Authorization failed: %s", e)
+
+        pool = concurrent.futures.ThreadPoolExecutor(len(GLOBAL_STATE) + 1,
+                                                     thread_name_prefix='manafirewall-status')
+        if authorize:
+            pool.submit(authorizeAll)
+        for key, getter in GLOBAL_STATE:
+            pool.submit(query, key, getter)
+        # workers exit once the calls are done, nobody waits for them
+        pool.shutdown(wait=False)
+
+    def _onCacheInvalidated(self, event, value):
+        self._activeZonesValid = False
+        self._objects.clear()
+
+    def cacheSizes(self):
+        '''Number of cached entries, for diagnostics (see memwatch).'''
+        return {
+            'objects':      len(self._objects),
+            'active_zones': len(self.active_zones),
+        }
+
+    def _forget(self, category, runtime, name=None):
+        '''Drop a cached object snapshot, or all of the category and view if
+        name is None.'''
+        if name is not None:
+            self._objects.pop((category, runtime, name), None)
+            return
+        for key in [k for k in self._objects if k[0] == category and k[1] == runtime]:
+            del self._objects[key]
+
+    def _onRuntimeZoneChanged(self, event, value):
+        self._forget('zones', True, value['zone'] if isinstance(value, dict) else value)
+
+    def _onRuntimeBindingChanged(self, event, value):
+        # the zone the binding moved from is not known
+        self._forget('zones', True)
+
+    def _onRuntimeIPSetChanged(self, event, value):
+        self._forget('ipsets', True, value['ipset'])
+
+    def _onConfigChanged(self, event, name):
+        category = event.split('-')[1] + 's'
+        if event.endswith('-renamed'):
+            # only the new name is given
+            self._forget(category, False)
+        else:
+            self._forget(category, False, name)
+
+    def _onConfigFilesChanged(self, event, changed):
+        # edited on disk (see configwatch): offline the permanent objects are
+        # read again; firewalld keeps serving the configuration it loaded,
+        # runtime and permanent, until it is reloaded
+        if not self.offline:
+            return
+        for category, names in changed.items():
+            for name in names:
+                self._forget(category, False, name)
+
+    # ------------------------------------------------------------------
+    # firewalld signals (GLib thread)
+    # ------------------------------------------------------------------
+
+    def fwConnectionChanged(self):
+        '''
+        connection changed
+        '''
+        if self.fw.connected:
+            self.router.post("connection-changed", True, force=True)
+            logger.info("Firewalld connected")
+        else:
+            self.router.post("connection-changed", False, force=True)
+            logger.info("Firewalld disconnected")
+
+    def panic_mode_enabled_cb(self):
+        self.router.post("panicmode-changed", True)
+
+    def panic_mode_disabled_cb(self):
+        self.router.post("panicmode-changed", False)
+
+    def default_zone_changed_cb(self, zone):
+        self.router.post("default-zone-changed", zone)
+
+    def conf_zone_added_cb(self, zone):
+        self.router.post("config-zone-added", zone, zone)
+
+    def conf_zone_updated_cb(self, zone):
+        self.router.post("config-zone-updated", zone, zone)
+
+    def conf_zone_removed_cb(self, zone):
+        self.router.post("config-zone-removed", zone, zone)
+
+    def conf_zone_renamed_cb(self, zone):
+        self.router.post("config-zone-renamed", zone, zone)
+
+    def conf_service_added_cb(self, service):
+        self.router.post("config-service-added", service, service)
+
+    def conf_service_updated_cb(self, service):
+        self.router.post("config-service-updated", service, service)
+
+    def conf_service_removed_cb(self, service):
+        self.router.post("config-service-removed", service, service)
+
+    def conf_service_renamed_cb(self, service):
+        self.router.post("config-service-renamed", service, service)
+
+    def conf_ipset_added_cb(self, ipset):
+        self.router.post("config-ipset-added", ipset, ipset)
+
+    def conf_ipset_updated_cb(self, ipset):
+        self.router.post("config-ipset-updated", ipset, ipset)
+
+    def conf_ipset_removed_cb(self, ipset):
+        self.router.post("config-ipset-removed", ipset, ipset)
+
+    def conf_ipset_renamed_cb(self, ipset):
+        self.router.post("config-ipset-renamed", ipset, ipset)
+
+    def ipset_entry_added_cb(self, ipset, entry):
+        self.router.post("ipset-entry-added", {'ipset': ipset, 'entry': entry}, ipset)
+
+    def ipset_entry_removed_cb(self, ipset, entry):
+        self.router.post("ipset-entry-removed", {'ipset': ipset, 'entry': entry}, ipset)
+
+    def service_added_cb(self, zone, service, timeout):
+        self.router.post("service-added", {'zone': zone, 'service': service}, zone)
+
+    def service_removed_cb(self, zone, service):
+        self.router.post("service-removed", {'zone': zone, 'service': service}, zone)
+
+    def port_added_cb(self, zone, port, protocol, timeout):
+        self.router.post("port-added", {'zone': zone, 'port': port, 'protocol': protocol}, zone)
+
+    def port_removed_cb(self, zone, port, protocol):
+        self.router.post("port-removed", {'zone': zone, 'port': port, 'protocol': protocol}, zone)
+
+    def protocol_added_cb(self, zone, protocol, timeout):
+        self.router.post("protocol-added", {'zone': zone, 'protocol': protocol}, zone)
+
+    def protocol_removed_cb(self, zone, protocol):
+        self.router.post("protocol-removed", {'zone': zone, 'protocol': protocol}, zone)
+
+    def source_port_added_cb(self, zone, port, protocol, timeout):
+        self.router.post("source-port-added", {'zone': zone, 'port': port, 'protocol': protocol}, zone)
+
+    def source_port_removed_cb(self, zone, port, protocol):
+        self.router.post("source-port-removed", {'zone': zone, 'port': port, 'protocol': protocol}, zone)
+
+    def masquerade_added_cb(self, zone, timeout):
+        self.router.post("masquerade-added", zone, zone)
+
+    def masquerade_removed_cb(self, zone):
+        self.router.post("masquerade-removed", zone, zone)
+
+    def forward_port_added_cb(self, zone, port, protocol, to_port, to_address, timeout):
+        self.router.post("forward-port-added", {'zone': zone, 'to_port': to_port, 'protocol': protocol,
+                                                'to_address': to_address}, zone)
+
+    def forward_port_removed_cb(self, zone, port, protocol, to_port, to_address):
+        self.router.post("forward-port-removed", {'zone': zone, 'to_port': to_port, 'protocol': protocol,
+                                                  'to_address': to_address}, zone)
+
+    def icmp_added_cb(self, zone, icmp, timeout):
+        self.router.post("icmp-changed", {'zone': zone, 'icmp': icmp, 'added': True}, zone)
+
+    def icmp_removed_cb(self, zone, icmp):
+        self.router.post("icmp-changed", {'zone': zone, 'icmp': icmp, 'added': False}, zone)
+
+    def icmp_inversion_added_cb(self, zone):
+        self.router.post("icmp-inversion", {'zone': zone, 'inversion': True}, zone)
+
+    def icmp_inversion_removed_cb(self, zone):
+        self.router.post("icmp-inversion", {'zone': zone, 'inversion': False}, zone)
+
+    def log_denied_changed_cb(self, value):
+        self.router.post("log-denied-changed", value)
+
+    def interface_added_cb(self, zone, interface):
+        self.router.post("interface-added", {'zone': zone, 'interface': interface}, zone)
+
+    def interface_removed_cb(self, zone, interface):
+        self.router.post("interface-removed", {'zone': zone, 'interface': interface}, zone)
+
+    def zone_of_interface_changed_cb(self, zone, interface):
+        # the interface moved to zone, the old zone is not given
+        self.router.post("zone-of-interface-changed", {'zone': zone, 'interface': interface}, zone)
+
+    def source_added_cb(self, zone, source):
+        self.router.post("source-added", {'zone': zone, 'source': source}, zone)
+
+    def source_removed_cb(self, zone, source):
+        self.router.post("source-removed", {'zone': zone, 'source': source}, zone)
+
+    def zone_of_source_changed_cb(self, zone, source):
+        self.router.post("zone-of-source-changed", {'zone': zone, 'source': source}, zone)
+
+    def reload_cb(self):
+        '''
+        firewalld reloaded, emitted after all config signals of the burst.
+        Raises the reload barrier discarding the burst already queued, so
+        that neither it nor late callbacks reach the views, then queues the
+        reloaded event that triggers the snapshot rebuild.
+        '''
+        if self._reload_started is None:
+            # daemon-triggered reload (firewall-cmd --reload), not started
+            # by reload()
+            self._reload_started = time.monotonic()
+        self.router.raiseBarrier(discard=True)
+        self.router.post("reloaded", True, force=True)
+
+    # ------------------------------------------------------------------
+    # reload
+    # ------------------------------------------------------------------
+
+    def reloadFailed(self):
+        '''The reload did not happen: accept the firewalld events again.'''
+        self._reload_started = None
+        self.router.lowerBarrier()
+
+    def reload(self):
+        '''Reload firewalld, returns False if the call failed. The barrier
+        is raised before the call, so that the signals of the burst posted
+        meanwhile are dropped; a failed call brings no 'reloaded' event,
+        the barrier is lowered again.'''
+        return self._reloadingCall('reload')
+
+    def _reloadingCall(self, method, *args):
+        self._reload_started = time.monotonic()
+        self.router.raiseBarrier()
+        try:
+            done = self._clientCall(method, *args)
+        except Exception:
+            self.reloadFailed()
+            raise
+        if not done:
+            self.reloadFailed()
+            return False
+        return True
+
+    def runtimeToPermanent(self):
+        self.fw.runtimeToPermanent()
+
+    def startReloadSnapshot(self):
+        '''Build the post-reload snapshot in a background thread.'''
+        threading.Thread(target=self.buildReloadSnapshot, daemon=True).start()
+
+    def buildReloadSnapshot(self):
+        '''
+        reads runtime and permanent views after a reload and queues them as
+        a single 'reload-snapshot' event
+        '''
+        # lower the barrier before reading, so that changes arriving while
+        # the snapshot is built are queued and not lost
+        self.router.lowerBarrier()
+        snapshot = None
+        try:
+            snapshot = self.viewState()
+        except Exception as e:
+            logger.warning("Cannot build reload snapshot: %s", e)
+        self.router.post("reload-snapshot", snapshot, force=True)
+
+    def viewState(self):
+        '''
+        object names of both views, active zones and global options, as
+        used by the reload snapshot (and the warm start cache)
+        '''
+        fw_config = self.fw.config()
+        state = {
+            'runtime': {
+                'zones':    self.fw.getZones(),
+                'services': self.fw.listServices(),
+                'ipsets':   self.fw.getIPSets(),
+            },
+            'permanent': {
+                'zones':    fw_config.getZoneNames(),
+                'services': fw_config.getServiceNames(),
+                'ipsets':   fw_config.getIPSetNames(),
+            },
+            'active_zones': self.fw.getActiveZones(),
+        }
+        state.update(self.globalState())
+        return state
+
+    def reloadCompleted(self):
+        '''The reload has been rendered, returns the time it took from the
+        reload request, or None if unknown.'''
+        if self._reload_started is None:
+            return None
+        elapsed = time.monotonic() - self._reload_started
+        self._reload_started = None
+        return elapsed
+
+    # ------------------------------------------------------------------
+    # reads
+    # ------------------------------------------------------------------
+
+    def _snapshotView(self, runtime):
+        if self.snapshot is None:
+            return None
+        return self.snapshot['runtime' if runtime else 'permanent']
+
+    def zoneNames(self, runtime):
+        view = self._snapshotView(runtime)
+        if view is not None:
+            return view['zones']
+        if runtime:
+            return self.fw.getZones()
+        return self.fw.config().getZoneNames()
+
+    def serviceNames(self, runtime):
+        view = self._snapshotView(runtime)
+        if view is not None:
+            return view['services']
+        if runtime:
+            return self.fw.listServices()
+        return self.fw.config().getServiceNames()
+
+    def ipsetNames(self, runtime):
+        view = self._snapshotView(runtime)
+        if view is not None:
+            return view['ipsets']
+        if runtime:
+            return self.fw.getIPSets()
+        return self.fw.config().getIPSetNames()
+
+    def names(self, category, runtime):
+        '''Returns the object names of any category, bypassing the reload
+        snapshot.'''
+        runtime_names, _settings, config_names, _get, _add = CATEGORY_API[category]
+        if runtime:
+            return getattr(self.fw, runtime_names)()
+        return getattr(self.fw.config(), config_names)()
+
+    def icmpTypeNames(self, runtime):
+        return self.names('icmptypes', runtime)
+
+    def ipsetTypes(self):
+        return self.fw.get_property("IPSetTypes")
+
+    def activeZones(self):
+        '''
+        returns active zones (runtime bindings), kept up to date by the
+        interface and source signals once read
+        '''
+        if self.snapshot is not None:
+            self.active_zones = self.snapshot['active_zones']
+            self._activeZonesValid = True
+        elif not self._activeZonesValid:
+            self.active_zones = self.fw.getActiveZones()
+            self._activeZonesValid = True
+        return self.active_zones
+
+    def defaultZone(self):
+        if self.snapshot is not None:
+            return self.snapshot['default_zone']
+        return self.fw.getDefaultZone()
+
+    def _readSettings(self, category, name, runtime):
+        if self.offline:
+            # snapshots have the settings getters, no conversion needed
+            return self.fw.store.read(category, name)
+        if runtime:
+            return getattr(self.fw, CATEGORY_API[category][1])(name)
+        return self._config(category, name).getSettings()
+
+    def _config(self, category, name):
+        return getattr(self.fw.config(), CATEGORY_API[category][3])(name)
+
+    def _object(self, category, name, runtime):
+        key = (category, runtime, name)
+        obj = self._objects.get(key)
+        if obj is None:
+            try:
+                settings = self._readSettings(category, name, runtime)
+            except Exception:
+                return None
+            obj = snapshot.CLASSES[category].fromSettings(name, settings)
+            self._objects[key] = obj
+        return obj
+
+    def objectSettings(self, category, name, runtime):
+        '''Returns the snapshot of any object, None if it cannot be read.'''
+        return self._object(category, name, runtime)
+
+    def zoneSettings(self, zone, runtime):
+        '''Returns the zone ZoneSnapshot, None if it cannot be read.'''
+        return self._object('zones', zone, runtime)
+
+    def serviceSettings(self, service, runtime):
+        '''Returns the service ServiceSnapshot, None if it cannot be read.'''
+        return self._object('services', service, runtime)
+
+    def ipsetSettings(self, ipset, runtime):
+        '''Returns the IP set IPSetSnapshot, None if it cannot be read.'''
+        return self._object('ipsets', ipset, runtime)
+
+    def readObjects(self, wanted, runtime):
+        '''
+        Returns {category: {name: snapshot}} for wanted, a mapping category
+        -> names. Cached objects are reused, the others are read
+        concurrently: a D-Bus call costs mostly its round trip, so
+        READ_WORKERS calls overlap. Read errors are raised.
+        '''
+        missing = [(c, n) for c, names in wanted.items() for n in names
+                   if (c, runtime, n) not in self._objects]
+
+        def read(key):
+            category, name = key
+            return snapshot.CLASSES[category].fromSettings(
+                name, self._readSettings(category, name, runtime))
+
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(READ_WORKERS) as pool:
+                # cache updates stay in the calling thread
+                for (category, name), obj in zip(missing, pool.map(read, missing)):
+                    self._objects[(category, runtime, name)] = obj
+        return {c: {n: self._objects[(c, runtime, n)] for n in names}
+                for c, names in wanted.items()}
+
+    def configSnapshot(self, runtime, categories=snapshot.ConfigSnapshot.CATEGORIES):
+        '''Returns the whole view as a ConfigSnapshot, see readObjects().'''
+        with concurrent.futures.ThreadPoolExecutor(READ_WORKERS) as pool:
+            names = pool.map(lambda c: self.names(c, runtime), categories)
+            wanted = dict(zip(categories, names))
+        return snapshot.ConfigSnapshot(**self.readObjects(wanted, runtime))
+
+    def ipsetEntries(self, ipset, runtime):
+        '''Returns the entries of the given IP set as a set.'''
+        obj = self.ipsetSettings(ipset, runtime)
+        return set(obj.entries) if obj is not None else set()
+
+    def richRules(self, zone, runtime):
+        obj = self.zoneSettings(zone, runtime)
+        return obj.getRichRules() if obj is not None else []
+
+    # ------------------------------------------------------------------
+    # binding cache
+    # ------------------------------------------------------------------
+
+    def applyBindingEvent(self, event, value):
+        '''
+        patch the cached active zones with an interface or source binding
+        event. Returns the set of touched zones, None if nothing is cached
+        yet (the next activeZones() reads the bindings anyway).
+        '''
+        if not self._activeZonesValid:
+            return None
+        zone = value['zone']
+        if 'interface' in value:
+            kind, name = 'interfaces', value['interface']
+        else:
+            kind, name = 'sources', value['source']
+
+        touched = {zone}
+        if event.endswith('-removed'):
+            bindings = self.active_zones.get(zone, {}).get(kind, [])
+            if name in bindings:
+                bindings.remove(name)
+        else:
+            # an interface or a source is bound to one zone only
+            for z, zone_data in self.active_zones.items():
+                bindings = zone_data.get(kind, [])
+                if z != zone and name in bindings:
+                    bindings.remove(name)
+                    touched.add(z)
+            zone_data = self.active_zones.setdefault(zone, {})
+            bindings = zone_data.setdefault(kind, [])
+            if name not in bindings:
+                bindings.append(name)
+        # zones without bindings are not active
+        for z in touched:
+            zone_data = self.active_zones.get(z)
+            if zone_data is not None and not zone_data.get('interfaces') and not zone_data.get('sources'):
+                del self.active_zones[z]
+        return touched
+
+    # ------------------------------------------------------------------
+    # permanent configuration objects
+    # ------------------------------------------------------------------
+
+    # config objects are taken to be changed, their cached snapshots are
+    # dropped at once instead of waiting for the config signal
+
+    def zoneConfig(self, zone):
+        self._forget('zones', False, zone)
+        return self._config('zones', zone)
+
+    def serviceConfig(self, service):
+        self._forget('services', False, service)
+        return self._config('services', service)
+
+    def ipsetConfig(self, ipset):
+        self._forget('ipsets', False, ipset)
+        return self._config('ipsets', ipset)
+
+    def addZone(self, zone, settings):
+        self.fw.config().addZone(zone, settings)
+
+    def addService(self, service, settings):
+        self.fw.config().addService(service, settings)
+
+    def addIPSet(self, ipset, settings):
+        self.fw.config().addIPSet(ipset, settings)
+
+    def newSettings(self, category):
+        '''Returns an empty firewalld settings object for the category.'''
+        from firewall import client
+        return {'zones':     client.FirewallClientZoneSettings,
+                'services':  client.FirewallClientServiceSettings,
+                'ipsets':    client.FirewallClientIPSetSettings,
+                'icmptypes': client.FirewallClientIcmpTypeSettings,
+                'helpers':   client.FirewallClientHelperSettings}[category]()
+
+    def updateObject(self, category, obj, create=False):
+        '''
+        write a whole permanent object snapshot with a single update (or
+        add) call
+        '''
+        self._forget(category, False, obj.name)
+        if create:
+            settings = obj.toSettings(self.newSettings(category))
+            getattr(self.fw.config(), CATEGORY_API[category][4])(obj.name, settings)
+            return
+        config = self._config(category, obj.name)
+        config.update(obj.toSettings(config.getSettings()))
+
+    def removeObject(self, category, name):
+        '''Remove a permanent object.'''
+        self._forget(category, False, name)
+        self._config(category, name).remove()
+
+    def setDefaultZone(self, zone):
+        self.fw.setDefaultZone(zone)
+
+    def setLogDenied(self, value):
+        '''firewalld reloads to apply it, see reload(). Returns False if the
+        call failed.'''
+        return self._reloadingCall('setLogDenied', value)
+
+    def setAutomaticHelpers(self, value):
+        self.fw.setAutomaticHelpers(value)
+
+    def setIPSetEntries(self, ipset, entries):
+        '''Replace the runtime entries of an IP set with a single call.'''
+        self._forget('ipsets', True, ipset)
+        self.fw.setEntries(ipset, list(entries))
+
+    # ------------------------------------------------------------------
+    # mutations
+    # ------------------------------------------------------------------
+
+    def _zoneCall(self, runtime, action, zone, element, args):
+        if element not in ZONE_ELEMENTS:
+            raise ValueError("Unknown zone element %s" % element)
+        if action != 'query':
+            self._forget('zones', runtime, zone)
+        if runtime:
+            return getattr(self.fw, action + element)(zone, *args)
+        return getattr(self.zoneConfig(zone), action + element)(*args)
+
+    def queryZoneElement(self, runtime, zone, element, *args):
+        return self._zoneCall(runtime, 'query', zone, element, args)
+
+    def addZoneElement(self, runtime, zone, element, *args):
+        return self._zoneCall(runtime, 'add', zone, element, args)
+
+    def removeZoneElement(self, runtime, zone, element, *args):
+        return self._zoneCall(runtime, 'remove', zone, element, args)
+
+    def setZoneElement(self, runtime, zone, element, enabled, *args):
+        '''Add or remove a zone element, only if needed.'''
+        if self.queryZoneElement(runtime, zone, element, *args) != enabled:
+            self._zoneCall(runtime, 'add' if enabled else 'remove', zone, element, args)
+
+    def replaceZoneElement(self, runtime, zone, element, old, new):
+        '''
+        add the element with the new arguments and remove the old one (old
+        None to just add it). Nothing is done if the new one exists already.
+        Returns True if something changed.
+        '''
+        if self.queryZoneElement(runtime, zone, element, *new):
+            return False
+        self._forget('zones', runtime, zone)
+        if runtime:
+            # add first, so that the runtime configuration never misses both
+            getattr(self.fw, 'add' + element)(zone, *new)
+            if old is not None:
+                getattr(self.fw, 'remove' + element)(zone, *old)
+        else:
+            config = self.zoneConfig(zone)
+            if old is not None:
+                getattr(config, 'remove' + element)(*old)
+            getattr(config, 'add' + element)(*new)
+        return True
+
+    def removeServiceElement(self, service, element, *args):
+        if element not in SERVICE_ELEMENTS:
+            raise ValueError("Unknown service element %s" % element)
+        getattr(self.serviceConfig(service), 'remove' + element)(*args)
+
+    def replaceServiceElement(self, service, element, old, new):
+        '''
+        permanent service counterpart of replaceZoneElement()
+        '''
+        if element not in SERVICE_ELEMENTS:
+            raise ValueError("Unknown service element %s" % element)
+        config = self.serviceConfig(service)
+        if getattr(config, 'query' + element)(*new):
+            return False
+        if old is not None:
+            getattr(config, 'remove' + element)(*old)
+        getattr(config, 'add' + element)(*new)
+        return True
+
+    def replaceIPSetEntry(self, runtime, ipset, old, new):
+        '''
+        add the new entry and remove the old one (old None to just add it).
+        Returns True if something changed.
+        '''
+        self._forget('ipsets', runtime, ipset)
+        if runtime:
+            if self.fw.queryEntry(ipset, new):
+                return False
+            self.fw.addEntry(ipset, new)
+            if old is not None:
+                self.fw.removeEntry(ipset, old)
+        else:
+            config = self.ipsetConfig(ipset)
+            if config.queryEntry(new):
+                return False
+            if old is not None:
+                config.removeEntry(old)
+            config.addEntry(new)
+        return True
+
+    def removeIPSetEntry(self, runtime, ipset, entry):
+        self._forget('ipsets', runtime, ipset)
+        if runtime:
+            if self.fw.queryEntry(ipset, entry):
+                self.fw.removeEntry(ipset, entry)
+        else:
+            self.ipsetConfig(ipset).removeEntry(entry)
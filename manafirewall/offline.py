@@ -0,0 +1,891 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+offline — firewalld configuration read and written as XML files, without
+a running firewalld.
+
+OfflineClient stands in for firewall.client.FirewallClient, exposing the
+part of its API the model and the dialogs use:
+
+ - the permanent configuration (config(), config objects with getSettings,
+   update, add/remove/query of elements, rename, remove, loadDefaults) is
+   kept in the XML files of the configuration directories;
+ - the runtime reads return the permanent configuration, as firewalld
+   would load it, and runtime changes raise OfflineError;
+ - the config signals are emitted by the client after each write, so views
+   are updated as with firewalld.
+
+Configuration directories are looked up under a root: ROOT/etc/firewalld
+(user configuration, written) and ROOT/usr/lib/firewalld (shipped
+defaults, read only), or ROOT itself if it is a configuration directory.
+
+Opening a tree only lists the directories. Each file is parsed on first
+use, the result is cached by file mtime and size; rich rules are converted
+with firewall.core.rich only then. The active bindings only look at the
+<interface> and <source> elements of the zones not read yet.
+
+Object names are checked (validName) before a path is built from them.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import manafirewall.snapshot as snapshot
+
+logger = logging.getLogger('manafirewall.offline')
+
+# category -> (directory, XML root tag, signal name part)
+CATEGORIES = {
+    'zones':     ('zones',     'zone',     'zone'),
+    'services':  ('services',  'service',  'service'),
+    'ipsets':    ('ipsets',    'ipset',    'ipset'),
+    'icmptypes': ('icmptypes', 'icmptype', 'icmptype'),
+    'helpers':   ('helpers',   'helper',   'helper'),
+}
+
+# firewalld.conf keys of the global options, and their defaults
+GLOBAL_KEYS = {
+    'default_zone':      ('DefaultZone',      'public'),
+    'log_denied':        ('LogDenied',        'off'),
+    'automatic_helpers': ('AutomaticHelpers', 'no'),
+}
+
+# zone target meaning "default", both spellings used by firewalld
+DEFAULT_TARGETS = ('default', '{chain}_{zone}')
+
+# used if firewall.core.ipset cannot be imported
+IPSET_TYPES = ['hash:ip', 'hash:ip,mark', 'hash:ip,port', 'hash:ip,port,ip',
+               'hash:ip,port,net', 'hash:mac', 'hash:net', 'hash:net,iface',
+               'hash:net,net', 'hash:net,port', 'hash:net,port,net']
+
+MAC_RE = re.compile(r'^([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$')
+
+# longest zone name firewalld accepts, as in firewall.functions.max_zone_name_len
+MAX_ZONE_NAME_LEN = 17
+
+
+class OfflineError(Exception):
+    '''The offline configuration cannot do what was asked.'''
+
+
+def validName(category, name):
+    '''Whether name can be the name of an object file: names come from
+    desired-state and history files too, they must not reach another
+    directory.'''
+    if not isinstance(name, str) or not name or name.startswith('.'):
+        return False
+    if '/' in name or '\\' in name or '\0' in name or any(c.isspace() for c in name):
+        return False
+    return category != 'zones' or len(name) <= MAX_ZONE_NAME_LEN
+
+
+def checkName(category, name):
+    '''Raises OfflineError if name is not valid, see validName.'''
+    if not validName(category, name):
+        raise OfflineError("INVALID_NAME: %r" % (name,))
+
+
+def configDirs(root):
+    '''Returns the (user, defaults) configuration directories of a root,
+    defaults None if missing.'''
+    etc_dir = os.path.join(root, 'etc', 'firewalld')
+    usr_dir = os.path.join(root, 'usr', 'lib', 'firewalld')
+    if os.path.isdir(etc_dir) or os.path.isdir(usr_dir):
+        return etc_dir, usr_dir if os.path.isdir(usr_dir) else None
+    if os.path.isdir(os.path.join(root, 'zones')):
+        return root, None
+    raise OfflineError("%s does not contain a firewalld configuration" % root)
+
+
+# ----------------------------------------------------------------------
+# XML <-> snapshot fields
+# ----------------------------------------------------------------------
+
+def _text(root, tag):
+    elem = root.find(tag)
+    return (elem.text or '').strip() if elem is not None else ''
+
+
+def _ports(root, tag):
+    return [(e.get('port', ''), e.get('protocol', '')) for e in root.findall(tag)]
+
+
+def _priority(root, key):
+    # the older "priority" attribute sets both
+    try:
+        return int(root.get(key) or root.get('priority') or 0)
+    except ValueError:
+        return 0
+
+
+def _zoneSource(elem):
+    if elem.get('ipset'):
+        return 'ipset:' + elem.get('ipset')
+    return elem.get('address') or elem.get('mac') or ''
+
+
+def _richRule(elem):
+    '''The rich rule string of a <rule> element.'''
+    from firewall.core import rich
+
+    def limit(e):
+        child = e.find('limit')
+        if child is None:
+            return None
+        if child.get('burst'):
+            return rich.Rich_Limit(child.get('value'), child.get('burst'))
+        return rich.Rich_Limit(child.get('value'))
+
+    rule = rich.Rich_Rule(family=elem.get('family'),
+                          priority=int(elem.get('priority', 0)))
+    for child in elem:
+        tag = child.tag
+        invert = child.get('invert', '').lower() in ('yes', 'true')
+        if tag == 'source':
+            rule.source = rich.Rich_Source(child.get('address'), child.get('mac'),
+                                           child.get('ipset'), invert=invert)
+        elif tag == 'destination':
+            rule.destination = rich.Rich_Destination(child.get('address'), child.get('ipset'),
+                                                     invert=invert)
+        elif tag == 'service':
+            rule.element = rich.Rich_Service(child.get('name'))
+        elif tag == 'port':
+            rule.element = rich.Rich_Port(child.get('port'), child.get('protocol'))
+        elif tag == 'source-port':
+            rule.element = rich.Rich_SourcePort(child.get('port'), child.get('protocol'))
+        elif tag == 'protocol':
+            rule.element = rich.Rich_Protocol(child.get('value'))
+        elif tag == 'icmp-block':
+            rule.element = rich.Rich_IcmpBlock(child.get('name'))
+        elif tag == 'icmp-type':
+            rule.element = rich.Rich_IcmpType(child.get('name'))
+        elif tag == 'masquerade':
+            rule.element = rich.Rich_Masquerade()
+        elif tag == 'forward-port':
+            rule.element = rich.Rich_ForwardPort(child.get('port'), child.get('protocol'),
+                                                 child.get('to-port', ''), child.get('to-addr', ''))
+        elif tag == 'tcp-mss-clamp':
+            rule.element = rich.Rich_Tcp_Mss_Clamp(child.get('value'))
+        elif tag == 'log':
+            rule.log = rich.Rich_Log(child.get('prefix'), child.get('level'), limit(child))
+        elif tag == 'nflog':
+            rule.log = rich.Rich_NFLog(child.get('group'), child.get('prefix'),
+                                       child.get('queue-size'), limit(child))
+        elif tag == 'audit':
+            rule.audit = rich.Rich_Audit(limit(child))
+        elif tag == 'accept':
+            rule.action = rich.Rich_Accept(limit(child))
+        elif tag == 'reject':
+            rule.action = rich.Rich_Reject(child.get('type'), limit(child))
+        elif tag == 'drop':
+            rule.action = rich.Rich_Drop(limit(child))
+        elif tag == 'mark':
+            rule.action = rich.Rich_Mark(child.get('set'), limit(child))
+        else:
+            raise OfflineError("Unknown rich rule element <%s>" % tag)
+    rule.check()
+    return str(rule)
+
+
+def _richRuleElement(rule_str):
+    '''The <rule> element of a rich rule string.'''
+    from firewall.core import rich
+    rule = rich.Rich_Rule(rule_str=rule_str)
+    elem = ET.Element('rule')
+    if rule.family:
+        elem.set('family', rule.family)
+    if rule.priority:
+        elem.set('priority', str(rule.priority))
+
+    def add(tag, limit=None, **attrs):
+        child = ET.SubElement(elem, tag)
+        for key, value in attrs.items():
+            if value not in (None, '', False):
+                child.set(key.replace('_', '-'), 'True' if value is True else str(value))
+        if limit is not None:
+            sub = ET.SubElement(child, 'limit', value=str(limit.value))
+            if getattr(limit, 'burst', None):
+                sub.set('burst', str(limit.burst))
+        return child
+
+    if rule.source:
+        add('source', address=rule.source.addr, mac=rule.source.mac,
+            ipset=rule.source.ipset, invert=rule.source.invert)
+    if rule.destination:
+        add('destination', address=rule.destination.addr,
+            ipset=getattr(rule.destination, 'ipset', None), invert=rule.destination.invert)
+    e = rule.element
+    if isinstance(e, rich.Rich_Service):
+        add('service', name=e.name)
+    elif isinstance(e, rich.Rich_SourcePort):
+        add('source-port', port=e.port, protocol=e.protocol)
+    elif isinstance(e, rich.Rich_ForwardPort):
+        add('forward-port', port=e.port, protocol=e.protocol, to_port=e.to_port, to_addr=e.to_address)
+    elif isinstance(e, rich.Rich_Port):
+        add('port', port=e.port, protocol=e.protocol)
+    elif isinstance(e, rich.Rich_Protocol):
+        add('protocol', value=e.value)
+    elif isinstance(e, rich.Rich_IcmpBlock):
+        add('icmp-block', name=e.name)
+    elif isinstance(e, rich.Rich_IcmpType):
+        add('icmp-type', name=e.name)
+    elif isinstance(e, rich.Rich_Masquerade):
+        add('masquerade')
+    elif e is not None and type(e).__name__ == 'Rich_Tcp_Mss_Clamp':
+        add('tcp-mss-clamp', value=e.value)
+    if isinstance(rule.log, rich.Rich_NFLog):
+        add('nflog', rule.log.limit, group=rule.log.group, prefix=rule.log.prefix,
+            queue_size=rule.log.threshold)
+    elif rule.log:
+        add('log', rule.log.limit, prefix=rule.log.prefix, level=rule.log.level)
+    if rule.audit:
+        add('audit', rule.audit.limit)
+    a = rule.action
+    if isinstance(a, rich.Rich_Accept):
+        add('accept', a.limit)
+    elif isinstance(a, rich.Rich_Reject):
+        add('reject', a.limit, type=a.type)
+    elif isinstance(a, rich.Rich_Drop):
+        add('drop', a.limit)
+    elif isinstance(a, rich.Rich_Mark):
+        add('mark', a.limit, set=a.set)
+    return elem
+
+
+def _readFields(category, root):
+    '''Snapshot fields of a parsed XML file.'''
+    fields = {
+        'version':     root.get('version', ''),
+        'short':       _text(root, 'short'),
+        'description': _text(root, 'description'),
+    }
+    if category == 'zones':
+        fields.update(
+            target=root.get('target') or 'default',
+            services=[e.get('name') for e in root.findall('service')],
+            ports=_ports(root, 'port'),
+            protocols=[e.get('value') for e in root.findall('protocol')],
+            source_ports=_ports(root, 'source-port'),
+            forward_ports=[(e.get('port', ''), e.get('protocol', ''),
+                            e.get('to-port', ''), e.get('to-addr', ''))
+                           for e in root.findall('forward-port')],
+            icmp_blocks=[e.get('name') for e in root.findall('icmp-block')],
+            icmp_block_inversion=root.find('icmp-block-inversion') is not None,
+            masquerade=root.find('masquerade') is not None,
+            forward=root.find('forward') is not None,
+            ingress_priority=_priority(root, 'ingress-priority'),
+            egress_priority=_priority(root, 'egress-priority'),
+            interfaces=[e.get('name') for e in root.findall('interface')],
+            sources=[_zoneSource(e) for e in root.findall('source')],
+            rich_rules=[_richRule(e) for e in root.findall('rule')])
+    elif category == 'services':
+        destinations = {}
+        for e in root.findall('destination'):
+            destinations.update((k, v) for k, v in e.attrib.items() if k in ('ipv4', 'ipv6'))
+        fields.update(
+            ports=_ports(root, 'port'),
+            protocols=[e.get('value') for e in root.findall('protocol')],
+            source_ports=_ports(root, 'source-port'),
+            modules=[e.get('name') for e in root.findall('module')],
+            destinations=destinations,
+            includes=[e.get('service') for e in root.findall('include')],
+            helpers=[e.get('name') for e in root.findall('helper')])
+    elif category == 'ipsets':
+        fields.update(
+            type=root.get('type', ''),
+            options={e.get('name'): e.get('value', '') for e in root.findall('option')},
+            entries=[(e.text or '').strip() for e in root.findall('entry')])
+    elif category == 'icmptypes':
+        destinations = []
+        for e in root.findall('destination'):
+            destinations.extend(k for k in ('ipv4', 'ipv6')
+                                if e.get(k, '').lower() in ('yes', 'true'))
+        fields.update(destinations=destinations)
+    elif category == 'helpers':
+        fields.update(
+            family=root.get('family', ''),
+            module=root.get('module', ''),
+            ports=_ports(root, 'port'))
+    return fields
+
+
+# elements written from the snapshot, any other one is kept as it is
+MANAGED_TAGS = {
+    'zones':     {'short', 'description', 'service', 'port', 'protocol', 'source-port',
+                  'forward-port', 'icmp-block', 'icmp-block-inversion', 'masquerade',
+                  'forward', 'interface', 'source', 'rule'},
+    'services':  {'short', 'description', 'port', 'protocol', 'source-port', 'module',
+                  'destination', 'include', 'helper'},
+    'ipsets':    {'short', 'description', 'option', 'entry'},
+    'icmptypes': {'short', 'description', 'destination'},
+    'helpers':   {'short', 'description', 'port'},
+}
+
+
+def _writeTree(category, obj, root, rules):
+    '''Update a parsed XML tree (a new one if root is None) from a
+    snapshot. rules maps the rich rules of the original tree to their
+    elements, kept verbatim.'''
+    if root is None:
+        root = ET.Element(CATEGORIES[category][1])
+    kept = [e for e in root if e.tag not in MANAGED_TAGS[category]]
+    for child in list(root):
+        root.remove(child)
+
+    def attr(key, value):
+        if value:
+            root.set(key, value)
+        elif key in root.attrib:
+            del root.attrib[key]
+
+    def sub(tag, text=None, **attrs):
+        elem = ET.SubElement(root, tag, {k.replace('_', '-'): v for k, v in attrs.items()
+                                         if v not in (None, '')})
+        if text is not None:
+            elem.text = text
+        return elem
+
+    attr('version', obj.version)
+    if obj.short:
+        sub('short', obj.short)
+    if obj.description:
+        sub('description', obj.description)
+    if category == 'zones':
+        attr('target', '' if obj.target in DEFAULT_TARGETS else obj.target)
+        # written as the two attributes
+        attr('priority', '')
+        attr('ingress-priority', str(obj.ingress_priority) if obj.ingress_priority else '')
+        attr('egress-priority', str(obj.egress_priority) if obj.egress_priority else '')
+        for name in sorted(obj.interfaces):
+            sub('interface', name=name)
+        for source in sorted(obj.sources):
+            if source.startswith('ipset:'):
+                sub('source', ipset=source[6:])
+            elif MAC_RE.match(source):
+                sub('source', mac=source)
+            else:
+                sub('source', address=source)
+        if obj.icmp_block_inversion:
+            sub('icmp-block-inversion')
+        for name in sorted(obj.services):
+            sub('service', name=name)
+        for port, protocol in sorted(obj.ports):
+            sub('port', port=port, protocol=protocol)
+        for value in sorted(obj.protocols):
+            sub('protocol', value=value)
+        for name in sorted(obj.icmp_blocks):
+            sub('icmp-block', name=name)
+        if obj.forward:
+            sub('forward')
+        if obj.masquerade:
+            sub('masquerade')
+        for port, protocol, to_port, to_addr in sorted(obj.forward_ports):
+            sub('forward-port', port=port, protocol=protocol, to_port=to_port, to_addr=to_addr)
+        for port, protocol in sorted(obj.source_ports):
+            sub('source-port', port=port, protocol=protocol)
+        for rule in sorted(obj.rich_rules):
+            root.append(rules[rule] if rule in rules else _richRuleElement(rule))
+    elif category == 'services':
+        for port, protocol in sorted(obj.ports):
+            sub('port', port=port, protocol=protocol)
+        for value in sorted(obj.protocols):
+            sub('protocol', value=value)
+        for port, protocol in sorted(obj.source_ports):
+            sub('source-port', port=port, protocol=protocol)
+        for name in sorted(obj.modules):
+            sub('module', name=name)
+        if obj.destinations:
+            sub('destination', **dict(obj.destinations))
+        for name in sorted(obj.includes):
+            sub('include', service=name)
+        for name in sorted(obj.helpers):
+            sub('helper', name=name)
+    elif category == 'ipsets':
+        attr('type', obj.type)
+        for name, value in sorted(obj.options):
+            sub('option', name=name, value=value)
+        for entry in sorted(obj.entries):
+            sub('entry', entry)
+    elif category == 'icmptypes':
+        if obj.destinations:
+            sub('destination', **{d: 'yes' for d in obj.destinations})
+    elif category == 'helpers':
+        attr('family', obj.family)
+        attr('module', obj.module)
+        for port, protocol in sorted(obj.ports):
+            sub('port', port=port, protocol=protocol)
+    for elem in kept:
+        root.append(elem)
+    ET.indent(root, space='  ')
+    return root
+
+
+# ----------------------------------------------------------------------
+# files
+# ----------------------------------------------------------------------
+
+class XmlStore:
+    '''Object files of a configuration tree, parsed lazily and cached by
+    mtime and size.'''
+
+    def __init__(self, root):
+        self.root = root
+        self.etc_dir, self.usr_dir = configDirs(root)
+        # path -> (mtime_ns, size, snapshot, tree, rich rule elements)
+        self._cache = {}
+        # zone path -> (mtime_ns, size, interfaces, sources), see bindings()
+        self._bindings = {}
+
+    def _dirs(self, category):
+        directory = CATEGORIES[category][0]
+        dirs = [os.path.join(self.etc_dir, directory)]
+        if self.usr_dir:
+            dirs.append(os.path.join(self.usr_dir, directory))
+        return dirs
+
+    def names(self, category):
+        names = set()
+        for directory in self._dirs(category):
+            try:
+                with os.scandir(directory) as it:
+                    names.update(e.name[:-4] for e in it if e.name.endswith('.xml') and e.is_file()
+                                 and validName(category, e.name[:-4]))
+            except FileNotFoundError:
+                pass
+        return sorted(names)
+
+    def path(self, category, name):
+        '''Path of the file in use, the user one first; None if
+        missing.'''
+        checkName(category, name)
+        for directory in self._dirs(category):
+            path = os.path.join(directory, name + '.xml')
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def userPath(self, category, name):
+        checkName(category, name)
+        return os.path.join(self._dirs(category)[0], name + '.xml')
+
+    def isShipped(self, category, name):
+        checkName(category, name)
+        return self.usr_dir is not None and \
+            os.path.isfile(os.path.join(self._dirs(category)[1], name + '.xml'))
+
+    def _load(self, category, name):
+        path = self.path(category, name)
+        if path is None:
+            raise OfflineError("INVALID_%s: %s" % (CATEGORIES[category][1].upper(), name))
+        st = os.stat(path)
+        entry = self._cache.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry
+        try:
+            tree = ET.parse(path).getroot()
+        except ET.ParseError as e:
+            raise OfflineError("Cannot parse %s: %s" % (path, e))
+        rules = {}
+        fields = _readFields(category, tree)
+        if category == 'zones':
+            rules = dict(zip(fields['rich_rules'], tree.findall('rule')))
+        obj = snapshot.CLASSES[category](name, **fields)
+        entry = (st.st_mtime_ns, st.st_size, obj, tree, rules)
+        self._cache[path] = entry
+        return entry
+
+    def read(self, category, name):
+        '''Returns the object snapshot.'''
+        return self._load(category, name)[2]
+
+    def bindings(self, name):
+        '''Returns the (interfaces, sources) of a zone. Unless the zone was
+        read already, only its <interface> and <source> elements are
+        looked at: no tree is kept and no rich rule converted.'''
+        path = self.path('zones', name)
+        if path is None:
+            raise OfflineError("INVALID_ZONE: %s" % name)
+        st = os.stat(path)
+        for entry in (self._cache.get(path), self._bindings.get(path)):
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                if len(entry) == 5:
+                    return entry[2].interfaces, entry[2].sources
+                return entry[2], entry[3]
+        interfaces, sources = [], []
+        # only the children of <zone>, rich rules have <source> too
+        depth = 0
+        try:
+            for event, elem in ET.iterparse(path, events=('start', 'end')):
+                if event == 'end':
+                    depth -= 1
+                    continue
+                depth += 1
+                if depth != 2:
+                    continue
+                if elem.tag == 'interface':
+                    interfaces.append(elem.get('name'))
+                elif elem.tag == 'source':
+                    sources.append(_zoneSource(elem))
+        except ET.ParseError as e:
+            raise OfflineError("Cannot parse %s: %s" % (path, e))
+        self._bindings[path] = (st.st_mtime_ns, st.st_size, interfaces, sources)
+        return interfaces, sources
+
+    def write(self, category, obj):
+        '''Write an object snapshot into the user directory, keeping the
+        XML elements not represented in snapshots.'''
+        tree, rules = None, {}
+        if self.path(category, obj.name) is not None:
+            _mtime, _size, _obj, tree, rules = self._load(category, obj.name)
+            tree = ET.fromstring(ET.tostring(tree))
+        root = _writeTree(category, obj, tree, rules)
+        path = self.userPath(category, obj.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        ET.ElementTree(root).write(tmp, encoding='utf-8', xml_declaration=True)
+        os.replace(tmp, path)
+        self._cache.pop(path, None)
+
+    def removeUser(self, category, name):
+        path = self.userPath(category, name)
+        os.remove(path)
+        self._cache.pop(path, None)
+
+    def rename(self, category, name, new_name):
+        os.rename(self.userPath(category, name), self.userPath(category, new_name))
+        self._cache.pop(self.userPath(category, name), None)
+
+    # firewalld.conf
+
+    def _confPath(self):
+        return os.path.join(self.etc_dir, 'firewalld.conf')
+
+    def readConf(self):
+        values = {key: default for key, (_conf_key, default) in GLOBAL_KEYS.items()}
+        keys = {conf_key: key for key, (conf_key, _default) in GLOBAL_KEYS.items()}
+        try:
+            with open(self._confPath()) as f:
+                for line in f:
+                    conf_key, sep, value = line.strip().partition('=')
+                    if sep and conf_key in keys:
+                        values[keys[conf_key]] = value.strip()
+        except FileNotFoundError:
+            pass
+        return values
+
+    def writeConf(self, key, value):
+        '''Set one option in firewalld.conf, keeping the other lines.'''
+        conf_key = GLOBAL_KEYS[key][0]
+        path = self._confPath()
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        for i, line in enumerate(lines):
+            if line.strip().partition('=')[0] == conf_key:
+                lines[i] = "%s=%s\n" % (conf_key, value)
+                break
+        else:
+            lines.append("%s=%s\n" % (conf_key, value))
+        os.makedirs(self.etc_dir, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            f.writelines(lines)
+        os.replace(path + '.tmp', path)
+
+
+# ----------------------------------------------------------------------
+# FirewallClient stand-in
+# ----------------------------------------------------------------------
+
+# config object element -> (snapshot attribute, number of arguments, 0 for
+# flags)
+ELEMENTS = {
+    'zones': {
+        'Service':            ('services', 1),
+        'Port':               ('ports', 2),
+        'Protocol':           ('protocols', 1),
+        'SourcePort':         ('source_ports', 2),
+        'ForwardPort':        ('forward_ports', 4),
+        'IcmpBlock':          ('icmp_blocks', 1),
+        'Interface':          ('interfaces', 1),
+        'Source':             ('sources', 1),
+        'RichRule':           ('rich_rules', 1),
+        'Masquerade':         ('masquerade', 0),
+        'IcmpBlockInversion': ('icmp_block_inversion', 0),
+        'Forward':            ('forward', 0),
+    },
+    'services': {
+        'Port':       ('ports', 2),
+        'Protocol':   ('protocols', 1),
+        'SourcePort': ('source_ports', 2),
+        'Module':     ('modules', 1),
+        'Helper':     ('helpers', 1),
+        'Include':    ('includes', 1),
+    },
+    'ipsets': {
+        'Entry': ('entries', 1),
+    },
+}
+
+
+class OfflineConfigObject:
+    '''FirewallClientConfigZone (and friends) counterpart.'''
+
+    def __init__(self, client, category, name):
+        self._client = client
+        self._category = category
+        self._name = name
+
+    @property
+    def _store(self):
+        return self._client.store
+
+    def _snapshot(self):
+        return self._store.read(self._category, self._name)
+
+    def _write(self, obj):
+        self._store.write(self._category, obj)
+        self._client.emit('config:%s-updated' % CATEGORIES[self._category][2], self._name)
+
+    def get_property(self, prop):
+        return self.get_properties()[prop]
+
+    def get_properties(self):
+        path = self._store.path(self._category, self._name)
+        shipped = self._store.isShipped(self._category, self._name)
+        return {
+            'name':     self._name,
+            'filename': self._name + '.xml',
+            'path':     os.path.dirname(path) if path else '',
+            # as firewalld: objects only in the user directory are their own
+            # defaults, shipped ones are builtin
+            'builtin':  shipped,
+            'default':  not shipped,
+        }
+
+    def getSettings(self):
+        return self._snapshot().toSettings(self._client.newSettings(self._category))
+
+    def update(self, settings):
+        self._write(snapshot.CLASSES[self._category].fromSettings(self._name, settings))
+
+    def loadDefaults(self):
+        if not self._store.isShipped(self._category, self._name):
+            raise OfflineError("NO_DEFAULTS: %s" % self._name)
+        try:
+            self._store.removeUser(self._category, self._name)
+        except FileNotFoundError:
+            pass
+        self._client.emit('config:%s-updated' % CATEGORIES[self._category][2], self._name)
+
+    def remove(self):
+        if self._store.isShipped(self._category, self._name):
+            raise OfflineError("BUILTIN_%s: %s" % (CATEGORIES[self._category][1].upper(), self._name))
+        self._store.removeUser(self._category, self._name)
+        self._client.emit('config:%s-removed' % CATEGORIES[self._category][2], self._name)
+
+    def rename(self, name):
+        if self._store.isShipped(self._category, self._name):
+            raise OfflineError("BUILTIN_%s: %s" % (CATEGORIES[self._category][1].upper(), self._name))
+        if self._store.path(self._category, name) is not None:
+            raise OfflineError("NAME_CONFLICT: %s" % name)
+        self._store.rename(self._category, self._name, name)
+        self._name = name
+        self._client.emit('config:%s-renamed' % CATEGORIES[self._category][2], name)
+
+    def getEntries(self):
+        return sorted(self._snapshot().entries)
+
+    def setEntries(self, entries):
+        self._write(self._snapshot().replace(entries=entries))
+
+    def __getattr__(self, method):
+        # {add,remove,query}<Element>(*args) of the firewalld config objects
+        for action in ('add', 'remove', 'query'):
+            element = method[len(action):]
+            if method.startswith(action) and element in ELEMENTS.get(self._category, {}):
+                break
+        else:
+            raise AttributeError(method)
+        attr, nargs = ELEMENTS[self._category][element]
+
+        def call(*args):
+            obj = self._snapshot()
+            if nargs == 0:
+                present = getattr(obj, attr)
+                value = action == 'add'
+            else:
+                value = tuple('' if a is None else str(a) for a in args[:nargs]) if nargs > 1 else args[0]
+                present = value in getattr(obj, attr)
+            if action == 'query':
+                return bool(present)
+            if nargs == 0:
+                if present != value:
+                    self._write(obj.replace(**{attr: value}))
+                return
+            if action == 'add' and present:
+                raise OfflineError("ALREADY_ENABLED: %s" % (value,))
+            if action == 'remove' and not present:
+                raise OfflineError("NOT_ENABLED: %s" % (value,))
+            values = set(getattr(obj, attr))
+            if action == 'add':
+                values.add(value)
+            else:
+                values.discard(value)
+            self._write(obj.replace(**{attr: values}))
+        return call
+
+
+class OfflineConfig:
+    '''FirewallClientConfig counterpart.'''
+
+    # API name part -> category
+    KINDS = {'Zone': 'zones', 'Service': 'services', 'IPSet': 'ipsets',
+             'IcmpType': 'icmptypes', 'Helper': 'helpers'}
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, method):
+        for kind, category in self.KINDS.items():
+            if method == 'get%sNames' % kind:
+                return lambda: self._client.store.names(category)
+            if method == 'get%sByName' % kind:
+                return lambda name: self._object(category, name)
+            if method == 'add%s' % kind:
+                return lambda name, settings: self._add(category, name, settings)
+        raise AttributeError(method)
+
+    def _object(self, category, name):
+        if self._client.store.path(category, name) is None:
+            raise OfflineError("INVALID_%s: %s" % (CATEGORIES[category][1].upper(), name))
+        return OfflineConfigObject(self._client, category, name)
+
+    def _add(self, category, name, settings):
+        if self._client.store.path(category, name) is not None:
+            raise OfflineError("NAME_CONFLICT: %s" % name)
+        self._client.store.write(category, snapshot.CLASSES[category].fromSettings(name, settings))
+        self._client.emit('config:%s-added' % CATEGORIES[category][2], name)
+        return OfflineConfigObject(self._client, category, name)
+
+
+class OfflineClient:
+    '''
+    FirewallClient counterpart over a configuration tree, see the module
+    documentation.
+    '''
+
+    offline = True
+    connected = True
+
+    # runtime reads -> category
+    RUNTIME_NAMES = {'getZones': 'zones', 'listServices': 'services', 'getIPSets': 'ipsets',
+                     'listIcmpTypes': 'icmptypes', 'getHelpers': 'helpers'}
+    RUNTIME_SETTINGS = {'getZoneSettings': 'zones', 'getServiceSettings': 'services',
+                        'getIPSetSettings': 'ipsets', 'getIcmpTypeSettings': 'icmptypes',
+                        'getHelperSettings': 'helpers'}
+
+    def __init__(self, root):
+        self.root = root
+        self.store = XmlStore(root)
+        self._config = OfflineConfig(self)
+        self._callbacks = {}
+
+    # FirewallClient plumbing
+
+    def connect(self, signal, callback):
+        self._callbacks.setdefault(signal, []).append(callback)
+
+    def emit(self, signal, *args):
+        for callback in self._callbacks.get(signal, ()):
+            callback(*args)
+
+    def setExceptionHandler(self, handler):
+        pass
+
+    def setNotAuthorizedLoop(self, enable):
+        pass
+
+    def authorizeAll(self):
+        pass
+
+    def config(self):
+        return self._config
+
+    def newSettings(self, category):
+        from firewall import client
+        return {'zones':     client.FirewallClientZoneSettings,
+                'services':  client.FirewallClientServiceSettings,
+                'ipsets':    client.FirewallClientIPSetSettings,
+                'icmptypes': client.FirewallClientIcmpTypeSettings,
+                'helpers':   client.FirewallClientHelperSettings}[category]()
+
+    def get_property(self, prop):
+        if prop == 'IPSetTypes':
+            try:
+                from firewall.core.ipset import IPSET_TYPES as types
+                return list(types)
+            except ImportError:
+                return list(IPSET_TYPES)
+        raise OfflineError("No property %s offline" % prop)
+
+    # global options, firewalld.conf
+
+    def getDefaultZone(self):
+        return self.store.readConf()['default_zone']
+
+    def setDefaultZone(self, zone):
+        if self.store.path('zones', zone) is None:
+            raise OfflineError("INVALID_ZONE: %s" % zone)
+        self.store.writeConf('default_zone', zone)
+        self.emit('default-zone-changed', zone)
+
+    def getLogDenied(self):
+        return self.store.readConf()['log_denied']
+
+    def setLogDenied(self, value):
+        self.store.writeConf('log_denied', value)
+        self.emit('log-denied-changed', value)
+
+    def getAutomaticHelpers(self):
+        return self.store.readConf()['automatic_helpers']
+
+    def setAutomaticHelpers(self, value):
+        self.store.writeConf('automatic_helpers', value)
+
+    def queryPanicMode(self):
+        return False
+
+    # runtime reads: the permanent configuration, as loaded at start
+
+    def getActiveZones(self):
+        active = {}
+        for name in self.store.names('zones'):
+            interfaces, sources = self.store.bindings(name)
+            if interfaces or sources:
+                active[name] = {'interfaces': sorted(interfaces),
+                                'sources': sorted(sources)}
+        return active
+
+    def getEntries(self, ipset):
+        return sorted(self.store.read('ipsets', ipset).entries)
+
+    def __getattr__(self, method):
+        if method in self.RUNTIME_NAMES:
+            return lambda: self.store.names(self.RUNTIME_NAMES[method])
+        if method in self.RUNTIME_SETTINGS:
+            category = self.RUNTIME_SETTINGS[method]
+            return lambda name: self.store.read(category, name).toSettings(self.newSettings(category))
+        if method.startswith('_'):
+            raise AttributeError(method)
+
+        def runtime_change(*args, **kwargs):
+            raise OfflineError("%s: no runtime configuration in offline mode" % method)
+        return runtime_change
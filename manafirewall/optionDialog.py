@@ -13,6 +13,9 @@ import os
 
 from firewall import config
 import manatools.ui.basedialog as basedialog
+import manafirewall.watchdog as watchdog
+import manafirewall.asynclog as asynclog
+import manafirewall.journal as journal
 import logging
 logger = logging.getLogger('manafirewall.optiondialog')
 
@@ -181,6 +184,13 @@ class OptionDialog(basedialog.BaseDialog):
     self.factory.createVSpacing(vbox, 0.3)
     heading.setAutoWrap()
 
+    if not self.parent.model.connected:
+      # still connecting, the values are read from firewalld
+      self.factory.createLabel(vbox, _("Not connected to firewalld yet, please reopen these options later."))
+      self.factory.createVStretch(vbox)
+      self.config_tab.showChild()
+      return
+
     hbox = self.factory.createHBox(self.factory.createLeft(vbox))
     defaultZoneCombo = self.factory.createComboBox( hbox, _("Default Zone") )
     defaultZoneCombo.setNotify(True)
@@ -274,6 +284,24 @@ class OptionDialog(basedialog.BaseDialog):
     self.eventManager.addWidgetEvent(cb_ipsets, _onCbIPSets, True)
     self.widget_callbacks.append({'widget': cb_ipsets, 'handler': _onCbIPSets})
 
+    # ── Out-of-band configuration file edits ───────────────────────────────
+    cb_watch = self.factory.createCheckBox(
+        self.factory.createLeft(vbox), _("Watch configuration files"), _s.get('watch_config_files', False))
+    cb_watch.setNotify(True)
+    try:
+      cb_watch.setHelpText(_("Notice zones, services and IP sets edited directly on disk "
+                             "(by an administrator or a configuration management tool), "
+                             "refresh them and warn that firewalld has not loaded them yet."))
+    except Exception:
+      pass
+
+    def _onCbWatch(obj):
+      if obj.widgetClass() == "YCheckBox":
+        self._ensure_settings()['watch_config_files'] = obj.isChecked()
+
+    self.eventManager.addWidgetEvent(cb_watch, _onCbWatch, True)
+    self.widget_callbacks.append({'widget': cb_watch, 'handler': _onCbWatch})
+
     self.factory.createVSpacing(vbox, 0.3)
 
     # ── Expert tabs (Zones right-pane) ────────────────────────────────────
@@ -388,6 +416,36 @@ class OptionDialog(basedialog.BaseDialog):
     level_debug = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'level_debug',
                                       default=False)
 
+    log_json = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'json',
+                                   default=False)
+
+    log_max_size = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'max_size_mb',
+                                       default=asynclog.DEFAULT_MAX_SIZE_MB)
+
+    log_backups = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'backups',
+                                      default=asynclog.DEFAULT_BACKUPS)
+
+    log_compress = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'compress',
+                                       default=False)
+
+    log_profiling = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'profiling',
+                                        default=False)
+
+    log_watchdog = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'watchdog',
+                                       default=False)
+
+    watchdog_budget = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'watchdog_budget_ms',
+                                          default=watchdog.DEFAULT_BUDGET_MS)
+
+    memory_diagnostics = self._safe_cfg_get(self._user_prefs(), 'settings', 'log', 'memory_diagnostics',
+                                             default=False)
+
+    journal_enabled = self._safe_cfg_get(self._user_prefs(), 'settings', 'journal', 'enabled',
+                                          default=True)
+
+    journal_retention = self._safe_cfg_get(self._user_prefs(), 'settings', 'journal', 'retention_days',
+                                            default=journal.DEFAULT_RETENTION_DAYS)
+
     # Ensure the 'log' sub-dict exists in userPreferences['settings'] for later writes
     self._ensure_settings().setdefault('log', {})
 
@@ -411,8 +469,62 @@ class OptionDialog(basedialog.BaseDialog):
     self.eventManager.addWidgetEvent(self.level_debug, self.onLevelDebugChange, True)
     self.widget_callbacks.append( { 'widget': self.level_debug, 'handler': self.onLevelDebugChange} )
 
+    self.log_json = self.factory.createCheckBox(self.log_vbox , _("JSON lines format (manafirewall.jsonl)"), log_json )
+    self.log_json.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_json, self.onLogJSONChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_json, 'handler': self.onLogJSONChange} )
+
+    hbox = self.factory.createHBox(self.log_vbox)
+    self.log_max_size = self.factory.createIntField(hbox, _("Rotate at (MB)"), 1, 1024, log_max_size)
+    self.log_max_size.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_max_size, self.onLogMaxSizeChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_max_size, 'handler': self.onLogMaxSizeChange} )
+    self.factory.createHSpacing(hbox)
+    self.log_backups = self.factory.createIntField(hbox, _("Rotated files kept"), 0, 100, log_backups)
+    self.log_backups.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_backups, self.onLogBackupsChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_backups, 'handler': self.onLogBackupsChange} )
+
+    self.log_compress = self.factory.createCheckBox(self.log_vbox , _("Compress rotated files (gzip)"), log_compress )
+    self.log_compress.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_compress, self.onLogCompressChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_compress, 'handler': self.onLogCompressChange} )
+
+    self.log_profiling = self.factory.createCheckBox(self.log_vbox , _("Profiling (handler latencies and D-Bus calls, Options menu report)"), log_profiling )
+    self.log_profiling.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_profiling, self.onProfilingChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_profiling, 'handler': self.onProfilingChange} )
+
+    hbox = self.factory.createHBox(self.log_vbox)
+    self.log_watchdog = self.factory.createCheckBox(self.factory.createLeft(hbox), _("Log UI stalls longer than"), log_watchdog )
+    self.log_watchdog.setNotify(True)
+    self.eventManager.addWidgetEvent(self.log_watchdog, self.onWatchdogChange, True)
+    self.widget_callbacks.append( { 'widget': self.log_watchdog, 'handler': self.onWatchdogChange} )
+    self.watchdog_budget = self.factory.createIntField(hbox, _("ms"), 50, 10000, watchdog_budget)
+    self.watchdog_budget.setNotify(True)
+    self.eventManager.addWidgetEvent(self.watchdog_budget, self.onWatchdogBudgetChange, True)
+    self.widget_callbacks.append( { 'widget': self.watchdog_budget, 'handler': self.onWatchdogBudgetChange} )
+    self.watchdog_budget.setEnabled(log_watchdog)
+
+    self.memory_diagnostics = self.factory.createCheckBox(self.log_vbox , _("Memory diagnostics (slower, logs growth every 5 minutes)"), memory_diagnostics )
+    self.memory_diagnostics.setNotify(True)
+    self.eventManager.addWidgetEvent(self.memory_diagnostics, self.onMemoryDiagnosticsChange, True)
+    self.widget_callbacks.append( { 'widget': self.memory_diagnostics, 'handler': self.onMemoryDiagnosticsChange} )
+
     self.log_vbox.setEnabled(log_enabled)
 
+    self.factory.createVSpacing(vbox, 0.3*self._VSPACING_PX)
+    self.journal_enabled = self.factory.createCheckBoxFrame(vbox, _("Audit journal of changes and firewalld events"), journal_enabled)
+    self.journal_enabled.setNotify(True)
+    self.eventManager.addWidgetEvent(self.journal_enabled, self.onJournalChange, True)
+    self.widget_callbacks.append( { 'widget': self.journal_enabled, 'handler': self.onJournalChange} )
+    hbox = self.factory.createHBox(self.journal_enabled)
+    self.journal_retention = self.factory.createIntField(hbox, _("Keep entries for (days)"), 1, 3650, journal_retention)
+    self.journal_retention.setNotify(True)
+    self.eventManager.addWidgetEvent(self.journal_retention, self.onJournalRetentionChange, True)
+    self.widget_callbacks.append( { 'widget': self.journal_retention, 'handler': self.onJournalRetentionChange} )
+    self.journal_retention.setEnabled(journal_enabled)
+
     self.factory.createVStretch(vbox)
     self.config_tab.showChild()
 
@@ -471,6 +583,98 @@ class OptionDialog(basedialog.BaseDialog):
     else:
       logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
 
+  def onLogJSONChange(self, obj):
+    '''
+    JSON lines log format Changing
+    '''
+    if obj.widgetClass() == "YCheckBox":
+      self._ensure_settings().setdefault('log', {})['json'] = obj.isChecked()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onLogMaxSizeChange(self, obj):
+    '''
+    Log rotation size Changing
+    '''
+    if obj.widgetClass() == "YIntField":
+      self._ensure_settings().setdefault('log', {})['max_size_mb'] = obj.value()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onLogBackupsChange(self, obj):
+    '''
+    Number of rotated log files Changing
+    '''
+    if obj.widgetClass() == "YIntField":
+      self._ensure_settings().setdefault('log', {})['backups'] = obj.value()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onLogCompressChange(self, obj):
+    '''
+    Rotated log files compression Changing
+    '''
+    if obj.widgetClass() == "YCheckBox":
+      self._ensure_settings().setdefault('log', {})['compress'] = obj.isChecked()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onJournalChange(self, obj):
+    '''
+    Audit journal enabling Changing
+    '''
+    if obj.widgetClass() == "YCheckBoxFrame":
+      self._ensure_settings().setdefault('journal', {})['enabled'] = obj.value()
+      self.journal_retention.setEnabled(obj.value())
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onJournalRetentionChange(self, obj):
+    '''
+    Audit journal retention Changing
+    '''
+    if obj.widgetClass() == "YIntField":
+      self._ensure_settings().setdefault('journal', {})['retention_days'] = obj.value()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onProfilingChange(self, obj):
+    '''
+    Profiling Changing
+    '''
+    if obj.widgetClass() == "YCheckBox":
+      self._ensure_settings().setdefault('log', {})['profiling'] = obj.isChecked()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onWatchdogChange(self, obj):
+    '''
+    Stall watchdog Changing
+    '''
+    if obj.widgetClass() == "YCheckBox":
+      self._ensure_settings().setdefault('log', {})['watchdog'] = obj.isChecked()
+      self.watchdog_budget.setEnabled(obj.isChecked())
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onWatchdogBudgetChange(self, obj):
+    '''
+    Stall watchdog budget Changing
+    '''
+    if obj.widgetClass() == "YIntField":
+      self._ensure_settings().setdefault('log', {})['watchdog_budget_ms'] = obj.value()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
+  def onMemoryDiagnosticsChange(self, obj):
+    '''
+    Memory diagnostics Changing
+    '''
+    if obj.widgetClass() == "YCheckBox":
+      self._ensure_settings().setdefault('log', {})['memory_diagnostics'] = obj.isChecked()
+    else:
+      logger.error("OptionDialog: Invalid object passed %s", obj.widgetClass())
+
   def onPanicModeChange(self, obj):
     '''
     Panic Mode Changing
@@ -506,9 +710,10 @@ class OptionDialog(basedialog.BaseDialog):
       old_ldValue = self.parent.fw.getLogDenied()
       logger.debug("New Log Denied %s", new_ldValue)
       if new_ldValue != old_ldValue:
-        self.parent.fw.setLogDenied(new_ldValue)
-        # set log denied force reload to update log denied status in runtime
-        self.parent._reloading = True
+        # firewalld reloads to apply it, the model raises the reload
+        # barrier only if the call succeeded
+        if not self.parent.model.setLogDenied(new_ldValue):
+          logger.warning("Cannot set Log Denied to %s", new_ldValue)
     else:
       logger.error("Invalid object passed %s", obj.widgetClass())
 
@@ -531,6 +736,7 @@ class OptionDialog(basedialog.BaseDialog):
     if k == "layout":
       s = self._ensure_settings()
       s['show_ipsets']         = False
+      s['watch_config_files']  = False
       s['show_interfaces_tab'] = False
       s['show_sources_tab']    = False
       s['show_rich_rules_tab'] = False
@@ -540,6 +746,18 @@ class OptionDialog(basedialog.BaseDialog):
         'enabled': False,
         'directory': os.path.expanduser("~"),
         'level_debug': False,
+        'json': False,
+        'max_size_mb': asynclog.DEFAULT_MAX_SIZE_MB,
+        'backups': asynclog.DEFAULT_BACKUPS,
+        'compress': False,
+        'profiling': False,
+        'watchdog': False,
+        'watchdog_budget_ms': watchdog.DEFAULT_BUDGET_MS,
+        'memory_diagnostics': False,
+      }
+      self._ensure_settings()['journal'] = {
+        'enabled': True,
+        'retention_days': journal.DEFAULT_RETENTION_DAYS,
       }
       self._openLoggingOptions()
 
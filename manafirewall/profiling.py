@@ -0,0 +1,336 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+profiling — optional latency and D-Bus call accounting of the running
+application (Logging options, "Profiling").
+
+The process wide profiler collects, while enabled:
+
+ - handlers: latency histograms of the functions decorated with
+   TimeFunction, the UI handlers and the fill functions of the dialog;
+ - events: time spent by the subscribers of each router event;
+ - queue: latency of each router event, from the signal arrival in the
+   GLib thread (EventRouter.post) to the end of its handling in the UI
+   thread;
+ - dbus: latency of each D-Bus method called through an AccountingClient;
+ - actions: D-Bus calls per user action. The outermost TimeFunction call
+   of the UI thread, or the dispatch of a router event, is the current
+   action; the calls done through an AccountingClient are counted under
+   it, and a read repeated with the same arguments within one run of the
+   action is counted as a duplicate.
+
+Histograms have fixed logarithmic buckets, recording is a bisect and a few
+additions. When disabled TimeFunction costs an attribute test and nothing
+else is installed.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import bisect
+import collections
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger('manafirewall.profiling')
+
+PROFILE_FORMAT = 'manafirewall-profile'
+PROFILE_VERSION = 1
+
+# bucket upper bounds in seconds, the last bucket is unbounded
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# calls done outside any action (background threads, startup)
+NO_ACTION = '(none)'
+
+
+class Histogram:
+    '''Latency histogram with the BUCKETS bounds.'''
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        '''Upper bound of the bucket holding the q quantile, at most the
+        maximum, None if empty.'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def asDict(self):
+        return {
+            'count':   self.count,
+            'total_s': self.total,
+            'mean_s':  self.total / self.count if self.count else None,
+            'p50_s':   self.quantile(0.5),
+            'p95_s':   self.quantile(0.95),
+            'p99_s':   self.quantile(0.99),
+            'max_s':   self.max,
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['inf'], self.counts)),
+        }
+
+
+# D-Bus methods not changing anything, see Profiler.countCall()
+READ_PREFIXES = ('get', 'list', 'query', 'is')
+
+# client methods not calling firewalld, not accounted
+LOCAL_METHODS = frozenset(('config', 'connect', 'setExceptionHandler', 'getExceptionHandler',
+                           'setNotAuthorizedLoop', 'getNotAuthorizedLoop'))
+
+
+class _Action:
+    __slots__ = ('histogram', 'calls', 'duplicates')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.calls = collections.Counter()
+        self.duplicates = collections.Counter()
+
+
+class Profiler:
+    '''Collects the measures, see the module documentation. record() and
+    countCall() may be called from any thread.'''
+
+    def __init__(self):
+        self.enabled = False
+        self.started = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def enable(self, enabled=True):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._histograms = {'handlers': {}, 'events': {}, 'queue': {}, 'dbus': {}}
+            self._actions = {}
+
+    # ------------------------------------------------------------------
+    # recording
+    # ------------------------------------------------------------------
+
+    def record(self, kind, name, seconds):
+        '''Add a measure to the kind ('handlers', 'events', 'queue',
+        'dbus') histogram of name.'''
+        with self._lock:
+            histograms = self._histograms[kind]
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def _currentAction(self):
+        return getattr(self._local, 'action', None)
+
+    def run(self, name, func, args=(), kwargs=None, kind='handlers'):
+        '''Call func measuring it as name; the outermost call of a thread
+        is an action.'''
+        outer = self._currentAction() is None
+        if outer:
+            self._local.action = name
+            self._local.reads = set()
+        start = time.monotonic()
+        try:
+            return func(*args, **(kwargs or {}))
+        finally:
+            elapsed = time.monotonic() - start
+            self.record(kind, name, elapsed)
+            if outer:
+                self._local.action = None
+                with self._lock:
+                    self._action(name).histogram.add(elapsed)
+            if elapsed >= 0.001:
+                logger.debug("%s took %.3f sec", name, elapsed)
+
+    def _action(self, name):
+        action = self._actions.get(name)
+        if action is None:
+            action = self._actions[name] = _Action()
+        return action
+
+    def countCall(self, method, args=(), seconds=None):
+        '''A D-Bus call has been done, counted under the current action.
+        seconds is its latency, if known.'''
+        name = self._currentAction()
+        duplicate = None
+        if name is not None and method.rpartition('.')[2].startswith(READ_PREFIXES):
+            call = "%s%r" % (method, tuple(args))
+            if call in self._local.reads:
+                duplicate = call
+            else:
+                self._local.reads.add(call)
+        with self._lock:
+            action = self._action(name or NO_ACTION)
+            action.calls[method] += 1
+            if duplicate is not None:
+                action.duplicates[duplicate] += 1
+        if seconds is not None:
+            self.record('dbus', method, seconds)
+
+    def callStats(self):
+        '''Returns ({method: Histogram dict}, {action: (runs, calls,
+        duplicates)}) for the bus statistics.'''
+        with self._lock:
+            methods = {name: h.asDict() for name, h in self._histograms['dbus'].items()}
+            actions = {name: (a.histogram.count, sum(a.calls.values()), dict(a.duplicates))
+                       for name, a in self._actions.items() if a.calls}
+        return methods, actions
+
+    # ------------------------------------------------------------------
+    # reports
+    # ------------------------------------------------------------------
+
+    def asDict(self):
+        with self._lock:
+            document = {
+                'format':  PROFILE_FORMAT,
+                'version': PROFILE_VERSION,
+                'started': self.started,
+                'time':    time.time(),
+            }
+            for kind, histograms in self._histograms.items():
+                document[kind] = {name: h.asDict() for name, h in sorted(histograms.items())}
+            document['actions'] = {
+                name: {'count': a.histogram.count,
+                       'latency': a.histogram.asDict(),
+                       'dbus_calls': sum(a.calls.values()),
+                       'dbus_calls_per_action': (sum(a.calls.values()) / a.histogram.count
+                                                 if a.histogram.count else None),
+                       'methods': dict(a.calls.most_common()),
+                       'duplicate_reads': dict(a.duplicates.most_common())}
+                for name, a in sorted(self._actions.items())
+            }
+        return document
+
+    def dump(self, path):
+        '''Write the measures as JSON to path.'''
+        with open(path, 'w') as f:
+            json.dump(self.asDict(), f, indent=2, sort_keys=True)
+
+    def report(self, top=15):
+        '''Returns the measures as text lines, slowest first.'''
+        document = self.asDict()
+        lines = []
+        for kind in ('handlers', 'events', 'queue', 'dbus'):
+            entries = sorted(document[kind].items(), key=lambda e: e[1]['total_s'], reverse=True)
+            if not entries:
+                continue
+            lines.append("%s (count, p50, p95, max ms):" % kind)
+            for name, h in entries[:top]:
+                lines.append("  %-40s %6d %8.2f %8.2f %8.2f" % (
+                    name, h['count'], h['p50_s'] * 1000, h['p95_s'] * 1000, h['max_s'] * 1000))
+        entries = sorted(document['actions'].items(), key=lambda e: e[1]['dbus_calls'], reverse=True)
+        if entries:
+            lines.append("D-Bus calls per action (actions, calls, per action, top methods):")
+            for name, a in entries[:top]:
+                methods = ", ".join("%s %d" % m for m in list(a['methods'].items())[:3])
+                per_action = a['dbus_calls_per_action']
+                lines.append("  %-40s %6d %6d %8s  %s" % (
+                    name, a['count'], a['dbus_calls'],
+                    "%.1f" % per_action if per_action is not None else "-", methods))
+        duplicates = [(n, call, count) for n, a in document['actions'].items()
+                      for call, count in a['duplicate_reads'].items()]
+        if duplicates:
+            lines.append("Duplicate reads within one action (action, call, repeats):")
+            for name, call, count in sorted(duplicates, key=lambda d: d[2], reverse=True)[:top]:
+                lines.append("  %-40s %s %d" % (name, call, count))
+        return lines
+
+
+# the application profiler
+profiler = Profiler()
+
+
+def TimeFunction(func):
+    """
+    This decorator measures execution time into the profiler, when enabled
+    """
+    name = func.__qualname__
+
+    def newFunc(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        return profiler.run(name, func, args, kwargs)
+
+    newFunc.__name__ = func.__name__
+    newFunc.__qualname__ = func.__qualname__
+    newFunc.__doc__ = func.__doc__
+    newFunc.__dict__.update(func.__dict__)
+    return newFunc
+
+
+class ClientProxy:
+    '''Base of the FirewallClient proxies (AccountingClient,
+    journal.JournalClient), the proxied object is _client.'''
+
+    def __init__(self, client):
+        self._client = client
+
+
+def proxiedClass(obj):
+    '''Class of obj, or of the object behind the client proxies wrapping
+    it.'''
+    while isinstance(obj, ClientProxy):
+        obj = obj._client
+    return type(obj)
+
+
+class AccountingClient(ClientProxy):
+    '''Proxy of a FirewallClient accounting its D-Bus calls into a
+    Profiler: latency, calls per action and duplicate reads. The D-Bus
+    objects it returns (config(), getZoneByName()...) are proxied as well,
+    their calls named Class.method; settings objects are local.'''
+
+    def __init__(self, client, profiler, prefix=''):
+        ClientProxy.__init__(self, client)
+        self._profiler = profiler
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        method = self._prefix + name
+        profiler = self._profiler
+        local = name in LOCAL_METHODS
+
+        def accounted(*args, **kwargs):
+            if local or not profiler.enabled:
+                result = attr(*args, **kwargs)
+            else:
+                start = time.monotonic()
+                try:
+                    result = attr(*args, **kwargs)
+                finally:
+                    profiler.countCall(method, args, time.monotonic() - start)
+            cls = proxiedClass(result)
+            if cls.__module__ == 'firewall.client' and not cls.__name__.endswith('Settings'):
+                return AccountingClient(result, profiler, cls.__name__ + '.')
+            return result
+        return accounted
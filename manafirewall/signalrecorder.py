@@ -0,0 +1,81 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+signalrecorder — records the firewalld signals received by the model, to
+replay them later (see benchmarks.replay).
+
+A recording is a gzip compressed JSON lines file: a header
+
+    {"format": "manafirewall-signals", "version": 1, "time": epoch}
+
+then one [seconds since start, signal, [arguments]] line per signal, as
+received by the ManaFirewallModel *_cb callbacks (signal is the
+FirewallClient signal name, e.g. "config:zone-updated"). D-Bus values are
+written as the JSON of the Python type they derive from.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import atexit
+import gzip
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger('manafirewall.signalrecorder')
+
+RECORDING_FORMAT = 'manafirewall-signals'
+RECORDING_VERSION = 1
+
+
+class SignalRecorder:
+    '''Writes the signals passed to the wrapped callbacks, see wrap().
+    Closed at exit.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps({'format': RECORDING_FORMAT, 'version': RECORDING_VERSION,
+                                     'time': time.time()}) + '\n')
+        self._start = time.monotonic()
+        atexit.register(self.close)
+        logger.info("Recording firewalld signals to %s", path)
+
+    def wrap(self, signal, callback):
+        '''Returns callback recording its calls as signal.'''
+        def recorded(*args):
+            self.record(signal, args)
+            return callback(*args)
+        return recorded
+
+    def record(self, signal, args):
+        line = json.dumps([round(time.monotonic() - self._start, 6), signal, list(args)],
+                          separators=(',', ':'), default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        logger.info("Recorded %d firewalld signals to %s", self.count, self.path)
+
+
+def load(path):
+    '''Returns the header and the list of (seconds, signal, arguments) of
+    a recording.'''
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != RECORDING_FORMAT or header.get('version') != RECORDING_VERSION:
+            raise ValueError("%s is not a signal recording" % path)
+        return header, [tuple(json.loads(line)) for line in f if line.strip()]
@@ -0,0 +1,327 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+snapshot — compact immutable snapshots of firewalld objects.
+
+FirewallClientZoneSettings and friends wrap mutable lists, so comparing or
+keeping several versions of them means deep copies. The classes here hold
+the same data as interned strings, tuples and frozensets:
+
+ - equality and hashing are cheap (the hash is computed once);
+ - replace() returns a new version sharing every unchanged field;
+ - diff() only looks at the fields that differ, and ConfigSnapshot.diff()
+   skips the objects shared by both versions by identity, so diffing two
+   versions costs O(changed).
+
+The get*() accessors mirror the firewalld settings API used by the views,
+returning sorted lists and dictionaries.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import sys
+
+# field kinds
+SCALAR = 'scalar'   # string or boolean
+SET = 'set'         # frozenset of strings or tuples of strings
+MAP = 'map'         # frozenset of (key, value) items
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (tuple, list)):
+        return tuple(_intern(v) for v in value)
+    return value
+
+
+def _freeze(kind, value):
+    if kind == SET:
+        return frozenset(_intern(v) for v in (value or ()))
+    if kind == MAP:
+        return frozenset((_intern(k), _intern(v)) for k, v in (value or {}).items())
+    return _intern(value)
+
+
+def _thaw(kind, value):
+    if kind == SET:
+        return sorted(value)
+    if kind == MAP:
+        return dict(value)
+    return value
+
+
+class ObjectSnapshot:
+    '''Base class of the zone, service and IP set snapshots.
+
+    FIELDS lists (attribute, settings getter suffix, kind); an accessor
+    get<suffix>() is added to each subclass. Fields the firewalld settings
+    class does not have (older firewalld) are None, and not written back.
+    '''
+
+    __slots__ = ('name', '_hash')
+    FIELDS = ()
+
+    def __init__(self, name, **fields):
+        object.__setattr__(self, 'name', sys.intern(name))
+        for attr, _suffix, kind in self.FIELDS:
+            object.__setattr__(self, attr, _freeze(kind, fields.get(attr)))
+        object.__setattr__(self, '_hash', None)
+
+    @classmethod
+    def fromSettings(cls, name, settings):
+        '''Build a snapshot from a firewalld settings object.'''
+        fields = {}
+        for attr, suffix, _kind in cls.FIELDS:
+            getter = getattr(settings, 'get' + suffix, None)
+            fields[attr] = getter() if getter is not None else None
+        return cls(name, **fields)
+
+    def toSettings(self, settings, attrs=None):
+        '''Write the given fields (all if None) into a firewalld settings
+        object, returns it.'''
+        for attr, suffix, kind in self.FIELDS:
+            if attrs is None or attr in attrs:
+                value = _thaw(kind, getattr(self, attr))
+                setter = getattr(settings, 'set' + suffix, None)
+                if value is not None and setter is not None:
+                    setter(value)
+        return settings
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def _values(self):
+        return tuple(getattr(self, attr) for attr, _suffix, _kind in self.FIELDS)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return hash(self) == hash(other) and self.name == other.name and \
+            self._values() == other._values()
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((type(self).__name__, self.name) + self._values()))
+        return self._hash
+
+    def __repr__(self):
+        return "<%s %s>" % (type(self).__name__, self.name)
+
+    def replace(self, **changes):
+        '''Return a new version with the given fields changed; unchanged
+        fields are shared with this one.'''
+        new = object.__new__(type(self))
+        object.__setattr__(new, 'name', sys.intern(changes.pop('name', self.name)))
+        for attr, _suffix, kind in self.FIELDS:
+            if attr in changes:
+                value = _freeze(kind, changes.pop(attr))
+            else:
+                value = getattr(self, attr)
+            object.__setattr__(new, attr, value)
+        object.__setattr__(new, '_hash', None)
+        if changes:
+            raise TypeError("Unknown fields %s" % ", ".join(changes))
+        return new
+
+    def diff(self, other):
+        '''
+        differences from this version to other, as a dictionary
+        attribute -> (added, removed) for sets and maps (as frozensets of
+        elements or items), attribute -> (old, new) for scalars
+        '''
+        changes = {}
+        if self is other:
+            return changes
+        for attr, _suffix, kind in self.FIELDS:
+            old = getattr(self, attr)
+            new = getattr(other, attr)
+            if old is new or old == new:
+                continue
+            if kind == SCALAR:
+                changes[attr] = (old, new)
+            else:
+                changes[attr] = (new - old, old - new)
+        return changes
+
+
+def _addAccessors(cls):
+    for attr, suffix, kind in cls.FIELDS:
+        def getter(self, _attr=attr, _kind=kind):
+            return _thaw(_kind, getattr(self, _attr))
+        getter.__name__ = 'get' + suffix
+        setattr(cls, getter.__name__, getter)
+    return cls
+
+
+@_addAccessors
+class ZoneSnapshot(ObjectSnapshot):
+    FIELDS = (
+        ('version',              'Version',            SCALAR),
+        ('short',                'Short',              SCALAR),
+        ('description',          'Description',        SCALAR),
+        ('target',               'Target',             SCALAR),
+        ('services',             'Services',           SET),
+        ('ports',                'Ports',              SET),
+        ('protocols',            'Protocols',          SET),
+        ('source_ports',         'SourcePorts',        SET),
+        ('forward_ports',        'ForwardPorts',       SET),
+        ('icmp_blocks',          'IcmpBlocks',         SET),
+        ('icmp_block_inversion', 'IcmpBlockInversion', SCALAR),
+        ('masquerade',           'Masquerade',         SCALAR),
+        ('interfaces',           'Interfaces',         SET),
+        ('sources',              'Sources',            SET),
+        ('rich_rules',           'RichRules',          SET),
+        # firewalld >= 1.0
+        ('forward',              'Forward',            SCALAR),
+        ('ingress_priority',     'IngressPriority',    SCALAR),
+        ('egress_priority',      'EgressPriority',     SCALAR),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+
+@_addAccessors
+class ServiceSnapshot(ObjectSnapshot):
+    FIELDS = (
+        ('version',      'Version',      SCALAR),
+        ('short',        'Short',        SCALAR),
+        ('description',  'Description',  SCALAR),
+        ('ports',        'Ports',        SET),
+        ('protocols',    'Protocols',    SET),
+        ('source_ports', 'SourcePorts',  SET),
+        ('modules',      'Modules',      SET),
+        ('destinations', 'Destinations', MAP),
+        ('includes',     'Includes',     SET),
+        ('helpers',      'Helpers',      SET),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+
+@_addAccessors
+class IPSetSnapshot(ObjectSnapshot):
+    FIELDS = (
+        ('version',     'Version',     SCALAR),
+        ('short',       'Short',       SCALAR),
+        ('description', 'Description', SCALAR),
+        ('type',        'Type',        SCALAR),
+        ('options',     'Options',     MAP),
+        ('entries',     'Entries',     SET),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+
+@_addAccessors
+class IcmpTypeSnapshot(ObjectSnapshot):
+    FIELDS = (
+        ('version',      'Version',      SCALAR),
+        ('short',        'Short',        SCALAR),
+        ('description',  'Description',  SCALAR),
+        ('destinations', 'Destinations', SET),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+
+@_addAccessors
+class HelperSnapshot(ObjectSnapshot):
+    FIELDS = (
+        ('version',     'Version',     SCALAR),
+        ('short',       'Short',       SCALAR),
+        ('description', 'Description', SCALAR),
+        ('family',      'Family',      SCALAR),
+        ('module',      'Module',      SCALAR),
+        ('ports',       'Ports',       SET),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+
+# category -> snapshot class
+CLASSES = {
+    'zones':     ZoneSnapshot,
+    'services':  ServiceSnapshot,
+    'ipsets':    IPSetSnapshot,
+    'icmptypes': IcmpTypeSnapshot,
+    'helpers':   HelperSnapshot,
+}
+
+
+class ConfigSnapshot:
+    '''One view (runtime or permanent) of zones, services, IP sets, ICMP
+    types and helpers.
+
+    Each category maps names to object snapshots. with*() and without()
+    return a new version sharing every untouched object.
+    '''
+
+    CATEGORIES = tuple(CLASSES)
+    __slots__ = CATEGORIES
+
+    def __init__(self, **categories):
+        for category in self.CATEGORIES:
+            object.__setattr__(self, category, dict(categories.pop(category, None) or {}))
+        if categories:
+            raise TypeError("Unknown categories %s" % ", ".join(categories))
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, ConfigSnapshot):
+            return NotImplemented
+        return not self.diff(other)
+
+    __hash__ = None
+
+    def _with(self, category, name, obj):
+        objects = dict(getattr(self, category))
+        if obj is None:
+            objects.pop(name, None)
+        else:
+            objects[obj.name] = obj
+        parts = {c: getattr(self, c) for c in self.CATEGORIES}
+        parts[category] = objects
+        return ConfigSnapshot(**parts)
+
+    def withZone(self, zone):
+        return self._with('zones', zone.name, zone)
+
+    def withService(self, service):
+        return self._with('services', service.name, service)
+
+    def withIPSet(self, ipset):
+        return self._with('ipsets', ipset.name, ipset)
+
+    def withObject(self, category, obj):
+        return self._with(category, obj.name, obj)
+
+    def without(self, category, name):
+        return self._with(category, name, None)
+
+    def diff(self, other):
+        '''
+        differences from this version to other:
+        {category: {'added': [names], 'removed': [names],
+                    'changed': {name: ObjectSnapshot.diff()}}}
+        only for categories that differ
+        '''
+        result = {}
+        for category in self.CATEGORIES:
+            old = getattr(self, category)
+            new = getattr(other, category)
+            if old is new:
+                continue
+            added = sorted(new.keys() - old.keys())
+            removed = sorted(old.keys() - new.keys())
+            changed = {}
+            for name in old.keys() & new.keys():
+                a, b = old[name], new[name]
+                # shared objects are skipped without looking inside
+                if a is b or a == b:
+                    continue
+                changed[name] = a.diff(b)
+            if added or removed or changed:
+                result[category] = {'added': added, 'removed': removed, 'changed': changed}
+        return result
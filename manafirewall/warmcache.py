@@ -0,0 +1,88 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+warmcache — last known firewalld state, painted at start before the
+connection is up.
+
+The cache holds what a reload snapshot holds (object names of both views,
+active zones, global options, see ManaFirewallModel.viewState()) plus the
+UI selection, in $XDG_CACHE_HOME/manafirewall/warmstart.json. It is keyed
+by the modification times of the firewalld configuration directories: a
+cache whose key differs is still shown, marked as outdated. Runtime
+changes do not touch those directories, so cached data is always shown as
+such until the connection replaces it.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('manafirewall.warmcache')
+
+CACHE_VERSION = 1
+
+# paths whose modification time keys the cache
+CONFIG_PATHS = (
+    '/etc/firewalld',
+    '/etc/firewalld/firewalld.conf',
+    '/etc/firewalld/zones',
+    '/etc/firewalld/services',
+    '/etc/firewalld/ipsets',
+    '/usr/lib/firewalld/zones',
+    '/usr/lib/firewalld/services',
+    '/usr/lib/firewalld/ipsets',
+)
+
+
+def defaultPath():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'manafirewall', 'warmstart.json')
+
+
+def configKey(paths=CONFIG_PATHS):
+    '''{path: mtime in ns}, None for missing paths.'''
+    key = {}
+    for path in paths:
+        try:
+            key[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            key[path] = None
+    return key
+
+
+def load(path=None):
+    '''
+    Returns (state, fresh): the cached state, None if there is none, and
+    whether the configuration files are unchanged since it was saved.
+    '''
+    path = path or defaultPath()
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, False
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring warm start cache %s: %s", path, e)
+        return None, False
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None, False
+    return data['state'], data['key'] == configKey(list(data['key']))
+
+
+def save(state, path=None):
+    '''Write the state, its 'time' is set to now.'''
+    path = path or defaultPath()
+    state = dict(state, time=time.time())
+    data = {'version': CACHE_VERSION, 'key': configKey(), 'state': state}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logger.warning("Cannot write warm start cache %s: %s", path, e)
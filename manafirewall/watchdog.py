@@ -0,0 +1,145 @@
+# vim: set fileencoding=utf-8 :
+# vim: set et ts=4 sw=4:
+'''
+watchdog — notices when the UI thread stops going back to its event loop
+(a hung firewalld or polkit, a slow path) and logs where it is stuck.
+
+The UI loop calls StallWatchdog.beat() at every doSomethingIntoLoop. A
+thread checks that the last beat is not older than the budget; when it is,
+and the UI thread is not simply waiting in a dialog event loop (a modal
+popup, a message box), the UI thread stack is logged, faulthandler style,
+together with the D-Bus method in flight if any. One report per stall,
+and no more than one every rate_limit seconds, the following ones are
+only counted.
+
+License: GPLv2+
+Author:  Angelo Naselli <anaselli@linux.it>
+@package manafirewall
+'''
+
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger('manafirewall.watchdog')
+
+DEFAULT_BUDGET_MS = 250
+
+# seconds between two stack reports
+DEFAULT_RATE_LIMIT = 60.0
+
+# where the UI thread waits for user events: being there is not a stall
+IDLE_PATHS = (os.path.join('manatools', 'ui') + os.sep,
+              os.path.join('manatools', 'aui') + os.sep)
+
+_CLIENT_PATH = os.path.join('firewall', 'client.py')
+_DBUS_PROXIES_PATH = os.path.join('dbus', 'proxies.py')
+
+
+def _frames(frame):
+    '''frame and its callers, innermost first'''
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def inFlightCall(frame):
+    '''Returns a description of the D-Bus call the stack of frame is doing,
+    None if none.'''
+    client_method = None
+    dbus_method = None
+    for f in _frames(frame):
+        filename = f.f_code.co_filename
+        if dbus_method is None and filename.endswith(_DBUS_PROXIES_PATH):
+            proxy_method = f.f_locals.get('self')
+            name = getattr(proxy_method, '_method_name', None)
+            if name:
+                interface = getattr(proxy_method, '_dbus_interface', None)
+                dbus_method = "%s.%s" % (interface, name) if interface else name
+        elif filename.endswith(_CLIENT_PATH) and not f.f_code.co_name.startswith('_'):
+            # keep the outermost FirewallClient method, decorators are _impl
+            client_method = f.f_code.co_name
+    if client_method and dbus_method:
+        return "%s (%s)" % (client_method, dbus_method)
+    return client_method or dbus_method
+
+
+class StallWatchdog:
+    '''Watches the UI thread (the one creating the watchdog by default)
+    from a daemon thread, see the module documentation.'''
+
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS, thread=None, rate_limit=DEFAULT_RATE_LIMIT):
+        self.budget = budget_ms / 1000.0
+        self.rate_limit = rate_limit
+        self._threadId = (thread or threading.current_thread()).ident
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stalledSince = None   # beat time of the stall being reported
+        self._lastReport = None
+        self.stalls = 0
+        self.suppressed = 0
+
+    def beat(self):
+        '''The UI loop is running, called by the UI thread.'''
+        self._beat = time.monotonic()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.beat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='manafirewall-watchdog', daemon=True)
+        self._thread.start()
+        logger.info("UI stall watchdog started, budget %d ms", self.budget * 1000)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        interval = max(self.budget / 2, 0.01)
+        while not self._stop.wait(interval):
+            self.check()
+
+    def check(self):
+        '''One watchdog round, returns True if a stall is going on.'''
+        beat = self._beat
+        now = time.monotonic()
+        if self._stalledSince is not None and beat != self._stalledSince:
+            logger.warning("UI loop stall ended after %.0f ms", (beat - self._stalledSince) * 1000)
+            self._stalledSince = None
+        if now - beat < self.budget:
+            return False
+        frame = sys._current_frames().get(self._threadId)
+        if frame is None or any(p in frame.f_code.co_filename for p in IDLE_PATHS):
+            # waiting for user input in a dialog loop, counts as a beat so
+            # that the time spent in a modal popup is not taken for a stall
+            self._beat = now
+            return False
+        if self._stalledSince == beat:
+            return True
+        self._stalledSince = beat
+        self.stalls += 1
+        if self._lastReport is not None and now - self._lastReport < self.rate_limit:
+            self.suppressed += 1
+            logger.warning("UI loop stalled for %.0f ms (stack not logged, %d suppressed)",
+                           (now - beat) * 1000, self.suppressed)
+            return True
+        self._lastReport = now
+        call = inFlightCall(frame)
+        stack = ''.join(traceback.format_stack(frame))
+        logger.warning("UI loop stalled for %.0f ms, budget %.0f ms%s\nUI thread stack (most recent call last):\n%s",
+                       (now - beat) * 1000, self.budget * 1000,
+                       ", in-flight D-Bus call: %s" % call if call else "", stack.rstrip())
+        return True